@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Mede o tempo do pós-processamento (ordenação, aba Árvore e filtro de ticker).
+
+Gera um DataFrame sintético no formato produzido por analisar_pasta_ou_zip e
+cronometra cada etapa isoladamente.
+
+Uso: scripts/profile_pos_processamento.py [--rows 500000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from extratorNotasCorretagem import (  # noqa: E402
+    _filter_dataframe_by_ticker,
+    criar_aba_arvore,
+    ordenar_dados_por_data,
+)
+
+TICKERS = ['PETR4', 'VALE3', 'PSSA3', 'ITSA4', 'BBAS3', 'WEGE3', 'KNCR11', 'HGLG11']
+
+
+def gerar_dataframe(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    datas = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 4000, rows), unit='D')
+    return pd.DataFrame({
+        'Data': datas.strftime('%d/%m/%Y'),
+        'Ticker': rng.choice([t.lower() if i % 2 else t for i, t in enumerate(TICKERS)], rows),
+        'Operação': rng.choice(['C', 'V'], rows),
+        'Quantidade': rng.integers(1, 1000, rows).astype(str),
+        'Preço': np.round(rng.uniform(1, 200, rows), 2).astype(str),
+    })
+
+
+def cronometrar(nome, func, repeat):
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    print(f'{nome:<32} melhor: {min(tempos):8.3f}s  média: {sum(tempos) / len(tempos):8.3f}s')
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = gerar_dataframe(args.rows)
+    print(f'DataFrame sintético: {len(df)} linhas')
+
+    ordenado = cronometrar(
+        'ordenar_dados_por_data', lambda: ordenar_dados_por_data(df.copy()), args.repeat
+    )
+    cronometrar('criar_aba_arvore', lambda: criar_aba_arvore(ordenado), args.repeat)
+    cronometrar(
+        '_filter_dataframe_by_ticker', lambda: _filter_dataframe_by_ticker(df, 'petr4'), args.repeat
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""Catálogo (índice SQLite) das notas de corretagem de uma pasta de entrada.
+
+Cada PDF — solto na pasta ou dentro de um ZIP — vira uma linha da tabela
+``notas`` com origem, hash do conteúdo, número de páginas, data(s) do pregão,
+número(s) da nota, corretora, se o PDF é criptografado e, para cópias exatas,
+a origem da qual ele é duplicata. O índice é montado lendo apenas o cabeçalho
+de cada página (sem extrair tabelas) e é incremental: arquivos com o mesmo
+tamanho e data de modificação não são relidos.
+
+A execução principal usa o catálogo para selecionar arquivos pela data real do
+pregão (--date-from/--date-to), pular duplicatas exatas encontradas soltas e em
+ZIPs e ordenar por data do pregão (--sort-by trade_date).
+
+Uso:
+    python3 src/extratorNotasCorretagem.py catalog [pasta] [--catalog catalogo.sqlite]
+    python3 src/catalog.py resouces/inputNotasCorretagem --list
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import zipfile
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOGO_ARQUIVO = "catalogo.sqlite"
+
+# Fração superior da página lida na varredura (número da nota, folha e data do pregão)
+_FRACAO_CABECALHO = 0.25
+_DATA_DESCONHECIDA = "9999-12-31"
+
+_RE_DATA = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+
+# Corretoras reconhecidas pelo texto do cabeçalho (primeira ocorrência vence)
+_CORRETORAS = [
+    ("Clear", re.compile(r"\bCLEAR\b", re.IGNORECASE)),
+    ("XP", re.compile(r"\bXP\s+INVESTIMENTOS\b", re.IGNORECASE)),
+    ("Rico", re.compile(r"\bRICO\b", re.IGNORECASE)),
+    ("BTG Pactual", re.compile(r"\bBTG\b", re.IGNORECASE)),
+    ("Inter", re.compile(r"\bINTER\s+(?:DTVM|DISTRIBUIDORA)\b", re.IGNORECASE)),
+    ("NuInvest", re.compile(r"\b(?:NU\s*INVEST|EASYNVEST)\b", re.IGNORECASE)),
+    ("Genial", re.compile(r"\bGENIAL\b", re.IGNORECASE)),
+    ("Itaú", re.compile(r"\bITA[ÚU]\b", re.IGNORECASE)),
+    ("Bradesco", re.compile(r"\bBRADESCO\b", re.IGNORECASE)),
+    ("Santander", re.compile(r"\bSANTANDER\b", re.IGNORECASE)),
+    ("Ágora", re.compile(r"\b[ÁA]GORA\b", re.IGNORECASE)),
+    ("Toro", re.compile(r"\bTORO\b", re.IGNORECASE)),
+    ("Modal", re.compile(r"\bMODAL\b", re.IGNORECASE)),
+]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS notas (
+    origem TEXT PRIMARY KEY,
+    caminho TEXT NOT NULL,
+    entrada_zip TEXT,
+    tamanho INTEGER,
+    mtime REAL,
+    hash_conteudo TEXT,
+    paginas INTEGER,
+    data_pregao TEXT,
+    datas_pregao TEXT,
+    numeros_nota TEXT,
+    corretora TEXT,
+    criptografado INTEGER NOT NULL DEFAULT 0,
+    duplicado_de TEXT,
+    erro TEXT,
+    indexado_em TEXT
+);
+CREATE INDEX IF NOT EXISTS notas_hash ON notas (hash_conteudo);
+CREATE INDEX IF NOT EXISTS notas_data ON notas (data_pregao);
+"""
+
+_COLUNAS = [
+    "origem",
+    "caminho",
+    "entrada_zip",
+    "tamanho",
+    "mtime",
+    "hash_conteudo",
+    "paginas",
+    "data_pregao",
+    "datas_pregao",
+    "numeros_nota",
+    "corretora",
+    "criptografado",
+    "duplicado_de",
+    "erro",
+    "indexado_em",
+]
+
+
+def caminho_catalogo_padrao() -> str:
+    """catalogo.sqlite na pasta de estatísticas."""
+    import extratorNotasCorretagem as extrator
+
+    return os.path.join(extrator.stats_folder, CATALOGO_ARQUIVO)
+
+
+def converter_data(valor: str) -> str:
+    """Converte DD/MM/AAAA ou AAAA-MM-DD em AAAA-MM-DD (ValueError se inválida)."""
+    texto = str(valor).strip()
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {valor!r} (use DD/MM/AAAA ou AAAA-MM-DD)")
+
+
+def origem_tarefa(tarefa: Dict[str, Any]) -> str:
+    """Identificador da tarefa no catálogo: caminho absoluto ou "arquivo.zip::entrada"."""
+    if tarefa["type"] == "zip_entry":
+        return f"{os.path.abspath(tarefa['zip'])}::{tarefa['name']}"
+    return os.path.abspath(tarefa["path"])
+
+
+def _conectar(caminho_catalogo: str) -> sqlite3.Connection:
+    pasta = os.path.dirname(caminho_catalogo)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    conn = sqlite3.connect(caminho_catalogo)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+def _ler_conteudo(tarefa: Dict[str, Any]) -> bytes:
+    if tarefa["type"] == "zip_entry":
+        with zipfile.ZipFile(tarefa["zip"], "r") as z:
+            return z.read(tarefa["name"])
+    with open(tarefa["path"], "rb") as arquivo:
+        return arquivo.read()
+
+
+def _texto_cabecalho(page) -> str:
+    """Texto da faixa superior da página; a página inteira se o recorte falhar."""
+    try:
+        recorte = page.crop((0, 0, page.width, page.height * _FRACAO_CABECALHO))
+        texto = recorte.extract_text()
+    except Exception:
+        texto = page.extract_text()
+    return texto or ""
+
+
+def _detectar_corretora(texto: str) -> str:
+    for nome, padrao in _CORRETORAS:
+        if padrao.search(texto):
+            return nome
+    return ""
+
+
+def _varrer_nota(tarefa: Dict[str, Any], abrir_pdf: Callable) -> Dict[str, Any]:
+    """Lê apenas os cabeçalhos do PDF e monta a linha do catálogo (sem origem/mtime)."""
+    from extratorNotasCorretagem import _extract_note_header, criar_bytesio_com_nome
+
+    conteudo = _ler_conteudo(tarefa)
+    linha: Dict[str, Any] = {
+        "hash_conteudo": hashlib.sha256(conteudo).hexdigest(),
+        # O dicionário /Encrypt fica no trailer (ou no dicionário do xref stream), sem compressão
+        "criptografado": int(b"/Encrypt" in conteudo),
+        "paginas": None,
+        "data_pregao": None,
+        "datas_pregao": None,
+        "numeros_nota": None,
+        "corretora": None,
+        "erro": None,
+    }
+    try:
+        pdf = abrir_pdf(criar_bytesio_com_nome(conteudo, tarefa["_name"]))
+        if pdf is None:
+            linha["erro"] = "PDF protegido"
+            return linha
+        datas: List[str] = []
+        notas: List[str] = []
+        corretora = ""
+        with pdf:
+            linha["paginas"] = len(pdf.pages)
+            for page in pdf.pages:
+                texto = _texto_cabecalho(page)
+                match_data = _RE_DATA.search(texto)
+                if match_data:
+                    dia, mes, ano = match_data.groups()
+                    data = f"{ano}-{mes}-{dia}"
+                    if data not in datas:
+                        datas.append(data)
+                nota, _ = _extract_note_header(texto)
+                if nota and nota not in notas:
+                    notas.append(nota)
+                corretora = corretora or _detectar_corretora(texto)
+    except Exception as e:
+        linha["erro"] = str(e)
+        return linha
+    linha["datas_pregao"] = ",".join(sorted(datas)) or None
+    linha["data_pregao"] = min(datas) if datas else None
+    linha["numeros_nota"] = ",".join(notas) or None
+    linha["corretora"] = corretora or None
+    return linha
+
+
+def _marcar_duplicatas(conn: sqlite3.Connection) -> int:
+    """Aponta duplicado_de de cada cópia exata para a origem canônica do mesmo hash.
+
+    A canônica é o PDF solto (antes de entradas de ZIP) e, entre iguais, a menor origem.
+    Returns:
+        Quantidade de duplicatas
+    """
+    conn.execute("UPDATE notas SET duplicado_de = NULL")
+    grupos: Dict[str, List[Tuple[int, str]]] = {}
+    for linha in conn.execute(
+        "SELECT origem, entrada_zip, hash_conteudo FROM notas WHERE hash_conteudo IS NOT NULL"
+    ):
+        grupos.setdefault(linha["hash_conteudo"], []).append(
+            (int(linha["entrada_zip"] is not None), linha["origem"])
+        )
+    duplicatas = []
+    for origens in grupos.values():
+        if len(origens) < 2:
+            continue
+        origens.sort()
+        canonica = origens[0][1]
+        duplicatas.extend((canonica, origem) for _, origem in origens[1:])
+    conn.executemany("UPDATE notas SET duplicado_de = ? WHERE origem = ?", duplicatas)
+    return len(duplicatas)
+
+
+def construir_catalogo(
+    caminho: str,
+    caminho_catalogo: Optional[str] = None,
+    abrir_pdf: Optional[Callable] = None,
+) -> Dict[str, Any]:
+    """Indexa (ou atualiza) o catálogo com todos os PDFs de uma pasta ou ZIP.
+
+    Args:
+        caminho: Pasta ou ZIP de entrada
+        caminho_catalogo: Arquivo SQLite (padrão: catalogo.sqlite na pasta de estatísticas)
+        abrir_pdf: Função que abre o PDF tratando senha (padrão: a da sessão padrão)
+
+    Returns:
+        Resumo com notes, scanned, reused, removed, duplicates, encrypted e catalog
+    """
+    from extratorNotasCorretagem import _listar_tarefas, sessao_padrao
+
+    caminho_catalogo = caminho_catalogo or caminho_catalogo_padrao()
+    abrir_pdf = abrir_pdf or sessao_padrao()._abrir_pdf
+    listagem = _listar_tarefas(caminho)
+    if listagem is None:
+        raise ValueError(f"Caminho não é arquivo ZIP ou pasta: {caminho}")
+    tarefas, _ = listagem
+    raiz = os.path.abspath(caminho)
+
+    varridos = 0
+    with closing(_conectar(caminho_catalogo)) as conn, conn:
+        existentes = {
+            linha["origem"]: (linha["tamanho"], linha["mtime"])
+            for linha in conn.execute(
+                "SELECT origem, tamanho, mtime FROM notas WHERE caminho = ? OR caminho LIKE ?",
+                (raiz, os.path.join(raiz, "%")),
+            )
+        }
+        vistos = set()
+        for tarefa in tarefas:
+            origem = origem_tarefa(tarefa)
+            vistos.add(origem)
+            if existentes.get(origem) == (tarefa["_size"], tarefa["_mtime"]):
+                continue
+            linha = _varrer_nota(tarefa, abrir_pdf)
+            linha.update(
+                origem=origem,
+                caminho=os.path.abspath(tarefa["zip"] if tarefa["type"] == "zip_entry" else tarefa["path"]),
+                entrada_zip=tarefa.get("name") if tarefa["type"] == "zip_entry" else None,
+                tamanho=tarefa["_size"],
+                mtime=tarefa["_mtime"],
+                duplicado_de=None,
+                indexado_em=datetime.now().isoformat(timespec="seconds"),
+            )
+            conn.execute(
+                f"INSERT OR REPLACE INTO notas ({', '.join(_COLUNAS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUNAS)})",
+                [linha[coluna] for coluna in _COLUNAS],
+            )
+            varridos += 1
+        removidos = [origem for origem in existentes if origem not in vistos]
+        conn.executemany("DELETE FROM notas WHERE origem = ?", [(origem,) for origem in removidos])
+        duplicatas = _marcar_duplicatas(conn)
+        criptografados = conn.execute(
+            "SELECT COUNT(*) FROM notas WHERE criptografado = 1"
+        ).fetchone()[0]
+
+    resumo = {
+        "catalog": caminho_catalogo,
+        "notes": len(tarefas),
+        "scanned": varridos,
+        "reused": len(tarefas) - varridos,
+        "removed": len(removidos),
+        "duplicates": duplicatas,
+        "encrypted": criptografados,
+    }
+    logger.info(
+        f"🗃️  Catálogo {caminho_catalogo}: {resumo['notes']} nota(s) | {varridos} lida(s) | "
+        f"{resumo['reused']} reaproveitada(s) | {duplicatas} duplicata(s)"
+    )
+    return resumo
+
+
+def carregar_catalogo(caminho_catalogo: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Retorna as linhas do catálogo indexadas pela origem ({} se o catálogo não existe)."""
+    caminho_catalogo = caminho_catalogo or caminho_catalogo_padrao()
+    if not os.path.exists(caminho_catalogo):
+        return {}
+    with closing(_conectar(caminho_catalogo)) as conn:
+        return {linha["origem"]: dict(linha) for linha in conn.execute("SELECT * FROM notas")}
+
+
+def selecionar_tarefas(
+    tarefas: List[Dict[str, Any]],
+    catalogo: Dict[str, Dict[str, Any]],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """Filtra as tarefas pelo intervalo de datas do pregão e descarta duplicatas exatas.
+
+    Um PDF entra se alguma das suas datas de pregão estiver no intervalo (datas em
+    AAAA-MM-DD). Uma duplicata só é descartada se a origem canônica também foi
+    selecionada. Cada tarefa recebe "_trade_date" (usado por --sort-by trade_date).
+
+    Returns:
+        tuple: (tarefas selecionadas, ignoradas pela data, duplicatas descartadas)
+    """
+    fora_do_intervalo = 0
+    selecionadas = []
+    for tarefa in tarefas:
+        linha = catalogo.get(origem_tarefa(tarefa), {})
+        datas = (linha.get("datas_pregao") or "").split(",") if linha.get("datas_pregao") else []
+        tarefa["_trade_date"] = linha.get("data_pregao") or _DATA_DESCONHECIDA
+        if date_from or date_to:
+            no_intervalo = [
+                data for data in datas
+                if (not date_from or data >= date_from) and (not date_to or data <= date_to)
+            ]
+            if not no_intervalo:
+                if not datas:
+                    logger.warning(f"⚠️  Data do pregão desconhecida no catálogo: {tarefa['_name']}")
+                fora_do_intervalo += 1
+                continue
+        selecionadas.append(tarefa)
+
+    origens = {origem_tarefa(tarefa) for tarefa in selecionadas}
+    unicas = []
+    duplicatas = 0
+    for tarefa in selecionadas:
+        canonica = catalogo.get(origem_tarefa(tarefa), {}).get("duplicado_de")
+        if canonica and canonica in origens:
+            logger.info(f"♊ Duplicata de {os.path.basename(canonica)} ignorada: {tarefa['_name']}")
+            duplicatas += 1
+            continue
+        unicas.append(tarefa)
+    return unicas, fora_do_intervalo, duplicatas
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="catalog",
+        description="Indexa as notas de uma pasta/ZIP lendo só os cabeçalhos (catálogo SQLite).",
+    )
+    parser.add_argument(
+        "caminho",
+        nargs="?",
+        default=None,
+        help="Pasta ou ZIP de entrada. Padrão: input.folder da configuração",
+    )
+    parser.add_argument(
+        "--catalog",
+        dest="caminho_catalogo",
+        default=None,
+        help=f"Arquivo SQLite do catálogo. Padrão: {CATALOGO_ARQUIVO} na pasta de estatísticas",
+    )
+    parser.add_argument("--list", action="store_true", help="Lista as notas indexadas")
+    args = parser.parse_args(argv)
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from extratorNotasCorretagem import config
+
+    caminho = args.caminho or config.resolve_path(config.get_input_folder())
+    try:
+        resumo = construir_catalogo(caminho, args.caminho_catalogo)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logger.error(f"✗ Erro ao montar o catálogo: {str(e)}")
+        return 1
+
+    if args.list:
+        for linha in sorted(
+            carregar_catalogo(resumo["catalog"]).values(),
+            key=lambda linha: (linha["data_pregao"] or _DATA_DESCONHECIDA, linha["origem"]),
+        ):
+            marcas = []
+            if linha["criptografado"]:
+                marcas.append("criptografado")
+            if linha["duplicado_de"]:
+                marcas.append(f"duplicata de {linha['duplicado_de']}")
+            print(
+                "\t".join(
+                    [
+                        linha["data_pregao"] or "?",
+                        linha["numeros_nota"] or "",
+                        linha["corretora"] or "",
+                        str(linha["paginas"] or 0),
+                        linha["origem"],
+                        ", ".join(marcas),
+                    ]
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ Módulo de Configuração - Carrega e gerencia configurações da aplicação
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 class ConfigManager:
@@ -17,7 +18,30 @@ class ConfigManager:
         'input.folder': 'resouces/inputNotasCorretagem',
         'output.folder': 'resouces/output',
         'logs.folder': 'resouces/output/logs',
-        'stats.folder': 'resouces/output/stats'
+        'stats.folder': 'resouces/output/stats',
+        'processing.file_timeout_seconds': '300',
+        'processing.max_rss_mb': '2048',
+        'processing.queue_lease_minutes': '120',
+        'web.max_concurrent_jobs': '2',
+        'web.max_queued_jobs': '8',
+        'web.max_jobs_per_client': '2',
+        'web.process_workers': '0',
+        'web.job_store': 'sqlite',
+        'web.job_store_path': '',
+        'web.max_upload_mb': '1024',
+        'web.max_request_mb': '4096',
+        'web.upload_chunk_kb': '1024',
+        'web.upload_prefetch_workers': '0',
+        'web.upload_sessions_folder': '',
+        'web.upload_chunk_max_mb': '64',
+        'web.upload_session_ttl_hours': '24',
+        'web.result_cache': 'true',
+        'web.result_cache_path': '',
+        'web.result_cache_ttl_days': '30',
+        'web.result_cache_max_files': '50000',
+        'web.job_ttl_hours': '24',
+        'web.janitor_interval_minutes': '10',
+        'web.compress_min_bytes': '1024'
     }
     
     def __init__(self, config_file='application.properties'):
@@ -86,6 +110,103 @@ class ConfigManager:
         """Obtém a pasta de estatísticas por execução"""
         return self.get('stats.folder')
     
+    def get_file_timeout_seconds(self):
+        """Obtém o tempo máximo (segundos) por arquivo no modo isolado"""
+        return float(self.get('processing.file_timeout_seconds'))
+
+    def get_max_rss_mb(self):
+        """Obtém a memória máxima (MB de RSS) por arquivo no modo isolado"""
+        return float(self.get('processing.max_rss_mb'))
+
+    def get_queue_lease_minutes(self):
+        """Obtém após quantos minutos sem renovação um lock da fila (--queue-dir) pode ser reassumido"""
+        return float(self.get('processing.queue_lease_minutes'))
+    
+    def get_web_max_concurrent_jobs(self):
+        """Obtém quantos jobs do webapp rodam ao mesmo tempo"""
+        return max(1, int(self.get('web.max_concurrent_jobs')))
+
+    def get_web_max_queued_jobs(self):
+        """Obtém quantos jobs do webapp podem aguardar na fila"""
+        return max(0, int(self.get('web.max_queued_jobs')))
+
+    def get_web_max_jobs_per_client(self):
+        """Obtém quantos jobs (na fila ou rodando) cada cliente do webapp pode ter"""
+        return max(1, int(self.get('web.max_jobs_per_client')))
+
+    def get_web_process_workers(self):
+        """Obtém o tamanho do pool de processos dos jobs do webapp (0 = número de CPUs)"""
+        workers = int(self.get('web.process_workers'))
+        return workers if workers > 0 else (os.cpu_count() or 1)
+
+    def get_web_job_store(self):
+        """Obtém o tipo de job store do webapp (sqlite ou memory)"""
+        return self.get('web.job_store').strip().lower()
+
+    def get_web_job_store_path(self):
+        """Obtém o arquivo SQLite dos jobs do webapp (padrão: pasta de estatísticas)"""
+        return self.get('web.job_store_path') or os.path.join(self.get_stats_folder(), 'web_jobs.sqlite')
+
+    def get_web_max_upload_mb(self):
+        """Obtém o tamanho máximo (MB) de cada arquivo enviado ao webapp"""
+        return float(self.get('web.max_upload_mb'))
+
+    def get_web_max_request_mb(self):
+        """Obtém o tamanho máximo (MB) de uma requisição de upload do webapp"""
+        return float(self.get('web.max_request_mb'))
+
+    def get_web_upload_chunk_kb(self):
+        """Obtém o tamanho (KB) dos blocos usados ao gravar uploads em disco"""
+        return max(1, int(self.get('web.upload_chunk_kb')))
+
+    def get_web_upload_prefetch_workers(self):
+        """Obtém quantas threads extraem os PDFs enquanto o upload ainda chega (0 = desativado)"""
+        return max(0, int(self.get('web.upload_prefetch_workers')))
+
+    def get_web_upload_sessions_folder(self):
+        """Obtém a pasta das sessões de upload retomável (padrão: pasta temporária do sistema)"""
+        return self.get('web.upload_sessions_folder') or os.path.join(
+            tempfile.gettempdir(), 'extrator_upload_sessions'
+        )
+
+    def get_web_upload_chunk_max_mb(self):
+        """Obtém o tamanho máximo (MB) de cada bloco de um upload retomável"""
+        return float(self.get('web.upload_chunk_max_mb'))
+
+    def get_web_upload_session_ttl_hours(self):
+        """Obtém por quantas horas uma sessão de upload sem atividade é mantida"""
+        return float(self.get('web.upload_session_ttl_hours'))
+
+    def get_web_result_cache(self):
+        """Indica se o webapp reaproveita registros e resultados de uploads já processados"""
+        return str(self.get('web.result_cache')).strip().lower() in ('true', '1', 'yes', 'sim')
+
+    def get_web_result_cache_path(self):
+        """Obtém o arquivo SQLite do cache de resultados (padrão: pasta de estatísticas)"""
+        return self.get('web.result_cache_path') or os.path.join(
+            self.get_stats_folder(), 'cache_resultados.sqlite'
+        )
+
+    def get_web_result_cache_ttl_days(self):
+        """Obtém por quantos dias os registros de um PDF sem uso ficam no cache de resultados"""
+        return float(self.get('web.result_cache_ttl_days'))
+
+    def get_web_result_cache_max_files(self):
+        """Obtém quantos PDFs o cache de registros guarda no máximo (0 = sem limite)"""
+        return max(0, int(self.get('web.result_cache_max_files')))
+
+    def get_web_job_ttl_hours(self):
+        """Obtém por quantas horas um job finalizado e seus arquivos exportados são mantidos"""
+        return float(self.get('web.job_ttl_hours'))
+
+    def get_web_janitor_interval_minutes(self):
+        """Obtém o intervalo (minutos) entre as limpezas de jobs e uploads expirados"""
+        return max(0.1, float(self.get('web.janitor_interval_minutes')))
+
+    def get_web_compress_min_bytes(self):
+        """Obtém o tamanho mínimo (bytes) de uma resposta JSON/HTML para comprimi-la com gzip/br"""
+        return max(0, int(self.get('web.compress_min_bytes')))
+
     def get_ticker_mapping(self) -> dict:
         """
         Carrega mapeamento de descrições de ativos para tickers B3
@@ -5,7 +5,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from config import get_config
 
@@ -51,6 +51,18 @@ def list_execution_history(limit: Optional[int] = None) -> List[Dict[str, Any]]:
     return history
 
 
+def history_signature() -> Tuple[Any, ...]:
+    """Nome, tamanho e mtime de cada execucao_*.json: muda quando uma execução grava seu arquivo."""
+    signature = []
+    for stats_file in STATS_DIR.glob("execucao_*.json"):
+        try:
+            stat = stats_file.stat()
+        except OSError:
+            continue
+        signature.append((stats_file.name, stat.st_size, stat.st_mtime_ns))
+    return (str(STATS_DIR), *sorted(signature))
+
+
 def build_history_summary(history: List[Dict[str, Any]]) -> Dict[str, Any]:
     total_runs = len(history)
     completed_runs = [run for run in history if run.get("status") == "completed"]
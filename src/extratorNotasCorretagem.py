@@ -1,50 +1,71 @@
-import pdfplumber
-import pandas as pd
+from __future__ import annotations
+
 import re
 import difflib
+import glob
+import hashlib
+import heapq
+import importlib.util
 import os
+import queue
 import zipfile
 import logging
+import multiprocessing
 import signal
+import socket
 import sys
+import threading
 import argparse
 import json
+import time
 from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from io import BytesIO
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional
+from functools import partial, wraps
+from typing import Any, Callable, Dict, List, Optional, Set
 from config import get_config
 
+
+def _importar_sob_demanda(nome: str):
+    """Importa um módulo só no primeiro acesso a um atributo (importlib.util.LazyLoader).
+
+    pandas, numpy e pdfplumber respondem pela maior parte do tempo de import deste
+    módulo; com a carga adiada, `--help`, o subcomando merge e quem só importa
+    funções auxiliares não pagam esse custo.
+    """
+    if nome in sys.modules:
+        return sys.modules[nome]
+    spec = importlib.util.find_spec(nome)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{nome}'", name=nome)
+    carregador = importlib.util.LazyLoader(spec.loader)
+    spec.loader = carregador
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    carregador.exec_module(modulo)
+    return modulo
+
+
+pdfplumber = _importar_sob_demanda("pdfplumber")
+np = _importar_sob_demanda("numpy")
+pd = _importar_sob_demanda("pandas")
+
 # Carregar configurações
 config = get_config()
 
-# Configuração de Logging
+# Configuração de Logging (aplicada por inicializar(); importar o módulo não cria pastas nem arquivos)
 logging_level = config.get_logging_level()
 logs_folder = config.resolve_path(config.get_logs_folder())
 stats_folder = config.resolve_path(config.get_stats_folder())
-
-# Criar pasta de logs se não existir
-if not os.path.exists(logs_folder):
-    os.makedirs(logs_folder)
-
-if not os.path.exists(stats_folder):
-    os.makedirs(stats_folder)
-
-# Gera nome do arquivo de log com timestamp
-log_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_file = os.path.join(logs_folder, f"extracao_{log_timestamp}.log")
-
-# Configurar logging com ambos console e arquivo
-logging.basicConfig(
-    level=getattr(logging, logging_level),
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%d/%m/%Y %H:%M:%S",
-    handlers=[logging.FileHandler(log_file, encoding="utf-8"), logging.StreamHandler()],
-)
+log_file: Optional[str] = None
 logger = logging.getLogger(__name__)
+_FORMATO_LOG = "%(asctime)s - %(levelname)s - %(message)s"
+_FORMATO_DATA_LOG = "%d/%m/%Y %H:%M:%S"
 
 # Flag para controle de interrupção pelo usuário (Ctrl+C)
 stop_processing = False
+_inicializado = False
 
 
 def _handle_sigint(signum, frame):
@@ -52,15 +73,47 @@ def _handle_sigint(signum, frame):
     if not stop_processing:
         stop_processing = True
         logger.warning(
-            "⏸️ Interrupção solicitada pelo usuário (Ctrl+C). Finalizando após o arquivo atual..."
+            "⏸️ Interrupção solicitada pelo usuário (Ctrl+C). Finalizando após a página atual..."
         )
     else:
         logger.error("✖ Forçando saída imediata por novo Ctrl+C")
         sys.exit(1)
 
 
-# Registra o handler para SIGINT
-signal.signal(signal.SIGINT, _handle_sigint)
+def inicializar(registrar_sigint: bool = True) -> Optional[str]:
+    """Prepara o ambiente da CLI e do webapp: pastas, arquivo de log e handler de Ctrl+C.
+
+    Cria as pastas de logs e de estatísticas, configura o logging (console e
+    arquivo extracao_<timestamp>.log) e registra o handler de SIGINT. Chamadas
+    repetidas não têm efeito.
+
+    Args:
+        registrar_sigint: False quando o processo já trata o Ctrl+C (ex.: uvicorn)
+
+    Returns:
+        Caminho do arquivo de log da execução
+    """
+    global log_file, _inicializado
+    if _inicializado:
+        return log_file
+    os.makedirs(logs_folder, exist_ok=True)
+    os.makedirs(stats_folder, exist_ok=True)
+
+    # Gera nome do arquivo de log com timestamp
+    log_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = os.path.join(logs_folder, f"extracao_{log_timestamp}.log")
+
+    # Configurar logging com ambos console e arquivo
+    logging.basicConfig(
+        level=getattr(logging, logging_level),
+        format=_FORMATO_LOG,
+        datefmt=_FORMATO_DATA_LOG,
+        handlers=[logging.FileHandler(log_file, encoding="utf-8"), logging.StreamHandler()],
+    )
+    if registrar_sigint:
+        signal.signal(signal.SIGINT, _handle_sigint)
+    _inicializado = True
+    return log_file
 
 
 def _format_elapsed(seconds: float) -> str:
@@ -106,7 +159,9 @@ def _count_total_pdfs(caminho):
         return 0
 
 
-def _build_execution_stats(caminho: str, year_filter: Optional[int], sort_by: str) -> Dict[str, Any]:
+def _build_execution_stats(
+    caminho: str, year_filter: Optional[int], sort_by: str, ticker_filter: Optional[str] = None
+) -> Dict[str, Any]:
     started_at = datetime.now()
     execution_id = started_at.strftime("%Y%m%d_%H%M%S_%f")
     return {
@@ -115,6 +170,7 @@ def _build_execution_stats(caminho: str, year_filter: Optional[int], sort_by: st
         "finished_at": None,
         "input_path": caminho,
         "year_filter": year_filter,
+        "ticker_filter": ticker_filter,
         "sort_by": sort_by,
         "status": "running",
         "totals": {
@@ -122,6 +178,7 @@ def _build_execution_stats(caminho: str, year_filter: Optional[int], sort_by: st
             "processed_files": 0,
             "failed_files": 0,
             "ignored_files": 0,
+            "quarantined_files": 0,
             "pages_processed": 0,
             "records_extracted": 0,
             "elapsed_seconds": 0.0,
@@ -167,6 +224,7 @@ def _finalize_execution_stats(stats: Dict[str, Any], status: str) -> Dict[str, A
 
 
 def _write_execution_stats(stats: Dict[str, Any]) -> str:
+    os.makedirs(stats_folder, exist_ok=True)
     stats_path = os.path.join(stats_folder, f"execucao_{stats['execution_id']}.json")
     with open(stats_path, "w", encoding="utf-8") as stats_file:
         json.dump(stats, stats_file, ensure_ascii=False, indent=2)
@@ -479,9 +537,13 @@ def _fuzzy_match_asset_name(cell_text: str, mapping_name: str) -> bool:
     - "SUZANO PAPEL ON NM" vs "SUZANOPAPEL ONNM" -> True (wordset match)
     - "SUZANO PAPEL ON NM" vs "PETROBRAS ON" -> False (0% overlap)
     """
-    cell_words = _extract_words_from_asset_name(cell_text)
-    mapping_words = _extract_words_from_asset_name(mapping_name)
+    return _fuzzy_match_words(
+        _extract_words_from_asset_name(cell_text), _extract_words_from_asset_name(mapping_name)
+    )
 
+
+def _fuzzy_match_words(cell_words: set, mapping_words: set) -> bool:
+    """Núcleo de _fuzzy_match_asset_name sobre conjuntos de palavras já extraídos."""
     if not mapping_words:
         return False
 
@@ -505,9 +567,13 @@ def _fuzzy_match_score(cell_text: str, mapping_name: str) -> float:
     - "PETROBRAS PN EJ N2" vs "PETROBRAS PN" → 0.8 (2/2 palavras do mapping, mas mapping é genérico)
     - "PETROBRAS PN EJ N2" vs "PETROBRAS ON" → 0.5 (1 palavra em comum, mapping genérico)
     """
-    cell_words = _extract_words_from_asset_name(cell_text)
-    mapping_words = _extract_words_from_asset_name(mapping_name)
+    return _fuzzy_score_words(
+        _extract_words_from_asset_name(cell_text), _extract_words_from_asset_name(mapping_name)
+    )
 
+
+def _fuzzy_score_words(cell_words: set, mapping_words: set) -> float:
+    """Núcleo de _fuzzy_match_score sobre conjuntos de palavras já extraídos."""
     if not mapping_words:
         return 0.0
 
@@ -535,83 +601,254 @@ def _string_similarity(a: str, b: str) -> float:
     return difflib.SequenceMatcher(None, a_norm, b_norm).ratio()
 
 
-def _extract_ticker_from_cells(cells, ticker_mapping=None):
-    """
-    Extrai ticker da linha, buscando padrão B3 ou nome de ativo conhecido.
+class _MapeamentoTickers:
+    """Mapeamento de tickers pré-processado para _extract_ticker_from_cells.
 
-    Estratégia (prioriza arquivo configurável sobre hardcoded):
-    1. Procura por padrão ticker B3 (4 letras + 2 dígitos)
-    2. Busca em ticker_mapping com correspondência exata
-    3. Busca em ticker_mapping com correspondência fuzzy (ordenada por score, prioriza descrições mais específicas)
-    4. Busca em DE_PARA_TICKERS (hardcoded) com correspondência exata
-    5. Busca em DE_PARA_TICKERS (hardcoded) com correspondência fuzzy (ordenada por score)
+    Normaliza os nomes e extrai os conjuntos de palavras de ticker_mapping e de
+    DE_PARA_TICKERS uma única vez, em vez de refazer isso para cada célula de
+    cada página. O resultado da busca é o mesmo da comparação direta com os dicionários.
     """
-    for cell in cells:
-        cell_str = str(cell).strip()
-        if not cell_str:
-            continue
 
-        # Passo 1: Tenta padrão ticker B3 (4 letras + 2 dígitos)
-        match = re.search(r"[A-Z]{4}\d{2}", cell_str)
-        if match:
-            return match.group(0)
+    def __init__(self, ticker_mapping: Optional[Dict[str, str]] = None):
+        self.ticker_mapping = ticker_mapping
+        self._mapeamento = self._compilar(ticker_mapping or {})
+        self._de_para = self._compilar(DE_PARA_TICKERS)
+        self.assinatura = hashlib.sha256(
+            json.dumps(ticker_mapping or {}, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _compilar(mapeamento: Dict[str, str]):
+        exatos: Dict[str, str] = {}
+        palavras = []
+        similares = []
+        for nome, ticker in mapeamento.items():
+            normalizado = _normalize_text_for_comparison(nome)
+            # Em nomes repetidos após a normalização vale o primeiro, como na busca sequencial
+            exatos.setdefault(normalizado, ticker)
+            palavras.append((_extract_words_from_asset_name(nome), ticker))
+            if nome:
+                similares.append((normalizado, ticker))
+        return exatos, palavras, similares
+
+    @staticmethod
+    def _melhor_fuzzy(cell_words: set, palavras) -> Optional[str]:
+        best_match = None
+        best_score = 0.0
+        for mapping_words, ticker in palavras:
+            if _fuzzy_match_words(cell_words, mapping_words):
+                score = _fuzzy_score_words(cell_words, mapping_words)
+                # Em caso de empate, a ordem do dicionário decide
+                if score > best_score:
+                    best_score = score
+                    best_match = ticker
+        return best_match
+
+    def extrair(self, cells) -> Optional[str]:
+        """Mesma estratégia de _extract_ticker_from_cells, usando os dados pré-processados."""
+        exatos_mapeamento, palavras_mapeamento, similares_mapeamento = self._mapeamento
+        exatos_de_para, palavras_de_para, similares_de_para = self._de_para
+        for cell in cells:
+            cell_str = str(cell).strip()
+            if not cell_str:
+                continue
 
-        cell_str_normalized = _normalize_text_for_comparison(cell_str)
+            # Passo 1: Tenta padrão ticker B3 (4 letras + 2 dígitos)
+            match = re.search(r"[A-Z]{4}\d{2}", cell_str)
+            if match:
+                return match.group(0)
 
-        # Passo 2: Tenta correspondência exata em ticker_mapping (configurável - PRIORIDADE)
-        if ticker_mapping:
-            for nome, ticker in ticker_mapping.items():
-                if _normalize_text_for_comparison(nome) == cell_str_normalized:
-                    return ticker
+            cell_str_normalized = _normalize_text_for_comparison(cell_str)
+            cell_words = _extract_words_from_asset_name(cell_str)
 
-        # Passo 3: Tenta correspondência fuzzy em ticker_mapping (prioriza descrições mais específicas)
-        if ticker_mapping:
-            best_match = None
-            best_score = 0.0
-            for nome, ticker in ticker_mapping.items():
-                if _fuzzy_match_asset_name(cell_str, nome):
-                    score = _fuzzy_match_score(cell_str, nome)
-                    # Prioriza matches com score mais alto (mais em comum)
-                    # Em caso de empate, a ordem do dicionário decide
-                    if score > best_score:
-                        best_score = score
-                        best_match = ticker
+            # Passos 2 e 3: ticker_mapping (configurável - PRIORIDADE), exato e fuzzy
+            if cell_str_normalized in exatos_mapeamento:
+                return exatos_mapeamento[cell_str_normalized]
+            best_match = self._melhor_fuzzy(cell_words, palavras_mapeamento)
             if best_match:
                 return best_match
 
-        # Passo 4: Tenta correspondência exata em DE_PARA (hardcoded - fallback)
-        for nome, ticker in DE_PARA_TICKERS.items():
-            if _normalize_text_for_comparison(nome) == cell_str_normalized:
-                return ticker
-
-        # Passo 5: Tenta correspondência fuzzy em DE_PARA (fallback ordenada por score)
-        best_match = None
-        best_score = 0.0
-        for nome, ticker in DE_PARA_TICKERS.items():
-            if _fuzzy_match_asset_name(cell_str, nome):
-                score = _fuzzy_match_score(cell_str, nome)
-                if score > best_score:
-                    best_score = score
-                    best_match = ticker
-        if best_match:
-            return best_match
+            # Passos 4 e 5: DE_PARA (hardcoded - fallback), exato e fuzzy
+            if cell_str_normalized in exatos_de_para:
+                return exatos_de_para[cell_str_normalized]
+            best_match = self._melhor_fuzzy(cell_words, palavras_de_para)
+            if best_match:
+                return best_match
 
-        # Passo 6: Última tentativa - correspondência por similaridade de string
-        # (cobre erros de digitação como 'BRASKEN' vs 'BRASKEM')
-        try:
-            for nome, ticker in ticker_mapping.items():
-                sim = _string_similarity(cell_str, nome)
-                if sim >= 0.85:
-                    return ticker
-            for nome, ticker in DE_PARA_TICKERS.items():
-                sim = _string_similarity(cell_str, nome)
+            # Passo 6: Última tentativa - correspondência por similaridade de string
+            # (cobre erros de digitação como 'BRASKEN' vs 'BRASKEM'); sem ticker_mapping não é feita
+            if self.ticker_mapping is None:
+                continue
+            for nome_normalizado, ticker in similares_mapeamento + similares_de_para:
+                sim = difflib.SequenceMatcher(None, cell_str_normalized, nome_normalizado).ratio()
                 if sim >= 0.85:
                     return ticker
-        except Exception:
-            pass
-    # Se não encontrou padrão, retorna None (linha provavelmente não é válida)
-    return None
+        # Se não encontrou padrão, retorna None (linha provavelmente não é válida)
+        return None
+
+
+class _FiltroTicker:
+    """Filtro de ticker (--ticker) aplicado durante a extração.
+
+    Reúne os apelidos do ticker alvo (o próprio código e as descrições de
+    ticker_mapping e DE_PARA_TICKERS que apontam para ele) para descartar, sem a
+    busca fuzzy completa, páginas e linhas que não podem resultar no ticker alvo.
+    """
+
+    def __init__(self, ticker: str, mapeamento: _MapeamentoTickers):
+        self.ticker = _normalize_ticker_value(ticker)
+        self.nomes = set()
+        self.palavras = set()
+        descricoes = list((mapeamento.ticker_mapping or {}).items()) + list(DE_PARA_TICKERS.items())
+        for nome, valor in descricoes:
+            if nome and _normalize_ticker_value(valor) == self.ticker:
+                self.nomes.add(_normalize_text_for_comparison(nome))
+                self.palavras |= _extract_words_from_asset_name(nome)
+        # O passo 6 (similaridade de string) só existe quando há ticker_mapping
+        self._similaridade = mapeamento.ticker_mapping is not None
+
+    def corresponde(self, ticker) -> bool:
+        return bool(ticker) and _normalize_ticker_value(ticker) == self.ticker
+
+    def pagina_relevante(self, texto) -> bool:
+        """Indica se o texto da página menciona o código ou algum apelido do ticker alvo.
+
+        Palavras com grafia próxima (cutoff 0.8) também contam, cobrindo os erros de
+        digitação que a similaridade de string da extração aceitaria.
+        """
+        if not texto:
+            return False
+        if self.ticker in _normalize_ticker_value(texto):
+            return True
+        palavras_pagina = set(_normalize_text_for_comparison(texto).split())
+        if palavras_pagina & self.palavras:
+            return True
+        return any(
+            difflib.get_close_matches(palavra, palavras_pagina, n=1, cutoff=0.8)
+            for palavra in self.palavras
+        )
+
+    def linha_candidata(self, cells) -> bool:
+        """Indica se alguma célula da linha pode ser resolvida para o ticker alvo.
+
+        Espelha os passos de _MapeamentoTickers.extrair restritos aos apelidos do alvo:
+        código na célula, nome exato, ao menos uma palavra em comum (pré-requisito do
+        fuzzy) ou limite superior da similaridade (quick_ratio) >= 0.85.
+        """
+        for cell in cells:
+            cell_str = str(cell).strip()
+            if not cell_str:
+                continue
+            if self.ticker in _normalize_ticker_value(cell_str):
+                return True
+            if not self.nomes:
+                continue
+            if _extract_words_from_asset_name(cell_str) & self.palavras:
+                return True
+            normalizado = _normalize_text_for_comparison(cell_str)
+            if normalizado in self.nomes:
+                return True
+            if self._similaridade:
+                for nome in self.nomes:
+                    comparador = difflib.SequenceMatcher(None, normalizado, nome)
+                    if comparador.real_quick_ratio() >= 0.85 and comparador.quick_ratio() >= 0.85:
+                        return True
+        return False
+
+
+# Marca dos registros cujo ticker ficou por resolver (linha descartada pelo _FiltroTicker)
+_TICKER_PENDENTE = object()
+
+
+def _assinatura_operacao(op):
+    return (op.get("Data"), op.get("Ticker"), op.get("Quantidade"), op.get("Preço"))
+
+
+def _ticker_da_linha(cells, ticker_mapping, filtro: Optional[_FiltroTicker] = None):
+    """Ticker da linha, ou _TICKER_PENDENTE se o filtro garante que não é o ticker alvo."""
+    if filtro is not None and not filtro.linha_candidata(cells):
+        return _TICKER_PENDENTE
+    return _extract_ticker_from_cells(cells, ticker_mapping)
+
+
+def _resolver_registro_adiado(registro, ticker_mapping) -> bool:
+    """Resolve o ticker de um registro adiado; False se a linha não tem ticker."""
+    registro["Ticker"] = _extract_ticker_from_cells(registro.pop("_cells"), ticker_mapping)
+    return bool(registro["Ticker"])
+
+
+def _resolver_linhas_filtradas(
+    dados_extraidos,
+    inicio_pagina: int,
+    operacoes_texto,
+    ticker_mapping,
+    filtro: _FiltroTicker,
+    assinaturas_descartadas: Counter,
+    linhas_adiadas,
+):
+    """Resolve os tickers adiados da página preservando a posição de cada registro.
+
+    A Linha (e a Chave) de uma operação é a sua posição na página, então os registros
+    adiados antes do último registro do ticker alvo são resolvidos (ou removidos, se
+    não houver ticker). Se o fallback de texto trouxer o ticker alvo, as operações dele
+    entram no fim da página e todos são resolvidos. Os demais ficam em linhas_adiadas e
+    só são resolvidos se o fallback de texto trouxer uma operação com a mesma data,
+    quantidade e preço (a assinatura deles conta na deduplicação).
+
+    Returns:
+        A nova lista de linhas adiadas
+    """
+    registros = dados_extraidos[inicio_pagina:]
+    limite = 0
+    if any(filtro.corresponde(op["Ticker"]) for op in operacoes_texto):
+        limite = len(registros)
+    else:
+        for posicao, registro in enumerate(registros):
+            if registro["Ticker"] is not _TICKER_PENDENTE and filtro.corresponde(registro["Ticker"]):
+                limite = posicao + 1
+
+    mantidos = []
+    for registro in registros[:limite]:
+        if registro["Ticker"] is not _TICKER_PENDENTE or _resolver_registro_adiado(
+            registro, ticker_mapping
+        ):
+            mantidos.append(registro)
+    dados_extraidos[inicio_pagina:] = mantidos
+    linhas_adiadas = list(linhas_adiadas)
+    for registro in registros[limite:]:
+        if registro["Ticker"] is _TICKER_PENDENTE:
+            linhas_adiadas.append(registro)
+        else:
+            assinaturas_descartadas[_assinatura_operacao(registro)] += 1
+
+    valores_texto = {(op["Data"], op["Quantidade"], op["Preço"]) for op in operacoes_texto}
+    ainda_adiadas = []
+    for registro in linhas_adiadas:
+        if (registro["Data"], registro["Quantidade"], registro["Preço"]) not in valores_texto:
+            ainda_adiadas.append(registro)
+        elif _resolver_registro_adiado(registro, ticker_mapping):
+            assinaturas_descartadas[_assinatura_operacao(registro)] += 1
+    return ainda_adiadas
+
+
+def _extract_ticker_from_cells(cells, ticker_mapping=None):
+    """
+    Extrai ticker da linha, buscando padrão B3 ou nome de ativo conhecido.
+
+    Estratégia (prioriza arquivo configurável sobre hardcoded):
+    1. Procura por padrão ticker B3 (4 letras + 2 dígitos)
+    2. Busca em ticker_mapping com correspondência exata
+    3. Busca em ticker_mapping com correspondência fuzzy (ordenada por score, prioriza descrições mais específicas)
+    4. Busca em DE_PARA_TICKERS (hardcoded) com correspondência exata
+    5. Busca em DE_PARA_TICKERS (hardcoded) com correspondência fuzzy (ordenada por score)
+    6. Similaridade de string (>= 0.85) com ticker_mapping e DE_PARA_TICKERS
 
+    ticker_mapping pode ser um dicionário ou o mapeamento já compilado de uma
+    ExtractorSession (ExtractorSession.ticker_mapping).
+    """
+    if not isinstance(ticker_mapping, _MapeamentoTickers):
+        ticker_mapping = _MapeamentoTickers(ticker_mapping)
+    return ticker_mapping.extrair(cells)
 
 def _extract_year_from_filename(filename: str) -> Optional[int]:
     """Extrai o ano do nome do arquivo PDF.
@@ -634,12 +871,46 @@ def _extract_year_from_filename(filename: str) -> Optional[int]:
     return None
 
 
-def _should_process_file(filename: str, target_year: Optional[int]) -> bool:
+def _sondar_ano_pregao(pdf_file, abrir_pdf: Optional[Callable] = None) -> Optional[int]:
+    """Lê apenas o texto da primeira página e retorna o ano da data do pregão.
+
+    Usa a mesma data que processar_pdf atribui aos registros (a primeira data
+    dd/mm/aaaa do texto), sem extrair tabelas. Retorna None se o PDF não abrir
+    ou não tiver data.
+    """
+    try:
+        pdf = (abrir_pdf or pdfplumber.open)(pdf_file)
+        if pdf is None:
+            return None
+        with pdf:
+            if not pdf.pages:
+                return None
+            texto = pdf.pages[0].extract_text() or ""
+    except Exception as e:
+        logger.debug(f"   Sondagem de ano falhou: {str(e)}")
+        return None
+    match_data = re.search(r"\d{2}/\d{2}/(\d{4})", texto)
+    return int(match_data.group(1)) if match_data else None
+
+
+def _sondar_ano_entrada_zip(z: zipfile.ZipFile, entrada: str, abrir_pdf: Optional[Callable] = None):
+    """_sondar_ano_pregao para um PDF dentro de um ZIP já aberto."""
+    bio = criar_bytesio_com_nome(z.read(entrada), os.path.basename(entrada))
+    return _sondar_ano_pregao(bio, abrir_pdf)
+
+
+def _should_process_file(
+    filename: str,
+    target_year: Optional[int],
+    sondar_ano: Optional[Callable[[], Optional[int]]] = None,
+) -> bool:
     """Verifica se o arquivo deve ser processado baseado no filtro de ano.
 
     Args:
         filename: Nome do arquivo
         target_year: Ano desejado (None = processar todos)
+        sondar_ano: Callback que lê o ano do cabeçalho da primeira página, usado
+            quando o nome do arquivo não tem ano
 
     Returns:
         True se deve processar, False caso contrário
@@ -648,6 +919,10 @@ def _should_process_file(filename: str, target_year: Optional[int]) -> bool:
         return True
 
     file_year = _extract_year_from_filename(filename)
+    if file_year is None and sondar_ano is not None:
+        file_year = sondar_ano()
+        if file_year is not None:
+            logger.debug(f"   🔎 Ano de {filename} lido do cabeçalho da nota: {file_year}")
     if file_year is None:
         logger.warning(f"⚠️  Não foi possível extrair ano de: {filename}")
         return False
@@ -670,7 +945,17 @@ def _filter_dataframe_by_ticker(df: pd.DataFrame, target_ticker: Optional[str])
         return df
 
     target = _normalize_ticker_value(target_ticker)
-    filtered = df[df["Ticker"].astype(str).apply(_normalize_ticker_value) == target].copy()
+    # Normaliza apenas os valores distintos (poucos tickers) e expande via códigos do factorize
+    codigos, valores_unicos = pd.factorize(df["Ticker"], use_na_sentinel=True)
+    unicos_alvo = np.fromiter(
+        (_normalize_ticker_value(valor) == target for valor in valores_unicos),
+        dtype=bool,
+        count=len(valores_unicos),
+    )
+    mascara = np.zeros(len(df), dtype=bool)
+    validos = codigos >= 0
+    mascara[validos] = unicos_alvo[codigos[validos]]
+    filtered = df[mascara].copy()
 
     logger.info(
         f"🔎 Filtro de ticker aplicado: {target} | Registros antes: {len(df)} | depois: {len(filtered)}"
@@ -678,790 +963,2509 @@ def _filter_dataframe_by_ticker(df: pd.DataFrame, target_ticker: Optional[str])
     return filtered
 
 
-def processar_pdf(pdf_file, senha=None, metrics_collector: Optional[List[Dict[str, Any]]] = None):
-    dados_extraidos = []
+# Cabeçalho da nota: "Nr. nota  Folha  Data pregão" seguido dos valores na linha de baixo
+_RE_CABECALHO_NOTA = re.compile(
+    r"Nr\.?\s*nota\s+Folha\s+Data\s+preg[ãa]o\s+(\d[\d.]*)\s+(\d+)\s+\d{2}/\d{2}/\d{4}",
+    re.IGNORECASE,
+)
+_RE_NUMERO_NOTA = re.compile(r"Nr\.?\s*(?:da\s+)?nota[:\s]+(\d[\d.]*)", re.IGNORECASE)
+_RE_FOLHA = re.compile(r"Folha[:\s]+(\d+)\b", re.IGNORECASE)
+
+# Colunas de identificação adicionadas a cada operação extraída
+COLUNAS_IDENTIFICACAO = ["Nota", "Folha", "Linha", "Chave"]
+
+# Versão das regras de extração: incrementar ao mudar o que processar_pdf devolve para
+# o mesmo PDF, invalidando os registros guardados em cache (record_cache)
+VERSAO_PARSER = "1"
+
+
+def _extract_note_header(texto):
+    """Extrai número da nota e folha do texto da página.
+
+    Args:
+        texto: Texto da página extraído pelo pdfplumber
+
+    Returns:
+        tuple: (nota, folha) como strings; vazias quando não encontradas
+    """
+    if not texto:
+        return "", ""
+
+    match = _RE_CABECALHO_NOTA.search(texto)
+    if match:
+        return match.group(1).replace(".", ""), match.group(2)
+
+    nota = ""
+    folha = ""
+    match_nota = _RE_NUMERO_NOTA.search(texto)
+    if match_nota:
+        nota = match_nota.group(1).replace(".", "")
+    match_folha = _RE_FOLHA.search(texto)
+    if match_folha:
+        folha = match_folha.group(1)
+    return nota, folha
 
-    # Carrega mapeamento de tickers do arquivo de configuração
-    ticker_mapping = config.get_ticker_mapping()
 
-    # Tratamento inteligente do nome do arquivo para diferentes tipos de entrada
+def _build_operation_key(data_pregao, nota, folha, linha):
+    """Monta a chave natural e estável de uma operação: AAAAMMDD-nota-folha-linha.
+
+    A mesma nota reprocessada gera sempre a mesma chave, então execuções diferentes
+    podem ser mescladas (ou gravadas com upsert) deduplicando por um conjunto de chaves.
+    """
+    data_chave = "00000000"
+    if data_pregao:
+        try:
+            data_chave = datetime.strptime(str(data_pregao), "%d/%m/%Y").strftime("%Y%m%d")
+        except ValueError:
+            pass
+    return f"{data_chave}-{nota}-{folha}-{linha}"
+
+
+def _identificador_conteudo(pdf_file):
+    """Retorna um identificador curto do conteúdo do PDF (usado quando a nota não tem número)."""
+    digest = hashlib.sha1()
     if isinstance(pdf_file, str):
-        arquivo_nome = os.path.basename(pdf_file)
+        with open(pdf_file, "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+                digest.update(bloco)
     else:
-        # Para file objects e BytesIO, tenta obter 'name', senão usa genérico
-        arquivo_nome = getattr(pdf_file, "name", "pdf_temporario.pdf")
+        posicao = pdf_file.tell()
+        pdf_file.seek(0)
+        digest.update(pdf_file.read())
+        pdf_file.seek(posicao)
+    return f"h{digest.hexdigest()[:12]}"
 
+
+def _parada_solicitada(should_stop: Optional[Callable[[], bool]] = None) -> bool:
+    """Indica se houve Ctrl+C (stop_processing) ou cancelamento pelo callback should_stop."""
+    if stop_processing:
+        return True
+    if should_stop is None:
+        return False
     try:
-        _inicio_processamento = datetime.now()
-        logger.info(f"📄 Processando arquivo: {arquivo_nome}")
-        sys.stderr.flush()
-        file_metrics: Dict[str, Any] = {
-            "file_name": arquivo_nome,
-            "status": "running",
-            "page_count": 0,
-            "records_extracted": 0,
-            "elapsed_seconds": 0.0,
-            "avg_seconds_per_page": 0.0,
-            "avg_seconds_per_record": 0.0,
-            "pages": [],
-            "error": None,
-        }
+        return bool(should_stop())
+    except Exception:
+        return False
 
-        # Tenta abrir com senha se fornecida
-        try:
-            if senha:
-                pdf = pdfplumber.open(pdf_file, password=senha)
-            else:
-                pdf = pdfplumber.open(pdf_file)
-        except pdfplumber.utils.exceptions.PdfminerException:
-            # Se falhar sem senha, tenta com a senha padrão da config
-            try:
-                senha_config = config.get_pdf_password()
-                if senha_config:
-                    pdf = pdfplumber.open(pdf_file, password=senha_config)
-                else:
-                    raise
-            except:
-                logger.warning(
-                    f"⚠️  {arquivo_nome}: PDF protegido. Configure 'pdf.password' em application.properties"
-                )
-                sys.stderr.flush()
-                return dados_extraidos
 
-        with pdf:
-            total_paginas = len(pdf.pages)
-            file_metrics["page_count"] = total_paginas
-            logger.debug(f"   Total de páginas: {total_paginas}")
+def processar_pdf(
+    pdf_file,
+    senha=None,
+    metrics_collector: Optional[List[Dict[str, Any]]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    pagina_inicial: int = 1,
+    ticker_filter: Optional[str] = None,
+    page_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+):
+    """Extrai as operações de um PDF usando a sessão padrão (veja ExtractorSession.processar_pdf)."""
+    return sessao_padrao().processar_pdf(
+        pdf_file,
+        senha=senha,
+        metrics_collector=metrics_collector,
+        should_stop=should_stop,
+        pagina_inicial=pagina_inicial,
+        ticker_filter=ticker_filter,
+        page_callback=page_callback,
+    )
 
-            for num_pagina, page in enumerate(pdf.pages, 1):
-                page_started_at = datetime.now()
-                try:
-                    # Extração da Data (procura por "Data pregão") [3, 8, 9]
-                    texto_topo = page.extract_text()
-                    data_pregao = None
-                    match_data = re.search(r"(\d{2}/\d{2}/\d{4})", texto_topo)
-                    if match_data:
-                        data_pregao = match_data.group(1)
-
-                    # Extração da Tabela de Negócios [1, 2, 10]
-                    tables = page.extract_tables()
-                    registros_pagina = 0
-
-                    for table in tables:
-                        if not table:
-                            continue
 
-                        # Detecta tabelas de negociações — geralmente 11 colunas em muitas corretoras
-                        num_cols = len(table[0]) if table and table[0] else 0
-                        table_text = " ".join(" ".join([str(c) for c in row if c]) for row in table)
-                        is_negociacao = (num_cols == 11) or any(
-                            k in table_text
-                            for k in ["Data pregão", "Nr. nota", "Negociação", "Especificação"]
-                        )
+def _identificador_tarefa(tarefa: Dict[str, Any]) -> str:
+    """Identificador estável da origem de uma tarefa, independente do ponto de montagem.
 
-                        if not is_negociacao:
-                            # Heurística fallback: tente encontrar linhas que contenham quantidade+preço
-                            # MAS USANDO A MESMA VALIDAÇÃO que acima
-                            for row in table[1:]:
-                                if not row or all(not (str(c).strip()) for c in row):
-                                    continue
+    Usa o nome do arquivo (ou "arquivo.zip::entrada" para PDFs dentro de ZIP), de modo
+    que máquinas com a pasta compartilhada em caminhos diferentes cheguem ao mesmo valor.
+    """
+    if tarefa["type"] == "zip_entry":
+        return f"{os.path.basename(tarefa['zip'])}::{tarefa['name']}"
+    return os.path.basename(tarefa["path"])
 
-                                cells = [(c or "").strip() for c in row]
 
-                                # APLICAR VALIDAÇÃO: recusa headers/footers/summaries
-                                if not _is_valid_data_row(cells, is_negotiation_table=False):
-                                    continue
+def _parse_shard(valor: str):
+    """Converte "i/n" em (i, n), com 1 <= i <= n."""
+    try:
+        indice, total = (int(parte) for parte in str(valor).split("/"))
+    except ValueError:
+        raise ValueError(f"Shard inválido: {valor!r} (use i/n, ex: 1/3)") from None
+    if total < 1 or not 1 <= indice <= total:
+        raise ValueError(f"Shard inválido: {valor!r} (i deve estar entre 1 e n)")
+    return indice, total
 
-                                try:
-                                    # Verifica se é uma linha válida de negociação
-                                    ticker = _extract_ticker_from_cells(cells, ticker_mapping)
-                                    if not ticker:
-                                        continue  # Não conseguiu extrair ticker válido
-
-                                    # Procura por padrões de número (quantidade/price)
-                                    possible_qty = None
-                                    possible_price = None
-                                    for c in cells:
-                                        if re.search(r"\d+[\.,]\d+", c):
-                                            # assume price-like
-                                            if not possible_price:
-                                                possible_price = _normalize_number(c)
-                                        elif re.search(
-                                            r"^\d+$", c.replace(".", "").replace(",", "")
-                                        ):
-                                            if not possible_qty:
-                                                possible_qty = _normalize_number(c)
-
-                                    if not possible_qty and not possible_price:
-                                        continue
 
-                                    operacao = ""
-                                    for c in cells:
-                                        if (
-                                            " C " in f" {c} ".upper()
-                                            or c.strip().upper() == "C"
-                                            or c.strip().upper() == "V"
-                                        ):
-                                            operacao = (
-                                                "C"
-                                                if "C" in c.upper()
-                                                else "V" if "V" in c.upper() else ""
-                                            )
-                                            if operacao:
-                                                break
-
-                                    dados_extraidos.append(
-                                        {
-                                            "Data": data_pregao,
-                                            "Ticker": ticker,
-                                            "Operação": operacao,
-                                            "Quantidade": possible_qty or "",
-                                            "Preço": possible_price or "",
-                                        }
-                                    )
-                                    registros_pagina += 1
-                                except Exception:
-                                    continue
-                            # fim heurística fallback
-                        else:
-                            # Para tabelas de negociação, processa TODAS as linhas (não pula a primeira)
-                            # A detecção de cabeçalho é feita dentro de _is_valid_data_row()
-                            start_row = 0 if is_negociacao else 1
-                            for row in table[start_row:]:
-                                # Filtra linhas vazias
-                                if not row or all(not (str(c).strip()) for c in row):
-                                    continue
-
-                                cells = [(c or "").strip() for c in row]
-
-                                # Verifica se é uma linha válida de negociação
-                                if not _is_valid_data_row(cells, is_negotiation_table=True):
-                                    continue
+def _shard_da_tarefa(tarefa: Dict[str, Any], total: int) -> int:
+    """Shard (1..total) da tarefa pelo hash estável do identificador de origem."""
+    digest = hashlib.sha1(_identificador_tarefa(tarefa).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % total + 1
 
-                                try:
-                                    # Mapeamento comum observado em amostras:
-                                    # col[2] = operação (C/V), col[5] = especificação (nome do ativo), col[7] = quantidade, col[8] = preço
-
-                                    # Extrai ticker de forma robusta
-                                    ticker = _extract_ticker_from_cells(cells, ticker_mapping)
-                                    if not ticker:
-                                        continue  # Não conseguiu extrair ticker válido
-
-                                    operacao = ""
-                                    if len(cells) > 2 and cells[2]:
-                                        operacao = (
-                                            "C"
-                                            if "C" in cells[2].upper()
-                                            else ("V" if "V" in cells[2].upper() else "")
-                                        )
 
-                                    quantidade_raw = cells[7] if len(cells) > 7 else ""
-                                    preco_raw = cells[8] if len(cells) > 8 else ""
+def _filtrar_shard(tarefas: List[Dict[str, Any]], shard) -> List[Dict[str, Any]]:
+    indice, total = shard
+    return [tarefa for tarefa in tarefas if _shard_da_tarefa(tarefa, total) == indice]
 
-                                    quantidade = _normalize_number(quantidade_raw)
-                                    preco = _normalize_number(preco_raw)
 
-                                    # Se não houver quantidade nem preço, provavelmente não é linha de negócio
-                                    if not quantidade and not preco:
-                                        continue
+def _caminho_fila(queue_dir: str, tarefa: Dict[str, Any], extensao: str) -> str:
+    """Arquivo da tarefa na pasta da fila (.lock, .done), pelo hash do identificador de origem."""
+    nome = hashlib.sha1(_identificador_tarefa(tarefa).encode("utf-8")).hexdigest()
+    return os.path.join(queue_dir, nome + extensao)
 
-                                    dados_extraidos.append(
-                                        {
-                                            "Data": data_pregao,
-                                            "Ticker": ticker,
-                                            "Operação": operacao,
-                                            "Quantidade": quantidade,
-                                            "Preço": preco,
-                                        }
-                                    )
-                                    registros_pagina += 1
-                                except Exception as e:
-                                    logger.debug(f"   ⚠️  Erro ao extrair linha: {str(e)}")
-                                    continue
-
-                    # FALLBACK: Extrair operações diretamente do texto como backup
-                    # Isso trata casos onde pdfplumber falha ao extrair todas as linhas das tabelas
-                    # (ex: operações do meio ficam faltando na divisão de tabelas)
-                    if data_pregao:
-                        operacoes_texto = _extract_operations_from_text(
-                            texto_topo, data_pregao, ticker_mapping
-                        )
 
-                        # Conta quantas vezes cada assinatura (Data+Ticker+Qtd+Preço) já existe
-                        # nas operações extraídas da tabela. Usa Counter (e não set) para
-                        # preservar operações idênticas legítimas — ex: 2 compras do mesmo ativo
-                        # na mesma data, mesma quantidade e mesmo preço na mesma nota.
-                        operacoes_existentes = Counter()
-                        for op in dados_extraidos:
-                            sig = (
-                                op.get("Data"),
-                                op.get("Ticker"),
-                                op.get("Quantidade"),
-                                op.get("Preço"),
-                            )
-                            operacoes_existentes[sig] += 1
-
-                        # Pré-computa quantas vezes cada sig aparece no texto extraído
-                        texto_count = Counter()
-                        for op in operacoes_texto:
-                            sig = (
-                                op.get("Data"),
-                                op.get("Ticker"),
-                                op.get("Quantidade"),
-                                op.get("Preço"),
-                            )
-                            texto_count[sig] += 1
-
-                        # Adiciona operações do texto apenas para a quantidade excedente.
-                        # Permite preservar operações idênticas legítimas (mesmo ativo,
-                        # mesma data, mesma qtd, mesmo preço na mesma nota) que o parser
-                        # de tabela pode ter capturado apenas parcialmente.
-                        novas_operacoes = 0
-                        texto_adicionadas = Counter()
-                        for op in operacoes_texto:
-                            sig = (
-                                op.get("Data"),
-                                op.get("Ticker"),
-                                op.get("Quantidade"),
-                                op.get("Preço"),
-                            )
-                            if texto_adicionadas[sig] + operacoes_existentes[sig] < texto_count[sig]:
-                                dados_extraidos.append(op)
-                                texto_adicionadas[sig] += 1
-                                novas_operacoes += 1
+def _caminho_presenca(queue_dir: str, dono: str) -> str:
+    """Arquivo cujo mtime indica que o processo dono ainda está trabalhando na fila."""
+    return os.path.join(queue_dir, dono.replace(":", "_") + ".alive")
 
-                        if novas_operacoes > 0:
-                            logger.debug(
-                                f"   ℹ️  Adicionadas {novas_operacoes} operação(ões) extraída(s) do texto"
-                            )
-                            registros_pagina += novas_operacoes
 
-                    if registros_pagina > 0:
-                        logger.debug(
-                            f"   ✓ Página {num_pagina}/{total_paginas}: {registros_pagina} registro(s) extraído(s)"
-                        )
+def _marcar_presenca(queue_dir: str) -> None:
+    """Renova a presença deste processo na fila (os locks dele continuam válidos)."""
+    from job_store import dono_atual
 
-                    page_elapsed = (datetime.now() - page_started_at).total_seconds()
-                    file_metrics["pages"].append(
-                        {
-                            "page_number": num_pagina,
-                            "records_extracted": registros_pagina,
-                            "elapsed_seconds": _round_metric(page_elapsed),
-                        }
-                    )
+    caminho = _caminho_presenca(queue_dir, dono_atual())
+    with open(caminho, "a", encoding="utf-8"):
+        pass
+    os.utime(caminho, None)
 
-                except Exception as e:
-                    logger.error(f"   ✗ Erro ao processar página {num_pagina}: {str(e)}")
-                    page_elapsed = (datetime.now() - page_started_at).total_seconds()
-                    file_metrics["pages"].append(
-                        {
-                            "page_number": num_pagina,
-                            "records_extracted": 0,
-                            "elapsed_seconds": _round_metric(page_elapsed),
-                            "error": str(e),
-                        }
-                    )
-                    continue
 
-        total_registros = len(dados_extraidos)
-        _tempo_processamento = (datetime.now() - _inicio_processamento).total_seconds()
-        file_metrics["records_extracted"] = total_registros
-        file_metrics["elapsed_seconds"] = _round_metric(_tempo_processamento)
-        file_metrics["avg_seconds_per_page"] = _round_metric(
-            _tempo_processamento / total_paginas if total_paginas else 0.0
-        )
-        file_metrics["avg_seconds_per_record"] = _round_metric(
-            _tempo_processamento / total_registros if total_registros else 0.0
-        )
-        if total_registros > 0:
-            file_metrics["status"] = "success"
-            logger.info(f"✓ {arquivo_nome}: {total_registros} registro(s) extraído(s) com sucesso [{_format_elapsed(_tempo_processamento)}]")
-        else:
-            file_metrics["status"] = "warning"
-            logger.warning(f"⚠️  {arquivo_nome}: Nenhum registro extraído [{_format_elapsed(_tempo_processamento)}]")
-        sys.stderr.flush()
+def _encerrar_presenca(queue_dir: str) -> None:
+    from job_store import dono_atual
 
+    try:
+        os.remove(_caminho_presenca(queue_dir, dono_atual()))
     except FileNotFoundError:
-        _tempo_processamento = (datetime.now() - _inicio_processamento).total_seconds()
-        file_metrics["status"] = "file_not_found"
-        file_metrics["error"] = "Arquivo não encontrado"
-        file_metrics["elapsed_seconds"] = _round_metric(_tempo_processamento)
-        logger.error(f"✗ Arquivo não encontrado: {arquivo_nome} [{_format_elapsed(_tempo_processamento)}]")
-    except Exception as e:
-        _tempo_processamento = (datetime.now() - _inicio_processamento).total_seconds()
-        file_metrics["status"] = "error"
-        file_metrics["error"] = str(e)
-        file_metrics["elapsed_seconds"] = _round_metric(_tempo_processamento)
-        logger.error(f"✗ Erro ao processar {arquivo_nome}: {str(e)} [{_format_elapsed(_tempo_processamento)}]")
+        pass
 
-    if metrics_collector is not None:
-        metrics_collector.append(file_metrics)
 
-    return dados_extraidos
+def _lock_abandonado(
+    queue_dir: str, caminho_lock: str, dados: Dict[str, Any], lease_seconds: float
+) -> bool:
+    """Indica se o dono de um lock deixou a tarefa sem concluí-la.
 
+    O lock é abandonado se o processo dono (neste host) não existe mais ou se nem a
+    presença dele na fila nem o próprio lock foram renovados há mais de lease_seconds
+    (único critério possível para donos de outra máquina).
+    """
+    from job_store import dono_ativo, dono_atual
+
+    # Locks antigos registram apenas host e pid
+    dono = dados.get("owner") or (f"{dados['host']}:{dados['pid']}" if "host" in dados else "")
+    if dono == dono_atual():
+        return False
+    if dono and not dono_ativo(dono):
+        return True
+    try:
+        renovado_em = os.path.getmtime(_caminho_presenca(queue_dir, dono)) if dono else 0.0
+    except OSError:
+        renovado_em = 0.0
+    try:
+        renovado_em = max(renovado_em, os.path.getmtime(caminho_lock))
+    except OSError:
+        return False
+    return time.time() - renovado_em > lease_seconds
 
-def analisar_pasta_ou_zip(
-    caminho,
-    year_filter: Optional[int] = None,
-    sort_by: str = "name",
-    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
-    should_stop: Optional[Callable[[], bool]] = None,
-    stats_output_path: Optional[List[str]] = None,
-):
-    todos_dados = []
-    arquivos_processados = 0
-    arquivos_erro = 0
-    arquivos_ignorados = 0
-    _inicio_total = datetime.now()
-    execution_stats = _build_execution_stats(caminho, year_filter, sort_by)
 
+def _reivindicar_tarefa(
+    queue_dir: str, tarefa: Dict[str, Any], lease_seconds: Optional[float] = None
+) -> bool:
+    """Reivindica a tarefa na fila compartilhada criando um arquivo .lock exclusivo.
+
+    A criação com O_CREAT | O_EXCL é atômica (inclusive em NFS v3+), então apenas um
+    processo/máquina consegue reivindicar cada tarefa. Tarefas com marcador .done já
+    foram concluídas e não são reivindicadas de novo; um lock abandonado (veja
+    _lock_abandonado, com lease_seconds vindo de processing.queue_lease_minutes) é
+    reassumido por um único processo, que cria antes um marcador .reclaim exclusivo
+    para aquela reivindicação.
+    """
+    from job_store import dono_atual
+
+    if lease_seconds is None:
+        lease_seconds = config.get_queue_lease_minutes() * 60
+    identificador = _identificador_tarefa(tarefa)
+    caminho_lock = _caminho_fila(queue_dir, tarefa, ".lock")
+    reivindicacao = {
+        "task": identificador,
+        "owner": dono_atual(),
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "claimed_at": datetime.now().isoformat(timespec="seconds"),
+    }
     try:
-        logger.info("=" * 60)
-        logger.info("🚀 INICIANDO PROCESSAMENTO")
-        if year_filter is not None:
-            logger.info(f"🔍 Filtro de ano ativo: {year_filter}")
-        logger.info("=" * 60)
-
-        # Resolve caminho relativo se necessário
-        if not os.path.isabs(caminho):
-            caminho_resolvido = os.path.join(os.path.dirname(__file__), caminho)
-            if os.path.exists(caminho_resolvido):
-                caminho = caminho_resolvido
-
-        # Validação do caminho fornecido
-        if not os.path.exists(caminho):
-            logger.error(f"✗ Caminho não encontrado: {caminho}")
-            return pd.DataFrame()
+        descritor = os.open(caminho_lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(descritor, "w", encoding="utf-8") as lock:
+            json.dump(reivindicacao, lock, ensure_ascii=False)
+        return True
 
-        total_arquivos = _count_total_pdfs(caminho)
-        execution_stats["totals"]["estimated_pdfs"] = total_arquivos
-        logger.info(f"📥 Total estimado de PDFs para processar: {total_arquivos}")
+    if os.path.exists(_caminho_fila(queue_dir, tarefa, ".done")):
+        return False
+    try:
+        with open(caminho_lock, "rb") as lock:
+            conteudo = lock.read()
+        dados = json.loads(conteudo.decode("utf-8"))
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        # Lock ainda sendo gravado por quem acabou de criá-lo (ou corrompido): vale só a idade
+        dados = {}
+    if not _lock_abandonado(queue_dir, caminho_lock, dados, lease_seconds):
+        return False
+    # Um marcador por reivindicação abandonada: só um processo a reassume, e um lock novo
+    # gravado nesse meio-tempo tem outro conteúdo (e outro marcador)
+    marcador = caminho_lock[: -len(".lock")] + f".{hashlib.sha1(conteudo).hexdigest()[:12]}.reclaim"
+    try:
+        os.close(os.open(marcador, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+    except FileExistsError:
+        return False
+    _gravar_json_atomico(caminho_lock, reivindicacao)
+    dono_anterior = dados.get("owner") or dados.get("host", "?")
+    logger.warning(
+        f"♻️  {identificador} reassumido: o dono anterior ({dono_anterior}) não concluiu a tarefa"
+    )
+    return True
 
-        if total_arquivos == 0:
-            logger.warning("⚠️  Nenhum arquivo PDF encontrado para processar")
-            return pd.DataFrame()
 
-        # Cria a lista de tarefas (uniformiza arquivos diretos e dentro de ZIPs)
-        tarefas = []
+def _concluir_tarefa(queue_dir: str, tarefa: Dict[str, Any], status: str) -> None:
+    """Grava o marcador .done: a tarefa não é mais reassumida por outros processos."""
+    from job_store import dono_atual
 
-        if caminho.endswith(".zip") or (os.path.isfile(caminho) and zipfile.is_zipfile(caminho)):
-            tarefas_tipo = "single_zip"
-            zip_stat = os.stat(caminho)
-            with zipfile.ZipFile(caminho, "r") as z:
-                for f in z.namelist():
-                    if f.endswith(".pdf"):
-                        # Aplica filtro de ano se especificado
-                        if _should_process_file(f, year_filter):
-                            info = z.getinfo(f)
-                            e_mtime = datetime(*info.date_time).timestamp() if info.date_time[0] > 0 else zip_stat.st_mtime
-                            tarefas.append({
-                                "type": "zip_entry",
-                                "zip": caminho,
-                                "name": f,
-                                "_name": os.path.basename(f),
-                                "_mtime": e_mtime,
-                                "_ctime": zip_stat.st_ctime,
-                            })
-                        else:
-                            arquivos_ignorados += 1
-
-        elif os.path.isdir(caminho):
-            # PDFs diretos
-            for f in os.listdir(caminho):
-                if f.endswith(".pdf"):
-                    # Aplica filtro de ano se especificado
-                    if _should_process_file(f, year_filter):
-                        full_path = os.path.join(caminho, f)
-                        st = os.stat(full_path)
-                        tarefas.append({
-                            "type": "file",
-                            "path": full_path,
-                            "_name": f,
-                            "_mtime": st.st_mtime,
-                            "_ctime": st.st_ctime,
-                        })
-                    else:
-                        arquivos_ignorados += 1
+    _gravar_json_atomico(
+        _caminho_fila(queue_dir, tarefa, ".done"),
+        {
+            "task": _identificador_tarefa(tarefa),
+            "owner": dono_atual(),
+            "status": status,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        },
+    )
 
-            # PDFs dentro de ZIPs na pasta
-            for zf in [f for f in os.listdir(caminho) if f.endswith(".zip")]:
-                caminho_zip = os.path.join(caminho, zf)
-                try:
-                    zip_stat = os.stat(caminho_zip)
-                    with zipfile.ZipFile(caminho_zip, "r") as z:
-                        for entry in z.namelist():
-                            if entry.endswith(".pdf"):
-                                # Aplica filtro de ano se especificado
-                                if _should_process_file(entry, year_filter):
-                                    info = z.getinfo(entry)
-                                    e_mtime = datetime(*info.date_time).timestamp() if info.date_time[0] > 0 else zip_stat.st_mtime
-                                    tarefas.append(
-                                        {
-                                            "type": "zip_entry",
-                                            "zip": caminho_zip,
-                                            "name": entry,
-                                            "_name": os.path.basename(entry),
-                                            "_mtime": e_mtime,
-                                            "_ctime": zip_stat.st_ctime,
-                                        }
-                                    )
-                                else:
-                                    arquivos_ignorados += 1
-                except Exception as e:
-                    logger.warning(f"⚠️  Não foi possível listar ZIP {zf}: {str(e)}")
 
-        else:
-            logger.error(f"✗ Caminho não é arquivo ZIP ou pasta: {caminho}")
-            return pd.DataFrame()
+def _sufixo_particao(shard=None, queue_dir: Optional[str] = None) -> str:
+    """Sufixo que distingue as saídas/estatísticas parciais de cada shard ou worker da fila."""
+    if shard is not None:
+        return f"shard{shard[0]}de{shard[1]}"
+    if queue_dir:
+        return f"{socket.gethostname()}_{os.getpid()}"
+    return ""
 
-        # Ordena a lista de tarefas pelo critério escolhido
-        _SORT_FIELDS = {"name": "_name", "mtime": "_mtime", "ctime": "_ctime"}
-        sort_field = _SORT_FIELDS.get(sort_by, "_name")
-        tarefas.sort(key=lambda t: t[sort_field])
-        logger.info(f"🗂️  Ordenação de arquivos: {sort_by} | {len(tarefas)} arquivo(s) a processar")
 
-        def _notify_progress(current_file: str, stage: str) -> None:
-            if progress_callback is None:
-                return
-            try:
-                progress_callback(
-                    {
-                        "stage": stage,
-                        "current_file": current_file,
-                        "processed_files": arquivos_processados,
-                        "failed_files": arquivos_erro,
-                        "total_files": len(tarefas),
-                    }
-                )
-            except Exception:
-                # Callback de progresso nunca deve interromper o processamento principal.
-                pass
+def _executar_tarefa(
+    sessao: "ExtractorSession",
+    tarefa: Dict[str, Any],
+    metrics_collector: List[Dict[str, Any]],
+    should_stop: Optional[Callable[[], bool]] = None,
+    page_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+):
+    """Processa uma tarefa (PDF direto ou entrada de ZIP) e retorna os registros extraídos."""
+    opcoes = {
+        "metrics_collector": metrics_collector,
+        "should_stop": should_stop,
+        "pagina_inicial": tarefa.get("_pagina_inicial", 1),
+    }
+    if tarefa.get("_ticker_filter"):
+        opcoes["ticker_filter"] = tarefa["_ticker_filter"]
+    if page_callback is not None:
+        opcoes["page_callback"] = page_callback
+    if tarefa["type"] == "file":
+        return sessao.processar_pdf(tarefa["path"], **opcoes)
+    with zipfile.ZipFile(tarefa["zip"], "r") as z:
+        with z.open(tarefa["name"]) as f:
+            bio = criar_bytesio_com_nome(f.read(), os.path.basename(tarefa["name"]))
+    return sessao.processar_pdf(bio, **opcoes)
+
+
+def _sha256_tarefa(tarefa: Dict[str, Any]) -> str:
+    """SHA-256 do conteúdo da tarefa (PDF direto ou entrada de ZIP), lido em blocos."""
+    digest = hashlib.sha256()
+    if tarefa["type"] == "file":
+        with open(tarefa["path"], "rb") as arquivo:
+            for bloco in iter(partial(arquivo.read, 1024 * 1024), b""):
+                digest.update(bloco)
+    else:
+        with zipfile.ZipFile(tarefa["zip"], "r") as z, z.open(tarefa["name"]) as arquivo:
+            for bloco in iter(partial(arquivo.read, 1024 * 1024), b""):
+                digest.update(bloco)
+    return digest.hexdigest()
 
-        if tarefas:
-            _notify_progress("", "started")
 
-        try:
-            for tarefa in tarefas:
-                graceful_stop_requested = stop_processing
-                if not graceful_stop_requested and should_stop is not None:
-                    try:
-                        graceful_stop_requested = bool(should_stop())
-                    except Exception:
-                        graceful_stop_requested = False
+def chave_cache_registros(sha256: str, assinatura: str, ticker_filter: Optional[str] = None) -> str:
+    """Chave de um arquivo no record_cache: conteúdo, assinatura da extração e filtro de ticker."""
+    return ":".join((sha256, assinatura, (ticker_filter or "").upper()))
 
-                if graceful_stop_requested:
-                    logger.warning(
-                        "⏸️ Interrupção detectada — finalizando processamento após o arquivo atual."
-                    )
-                    break
 
-                current_file = tarefa.get("_name") or os.path.basename(tarefa.get("path", ""))
-                _notify_progress(current_file, "processing")
+def _metricas_falha(file_name: str, status: str, error: str, elapsed_seconds: float = 0.0):
+    return {
+        "file_name": file_name,
+        "status": status,
+        "page_count": 0,
+        "records_extracted": 0,
+        "elapsed_seconds": _round_metric(elapsed_seconds),
+        "avg_seconds_per_page": 0.0,
+        "avg_seconds_per_record": 0.0,
+        "pages": [],
+        "error": error,
+    }
 
-                if tarefa["type"] == "file":
-                    try:
-                        file_metrics: List[Dict[str, Any]] = []
-                        dados = processar_pdf(tarefa["path"], metrics_collector=file_metrics)
-                        todos_dados.extend(dados)
-                        arquivos_processados += 1
-                        if file_metrics:
-                            execution_stats["files"].append(file_metrics[0])
-                        _notify_progress(current_file, "processed")
-                    except Exception as e:
-                        logger.error(f"✗ Erro ao processar {tarefa['path']}: {str(e)}")
-                        arquivos_erro += 1
-                        execution_stats["files"].append(
-                            {
-                                "file_name": current_file,
-                                "status": "error",
-                                "page_count": 0,
-                                "records_extracted": 0,
-                                "elapsed_seconds": 0.0,
-                                "avg_seconds_per_page": 0.0,
-                                "avg_seconds_per_record": 0.0,
-                                "pages": [],
-                                "error": str(e),
-                            }
-                        )
-                        _notify_progress(current_file, "error")
 
-                elif tarefa["type"] == "zip_entry":
-                    try:
-                        with zipfile.ZipFile(tarefa["zip"], "r") as z:
-                            with z.open(tarefa["name"]) as f:
-                                bio = criar_bytesio_com_nome(
-                                    f.read(), os.path.basename(tarefa["name"])
+# ---------------------------------------------------------------------------
+# Modo isolado: cada PDF em um processo filho com limite de tempo e de memória
+# ---------------------------------------------------------------------------
+
+QUARENTENA_ARQUIVO = "quarentena.json"
+_INTERVALO_WATCHDOG = 0.1
+
+
+class LimiteArquivoExcedido(Exception):
+    """O processamento de um arquivo excedeu o tempo (timeout) ou a memória (oom) permitidos."""
+
+    def __init__(self, status: str, mensagem: str, elapsed_seconds: float = 0.0):
+        super().__init__(mensagem)
+        self.status = status
+        self.elapsed_seconds = elapsed_seconds
+
+
+def _filho_processar_tarefa(sessao, tarefa, conexao):
+    """Ponto de entrada do processo filho: envia (status, dados, métricas) pelo pipe."""
+    try:
+        metrics: List[Dict[str, Any]] = []
+        dados = _executar_tarefa(sessao, tarefa, metrics)
+        conexao.send(("ok", dados, metrics))
+    except MemoryError:
+        conexao.send(("oom", "MemoryError no processo filho", None))
+    except Exception as e:
+        conexao.send(("error", str(e), None))
+    finally:
+        conexao.close()
+
+
+def _rss_processo_mb(pid: int) -> Optional[float]:
+    """Memória residente (RSS) do processo em MB, ou None se não for possível medir."""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as statm:
+            paginas = int(statm.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _processar_tarefa_isolada(
+    sessao: "ExtractorSession",
+    tarefa: Dict[str, Any],
+    metrics_collector: List[Dict[str, Any]],
+    timeout_seconds: Optional[float],
+    max_rss_mb: Optional[float],
+):
+    """Executa a tarefa em um processo filho vigiado por um watchdog.
+
+    O filho é encerrado (SIGKILL) se ultrapassar o tempo de parede ou o RSS máximo.
+    A medição de RSS usa /proc (Linux) ou psutil, quando disponível.
+
+    Raises:
+        LimiteArquivoExcedido: status "timeout" ou "oom"
+        RuntimeError: erro de processamento no filho
+    """
+    contexto = multiprocessing.get_context()
+    receptor, emissor = contexto.Pipe(duplex=False)
+    processo = contexto.Process(target=_filho_processar_tarefa, args=(sessao, tarefa, emissor))
+    inicio = time.monotonic()
+    processo.start()
+    emissor.close()
+
+    try:
+        while not receptor.poll(_INTERVALO_WATCHDOG):
+            decorrido = time.monotonic() - inicio
+            if timeout_seconds and decorrido > timeout_seconds:
+                raise LimiteArquivoExcedido(
+                    "timeout", f"tempo limite de {timeout_seconds:g}s excedido", decorrido
+                )
+            if max_rss_mb:
+                rss = _rss_processo_mb(processo.pid)
+                if rss is not None and rss > max_rss_mb:
+                    raise LimiteArquivoExcedido(
+                        "oom", f"memória {rss:.0f} MB acima do limite de {max_rss_mb:g} MB", decorrido
+                    )
+        try:
+            status, dados, metrics = receptor.recv()
+        except EOFError:
+            processo.join()
+            if processo.exitcode == -signal.SIGKILL:
+                # Encerrado pelo kernel (OOM killer) antes de responder
+                raise LimiteArquivoExcedido(
+                    "oom", "processo filho encerrado pelo sistema (SIGKILL)", time.monotonic() - inicio
+                ) from None
+            raise RuntimeError(
+                f"processo filho terminou sem resposta (código {processo.exitcode})"
+            ) from None
+    finally:
+        receptor.close()
+        if processo.is_alive():
+            processo.kill()
+        processo.join()
+
+    if status == "oom":
+        raise LimiteArquivoExcedido("oom", dados, time.monotonic() - inicio)
+    if status == "error":
+        raise RuntimeError(dados)
+    metrics_collector.extend(metrics or [])
+    return dados
+
+
+def _caminho_quarentena() -> str:
+    return os.path.join(stats_folder, QUARENTENA_ARQUIVO)
+
+
+def carregar_quarentena() -> Dict[str, Dict[str, Any]]:
+    """Lê a quarentena ({identificador: detalhes}) da pasta de estatísticas."""
+    try:
+        with open(_caminho_quarentena(), "r", encoding="utf-8") as arquivo:
+            quarentena = json.load(arquivo)
+        return quarentena if isinstance(quarentena, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _gravar_json_atomico(caminho: str, conteudo: Any) -> str:
+    """Grava JSON em arquivo temporário e substitui o destino com os.replace."""
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(conteudo, arquivo, ensure_ascii=False, indent=2, default=str)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def _salvar_quarentena(quarentena: Dict[str, Dict[str, Any]]) -> None:
+    _gravar_json_atomico(_caminho_quarentena(), quarentena)
+
+
+def _em_quarentena(quarentena: Dict[str, Dict[str, Any]], tarefa: Dict[str, Any]) -> bool:
+    """A tarefa está em quarentena se o mesmo arquivo (nome e tamanho) já excedeu os limites."""
+    registro = quarentena.get(_identificador_tarefa(tarefa))
+    return bool(registro) and registro.get("size") == tarefa.get("_size")
+
+
+# Pool de --workers: processos que não herdam por fork as threads e os locks do pai (ex.: uvicorn)
+_METODO_INICIO_POOL = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Intervalo (segundos) em que o pai repassa a parada e as páginas do pool durante a execução
+_INTERVALO_POOL_SEGUNDOS = 0.25
+
+
+def _inicializar_processo_pool(arquivo_log: Optional[str] = None, nivel: str = "INFO") -> None:
+    """Prepara cada processo do pool, que não herda a configuração do pai (forkserver/spawn).
+
+    Ignora o Ctrl+C (a parada chega pelo sinal compartilhado da execução) e configura
+    o logging como inicializar(): mesmo nível e formato, no console e, se houver, no
+    arquivo de log da execução (aberto em modo append junto com o do pai).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if arquivo_log:
+        handlers.insert(0, logging.FileHandler(arquivo_log, encoding="utf-8"))
+    logging.basicConfig(
+        level=getattr(logging, nivel),
+        format=_FORMATO_LOG,
+        datefmt=_FORMATO_DATA_LOG,
+        handlers=handlers,
+    )
+
+
+class _ParadaCompartilhada:
+    """should_stop dos processos do pool: lê o Event do Manager que o pai sinaliza."""
+
+    def __init__(self, evento):
+        self.evento = evento
+
+    def __call__(self) -> bool:
+        try:
+            return self.evento.is_set()
+        except (OSError, EOFError):
+            # Manager encerrado: a execução no processo pai já terminou
+            return True
+
+
+class _PaginasCompartilhadas:
+    """page_callback dos processos do pool: envia (índice da tarefa, página) pela fila do Manager."""
+
+    def __init__(self, fila, indice: int):
+        self.fila = fila
+        self.indice = indice
+
+    def __call__(self, pagina: Dict[str, Any]) -> None:
+        self.fila.put((self.indice, pagina))
+
+
+def _executar_tarefa_cronometrada(
+    sessao: "ExtractorSession",
+    tarefa: Dict[str, Any],
+    isolate: bool = False,
+    file_timeout: Optional[float] = None,
+    max_rss_mb: Optional[float] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    page_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+):
+    """Processa a tarefa (inline ou isolada) e retorna (registros, métricas, segundos).
+
+    No modo isolado, should_stop e page_callback não chegam ao processo filho (ele para
+    por página apenas com o Ctrl+C e não notifica páginas). No pool de --workers eles
+    chegam como _ParadaCompartilhada e _PaginasCompartilhadas.
+    """
+    inicio = time.monotonic()
+    file_metrics: List[Dict[str, Any]] = []
+    if isolate:
+        dados = _processar_tarefa_isolada(sessao, tarefa, file_metrics, file_timeout, max_rss_mb)
+    else:
+        dados = _executar_tarefa(sessao, tarefa, file_metrics, should_stop, page_callback)
+    return dados, file_metrics, time.monotonic() - inicio
+
+
+# ---------------------------------------------------------------------------
+# Escalonamento por custo estimado (longest-job-first) para execuções paralelas
+# ---------------------------------------------------------------------------
+
+_HISTORICO_MAX_EXECUCOES = 50
+_BYTES_POR_PAGINA_PADRAO = 60_000
+_SEGUNDOS_POR_PAGINA_PADRAO = 1.0
+
+
+def _carregar_historico_custos():
+    """Lê os execucao_*.json mais recentes e retorna o último registro de cada arquivo.
+
+    Returns:
+        tuple: ({file_name: métricas}, segundos médios por página, bytes médios por página)
+    """
+    caminhos = sorted(glob.glob(os.path.join(stats_folder, "execucao_*.json")))
+    por_arquivo: Dict[str, Dict[str, Any]] = {}
+    for caminho in caminhos[-_HISTORICO_MAX_EXECUCOES:]:
+        try:
+            with open(caminho, "r", encoding="utf-8") as arquivo:
+                execucao = json.load(arquivo)
+        except (OSError, json.JSONDecodeError):
+            continue
+        for metricas in execucao.get("files") or []:
+            if metricas.get("status") in ("error", "file_not_found"):
+                continue
+            if float(metricas.get("elapsed_seconds") or 0) > 0:
+                por_arquivo[metricas.get("file_name")] = metricas
+
+    segundos = sum(float(m.get("elapsed_seconds") or 0) for m in por_arquivo.values())
+    paginas = sum(int(m.get("page_count") or 0) for m in por_arquivo.values())
+    com_tamanho = [m for m in por_arquivo.values() if m.get("file_size") and m.get("page_count")]
+    bytes_totais = sum(int(m["file_size"]) for m in com_tamanho)
+    paginas_com_tamanho = sum(int(m["page_count"]) for m in com_tamanho)
+    return (
+        por_arquivo,
+        segundos / paginas if paginas else _SEGUNDOS_POR_PAGINA_PADRAO,
+        bytes_totais / paginas_com_tamanho if paginas_com_tamanho else _BYTES_POR_PAGINA_PADRAO,
+    )
+
+
+def _estimar_custos(tarefas: List[Dict[str, Any]]) -> List[float]:
+    """Estima o custo (segundos) de cada tarefa.
+
+    Usa o tempo da última execução do mesmo arquivo (com o mesmo tamanho). Sem
+    histórico, estima as páginas pelo tamanho do arquivo (bytes por página medidos
+    nas execuções anteriores) e multiplica pelos segundos médios por página.
+    """
+    historico, segundos_por_pagina, bytes_por_pagina = _carregar_historico_custos()
+    custos = []
+    for tarefa in tarefas:
+        anterior = historico.get(tarefa["_name"])
+        if anterior and anterior.get("file_size") not in (None, tarefa.get("_size")):
+            anterior = None  # arquivo mudou desde a última execução
+        if anterior:
+            custos.append(float(anterior["elapsed_seconds"]))
+            continue
+        paginas = max(1.0, (tarefa.get("_size") or 0) / bytes_por_pagina)
+        custos.append(paginas * segundos_por_pagina)
+    return custos
+
+
+def _simular_makespan(duracoes: List[float], workers: int) -> float:
+    """Tempo total de uma fila de tarefas despachadas em ordem para o worker livre mais cedo."""
+    fins = [0.0] * max(1, workers)
+    for duracao in duracoes:
+        heapq.heappush(fins, heapq.heappop(fins) + duracao)
+    return max(fins)
+
+
+def _resumo_escalonamento(tarefas, custos, ordem_despacho, duracoes, workers, makespan_real):
+    """Compara o despacho longest-job-first com o despacho na ordem de --sort-by.
+
+    As duas ordens são reproduzidas com as durações reais de cada arquivo, o que
+    isola o efeito do escalonamento da variação de desempenho entre execuções.
+    """
+    ordem_original = range(len(tarefas))
+    reais = [duracoes.get(indice, 0.0) for indice in ordem_original]
+    makespan_ordem = _simular_makespan(reais, workers)
+    makespan_ljf = _simular_makespan([reais[indice] for indice in ordem_despacho], workers)
+    ganho = makespan_ordem - makespan_ljf
+    return {
+        "strategy": "longest_job_first",
+        "workers": workers,
+        "estimated_makespan_seconds": _round_metric(
+            _simular_makespan([custos[indice] for indice in ordem_despacho], workers)
+        ),
+        "estimated_makespan_sort_order_seconds": _round_metric(_simular_makespan(custos, workers)),
+        "replayed_makespan_seconds": _round_metric(makespan_ljf),
+        "replayed_makespan_sort_order_seconds": _round_metric(makespan_ordem),
+        "makespan_improvement_seconds": _round_metric(ganho),
+        "makespan_improvement_pct": _round_metric(100 * ganho / makespan_ordem if makespan_ordem else 0.0),
+        "actual_makespan_seconds": _round_metric(makespan_real),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint de execuções interrompidas (--resume)
+# ---------------------------------------------------------------------------
+
+
+def caminho_checkpoint(execution_id: str) -> str:
+    """Caminho do checkpoint de uma execução na pasta de estatísticas."""
+    return os.path.join(stats_folder, f"checkpoint_{execution_id}.json")
+
+
+def carregar_checkpoint(execution_id: str) -> Optional[Dict[str, Any]]:
+    """Lê o checkpoint de uma execução interrompida, ou None se não existir/for inválido."""
+    try:
+        with open(caminho_checkpoint(execution_id), "r", encoding="utf-8") as arquivo:
+            checkpoint = json.load(arquivo)
+    except (OSError, json.JSONDecodeError):
+        return None
+    checkpoint.setdefault("completed", {})
+    checkpoint.setdefault("partial", {})
+    return checkpoint
+
+
+def _aplicar_checkpoint(checkpoint: Dict[str, Any], tarefas: List[Dict[str, Any]]):
+    """Reaproveita os resultados de um checkpoint para as tarefas atuais.
+
+    Arquivos concluídos (mesmo nome e tamanho) não são processados de novo; os
+    interrompidos recebem `_pagina_inicial` e os registros das páginas já lidas.
+
+    Returns:
+        tuple: ({índice: registros concluídos}, {índice: métricas}, {índice: registros parciais})
+    """
+    concluidos: Dict[int, List[Dict[str, Any]]] = {}
+    metricas: Dict[int, Dict[str, Any]] = {}
+    prefixos: Dict[int, List[Dict[str, Any]]] = {}
+    for indice, tarefa in enumerate(tarefas):
+        identificador = _identificador_tarefa(tarefa)
+        concluido = checkpoint["completed"].get(identificador)
+        if concluido and concluido.get("size") == tarefa.get("_size"):
+            concluidos[indice] = concluido.get("records") or []
+            metricas[indice] = concluido.get("metrics") or {}
+            continue
+        parcial = checkpoint["partial"].get(identificador)
+        if parcial and parcial.get("size") == tarefa.get("_size"):
+            tarefa["_pagina_inicial"] = int(parcial.get("pages_completed") or 0) + 1
+            prefixos[indice] = parcial.get("records") or []
+    return concluidos, metricas, prefixos
+
+
+def _listar_tarefas(caminho, year_filter: Optional[int] = None, abrir_pdf: Optional[Callable] = None):
+    """Descobre as tarefas (PDFs diretos e PDFs dentro de ZIPs) de um caminho.
+
+    Com year_filter, arquivos sem ano no nome têm a primeira página sondada
+    (_sondar_ano_pregao, abrindo com abrir_pdf quando informado).
+
+    Returns:
+        tuple: (lista de tarefas, quantidade ignorada pelo filtro de ano), ou None
+        se o caminho não for arquivo ZIP nem pasta
+    """
+    tarefas = []
+    arquivos_ignorados = 0
+
+    if caminho.endswith(".zip") or (os.path.isfile(caminho) and zipfile.is_zipfile(caminho)):
+        zip_stat = os.stat(caminho)
+        with zipfile.ZipFile(caminho, "r") as z:
+            for f in z.namelist():
+                if f.endswith(".pdf"):
+                    # Aplica filtro de ano se especificado
+                    sondar = partial(_sondar_ano_entrada_zip, z, f, abrir_pdf)
+                    if _should_process_file(f, year_filter, sondar):
+                        info = z.getinfo(f)
+                        e_mtime = datetime(*info.date_time).timestamp() if info.date_time[0] > 0 else zip_stat.st_mtime
+                        tarefas.append({
+                            "type": "zip_entry",
+                            "zip": caminho,
+                            "name": f,
+                            "_name": os.path.basename(f),
+                            "_mtime": e_mtime,
+                            "_ctime": zip_stat.st_ctime,
+                            "_size": info.file_size,
+                        })
+                    else:
+                        arquivos_ignorados += 1
+
+    elif os.path.isdir(caminho):
+        # PDFs diretos
+        for f in os.listdir(caminho):
+            if f.endswith(".pdf"):
+                # Aplica filtro de ano se especificado
+                full_path = os.path.join(caminho, f)
+                sondar = partial(_sondar_ano_pregao, full_path, abrir_pdf)
+                if _should_process_file(f, year_filter, sondar):
+                    st = os.stat(full_path)
+                    tarefas.append({
+                        "type": "file",
+                        "path": full_path,
+                        "_name": f,
+                        "_mtime": st.st_mtime,
+                        "_ctime": st.st_ctime,
+                        "_size": st.st_size,
+                    })
+                else:
+                    arquivos_ignorados += 1
+
+        # PDFs dentro de ZIPs na pasta
+        for zf in [f for f in os.listdir(caminho) if f.endswith(".zip")]:
+            caminho_zip = os.path.join(caminho, zf)
+            try:
+                zip_stat = os.stat(caminho_zip)
+                with zipfile.ZipFile(caminho_zip, "r") as z:
+                    for entry in z.namelist():
+                        if entry.endswith(".pdf"):
+                            # Aplica filtro de ano se especificado
+                            sondar = partial(_sondar_ano_entrada_zip, z, entry, abrir_pdf)
+                            if _should_process_file(entry, year_filter, sondar):
+                                info = z.getinfo(entry)
+                                e_mtime = datetime(*info.date_time).timestamp() if info.date_time[0] > 0 else zip_stat.st_mtime
+                                tarefas.append(
+                                    {
+                                        "type": "zip_entry",
+                                        "zip": caminho_zip,
+                                        "name": entry,
+                                        "_name": os.path.basename(entry),
+                                        "_mtime": e_mtime,
+                                        "_ctime": zip_stat.st_ctime,
+                                        "_size": info.file_size,
+                                    }
+                                )
+                            else:
+                                arquivos_ignorados += 1
+            except Exception as e:
+                logger.warning(f"⚠️  Não foi possível listar ZIP {zf}: {str(e)}")
+
+    else:
+        return None
+
+    return tarefas, arquivos_ignorados
+
+
+def analisar_pasta_ou_zip(
+    caminho,
+    year_filter: Optional[int] = None,
+    sort_by: str = "name",
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats_output_path: Optional[List[str]] = None,
+    shard=None,
+    queue_dir: Optional[str] = None,
+    isolate: bool = False,
+    file_timeout: Optional[float] = None,
+    max_rss_mb: Optional[float] = None,
+    force: bool = False,
+    workers: int = 1,
+    resume_from: Optional[str] = None,
+    ticker_filter: Optional[str] = None,
+    catalog_path: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    record_cache=None,
+):
+    """Processa uma pasta ou ZIP usando a sessão padrão (veja ExtractorSession.analisar_pasta_ou_zip)."""
+    return sessao_padrao().analisar_pasta_ou_zip(
+        caminho,
+        year_filter=year_filter,
+        sort_by=sort_by,
+        progress_callback=progress_callback,
+        should_stop=should_stop,
+        stats_output_path=stats_output_path,
+        shard=shard,
+        queue_dir=queue_dir,
+        isolate=isolate,
+        file_timeout=file_timeout,
+        max_rss_mb=max_rss_mb,
+        force=force,
+        workers=workers,
+        resume_from=resume_from,
+        ticker_filter=ticker_filter,
+        catalog_path=catalog_path,
+        date_from=date_from,
+        date_to=date_to,
+        record_cache=record_cache,
+    )
+
+# Colunas da aba Árvore: Ano, Mês, Dia, Data, Ticker, Operação, Quantidade, Preço
+_COLUNAS_ARVORE = ["Ano", "Mes", "Dia", "Data", "Ticker", "Operação", "Quantidade", "Preço"]
+
+
+def _converter_datas_pregao(datas):
+    """Converte a coluna Data (DD/MM/YYYY) para datetime64 de forma vetorizada.
+
+    Cada data distinta é convertida uma única vez (há poucas datas de pregão por
+    volume de operações) e o resultado é expandido pelos códigos do factorize.
+    """
+    codigos, datas_unicas = pd.factorize(datas, use_na_sentinel=True)
+    convertidas = pd.to_datetime(pd.Series(datas_unicas, dtype=object), format="%d/%m/%Y")
+    valores = np.append(convertidas.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(valores[codigos], index=datas.index, name=datas.name)
+
+
+def _chaves_ordenacao(df):
+    """Monta chaves inteiras (data, ticker) para ordenação com np.lexsort.
+
+    Valores ausentes ficam no final, como em sort_values(na_position="last").
+    """
+    datas = _converter_datas_pregao(df["Data"]).to_numpy(dtype="datetime64[ns]")
+    chave_data = datas.view(np.int64).copy()
+    chave_data[np.isnat(datas)] = np.iinfo(np.int64).max
+
+    codigos, tickers_unicos = pd.factorize(df["Ticker"], use_na_sentinel=True)
+    posicao_alfabetica = np.empty(len(tickers_unicos) + 1, dtype=np.int64)
+    posicao_alfabetica[np.argsort(tickers_unicos.astype(str), kind="stable")] = np.arange(
+        len(tickers_unicos)
+    )
+    posicao_alfabetica[-1] = len(tickers_unicos)  # código -1 (ausente) vai para o final
+    return chave_data, posicao_alfabetica[codigos]
+
+
+def ordenar_dados_por_data(df):
+    """Ordena o DataFrame por Data (do mais antigo para o mais recente).
+
+    A coluna Data é convertida apenas para gerar a chave de ordenação; os valores
+    originais em DD/MM/YYYY são preservados, sem conversão de volta para texto.
+
+    Args:
+        df (pd.DataFrame): DataFrame com coluna 'Data' em formato DD/MM/YYYY
+
+    Returns:
+        pd.DataFrame: DataFrame ordenado por data
+    """
+    if df.empty:
+        return df
+
+    try:
+        # Ordena por Data (do mais antigo para o mais recente) e depois por Ticker (alfabético)
+        chave_data, chave_ticker = _chaves_ordenacao(df)
+        df = df.iloc[np.lexsort((chave_ticker, chave_data))]
+
+        logger.info(
+            "✓ Dados ordenados por data (mais antigo para o mais recente) e depois por ticker"
+        )
+        return df.reset_index(drop=True)
+
+    except Exception as e:
+        logger.warning(f"⚠️  Erro ao ordenar dados por data: {str(e)}")
+        return df
+
+
+def primeiras_por_data(df, quantidade: int):
+    """As primeiras linhas na ordem de ordenar_dados_por_data, sem ordenar o DataFrame inteiro.
+
+    Seleção parcial (np.partition) da data de corte: só as linhas até essa data
+    são ordenadas. Útil para prévias de resultados grandes.
+
+    Args:
+        df (pd.DataFrame): DataFrame com coluna 'Data' em formato DD/MM/YYYY
+        quantidade (int): Número de linhas
+
+    Returns:
+        pd.DataFrame: Até `quantidade` linhas, iguais a ordenar_dados_por_data(df).head(quantidade)
+    """
+    if quantidade >= len(df):
+        return ordenar_dados_por_data(df)
+    if quantidade <= 0:
+        return df.iloc[:0]
+    try:
+        chave_data, chave_ticker = _chaves_ordenacao(df)
+        corte = np.partition(chave_data, quantidade - 1)[quantidade - 1]
+        candidatas = np.flatnonzero(chave_data <= corte)
+        ordem = np.lexsort((chave_ticker[candidatas], chave_data[candidatas]))
+        return df.iloc[candidatas[ordem[:quantidade]]].reset_index(drop=True)
+    except Exception as e:
+        logger.warning(f"⚠️  Erro ao selecionar as primeiras linhas por data: {str(e)}")
+        return ordenar_dados_por_data(df).head(quantidade)
+
+
+def _marcar_mudancas(chaves):
+    """Retorna máscara booleana indicando onde a chave inteira difere da linha anterior."""
+    muda = np.ones(len(chaves), dtype=bool)
+    muda[1:] = chaves[1:] != chaves[:-1]
+    return muda
+
+
+def _colunas_periodo_arvore(datas):
+    """Calcula as colunas Ano, Mes e Dia da aba Árvore a partir das datas de pregão.
+
+    A detecção de mudança de período é feita sobre inteiros (AAAA, AAAAMM, AAAAMMDD);
+    somente as posições onde o período muda recebem texto, o restante fica vazio.
+
+    Returns:
+        tuple: Arrays (Ano, Mes, Dia) do tipo object, alinhados às linhas de entrada
+    """
+    datas_dt = _converter_datas_pregao(datas)
+    ano = datas_dt.dt.year.fillna(0).to_numpy(dtype=np.int64)
+    mes = datas_dt.dt.month.fillna(0).to_numpy(dtype=np.int64)
+    dia = datas_dt.dt.day.fillna(0).to_numpy(dtype=np.int64)
+
+    colunas = []
+    for valores, chaves, largura in (
+        (ano, ano, 4),
+        (mes, ano * 100 + mes, 2),
+        (dia, ano * 10000 + mes * 100 + dia, 2),
+    ):
+        coluna = np.full(len(valores), "", dtype=object)
+        posicoes = np.flatnonzero(_marcar_mudancas(chaves))
+        coluna[posicoes] = [str(valor).zfill(largura) for valor in valores[posicoes]]
+        colunas.append(coluna)
+    return tuple(colunas)
+
+
+def criar_aba_arvore(df):
+    """Cria um DataFrame com estrutura de árvore partindo a Data em Ano/Mês/Dia.
+
+    As colunas de Ano, Mês e Dia são preenchidas apenas ao mudar o período,
+    criando uma visualização em árvore hierárquica.
+
+    Args:
+        df (pd.DataFrame): DataFrame ordenado com coluna 'Data' em DD/MM/YYYY
+
+    Returns:
+        pd.DataFrame: DataFrame com colunas [Ano, Mês, Dia, Data, Ticker, Operação,
+                      Quantidade, Preço]
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    try:
+        df_arvore = df[_COLUNAS_ARVORE[3:]].reset_index(drop=True)
+        ano, mes, dia = _colunas_periodo_arvore(df_arvore["Data"])
+        df_arvore.insert(0, "Dia", dia)
+        df_arvore.insert(0, "Mes", mes)
+        df_arvore.insert(0, "Ano", ano)
+        return df_arvore
+
+    except Exception as e:
+        logger.warning(f"⚠️  Erro ao criar aba de árvore: {str(e)}")
+        return df.copy()
+
+
+# Formatos numéricos nativos do Excel por coluna (o separador exibido segue o locale do usuário)
+_XLSX_NUMBER_FORMATS = {"Quantidade": "#,##0", "Preço": "#,##0.00"}
+
+
+def _valor_numerico_excel(valor):
+    """Converte o valor textual normalizado ('1234.56') em número nativo para o Excel.
+
+    Valores vazios viram célula vazia; valores não numéricos são mantidos como estão.
+    """
+    if valor is None or isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (int, float)):
+        return None if valor != valor else valor  # NaN -> célula vazia
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    try:
+        numero = float(texto)
+    except ValueError:
+        return valor
+    return int(numero) if numero.is_integer() and "." not in texto else numero
+
+
+def _iter_linhas_dados(df):
+    """Gera as linhas da aba 'Dados' (cabeçalho seguido dos registros), sem copiar o DataFrame."""
+    yield list(df.columns)
+    yield from df.itertuples(index=False, name=None)
+
+
+def _iter_linhas_arvore(df):
+    """Gera as linhas da aba 'Árvore' a partir do DataFrame já ordenado por data.
+
+    Usa os mesmos marcadores de período de criar_aba_arvore(), sem materializar
+    um segundo DataFrame com as colunas da árvore.
+    """
+    colunas = [c for c in _COLUNAS_ARVORE[3:] if c in df.columns]
+    yield _COLUNAS_ARVORE[:3] + colunas
+
+    if "Data" in colunas:
+        try:
+            periodos = zip(*_colunas_periodo_arvore(df["Data"]))
+        except ValueError:
+            periodos = None
+    else:
+        periodos = None
+    if periodos is None:
+        periodos = iter(lambda: ("", "", ""), None)
+
+    for periodo, registro in zip(periodos, df[colunas].itertuples(index=False, name=None)):
+        yield tuple(periodo) + registro
+
+
+def _exportar_xlsx_streaming(arquivo_saida, df):
+    """Grava as abas 'Dados' e 'Árvore' linha a linha com openpyxl em modo write-only.
+
+    O modo write-only descarrega as linhas para disco à medida que são escritas,
+    então o consumo de memória não cresce com o tamanho da planilha.
+
+    Returns:
+        dict: Quantidade de linhas de dados gravadas por aba
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    linhas_por_aba = {}
+    for nome_aba, linhas in (("Dados", _iter_linhas_dados(df)), ("Árvore", _iter_linhas_arvore(df))):
+        worksheet = workbook.create_sheet(nome_aba)
+        cabecalho = next(linhas)
+        worksheet.append(cabecalho)
+        formatos = [_XLSX_NUMBER_FORMATS.get(coluna) for coluna in cabecalho]
+
+        total = 0
+        for linha in linhas:
+            celulas = []
+            for valor, formato_numero in zip(linha, formatos):
+                if formato_numero is None:
+                    celulas.append(valor)
+                    continue
+                celula = WriteOnlyCell(worksheet, value=_valor_numerico_excel(valor))
+                celula.number_format = formato_numero
+                celulas.append(celula)
+            worksheet.append(celulas)
+            total += 1
+        linhas_por_aba[nome_aba] = total
+
+    workbook.save(arquivo_saida)
+    return linhas_por_aba
+
+
+# Formatos de exportação suportados e limite de threads de escrita simultânea
+FORMATOS_EXPORTACAO = ("csv", "xlsx", "json", "parquet")
+_MAX_EXPORT_WORKERS = 4
+
+
+def _parse_formatos(formato) -> List[str]:
+    """Normaliza o formato de saída em lista: aceita 'csv', 'csv,xlsx' ou ['csv', 'xlsx']."""
+    if isinstance(formato, str):
+        partes = formato.split(",")
+    else:
+        partes = list(formato or [])
+    formatos = []
+    for parte in partes:
+        item = str(parte).strip().lower()
+        if item and item not in formatos:
+            formatos.append(item)
+    return formatos
+
+
+def _exportar_csv(arquivo_saida, df):
+    df.to_csv(arquivo_saida, index=False, encoding="utf-8-sig")
+    logger.info(f"✓ Dados exportados para CSV: {arquivo_saida}")
+    logger.info(f"   Linhas: {len(df)} | Colunas: {len(df.columns)}")
+
+
+def _exportar_xlsx(arquivo_saida, df):
+    # Aba 1: Dados completos e ordenados | Aba 2: Árvore (Ano/Mês/Dia hierárquicos)
+    # Quantidade e Preço são gravados como números nativos do Excel
+    linhas_por_aba = _exportar_xlsx_streaming(arquivo_saida, df)
+    logger.info(
+        f"✓ Aba 'Dados' criada: {linhas_por_aba['Dados']} linhas, {len(df.columns)} colunas"
+    )
+    logger.info(
+        f"✓ Aba 'Árvore' criada: {linhas_por_aba['Árvore']} linhas (estrutura hierárquica)"
+    )
+    logger.info(f"✓ Arquivo XLSX exportado com 2 abas: {arquivo_saida}")
+
+
+def _exportar_json(arquivo_saida, df):
+    df.to_json(arquivo_saida, orient="records", indent=2, force_ascii=False)
+    logger.info(f"✓ Dados exportados para JSON: {arquivo_saida}")
+    logger.info(f"   Linhas: {len(df)} | Colunas: {len(df.columns)}")
+
+
+def _exportar_parquet(arquivo_saida, df):
+    df.to_parquet(arquivo_saida, index=False)
+    logger.info(f"✓ Dados exportados para Parquet: {arquivo_saida}")
+    logger.info(f"   Linhas: {len(df)} | Colunas: {len(df.columns)}")
+
+
+_EXPORTADORES = {
+    "csv": _exportar_csv,
+    "xlsx": _exportar_xlsx,
+    "json": _exportar_json,
+    "parquet": _exportar_parquet,
+}
+
+# Biblioteca opcional exigida por formato (usada na mensagem de instalação)
+_DEPENDENCIAS_FORMATO = {"xlsx": "openpyxl", "parquet": "pyarrow"}
+
+
+def _executar_exportador(formato, arquivo_saida, df) -> Optional[str]:
+    """Executa o exportador de um formato; retorna o caminho gerado ou None em caso de erro."""
+    try:
+        _EXPORTADORES[formato](arquivo_saida, df)
+        return arquivo_saida
+    except ImportError as e:
+        dependencia = _DEPENDENCIAS_FORMATO.get(formato)
+        if dependencia and dependencia in str(e):
+            logger.error(
+                f"✗ Erro: {dependencia} não instalado. Para usar {formato.upper()}, instale com:"
+            )
+            logger.error(f"   pip install {dependencia}")
+        else:
+            logger.error(f"✗ Biblioteca não encontrada: {str(e)}")
+    except Exception as e:
+        logger.error(f"✗ Erro ao exportar dados para {formato.upper()}: {str(e)}")
+    return None
+
+
+def exportar_dados(
+    df, formato=None, ticker=None, sufixo: Optional[str] = None, pasta: Optional[str] = None
+) -> List[str]:
+    """Exporta os dados usando a sessão padrão (veja ExtractorSession.exportar_dados)."""
+    return sessao_padrao().exportar_dados(df, formato=formato, ticker=ticker, sufixo=sufixo, pasta=pasta)
+
+
+# ---------------------------------------------------------------------------
+# Sessão de extração: estado reaproveitado entre arquivos, jobs e execuções
+# ---------------------------------------------------------------------------
+
+
+def _cancelavel(metodo):
+    """Dá a cada chamada do método um sinal de cancelamento próprio, somado ao should_stop.
+
+    ExtractorSession.cancelar() sinaliza apenas as chamadas em andamento: as que
+    começarem depois rodam normalmente na mesma sessão.
+    """
+
+    @wraps(metodo)
+    def _chamada(self, *args, should_stop: Optional[Callable[[], bool]] = None, **kwargs):
+        cancelamento = threading.Event()
+        with self._lock:
+            self._cancelamentos.add(cancelamento)
+        try:
+            return metodo(
+                self,
+                *args,
+                should_stop=lambda: _parada_solicitada(should_stop) or cancelamento.is_set(),
+                **kwargs,
+            )
+        finally:
+            with self._lock:
+                self._cancelamentos.discard(cancelamento)
+
+    return _chamada
+
+
+class ExtractorSession:
+    """Motor de extração reutilizável.
+
+    Concentra o estado que antes era recriado a cada PDF ou execução: a
+    configuração, o mapeamento de tickers já compilado, a senha que abriu os
+    últimos PDFs, o pool de workers, o sinal de cancelamento e o destino das
+    métricas por arquivo. Processos de longa duração (webapp) criam a sessão
+    uma vez, chamam aquecer() e a reutilizam em todos os jobs; as funções de
+    módulo processar_pdf, analisar_pasta_ou_zip e exportar_dados delegam para
+    a sessão padrão (sessao_padrao()).
+
+    Args:
+        config_manager: ConfigManager a usar (None = configuração global do módulo)
+        workers: Número padrão de workers de analisar_pasta_ou_zip
+        metrics_sink: Callable que recebe as métricas de cada arquivo processado
+    """
+
+    def __init__(
+        self,
+        config_manager=None,
+        workers: int = 1,
+        metrics_sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self._config = config_manager
+        self.workers = workers
+        self.metrics_sink = metrics_sink
+        self._cancelamentos: Set[threading.Event] = set()
+        self._lock = threading.Lock()
+        self._mapeamento: Optional[_MapeamentoTickers] = None
+        self._senha_em_cache: Optional[str] = None
+        self._pool = None
+        self._pool_chave = None
+
+    @property
+    def config(self):
+        return self._config if self._config is not None else config
+
+    def __getstate__(self):
+        # A sessão vai para os processos filhos (--workers/--isolate) junto com cada tarefa:
+        # pool, lock, sinais de cancelamento e metrics_sink ficam só no processo pai
+        estado = self.__dict__.copy()
+        for atributo in ("_cancelamentos", "_lock", "_pool", "_pool_chave", "metrics_sink"):
+            estado[atributo] = None
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._cancelamentos = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.fechar()
+
+    @property
+    def ticker_mapping(self) -> "_MapeamentoTickers":
+        """Mapeamento de tickers compilado, carregado da configuração no primeiro uso."""
+        return self._carregar_mapeamento()
+
+    def _carregar_mapeamento(self) -> "_MapeamentoTickers":
+        if self._mapeamento is None:
+            with self._lock:
+                if self._mapeamento is None:
+                    self._mapeamento = _MapeamentoTickers(self.config.get_ticker_mapping())
+        return self._mapeamento
+
+    def atualizar_mapeamento(self) -> bool:
+        """Relê tickerMapping.properties e recompila o mapeamento apenas se ele mudou.
+
+        Returns:
+            True se o mapeamento foi (re)compilado
+        """
+        mapeamento = self.config.get_ticker_mapping()
+        with self._lock:
+            if self._mapeamento is not None and self._mapeamento.ticker_mapping == mapeamento:
+                return False
+            self._mapeamento = _MapeamentoTickers(mapeamento)
+        logger.debug(f"   Mapeamento de tickers compilado: {len(mapeamento)} descrição(ões)")
+        return True
+
+    def aquecer(self) -> "ExtractorSession":
+        """Carrega e compila o mapeamento de tickers antes do primeiro arquivo."""
+        self._carregar_mapeamento()
+        return self
+
+    def assinatura_extracao(self, atualizar: bool = True) -> str:
+        """Identifica o que a extração de um mesmo PDF produz: versão do parser e mapeamento.
+
+        Registros extraídos com a mesma assinatura (e o mesmo filtro de ticker) podem
+        ser reaproveitados; com atualizar, o mapeamento é relido antes.
+        """
+        if atualizar:
+            self.atualizar_mapeamento()
+        return f"{VERSAO_PARSER}:{self.ticker_mapping.assinatura}"
+
+    def cancelar(self) -> None:
+        """Cancela os processamentos em andamento na sessão antes da próxima página.
+
+        Chamadas iniciadas depois não são afetadas: a sessão continua reutilizável.
+        """
+        with self._lock:
+            for cancelamento in self._cancelamentos:
+                cancelamento.set()
+
+    def fechar(self) -> None:
+        """Encerra o pool de workers da sessão (se houver)."""
+        with self._lock:
+            pool, self._pool, self._pool_chave = self._pool, None, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _emitir_metricas(self, metricas: Dict[str, Any]) -> None:
+        if self.metrics_sink is None:
+            return
+        try:
+            self.metrics_sink(metricas)
+        except Exception:
+            # Um sink com problema nunca deve interromper o processamento principal.
+            pass
+
+    def _executor(self, workers: int, isolate: bool):
+        """Pool de workers da sessão, recriado apenas se o tamanho ou o tipo mudar."""
+        chave = ("thread" if isolate else "process", workers)
+        with self._lock:
+            if self._pool is not None and self._pool_chave == chave:
+                return self._pool
+            anterior, self._pool = self._pool, None
+            if anterior is not None:
+                anterior.shutdown(wait=True)
+            if isolate:
+                # Cada thread apenas vigia o processo filho do seu arquivo
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="isolado")
+            else:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(_METODO_INICIO_POOL),
+                    initializer=_inicializar_processo_pool,
+                    initargs=(log_file, logging_level),
+                )
+            self._pool_chave = chave
+            return self._pool
+
+    def _abrir_pdf(self, pdf_file, senha=None):
+        """Abre o PDF com a senha informada ou, se protegido, com a senha da configuração.
+
+        A senha da configuração que funcionou fica em cache e é tentada primeiro nos
+        próximos arquivos, evitando a abertura sem senha que falharia de novo.
+        Retorna None se o PDF continuar protegido.
+        """
+        if not senha and self._senha_em_cache:
+            try:
+                return pdfplumber.open(pdf_file, password=self._senha_em_cache)
+            except pdfplumber.utils.exceptions.PdfminerException:
+                self._senha_em_cache = None
+        try:
+            if senha:
+                return pdfplumber.open(pdf_file, password=senha)
+            return pdfplumber.open(pdf_file)
+        except pdfplumber.utils.exceptions.PdfminerException:
+            # Se falhar sem senha, tenta com a senha padrão da config
+            try:
+                senha_config = self.config.get_pdf_password()
+                if not senha_config:
+                    return None
+                pdf = pdfplumber.open(pdf_file, password=senha_config)
+            except Exception:
+                return None
+            self._senha_em_cache = senha_config
+            return pdf
+
+    def _selecionar_pelo_catalogo(
+        self, caminho, tarefas, catalog_path, date_from, date_to, execution_stats
+    ) -> List[Dict[str, Any]]:
+        """Atualiza o catálogo e aplica o intervalo de datas do pregão e o descarte de duplicatas."""
+        from catalog import carregar_catalogo, construir_catalogo, converter_data, selecionar_tarefas
+
+        date_from = converter_data(date_from) if date_from else None
+        date_to = converter_data(date_to) if date_to else None
+        resumo = construir_catalogo(caminho, catalog_path, abrir_pdf=self._abrir_pdf)
+        tarefas, fora_do_intervalo, duplicatas = selecionar_tarefas(
+            tarefas, carregar_catalogo(resumo["catalog"]), date_from, date_to
+        )
+        execution_stats["catalog"] = {
+            "path": resumo["catalog"],
+            "scanned_files": resumo["scanned"],
+            "date_from": date_from,
+            "date_to": date_to,
+            "ignored_by_date": fora_do_intervalo,
+            "duplicates_skipped": duplicatas,
+        }
+        if date_from or date_to:
+            logger.info(
+                f"📅 Intervalo do pregão {date_from or '…'} a {date_to or '…'}: "
+                f"{fora_do_intervalo} arquivo(s) fora do intervalo"
+            )
+        if duplicatas:
+            logger.info(f"♊ {duplicatas} duplicata(s) exata(s) ignorada(s)")
+        return tarefas
+
+    @_cancelavel
+    def processar_pdf(
+        self,
+        pdf_file,
+        senha=None,
+        metrics_collector: Optional[List[Dict[str, Any]]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        pagina_inicial: int = 1,
+        ticker_filter: Optional[str] = None,
+        page_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """Extrai as operações de um PDF de nota de corretagem.
+
+        O cancelamento (Ctrl+C, should_stop ou cancelar()) é verificado antes de cada página: ao
+        ser solicitado, o processamento para, as métricas recebem status "cancelled"
+        com "pages_completed" e são retornados os registros das páginas já concluídas.
+        Com pagina_inicial > 1 as páginas anteriores são puladas (retomada de checkpoint).
+
+        Com ticker_filter, apenas as operações desse ticker são retornadas: páginas
+        que não mencionam o ticker são puladas ("skipped" nas métricas da página) e a
+        resolução fuzzy é adiada nas linhas que não podem resultar nele. Nota, Folha,
+        Linha e Chave são as mesmas de uma extração sem filtro.
+
+        page_callback recebe, ao fim de cada página, as métricas da página com
+        "page_count" (total de páginas do PDF).
+        """
+        dados_extraidos = []
+
+        # Mapeamento de tickers compilado uma única vez pela sessão
+        ticker_mapping = self.ticker_mapping
+        filtro_ticker = _FiltroTicker(ticker_filter, ticker_mapping) if ticker_filter else None
+        # Com filtro: assinaturas dos registros de outros tickers já descartados e linhas
+        # descartadas sem resolver o ticker (ambas entram na deduplicação do fallback de texto)
+        assinaturas_descartadas: Counter = Counter()
+        linhas_adiadas: List[Dict[str, Any]] = []
+
+        # Tratamento inteligente do nome do arquivo para diferentes tipos de entrada
+        if isinstance(pdf_file, str):
+            arquivo_nome = os.path.basename(pdf_file)
+        else:
+            # Para file objects e BytesIO, tenta obter 'name', senão usa genérico
+            arquivo_nome = getattr(pdf_file, "name", "pdf_temporario.pdf")
+
+        try:
+            _inicio_processamento = datetime.now()
+            logger.info(f"📄 Processando arquivo: {arquivo_nome}")
+            sys.stderr.flush()
+            file_metrics: Dict[str, Any] = {
+                "file_name": arquivo_nome,
+                "status": "running",
+                "page_count": 0,
+                "records_extracted": 0,
+                "elapsed_seconds": 0.0,
+                "avg_seconds_per_page": 0.0,
+                "avg_seconds_per_record": 0.0,
+                "pages": [],
+                "error": None,
+            }
+            if filtro_ticker is not None:
+                file_metrics["pages_skipped"] = 0
+
+            pdf = self._abrir_pdf(pdf_file, senha)
+            if pdf is None:
+                logger.warning(
+                    f"⚠️  {arquivo_nome}: PDF protegido. Configure 'pdf.password' em application.properties"
+                )
+                sys.stderr.flush()
+                return dados_extraidos
+
+            with pdf:
+                identificador_arquivo = None
+                total_paginas = len(pdf.pages)
+                file_metrics["page_count"] = total_paginas
+                logger.debug(f"   Total de páginas: {total_paginas}")
+
+                cancelado = False
+
+                def _registrar_pagina(metricas_pagina: Dict[str, Any]) -> None:
+                    file_metrics["pages"].append(metricas_pagina)
+                    if page_callback is None:
+                        return
+                    try:
+                        page_callback(dict(metricas_pagina, page_count=total_paginas))
+                    except Exception:
+                        # Callback de página nunca deve interromper a extração.
+                        pass
+
+                for num_pagina, page in enumerate(pdf.pages, 1):
+                    if num_pagina < pagina_inicial:
+                        continue
+                    if _parada_solicitada(should_stop):
+                        cancelado = True
+                        file_metrics["pages_completed"] = num_pagina - 1
+                        break
+                    page_started_at = datetime.now()
+                    try:
+                        # Extração da Data (procura por "Data pregão") [3, 8, 9]
+                        texto_topo = page.extract_text()
+                        if filtro_ticker is not None and not filtro_ticker.pagina_relevante(texto_topo):
+                            file_metrics["pages_skipped"] += 1
+                            _registrar_pagina(
+                                {
+                                    "page_number": num_pagina,
+                                    "records_extracted": 0,
+                                    "elapsed_seconds": _round_metric(
+                                        (datetime.now() - page_started_at).total_seconds()
+                                    ),
+                                    "skipped": "ticker_filter",
+                                }
+                            )
+                            continue
+                        data_pregao = None
+                        match_data = re.search(r"(\d{2}/\d{2}/\d{4})", texto_topo)
+                        if match_data:
+                            data_pregao = match_data.group(1)
+
+                        # Número da nota e folha identificam a origem de cada operação
+                        nota, folha = _extract_note_header(texto_topo)
+                        inicio_pagina = len(dados_extraidos)
+
+                        # Extração da Tabela de Negócios [1, 2, 10]
+                        tables = page.extract_tables()
+                        registros_pagina = 0
+
+                        for table in tables:
+                            if not table:
+                                continue
+
+                            # Detecta tabelas de negociações — geralmente 11 colunas em muitas corretoras
+                            num_cols = len(table[0]) if table and table[0] else 0
+                            table_text = " ".join(" ".join([str(c) for c in row if c]) for row in table)
+                            is_negociacao = (num_cols == 11) or any(
+                                k in table_text
+                                for k in ["Data pregão", "Nr. nota", "Negociação", "Especificação"]
+                            )
+
+                            if not is_negociacao:
+                                # Heurística fallback: tente encontrar linhas que contenham quantidade+preço
+                                # MAS USANDO A MESMA VALIDAÇÃO que acima
+                                for row in table[1:]:
+                                    if not row or all(not (str(c).strip()) for c in row):
+                                        continue
+
+                                    cells = [(c or "").strip() for c in row]
+
+                                    # APLICAR VALIDAÇÃO: recusa headers/footers/summaries
+                                    if not _is_valid_data_row(cells, is_negotiation_table=False):
+                                        continue
+
+                                    try:
+                                        # Verifica se é uma linha válida de negociação
+                                        ticker = _ticker_da_linha(cells, ticker_mapping, filtro_ticker)
+                                        if not ticker:
+                                            continue  # Não conseguiu extrair ticker válido
+
+                                        # Procura por padrões de número (quantidade/price)
+                                        possible_qty = None
+                                        possible_price = None
+                                        for c in cells:
+                                            if re.search(r"\d+[\.,]\d+", c):
+                                                # assume price-like
+                                                if not possible_price:
+                                                    possible_price = _normalize_number(c)
+                                            elif re.search(
+                                                r"^\d+$", c.replace(".", "").replace(",", "")
+                                            ):
+                                                if not possible_qty:
+                                                    possible_qty = _normalize_number(c)
+
+                                        if not possible_qty and not possible_price:
+                                            continue
+
+                                        operacao = ""
+                                        for c in cells:
+                                            if (
+                                                " C " in f" {c} ".upper()
+                                                or c.strip().upper() == "C"
+                                                or c.strip().upper() == "V"
+                                            ):
+                                                operacao = (
+                                                    "C"
+                                                    if "C" in c.upper()
+                                                    else "V" if "V" in c.upper() else ""
+                                                )
+                                                if operacao:
+                                                    break
+
+                                        dados_extraidos.append(
+                                            {
+                                                "Data": data_pregao,
+                                                "Ticker": ticker,
+                                                "Operação": operacao,
+                                                "Quantidade": possible_qty or "",
+                                                "Preço": possible_price or "",
+                                            }
+                                        )
+                                        if ticker is _TICKER_PENDENTE:
+                                            dados_extraidos[-1]["_cells"] = cells
+                                        registros_pagina += 1
+                                    except Exception:
+                                        continue
+                                # fim heurística fallback
+                            else:
+                                # Para tabelas de negociação, processa TODAS as linhas (não pula a primeira)
+                                # A detecção de cabeçalho é feita dentro de _is_valid_data_row()
+                                start_row = 0 if is_negociacao else 1
+                                for row in table[start_row:]:
+                                    # Filtra linhas vazias
+                                    if not row or all(not (str(c).strip()) for c in row):
+                                        continue
+
+                                    cells = [(c or "").strip() for c in row]
+
+                                    # Verifica se é uma linha válida de negociação
+                                    if not _is_valid_data_row(cells, is_negotiation_table=True):
+                                        continue
+
+                                    try:
+                                        # Mapeamento comum observado em amostras:
+                                        # col[2] = operação (C/V), col[5] = especificação (nome do ativo), col[7] = quantidade, col[8] = preço
+
+                                        # Extrai ticker de forma robusta
+                                        ticker = _ticker_da_linha(cells, ticker_mapping, filtro_ticker)
+                                        if not ticker:
+                                            continue  # Não conseguiu extrair ticker válido
+
+                                        operacao = ""
+                                        if len(cells) > 2 and cells[2]:
+                                            operacao = (
+                                                "C"
+                                                if "C" in cells[2].upper()
+                                                else ("V" if "V" in cells[2].upper() else "")
+                                            )
+
+                                        quantidade_raw = cells[7] if len(cells) > 7 else ""
+                                        preco_raw = cells[8] if len(cells) > 8 else ""
+
+                                        quantidade = _normalize_number(quantidade_raw)
+                                        preco = _normalize_number(preco_raw)
+
+                                        # Se não houver quantidade nem preço, provavelmente não é linha de negócio
+                                        if not quantidade and not preco:
+                                            continue
+
+                                        dados_extraidos.append(
+                                            {
+                                                "Data": data_pregao,
+                                                "Ticker": ticker,
+                                                "Operação": operacao,
+                                                "Quantidade": quantidade,
+                                                "Preço": preco,
+                                            }
+                                        )
+                                        if ticker is _TICKER_PENDENTE:
+                                            dados_extraidos[-1]["_cells"] = cells
+                                        registros_pagina += 1
+                                    except Exception as e:
+                                        logger.debug(f"   ⚠️  Erro ao extrair linha: {str(e)}")
+                                        continue
+
+                        # FALLBACK: Extrair operações diretamente do texto como backup
+                        # Isso trata casos onde pdfplumber falha ao extrair todas as linhas das tabelas
+                        # (ex: operações do meio ficam faltando na divisão de tabelas)
+                        operacoes_texto = (
+                            _extract_operations_from_text(texto_topo, data_pregao, ticker_mapping)
+                            if data_pregao
+                            else []
+                        )
+                        if filtro_ticker is not None:
+                            linhas_adiadas = _resolver_linhas_filtradas(
+                                dados_extraidos,
+                                inicio_pagina,
+                                operacoes_texto,
+                                ticker_mapping,
+                                filtro_ticker,
+                                assinaturas_descartadas,
+                                linhas_adiadas,
+                            )
+
+                        if operacoes_texto:
+                            # Conta quantas vezes cada assinatura (Data+Ticker+Qtd+Preço) já existe
+                            # nas operações extraídas da tabela. Usa Counter (e não set) para
+                            # preservar operações idênticas legítimas — ex: 2 compras do mesmo ativo
+                            # na mesma data, mesma quantidade e mesmo preço na mesma nota.
+                            operacoes_existentes = Counter()
+                            for op in dados_extraidos:
+                                sig = (
+                                    op.get("Data"),
+                                    op.get("Ticker"),
+                                    op.get("Quantidade"),
+                                    op.get("Preço"),
                                 )
-                                file_metrics = []
-                                dados = processar_pdf(bio, metrics_collector=file_metrics)
-                                todos_dados.extend(dados)
-                                arquivos_processados += 1
-                                if file_metrics:
-                                    execution_stats["files"].append(file_metrics[0])
-                                _notify_progress(current_file, "processed")
-                    except Exception as e:
-                        logger.error(
-                            f"✗ Erro ao processar {tarefa['name']} do ZIP {os.path.basename(tarefa['zip'])}: {str(e)}"
+                                operacoes_existentes[sig] += 1
+                            operacoes_existentes.update(assinaturas_descartadas)
+
+                            # Pré-computa quantas vezes cada sig aparece no texto extraído
+                            texto_count = Counter()
+                            for op in operacoes_texto:
+                                sig = (
+                                    op.get("Data"),
+                                    op.get("Ticker"),
+                                    op.get("Quantidade"),
+                                    op.get("Preço"),
+                                )
+                                texto_count[sig] += 1
+
+                            # Adiciona operações do texto apenas para a quantidade excedente.
+                            # Permite preservar operações idênticas legítimas (mesmo ativo,
+                            # mesma data, mesma qtd, mesmo preço na mesma nota) que o parser
+                            # de tabela pode ter capturado apenas parcialmente.
+                            novas_operacoes = 0
+                            texto_adicionadas = Counter()
+                            for op in operacoes_texto:
+                                sig = (
+                                    op.get("Data"),
+                                    op.get("Ticker"),
+                                    op.get("Quantidade"),
+                                    op.get("Preço"),
+                                )
+                                if texto_adicionadas[sig] + operacoes_existentes[sig] < texto_count[sig]:
+                                    dados_extraidos.append(op)
+                                    texto_adicionadas[sig] += 1
+                                    novas_operacoes += 1
+
+                            if novas_operacoes > 0:
+                                logger.debug(
+                                    f"   ℹ️  Adicionadas {novas_operacoes} operação(ões) extraída(s) do texto"
+                                )
+                                registros_pagina += novas_operacoes
+
+                        # Chave natural: nota + folha + posição da operação na página
+                        if not nota and len(dados_extraidos) > inicio_pagina:
+                            if identificador_arquivo is None:
+                                identificador_arquivo = _identificador_conteudo(pdf_file)
+                            nota = identificador_arquivo
+                        folha_registro = folha or str(num_pagina)
+                        for linha, operacao_pagina in enumerate(
+                            dados_extraidos[inicio_pagina:], start=1
+                        ):
+                            operacao_pagina["Nota"] = nota
+                            operacao_pagina["Folha"] = folha_registro
+                            operacao_pagina["Linha"] = linha
+                            operacao_pagina["Chave"] = _build_operation_key(
+                                operacao_pagina.get("Data"), nota, folha_registro, linha
+                            )
+                        if filtro_ticker is not None:
+                            registros_alvo = []
+                            for operacao_pagina in dados_extraidos[inicio_pagina:]:
+                                if filtro_ticker.corresponde(operacao_pagina["Ticker"]):
+                                    registros_alvo.append(operacao_pagina)
+                                else:
+                                    assinaturas_descartadas[_assinatura_operacao(operacao_pagina)] += 1
+                            dados_extraidos[inicio_pagina:] = registros_alvo
+                            registros_pagina = len(registros_alvo)
+
+                        if registros_pagina > 0:
+                            logger.debug(
+                                f"   ✓ Página {num_pagina}/{total_paginas}: {registros_pagina} registro(s) extraído(s)"
+                            )
+
+                        page_elapsed = (datetime.now() - page_started_at).total_seconds()
+                        _registrar_pagina(
+                            {
+                                "page_number": num_pagina,
+                                "records_extracted": registros_pagina,
+                                "elapsed_seconds": _round_metric(page_elapsed),
+                            }
                         )
-                        arquivos_erro += 1
-                        execution_stats["files"].append(
+
+                    except Exception as e:
+                        logger.error(f"   ✗ Erro ao processar página {num_pagina}: {str(e)}")
+                        page_elapsed = (datetime.now() - page_started_at).total_seconds()
+                        _registrar_pagina(
                             {
-                                "file_name": current_file,
-                                "status": "error",
-                                "page_count": 0,
+                                "page_number": num_pagina,
                                 "records_extracted": 0,
-                                "elapsed_seconds": 0.0,
-                                "avg_seconds_per_page": 0.0,
-                                "avg_seconds_per_record": 0.0,
-                                "pages": [],
+                                "elapsed_seconds": _round_metric(page_elapsed),
                                 "error": str(e),
                             }
                         )
-                        _notify_progress(current_file, "error")
-
-        except KeyboardInterrupt:
-            logger.warning(
-                "⚠️  Execução interrompida pelo usuário (KeyboardInterrupt). Salvando progresso parcial..."
+                        continue
+
+            total_registros = len(dados_extraidos)
+            _tempo_processamento = (datetime.now() - _inicio_processamento).total_seconds()
+            file_metrics["records_extracted"] = total_registros
+            file_metrics["elapsed_seconds"] = _round_metric(_tempo_processamento)
+            file_metrics["avg_seconds_per_page"] = _round_metric(
+                _tempo_processamento / total_paginas if total_paginas else 0.0
             )
-            # stop_processing já será True pelo handler; fora do laço iremos exportar o parcial
-
-        # Resumo final
-        _tempo_total = (datetime.now() - _inicio_total).total_seconds()
-        logger.info("\n" + "=" * 60)
-        logger.info("📊 RESUMO DO PROCESSAMENTO")
-        logger.info("=" * 60)
-        logger.info(f"✓ Arquivos processados com sucesso: {arquivos_processados}")
-        if arquivos_erro > 0:
-            logger.warning(f"⚠️  Arquivos com erro: {arquivos_erro}")
-        if arquivos_ignorados > 0:
-            logger.info(f"⏭️ Arquivos ignorados (fora do filtro de ano): {arquivos_ignorados}")
-        logger.info(f"📈 Total de registros extraídos: {len(todos_dados)}")
-        logger.info(f"⏱️  Tempo total de processamento: {_format_elapsed(_tempo_total)}")
-        logger.info("=" * 60)
-
-        execution_stats["totals"]["processed_files"] = arquivos_processados
-        execution_stats["totals"]["failed_files"] = arquivos_erro
-        execution_stats["totals"]["ignored_files"] = arquivos_ignorados
-        execution_stats["totals"]["pages_processed"] = sum(
-            int(file_stat.get("page_count") or 0) for file_stat in execution_stats["files"]
-        )
-        execution_stats["totals"]["records_extracted"] = len(todos_dados)
-        execution_stats = _finalize_execution_stats(
-            execution_stats,
-            "cancelled" if stop_processing else "completed",
-        )
-        stats_path = _write_execution_stats(execution_stats)
-        logger.info(f"🧾 Estatísticas da execução salvas em: {stats_path}")
-        if stats_output_path is not None:
-            stats_output_path.append(stats_path)
+            file_metrics["avg_seconds_per_record"] = _round_metric(
+                _tempo_processamento / total_registros if total_registros else 0.0
+            )
+            if cancelado:
+                file_metrics["status"] = "cancelled"
+                logger.warning(
+                    f"⏸️ {arquivo_nome}: interrompido após a página {file_metrics['pages_completed']}/{total_paginas} "
+                    f"({total_registros} registro(s) até aqui)"
+                )
+            elif total_registros > 0:
+                file_metrics["status"] = "success"
+                logger.info(f"✓ {arquivo_nome}: {total_registros} registro(s) extraído(s) com sucesso [{_format_elapsed(_tempo_processamento)}]")
+            else:
+                file_metrics["status"] = "warning"
+                logger.warning(f"⚠️  {arquivo_nome}: Nenhum registro extraído [{_format_elapsed(_tempo_processamento)}]")
+            sys.stderr.flush()
+
+        except FileNotFoundError:
+            _tempo_processamento = (datetime.now() - _inicio_processamento).total_seconds()
+            file_metrics["status"] = "file_not_found"
+            file_metrics["error"] = "Arquivo não encontrado"
+            file_metrics["elapsed_seconds"] = _round_metric(_tempo_processamento)
+            logger.error(f"✗ Arquivo não encontrado: {arquivo_nome} [{_format_elapsed(_tempo_processamento)}]")
+        except Exception as e:
+            _tempo_processamento = (datetime.now() - _inicio_processamento).total_seconds()
+            file_metrics["status"] = "error"
+            file_metrics["error"] = str(e)
+            file_metrics["elapsed_seconds"] = _round_metric(_tempo_processamento)
+            logger.error(f"✗ Erro ao processar {arquivo_nome}: {str(e)} [{_format_elapsed(_tempo_processamento)}]")
+
+        if metrics_collector is not None:
+            metrics_collector.append(file_metrics)
+
+        return dados_extraidos
+
+
+    @_cancelavel
+    def analisar_pasta_ou_zip(
+        self,
+        caminho,
+        year_filter: Optional[int] = None,
+        sort_by: str = "name",
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        stats_output_path: Optional[List[str]] = None,
+        shard=None,
+        queue_dir: Optional[str] = None,
+        isolate: bool = False,
+        file_timeout: Optional[float] = None,
+        max_rss_mb: Optional[float] = None,
+        force: bool = False,
+        workers: Optional[int] = None,
+        resume_from: Optional[str] = None,
+        ticker_filter: Optional[str] = None,
+        catalog_path: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        record_cache=None,
+    ):
+        """Processa os PDFs de uma pasta ou ZIP e retorna os registros em um DataFrame.
+
+        Sem workers, usa o número de workers da sessão. O mapeamento de tickers é
+        relido no início (e recompilado só se mudou) e as métricas de cada arquivo
+        também são enviadas ao metrics_sink da sessão. Com year_filter, arquivos sem
+        ano no nome são filtrados pela data da primeira página; com ticker_filter, a
+        extração de cada PDF já retorna só as operações do ticker.
+
+        Com catalog_path, date_from/date_to (DD/MM/AAAA ou AAAA-MM-DD) ou
+        sort_by="trade_date", o catálogo (catalog.py) é atualizado antes: os arquivos
+        são selecionados pela data real do pregão e duplicatas exatas são puladas.
+
+        progress_callback recebe os estágios de cada arquivo (started, processing,
+        processed, error, cancelled, finished) e, fora do modo isolado, um evento
+        "page" ao fim de cada página. Com workers, o cancelamento (should_stop,
+        cancelar()) e as páginas passam pelo Manager da execução, e os processos do
+        pool param antes da próxima página.
+
+        Com record_cache (objeto com buscar(chave) e guardar(chave, registros), ex.:
+        result_cache.ResultCache), cada arquivo é identificado pelo SHA-256 do conteúdo
+        junto com assinatura_extracao() e o filtro de ticker: arquivos já extraídos
+        reaproveitam os registros guardados e os demais são guardados ao concluir.
+        """
+        workers = self.workers if workers is None else workers
+        todos_dados = []
+        resultados: Dict[int, List[Dict[str, Any]]] = {}
+        parciais: Dict[int, Dict[str, Any]] = {}
+        arquivos_processados = 0
+        arquivos_erro = 0
+        arquivos_ignorados = 0
+        _inicio_total = datetime.now()
+        execution_stats = _build_execution_stats(caminho, year_filter, sort_by, ticker_filter)
+        if shard is not None or queue_dir:
+            sufixo = _sufixo_particao(shard, queue_dir)
+            execution_stats["execution_id"] += f"_{sufixo}"
+            execution_stats["sharding"] = {
+                "shard": f"{shard[0]}/{shard[1]}" if shard is not None else None,
+                "queue_dir": queue_dir,
+                "assigned_tasks": None,
+                "claimed_elsewhere": 0,
+            }
+        # Tarefas desta execução concluídas na fila (com o status do marcador .done)
+        concluidas_fila: List[tuple] = []
 
-        if tarefas:
-            _notify_progress("", "finished")
+        try:
+            self.atualizar_mapeamento()
+            logger.info("=" * 60)
+            logger.info("🚀 INICIANDO PROCESSAMENTO")
+            if year_filter is not None:
+                logger.info(f"🔍 Filtro de ano ativo: {year_filter}")
+            logger.info("=" * 60)
 
-        df = pd.DataFrame(todos_dados)
-        return df
+            # Resolve caminho relativo se necessário
+            if not os.path.isabs(caminho):
+                caminho_resolvido = os.path.join(os.path.dirname(__file__), caminho)
+                if os.path.exists(caminho_resolvido):
+                    caminho = caminho_resolvido
+
+            # Validação do caminho fornecido
+            if not os.path.exists(caminho):
+                logger.error(f"✗ Caminho não encontrado: {caminho}")
+                return pd.DataFrame()
+
+            total_arquivos = _count_total_pdfs(caminho)
+            execution_stats["totals"]["estimated_pdfs"] = total_arquivos
+            logger.info(f"📥 Total estimado de PDFs para processar: {total_arquivos}")
+
+            if total_arquivos == 0:
+                logger.warning("⚠️  Nenhum arquivo PDF encontrado para processar")
+                return pd.DataFrame()
+
+            # Cria a lista de tarefas (uniformiza arquivos diretos e dentro de ZIPs)
+            listagem = _listar_tarefas(caminho, year_filter, abrir_pdf=self._abrir_pdf)
+            if listagem is None:
+                logger.error(f"✗ Caminho não é arquivo ZIP ou pasta: {caminho}")
+                return pd.DataFrame()
+            tarefas, arquivos_ignorados = listagem
+            if ticker_filter:
+                for tarefa in tarefas:
+                    tarefa["_ticker_filter"] = ticker_filter
+            if catalog_path or date_from or date_to or sort_by == "trade_date":
+                tarefas = self._selecionar_pelo_catalogo(
+                    caminho, tarefas, catalog_path, date_from, date_to, execution_stats
+                )
 
-    except Exception as e:
-        logger.error(f"✗ Erro inesperado durante o processamento: {str(e)}")
-        execution_stats["totals"]["processed_files"] = arquivos_processados
-        execution_stats["totals"]["failed_files"] = arquivos_erro + 1
-        execution_stats["totals"]["ignored_files"] = arquivos_ignorados
-        execution_stats["totals"]["pages_processed"] = sum(
-            int(file_stat.get("page_count") or 0) for file_stat in execution_stats["files"]
-        )
-        execution_stats["totals"]["records_extracted"] = len(todos_dados)
-        execution_stats["error"] = str(e)
-        execution_stats = _finalize_execution_stats(execution_stats, "failed")
-        stats_path = _write_execution_stats(execution_stats)
-        logger.info(f"🧾 Estatísticas da execução salvas em: {stats_path}")
-        if stats_output_path is not None:
-            stats_output_path.append(stats_path)
-        logger.info("=" * 60)
-        return pd.DataFrame()
+            if shard is not None:
+                tarefas = _filtrar_shard(tarefas, shard)
+                logger.info(f"🧩 Shard {shard[0]}/{shard[1]}: {len(tarefas)} arquivo(s) atribuído(s)")
+            if queue_dir:
+                os.makedirs(queue_dir, exist_ok=True)
+                _marcar_presenca(queue_dir)
+                lease_fila = self.config.get_queue_lease_minutes() * 60
+                logger.info(f"📬 Fila compartilhada: {queue_dir}")
+            if "sharding" in execution_stats:
+                execution_stats["sharding"]["assigned_tasks"] = len(tarefas)
+
+            # Arquivos que já excederam os limites do modo isolado são pulados, exceto com force
+            quarentena = carregar_quarentena()
+            if quarentena and not force:
+                em_quarentena = [t for t in tarefas if _em_quarentena(quarentena, t)]
+                if em_quarentena:
+                    tarefas = [t for t in tarefas if not _em_quarentena(quarentena, t)]
+                    execution_stats["totals"]["quarantined_files"] = len(em_quarentena)
+                    logger.warning(
+                        f"🚧 {len(em_quarentena)} arquivo(s) em quarentena ignorado(s) "
+                        f"(use --force para reprocessar): {_caminho_quarentena()}"
+                    )
+            if isolate:
+                file_timeout = file_timeout if file_timeout is not None else self.config.get_file_timeout_seconds()
+                max_rss_mb = max_rss_mb if max_rss_mb is not None else self.config.get_max_rss_mb()
+                execution_stats["isolation"] = {"timeout_seconds": file_timeout, "max_rss_mb": max_rss_mb}
+                logger.info(
+                    f"🛡️  Modo isolado: timeout {file_timeout:g}s | memória máxima {max_rss_mb:g} MB por arquivo"
+                )
 
+            # Ordena a lista de tarefas pelo critério escolhido (data do pregão: desempate pelo nome)
+            _SORT_FIELDS = {"name": "_name", "mtime": "_mtime", "ctime": "_ctime"}
+            if sort_by == "trade_date":
+                tarefas.sort(key=lambda t: (t["_trade_date"], t["_name"]))
+            else:
+                sort_field = _SORT_FIELDS.get(sort_by, "_name")
+                tarefas.sort(key=lambda t: t[sort_field])
+            logger.info(f"🗂️  Ordenação de arquivos: {sort_by} | {len(tarefas)} arquivo(s) a processar")
+
+            # Retomada: reaproveita arquivos concluídos e continua os interrompidos da página seguinte
+            metricas_concluidas: Dict[int, Dict[str, Any]] = {}
+            prefixos: Dict[int, List[Dict[str, Any]]] = {}
+            if resume_from:
+                checkpoint_anterior = carregar_checkpoint(resume_from)
+                if checkpoint_anterior is None:
+                    logger.error(f"✗ Checkpoint não encontrado: {caminho_checkpoint(resume_from)}")
+                    return pd.DataFrame()
+                reaproveitados, metricas_concluidas, prefixos = _aplicar_checkpoint(
+                    checkpoint_anterior, tarefas
+                )
+                resultados.update(reaproveitados)
+                arquivos_processados += len(reaproveitados)
+                execution_stats["resume"] = {
+                    "from_execution_id": resume_from,
+                    "reused_files": len(reaproveitados),
+                    "resumed_partial_files": len(prefixos),
+                }
+                logger.info(
+                    f"⏯️  Retomando a execução {resume_from}: {len(reaproveitados)} arquivo(s) já concluído(s), "
+                    f"{len(prefixos)} continuam da página em que pararam"
+                )
 
-def ordenar_dados_por_data(df):
-    """Ordena o DataFrame por Data (do mais antigo para o mais recente).
+            # Cache de registros: conteúdo já extraído com a mesma assinatura não é reprocessado
+            chaves_cache: Dict[int, str] = {}
+            if record_cache is not None:
+                assinatura = self.assinatura_extracao(atualizar=False)
+                reaproveitados_cache = []
+                for indice, tarefa in enumerate(tarefas):
+                    if indice in resultados or indice in prefixos:
+                        continue
+                    try:
+                        chave = chave_cache_registros(
+                            _sha256_tarefa(tarefa), assinatura, tarefa.get("_ticker_filter")
+                        )
+                        registros_cache = record_cache.buscar(chave)
+                    except Exception as e:
+                        logger.warning(f"⚠️  Cache de registros indisponível para {tarefa['_name']}: {e}")
+                        continue
+                    if registros_cache is None:
+                        chaves_cache[indice] = chave
+                        continue
+                    resultados[indice] = registros_cache
+                    metricas_concluidas[indice] = {
+                        "file_name": tarefa["_name"],
+                        "status": "cached",
+                        "records_extracted": len(registros_cache),
+                    }
+                    arquivos_processados += 1
+                    reaproveitados_cache.append(tarefa["_name"])
+                consultados = len(reaproveitados_cache) + len(chaves_cache)
+                execution_stats["record_cache"] = {
+                    "hits": len(reaproveitados_cache),
+                    "misses": len(chaves_cache),
+                    "hit_ratio": _round_metric(len(reaproveitados_cache) / consultados) if consultados else 0.0,
+                    "cached_files": reaproveitados_cache,
+                }
+                logger.info(
+                    f"♻️  Cache de registros: {len(reaproveitados_cache)} de {consultados} arquivo(s) reaproveitado(s)"
+                )
 
-    Args:
-        df (pd.DataFrame): DataFrame com coluna 'Data' em formato DD/MM/YYYY
+            def _notify_progress(current_file: str, stage: str) -> None:
+                if progress_callback is None:
+                    return
+                try:
+                    progress_callback(
+                        {
+                            "stage": stage,
+                            "current_file": current_file,
+                            "processed_files": arquivos_processados,
+                            "failed_files": arquivos_erro,
+                            "total_files": len(tarefas),
+                        }
+                    )
+                except Exception:
+                    # Callback de progresso nunca deve interromper o processamento principal.
+                    pass
 
-    Returns:
-        pd.DataFrame: DataFrame ordenado por data
-    """
-    if df.empty:
-        return df
+            def _notify_page(current_file: str, pagina: Dict[str, Any]) -> None:
+                if progress_callback is None:
+                    return
+                try:
+                    progress_callback(
+                        {
+                            "stage": "page",
+                            "current_file": current_file,
+                            "processed_files": arquivos_processados,
+                            "failed_files": arquivos_erro,
+                            "total_files": len(tarefas),
+                            "page_number": pagina["page_number"],
+                            "page_count": pagina["page_count"],
+                            "records_extracted": pagina["records_extracted"],
+                        }
+                    )
+                except Exception:
+                    pass
 
-    try:
-        # Converte coluna Data para datetime (formato DD/MM/YYYY)
-        df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y")
+            if tarefas:
+                _notify_progress("", "started")
 
-        # Ordena por Data (do mais antigo para o mais recente) e depois por Ticker (alfabético)
-        df = df.sort_values(["Data", "Ticker"], ascending=True)
+            # Os registros ficam em `resultados` pela posição na ordem de --sort-by: com vários
+            # workers os arquivos terminam fora de ordem, mas a saída segue a ordenação escolhida
+            parada_registrada = False
 
-        # Converte Data de volta para string no formato original DD/MM/YYYY
-        df["Data"] = df["Data"].dt.strftime("%d/%m/%Y")
+            def _verificar_parada() -> bool:
+                nonlocal parada_registrada
+                graceful_stop_requested = _parada_solicitada(should_stop)
+                if graceful_stop_requested and not parada_registrada:
+                    parada_registrada = True
+                    logger.warning(
+                        "⏸️ Interrupção detectada — finalizando processamento após a página atual."
+                    )
+                return graceful_stop_requested
+
+            def _iniciar_tarefa(tarefa) -> bool:
+                if queue_dir:
+                    _marcar_presenca(queue_dir)
+                    if not _reivindicar_tarefa(queue_dir, tarefa, lease_fila):
+                        # Já reivindicada por outro processo/máquina
+                        execution_stats["sharding"]["claimed_elsewhere"] += 1
+                        return False
+                _notify_progress(tarefa["_name"], "processing")
+                return True
+
+            def _registrar_sucesso(indice, tarefa, dados, file_metrics) -> None:
+                nonlocal arquivos_processados
+                current_file = tarefa["_name"]
+                dados = prefixos.pop(indice, []) + dados
+                if file_metrics:
+                    file_metrics[0].setdefault("file_size", tarefa.get("_size"))
+                    execution_stats["files"].append(file_metrics[0])
+                    self._emitir_metricas(file_metrics[0])
+                    if file_metrics[0].get("status") == "cancelled":
+                        # Interrompido no meio do arquivo: guarda as páginas concluídas para o checkpoint
+                        parciais[indice] = {
+                            "pages_completed": tarefa.get("_pagina_inicial", 1) - 1
+                            if file_metrics[0].get("pages_completed") is None
+                            else file_metrics[0]["pages_completed"],
+                            "records": dados,
+                        }
+                        _notify_progress(current_file, "cancelled")
+                        return
+                    metricas_concluidas[indice] = file_metrics[0]
+                resultados[indice] = dados
+                arquivos_processados += 1
+                if queue_dir:
+                    concluidas_fila.append((tarefa, "processed"))
+                paginas_com_erro = file_metrics and any("error" in p for p in file_metrics[0].get("pages", []))
+                if indice in chaves_cache and not paginas_com_erro:
+                    try:
+                        record_cache.guardar(chaves_cache[indice], dados)
+                    except Exception as e:
+                        logger.warning(f"⚠️  Não foi possível guardar {current_file} no cache de registros: {e}")
+                if quarentena.pop(_identificador_tarefa(tarefa), None) is not None:
+                    _salvar_quarentena(quarentena)
+                    logger.info(f"✓ {current_file} processado com sucesso e removido da quarentena")
+                _notify_progress(current_file, "processed")
+
+            def _registrar_falha(tarefa, erro: Exception) -> None:
+                nonlocal arquivos_erro
+                current_file = tarefa["_name"]
+                arquivos_erro += 1
+                if queue_dir:
+                    concluidas_fila.append((tarefa, getattr(erro, "status", "error")))
+                if isinstance(erro, LimiteArquivoExcedido):
+                    logger.error(f"✗ {current_file} interrompido ({erro.status}): {str(erro)}")
+                    execution_stats["files"].append(
+                        _metricas_falha(current_file, erro.status, str(erro), erro.elapsed_seconds)
+                    )
+                    self._emitir_metricas(execution_stats["files"][-1])
+                    quarentena[_identificador_tarefa(tarefa)] = {
+                        "file_name": current_file,
+                        "status": erro.status,
+                        "reason": str(erro),
+                        "size": tarefa.get("_size"),
+                        "execution_id": execution_stats["execution_id"],
+                        "quarantined_at": datetime.now().isoformat(timespec="seconds"),
+                    }
+                    _salvar_quarentena(quarentena)
+                    logger.warning(f"🚧 {current_file} adicionado à quarentena")
+                else:
+                    if tarefa["type"] == "zip_entry":
+                        logger.error(
+                            f"✗ Erro ao processar {tarefa['name']} do ZIP {os.path.basename(tarefa['zip'])}: {str(erro)}"
+                        )
+                    else:
+                        logger.error(f"✗ Erro ao processar {tarefa['path']}: {str(erro)}")
+                    execution_stats["files"].append(_metricas_falha(current_file, "error", str(erro)))
+                    self._emitir_metricas(execution_stats["files"][-1])
+                _notify_progress(current_file, "error")
 
-        logger.info(
-            "✓ Dados ordenados por data (mais antigo para o mais recente) e depois por ticker"
-        )
-        return df.reset_index(drop=True)
+            limites_isolamento = (isolate, file_timeout, max_rss_mb)
 
-    except Exception as e:
-        logger.warning(f"⚠️  Erro ao ordenar dados por data: {str(e)}")
-        return df
+            try:
+                if workers > 1 and len(tarefas) > 1:
+                    custos = _estimar_custos(tarefas)
+                    # Longest-job-first: despacha primeiro os arquivos mais caros (ordenação estável)
+                    ordem_despacho = sorted(
+                        (i for i in range(len(tarefas)) if i not in resultados), key=lambda i: -custos[i]
+                    )
+                    logger.info(
+                        f"⚙️  {workers} workers | despacho por custo estimado (maior primeiro)"
+                    )
+                    duracoes: Dict[int, float] = {}
+                    inicio_paralelo = time.monotonic()
+                    # Pool da sessão, reaproveitado entre execuções (webapp, daemon)
+                    executor = self._executor(workers, isolate)
+                    pendentes: Dict[Any, int] = {}
+                    fila_despacho = iter(ordem_despacho)
+                    # Os processos do pool não enxergam should_stop nem progress_callback do pai:
+                    # a parada e as páginas passam por um Event e uma fila do Manager da execução
+                    compartilhado = parada_compartilhada = fila_paginas = None
+                    if not isolate:
+                        compartilhado = multiprocessing.get_context(_METODO_INICIO_POOL).Manager()
+                        parada_compartilhada = compartilhado.Event()
+                        fila_paginas = compartilhado.Queue() if progress_callback else None
+
+                    def _despachar_proxima() -> None:
+                        for indice in fila_despacho:
+                            if _verificar_parada():
+                                return
+                            if _iniciar_tarefa(tarefas[indice]):
+                                opcoes = {}
+                                if parada_compartilhada is not None:
+                                    opcoes["should_stop"] = _ParadaCompartilhada(parada_compartilhada)
+                                if fila_paginas is not None:
+                                    opcoes["page_callback"] = _PaginasCompartilhadas(fila_paginas, indice)
+                                futuro = executor.submit(
+                                    _executar_tarefa_cronometrada,
+                                    self,
+                                    tarefas[indice],
+                                    *limites_isolamento,
+                                    **opcoes,
+                                )
+                                pendentes[futuro] = indice
+                                return
 
+                    def _repassar_paginas() -> None:
+                        while fila_paginas is not None:
+                            try:
+                                indice, pagina = fila_paginas.get_nowait()
+                            except queue.Empty:
+                                return
+                            _notify_page(tarefas[indice]["_name"], pagina)
 
-def criar_aba_arvore(df):
-    """Cria um DataFrame com estrutura de árvore partindo a Data em Ano/Mês/Dia.
+                    for _ in range(workers):
+                        _despachar_proxima()
 
-    As colunas de Ano, Mês e Dia são preenchidas apenas ao mudar o período,
-    criando uma visualização em árvore hierárquica.
+                    try:
+                        while pendentes:
+                            concluidos, _ = wait(
+                                list(pendentes),
+                                timeout=_INTERVALO_POOL_SEGUNDOS if compartilhado is not None else None,
+                                return_when=FIRST_COMPLETED,
+                            )
+                            _repassar_paginas()
+                            if parada_compartilhada is not None and _verificar_parada():
+                                parada_compartilhada.set()
+                            for futuro in concluidos:
+                                indice = pendentes.pop(futuro)
+                                try:
+                                    dados, file_metrics, duracoes[indice] = futuro.result()
+                                    _registrar_sucesso(indice, tarefas[indice], dados, file_metrics)
+                                except Exception as e:
+                                    duracoes[indice] = getattr(e, "elapsed_seconds", 0.0)
+                                    _registrar_falha(tarefas[indice], e)
+                                _despachar_proxima()
+                    finally:
+                        for futuro in pendentes:
+                            futuro.cancel()
+                        if compartilhado is not None:
+                            # Interrompido (ex.: KeyboardInterrupt): os arquivos em andamento param na
+                            # próxima página, pelo Event ou pelo Manager encerrado
+                            parada_compartilhada.set()
+                            compartilhado.shutdown()
+
+                    execution_stats["scheduling"] = _resumo_escalonamento(
+                        tarefas, custos, ordem_despacho, duracoes, workers,
+                        time.monotonic() - inicio_paralelo,
+                    )
+                else:
+                    for indice, tarefa in enumerate(tarefas):
+                        if indice in resultados:
+                            continue  # já concluído no checkpoint retomado
+                        if _verificar_parada():
+                            break
+                        if not _iniciar_tarefa(tarefa):
+                            continue
+                        try:
+                            dados, file_metrics, _ = _executar_tarefa_cronometrada(
+                                self,
+                                tarefa,
+                                *limites_isolamento,
+                                should_stop=should_stop,
+                                page_callback=(
+                                    partial(_notify_page, tarefa["_name"]) if progress_callback else None
+                                ),
+                            )
+                            _registrar_sucesso(indice, tarefa, dados, file_metrics)
+                        except Exception as e:
+                            _registrar_falha(tarefa, e)
 
-    Args:
-        df (pd.DataFrame): DataFrame ordenado com coluna 'Data' em DD/MM/YYYY
+            except KeyboardInterrupt:
+                logger.warning(
+                    "⚠️  Execução interrompida pelo usuário (KeyboardInterrupt). Salvando progresso parcial..."
+                )
+                # stop_processing já será True pelo handler; fora do laço iremos exportar o parcial
+
+            registros_por_indice = {indice: parcial["records"] for indice, parcial in parciais.items()}
+            registros_por_indice.update(resultados)
+            todos_dados = [
+                registro for indice in sorted(registros_por_indice) for registro in registros_por_indice[indice]
+            ]
+
+            cancelado = stop_processing or parada_registrada or bool(parciais)
+            if cancelado:
+                checkpoint = {
+                    "execution_id": execution_stats["execution_id"],
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "input_path": caminho,
+                    "year_filter": year_filter,
+                    "ticker_filter": ticker_filter,
+                    "sort_by": sort_by,
+                    "completed": {
+                        _identificador_tarefa(tarefas[indice]): {
+                            "size": tarefas[indice].get("_size"),
+                            "metrics": metricas_concluidas.get(indice, {}),
+                            "records": registros,
+                        }
+                        for indice, registros in resultados.items()
+                    },
+                    "partial": {
+                        _identificador_tarefa(tarefas[indice]): {
+                            "size": tarefas[indice].get("_size"),
+                            "pages_completed": parcial["pages_completed"],
+                            "records": parcial["records"],
+                        }
+                        for indice, parcial in parciais.items()
+                    },
+                }
+                execution_stats["checkpoint"] = _gravar_json_atomico(
+                    caminho_checkpoint(execution_stats["execution_id"]), checkpoint
+                )
+                logger.info(
+                    f"💾 Checkpoint salvo: {execution_stats['checkpoint']} "
+                    f"(retome com --resume {execution_stats['execution_id']})"
+                )
+            elif resume_from and os.path.exists(caminho_checkpoint(resume_from)):
+                os.remove(caminho_checkpoint(resume_from))
+                logger.info(f"🧹 Checkpoint {resume_from} concluído e removido")
+
+            if queue_dir:
+                # Os registros só saem da execução agora (DataFrame devolvido e checkpoint): até lá a
+                # presença renovada mantém os locks, e um processo que cair os deixa para reassumir
+                for tarefa, status in concluidas_fila:
+                    _concluir_tarefa(queue_dir, tarefa, status)
+                _encerrar_presenca(queue_dir)
+
+            # Resumo final
+            _tempo_total = (datetime.now() - _inicio_total).total_seconds()
+            logger.info("\n" + "=" * 60)
+            logger.info("📊 RESUMO DO PROCESSAMENTO")
+            logger.info("=" * 60)
+            logger.info(f"✓ Arquivos processados com sucesso: {arquivos_processados}")
+            if arquivos_erro > 0:
+                logger.warning(f"⚠️  Arquivos com erro: {arquivos_erro}")
+            if arquivos_ignorados > 0:
+                logger.info(f"⏭️ Arquivos ignorados (fora do filtro de ano): {arquivos_ignorados}")
+            if execution_stats.get("sharding", {}).get("claimed_elsewhere"):
+                logger.info(
+                    f"📬 Arquivos processados por outros workers da fila: "
+                    f"{execution_stats['sharding']['claimed_elsewhere']}"
+                )
+            if "scheduling" in execution_stats:
+                escalonamento = execution_stats["scheduling"]
+                logger.info(
+                    f"⚙️  Makespan: {_format_elapsed(escalonamento['actual_makespan_seconds'])} "
+                    f"| ganho estimado do despacho por custo: "
+                    f"{escalonamento['makespan_improvement_pct']:.1f}%"
+                )
+            logger.info(f"📈 Total de registros extraídos: {len(todos_dados)}")
+            logger.info(f"⏱️  Tempo total de processamento: {_format_elapsed(_tempo_total)}")
+            logger.info("=" * 60)
 
-    Returns:
-        pd.DataFrame: DataFrame com colunas [Ano, Mês, Dia, Data, Ticker, Operação,
-                      Quantidade, Preço]
-    """
-    if df.empty:
-        return pd.DataFrame()
+            execution_stats["totals"]["processed_files"] = arquivos_processados
+            execution_stats["totals"]["failed_files"] = arquivos_erro
+            execution_stats["totals"]["ignored_files"] = arquivos_ignorados
+            execution_stats["totals"]["pages_processed"] = sum(
+                int(file_stat.get("page_count") or 0) for file_stat in execution_stats["files"]
+            )
+            execution_stats["totals"]["records_extracted"] = len(todos_dados)
+            execution_stats = _finalize_execution_stats(
+                execution_stats,
+                "cancelled" if cancelado else "completed",
+            )
+            stats_path = _write_execution_stats(execution_stats)
+            logger.info(f"🧾 Estatísticas da execução salvas em: {stats_path}")
+            if stats_output_path is not None:
+                stats_output_path.append(stats_path)
+
+            if tarefas:
+                _notify_progress("", "finished")
+
+            df = pd.DataFrame(todos_dados)
+            return df
+
+        except Exception as e:
+            logger.error(f"✗ Erro inesperado durante o processamento: {str(e)}")
+            execution_stats["totals"]["processed_files"] = arquivos_processados
+            execution_stats["totals"]["failed_files"] = arquivos_erro + 1
+            execution_stats["totals"]["ignored_files"] = arquivos_ignorados
+            execution_stats["totals"]["pages_processed"] = sum(
+                int(file_stat.get("page_count") or 0) for file_stat in execution_stats["files"]
+            )
+            execution_stats["totals"]["records_extracted"] = sum(
+                len(dados) for dados in resultados.values()
+            )
+            execution_stats["error"] = str(e)
+            execution_stats = _finalize_execution_stats(execution_stats, "failed")
+            stats_path = _write_execution_stats(execution_stats)
+            logger.info(f"🧾 Estatísticas da execução salvas em: {stats_path}")
+            if stats_output_path is not None:
+                stats_output_path.append(stats_path)
+            logger.info("=" * 60)
+            return pd.DataFrame()
 
-    try:
-        # Cria cópia para não modificar o original
-        df_arvore = df.copy()
-
-        # Extrai Ano, Mês, Dia da Data
-        df_arvore["Data_dt"] = pd.to_datetime(df_arvore["Data"], format="%d/%m/%Y")
-        df_arvore["Ano"] = df_arvore["Data_dt"].dt.year.astype(str)
-        df_arvore["Mes"] = df_arvore["Data_dt"].dt.month.astype(str).str.zfill(2)
-        df_arvore["Dia"] = df_arvore["Data_dt"].dt.day.astype(str).str.zfill(2)
-
-        # Monta chave de período (Ano-Mês-Dia)
-        df_arvore["periodo"] = df_arvore["Ano"] + "-" + df_arvore["Mes"] + "-" + df_arvore["Dia"]
-
-        # Identifica onde o período muda em relação à linha anterior
-        df_arvore["periodo_anterior"] = df_arvore["periodo"].shift(1)
-        df_arvore["muda_ano"] = df_arvore["Ano"] != df_arvore["Ano"].shift(1)
-        df_arvore["muda_mes"] = (df_arvore["Ano"] + "-" + df_arvore["Mes"]) != (
-            df_arvore["Ano"].shift(1) + "-" + df_arvore["Mes"].shift(1)
-        )
-        df_arvore["muda_dia"] = df_arvore["periodo"] != df_arvore["periodo"].shift(1)
 
-        # Preenche Ano, Mês, Dia apenas quando mudam (criando efeito de árvore)
-        df_arvore.loc[~df_arvore["muda_ano"], "Ano"] = ""
-        df_arvore.loc[~df_arvore["muda_mes"], "Mes"] = ""
-        df_arvore.loc[~df_arvore["muda_dia"], "Dia"] = ""
+    def exportar_dados(
+        self, df, formato=None, ticker=None, sufixo: Optional[str] = None, pasta: Optional[str] = None
+    ) -> List[str]:
+        """Exporta os dados extraídos para um ou mais formatos.
 
-        # Ordena colunas: Ano, Mês, Dia, Data, Ticker, Operação, Quantidade, Preço
-        colunas_arvore = ["Ano", "Mes", "Dia", "Data", "Ticker", "Operação", "Quantidade", "Preço"]
-        df_arvore = df_arvore[colunas_arvore]
+        A ordenação por data é feita uma única vez e os arquivos de cada formato
+        são gravados em paralelo em um pequeno pool de threads.
 
-        # Remove coluna auxiliar de data convertida
-        if "Data_dt" in df_arvore.columns:
-            df_arvore = df_arvore.drop("Data_dt", axis=1, errors="ignore")
+        Args:
+            df (pd.DataFrame): DataFrame com os dados extraídos
+            formato (str | list): Formato(s) de saída (csv, xlsx, json, parquet), ex: "csv,xlsx".
+                Se None, usa config.
+            ticker (str): Ticker filtrado, quando aplicável. Incluído no nome do arquivo.
+            sufixo (str): Identificador da saída parcial (shard/worker), incluído no nome do arquivo.
+            pasta (str): Pasta de destino (ex.: uma pasta por job do webapp). Se None, usa config.
 
-        return df_arvore.reset_index(drop=True)
+        Returns:
+            list: Caminhos dos arquivos gerados (lista vazia se nada foi exportado)
+        """
+        if df.empty:
+            logger.warning("⚠️  Nenhum dado para exportar")
+            return []
 
-    except Exception as e:
-        logger.warning(f"⚠️  Erro ao criar aba de árvore: {str(e)}")
-        return df.copy()
+        # Obtém formato da config se não fornecido
+        if formato is None:
+            formato = self.config.get_output_format()
+        formatos = _parse_formatos(formato)
 
+        nao_suportados = [f for f in formatos if f not in _EXPORTADORES]
+        if not formatos or nao_suportados:
+            logger.error(f"✗ Formato não suportado: {', '.join(nao_suportados) or formato}")
+            logger.info(f"   Formatos suportados: {', '.join(FORMATOS_EXPORTACAO)}")
+            return []
 
-def exportar_dados(df, formato=None, ticker=None):
-    """Exporta os dados extraídos para o formato especificado.
+        try:
+            # Ordena dados por data antes de exportar (uma vez para todos os formatos)
+            df = ordenar_dados_por_data(df)
+
+            # Cria pasta de output
+            pasta_output = pasta or self.config.get_output_folder()
+            if not os.path.exists(pasta_output):
+                os.makedirs(pasta_output, exist_ok=True)
+                logger.info(f"✓ Pasta de saída criada: {pasta_output}")
+
+            # Gera nome do arquivo com timestamp (o mesmo para todos os formatos da execução)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            ticker_suffix = f"_{_normalize_ticker_value(ticker)}" if ticker else ""
+            particao_suffix = f"_{sufixo}" if sufixo else ""
+            destinos = {
+                f: os.path.join(
+                    pasta_output, f"dados_extraidos{ticker_suffix}_{timestamp}{particao_suffix}.{f}"
+                )
+                for f in formatos
+            }
+        except Exception as e:
+            logger.error(f"✗ Erro ao exportar dados: {str(e)}")
+            return []
+
+        if len(formatos) == 1:
+            resultados = [_executar_exportador(formatos[0], destinos[formatos[0]], df)]
+        else:
+            workers = min(len(formatos), _MAX_EXPORT_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="exportar") as pool:
+                resultados = list(
+                    pool.map(lambda f: _executar_exportador(f, destinos[f], df), formatos)
+                )
 
-    Args:
-        df (pd.DataFrame): DataFrame com os dados extraídos
-        formato (str): Formato de saída (csv, xlsx, json). Se None, usa config.
-        ticker (str): Ticker filtrado, quando aplicável. Incluído no nome do arquivo.
+        return [caminho for caminho in resultados if caminho]
 
-    Returns:
-        bool: True se exportado com sucesso, False caso contrário
-    """
-    if df.empty:
-        logger.warning("⚠️  Nenhum dado para exportar")
-        return False
 
-    try:
-        # Ordena dados por data antes de exportar
-        df = ordenar_dados_por_data(df)
-        # Obtém formato da config se não fornecido
-        if formato is None:
-            formato = config.get_output_format().lower()
-
-        # Cria pasta de output
-        pasta_output = config.get_output_folder()
-        if not os.path.exists(pasta_output):
-            os.makedirs(pasta_output)
-            logger.info(f"✓ Pasta de saída criada: {pasta_output}")
-
-        # Gera nome do arquivo com timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        ticker_suffix = f"_{_normalize_ticker_value(ticker)}" if ticker else ""
-
-        # Exporta no formato escolhido
-        if formato == "csv":
-            arquivo_saida = os.path.join(pasta_output, f"dados_extraidos{ticker_suffix}_{timestamp}.csv")
-            df.to_csv(arquivo_saida, index=False, encoding="utf-8-sig")
-            logger.info(f"✓ Dados exportados para CSV: {arquivo_saida}")
-            logger.info(f"   Linhas: {len(df)} | Colunas: {len(df.columns)}")
-
-        elif formato == "xlsx":
-            arquivo_saida = os.path.join(pasta_output, f"dados_extraidos{ticker_suffix}_{timestamp}.xlsx")
-            # Cria writer para múltiplas abas
-            with pd.ExcelWriter(arquivo_saida, engine="openpyxl") as writer:
-                # Aba 1: Dados completos e ordenados
-                # Formata coluna Preço com separador decimal em vírgula (padrão brasileiro)
-                df_export = df.copy()
-                if "Preço" in df_export.columns:
-                    df_export["Preço"] = (
-                        df_export["Preço"].astype(str).str.replace(".", ",", regex=False)
-                    )
-                df_export.to_excel(writer, sheet_name="Dados", index=False)
-                logger.info(
-                    f"✓ Aba 'Dados' criada: {len(df_export)} linhas, {len(df_export.columns)} colunas"
-                )
 
-                # Aba 2: Estrutura de árvore (Ano/Mês/Dia hierárquicos)
-                df_arvore = criar_aba_arvore(df)
-                if "Preço" in df_arvore.columns:
-                    df_arvore["Preço"] = (
-                        df_arvore["Preço"].astype(str).str.replace(".", ",", regex=False)
-                    )
-                df_arvore.to_excel(writer, sheet_name="Árvore", index=False)
-                logger.info(
-                    f"✓ Aba 'Árvore' criada: {len(df_arvore)} linhas (estrutura hierárquica)"
-                )
+_SESSAO_PADRAO: Optional[ExtractorSession] = None
+_SESSAO_PADRAO_LOCK = threading.Lock()
 
-            logger.info(f"✓ Arquivo XLSX exportado com 2 abas: {arquivo_saida}")
 
-        elif formato == "json":
-            arquivo_saida = os.path.join(pasta_output, f"dados_extraidos{ticker_suffix}_{timestamp}.json")
-            df.to_json(arquivo_saida, orient="records", indent=2, force_ascii=False)
-            logger.info(f"✓ Dados exportados para JSON: {arquivo_saida}")
-            logger.info(f"   Linhas: {len(df)} | Colunas: {len(df.columns)}")
-        else:
-            logger.error(f"✗ Formato não suportado: {formato}")
-            logger.info("   Formatos suportados: csv, xlsx, json")
-            return False
+def sessao_padrao() -> ExtractorSession:
+    """Sessão compartilhada pelas funções de módulo (criada no primeiro uso)."""
+    global _SESSAO_PADRAO
+    if _SESSAO_PADRAO is None:
+        with _SESSAO_PADRAO_LOCK:
+            if _SESSAO_PADRAO is None:
+                _SESSAO_PADRAO = ExtractorSession()
+    return _SESSAO_PADRAO
 
-        return True
 
-    except ImportError as e:
-        if "openpyxl" in str(e) and formato == "xlsx":
-            logger.error("✗ Erro: openpyxl não instalado. Para usar XLSX, instale com:")
-            logger.error("   pip install openpyxl")
-        else:
-            logger.error(f"✗ Biblioteca não encontrada: {str(e)}")
-        return False
-    except Exception as e:
-        logger.error(f"✗ Erro ao exportar dados: {str(e)}")
-        return False
+if __name__ == "__main__":
+    # Subcomando "merge": intercala saídas parciais já geradas, sem processar PDFs
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        from merge_outputs import main as merge_main
 
+        sys.exit(merge_main(sys.argv[2:]))
+
+    # Subcomando "catalog": indexa as notas lendo só os cabeçalhos, sem extrair operações
+    if len(sys.argv) > 1 and sys.argv[1] == "catalog":
+        from catalog import main as catalog_main
+
+        sys.exit(catalog_main(sys.argv[2:]))
+
+    # Subcomando "submit": envia um job ao daemon (--serve) ou o executa aqui se não houver daemon
+    if len(sys.argv) > 1 and sys.argv[1] == "submit":
+        from worker_daemon import main as submit_main
+
+        sys.exit(submit_main(sys.argv[2:]))
 
-if __name__ == "__main__":
     # Cria parser de argumentos de linha de comando
     parser = argparse.ArgumentParser(
         description="Extrator de Notas de Negociação da Clear Corretora",
@@ -1473,6 +3477,19 @@ Exemplos de uso:
   python3 extratorNotasCorretagem.py -y 2026 -t VALE3        # Ano + ticker
   python3 extratorNotasCorretagem.py --sort-by mtime         # Ordena por data de modificação
   python3 extratorNotasCorretagem.py --sort-by ctime         # Ordena por data de criação
+  python3 extratorNotasCorretagem.py --sort-by trade_date    # Ordena pela data do pregão (catálogo)
+  python3 extratorNotasCorretagem.py --date-from 01/03/2024 --date-to 31/03/2024  # Pregões de março
+  python3 extratorNotasCorretagem.py --format csv,xlsx,json  # Vários formatos em uma execução
+  python3 extratorNotasCorretagem.py --merge-into mestre.csv # Mescla só operações novas no mestre
+  python3 extratorNotasCorretagem.py --shard 1/3               # Processa só a 1ª de 3 partições
+  python3 extratorNotasCorretagem.py --queue-dir /mnt/fila      # Divide o trabalho via fila compartilhada
+  python3 extratorNotasCorretagem.py --workers 4                # 4 PDFs em paralelo, maiores primeiro
+  python3 extratorNotasCorretagem.py --resume 20260513_120000_000000  # Retoma execução interrompida
+  python3 extratorNotasCorretagem.py --isolate --file-timeout 120  # Um processo por PDF, com limites
+  python3 extratorNotasCorretagem.py --serve --workers 4        # Daemon aquecido recebendo jobs
+  python3 extratorNotasCorretagem.py submit notas/ -y 2024      # Envia job ao daemon (ou roda local)
+  python3 extratorNotasCorretagem.py merge a.csv b.json -o todos.csv  # Intercala saídas parciais
+  python3 extratorNotasCorretagem.py catalog --list             # Indexa as notas (só cabeçalhos)
         """,
     )
     parser.add_argument(
@@ -1480,7 +3497,10 @@ Exemplos de uso:
         "-y",
         type=int,
         default=None,
-        help="Filtrar por ano (extrair apenas PDFs com esse ano no nome do arquivo)",
+        help=(
+            "Filtrar por ano: PDFs com ano no nome do arquivo são escolhidos pelo nome; "
+            "os demais, pela data do pregão na primeira página"
+        ),
     )
     parser.add_argument(
         "--ticker",
@@ -1492,12 +3512,149 @@ Exemplos de uso:
     parser.add_argument(
         "--sort-by",
         "-s",
-        choices=["name", "mtime", "ctime"],
+        choices=["name", "mtime", "ctime", "trade_date"],
         default="name",
-        help="Critério de ordenação dos arquivos antes de processar (name=nome, mtime=modificação, ctime=criação). Padrão: name",
+        help="Critério de ordenação dos arquivos antes de processar (name=nome, mtime=modificação, ctime=criação, "
+        "trade_date=data do pregão, pelo catálogo). Padrão: name",
+    )
+
+    parser.add_argument(
+        "--catalog",
+        dest="catalog_path",
+        nargs="?",
+        const="",
+        default=None,
+        help="Usa o catálogo de notas (atualizado antes da execução) para pular duplicatas exatas. "
+        "Padrão: catalogo.sqlite na pasta de estatísticas",
+    )
+
+    parser.add_argument(
+        "--date-from",
+        dest="date_from",
+        default=None,
+        help="Processa apenas notas com pregão a partir desta data (DD/MM/AAAA ou AAAA-MM-DD), pelo catálogo",
+    )
+
+    parser.add_argument(
+        "--date-to",
+        dest="date_to",
+        default=None,
+        help="Processa apenas notas com pregão até esta data (DD/MM/AAAA ou AAAA-MM-DD), pelo catálogo",
+    )
+
+    parser.add_argument(
+        "--format",
+        "-f",
+        dest="output_format",
+        type=str,
+        default=None,
+        help="Formato(s) de saída separados por vírgula (csv, xlsx, json, parquet). Padrão: output.format da configuração",
+    )
+
+    parser.add_argument(
+        "--merge-into",
+        dest="merge_into",
+        type=str,
+        default=None,
+        help="Mescla apenas as operações novas em um dataset mestre (.csv, .parquet, .sqlite/.db ou .xlsx) em vez de gerar um novo arquivo",
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="Processa apenas a partição i de n (ex: 1/3), definida por hash estável do nome de cada PDF",
+    )
+
+    parser.add_argument(
+        "--queue-dir",
+        dest="queue_dir",
+        type=str,
+        default=None,
+        help="Pasta compartilhada de fila: cada PDF é reivindicado por um único processo/máquina via arquivo .lock",
+    )
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Número de PDFs processados em paralelo; os mais caros (pelo histórico) são despachados primeiro. Padrão: 1",
+    )
+
+    parser.add_argument(
+        "--resume",
+        dest="resume_from",
+        type=str,
+        default=None,
+        help="Retoma uma execução interrompida a partir do checkpoint (execution_id informado ao interromper)",
+    )
+
+    parser.add_argument(
+        "--isolate",
+        action="store_true",
+        help="Processa cada PDF em um processo filho com limite de tempo e de memória; arquivos que excedem vão para a quarentena",
+    )
+
+    parser.add_argument(
+        "--file-timeout",
+        dest="file_timeout",
+        type=float,
+        default=None,
+        help="Tempo máximo em segundos por PDF no modo isolado. Padrão: processing.file_timeout_seconds da configuração",
+    )
+
+    parser.add_argument(
+        "--max-rss-mb",
+        dest="max_rss_mb",
+        type=float,
+        default=None,
+        help="Memória máxima (RSS, em MB) por PDF no modo isolado. Padrão: processing.max_rss_mb da configuração",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocessa também os PDFs que estão na quarentena",
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Roda como daemon aquecido recebendo jobs (linhas JSON) pelo socket de --socket; "
+        "envie jobs com o subcomando submit",
+    )
+
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Socket Unix do daemon (--serve). Padrão: extrator-notas-<uid>.sock na pasta temporária; "
+        "'-' usa stdin/stdout",
     )
 
     args = parser.parse_args()
+    if args.serve:
+        from worker_daemon import servir
+
+        # Sem o handler de Ctrl+C da extração: no daemon ele encerra o servidor
+        inicializar(registrar_sigint=False)
+        sys.exit(servir(args.socket, ExtractorSession(workers=max(1, args.workers))))
+    inicializar()
+    try:
+        shard = _parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    queue_dir = config.resolve_path(args.queue_dir) if args.queue_dir else None
+    try:
+        from catalog import caminho_catalogo_padrao, converter_data
+
+        date_from = converter_data(args.date_from) if args.date_from else None
+        date_to = converter_data(args.date_to) if args.date_to else None
+    except ValueError as e:
+        parser.error(str(e))
+    catalog_path = None
+    if args.catalog_path is not None:
+        catalog_path = config.resolve_path(args.catalog_path) if args.catalog_path else caminho_catalogo_padrao()
     year_filter = args.year
     ticker_filter = args.ticker
     sort_by = args.sort_by
@@ -1523,23 +3680,54 @@ Exemplos de uso:
         logger.info("   3. Coloque seus arquivos PDF ou ZIP dentro dessa pasta")
     else:
         logger.info("✓ Pasta encontrada. Processando...\n")
-        df = analisar_pasta_ou_zip(caminho_absoluto, year_filter=year_filter, sort_by=sort_by)
+        df = analisar_pasta_ou_zip(
+            caminho_absoluto,
+            year_filter=year_filter,
+            sort_by=sort_by,
+            shard=shard,
+            queue_dir=queue_dir,
+            isolate=args.isolate or args.file_timeout is not None or args.max_rss_mb is not None,
+            file_timeout=args.file_timeout,
+            max_rss_mb=args.max_rss_mb,
+            force=args.force,
+            workers=max(1, args.workers),
+            resume_from=args.resume_from,
+            ticker_filter=ticker_filter,
+            catalog_path=catalog_path,
+            date_from=date_from,
+            date_to=date_to,
+        )
         df = _filter_dataframe_by_ticker(df, ticker_filter)
 
         if not df.empty:
             logger.info(f"\n📋 Primeiras linhas dos dados extraídos:")
             logger.info(f"\n{df.head()}")
 
-            # Exporta os dados
-            logger.info("\n" + "=" * 60)
-            logger.info("💾 EXPORTANDO DADOS")
-            logger.info("=" * 60)
-            formato = config.get_output_format()
-            sucesso = exportar_dados(df, formato, ticker=ticker_filter)
+            if args.merge_into:
+                from master_dataset import mesclar_no_mestre
+
+                logger.info("\n" + "=" * 60)
+                logger.info("🔀 MESCLANDO NO DATASET MESTRE")
+                logger.info("=" * 60)
+                resumo_merge = mesclar_no_mestre(df, config.resolve_path(args.merge_into))
 
-            if sucesso:
-                logger.info(f"\n✓ Processamento concluído com sucesso!")
+                if resumo_merge is not None:
+                    logger.info(f"\n✓ Processamento concluído com sucesso!")
+                else:
+                    logger.warning("⚠️  Dados extraídos mas não foi possível mesclar no mestre.")
             else:
-                logger.warning("⚠️  Dados extraídos mas não foi possível exportar.")
+                # Exporta os dados
+                logger.info("\n" + "=" * 60)
+                logger.info("💾 EXPORTANDO DADOS")
+                logger.info("=" * 60)
+                formato = args.output_format or config.get_output_format()
+                arquivos_gerados = exportar_dados(
+                    df, formato, ticker=ticker_filter, sufixo=_sufixo_particao(shard, queue_dir)
+                )
+
+                if arquivos_gerados:
+                    logger.info(f"\n✓ Processamento concluído com sucesso!")
+                else:
+                    logger.warning("⚠️  Dados extraídos mas não foi possível exportar.")
         else:
             logger.warning("⚠️  Nenhum dado foi extraído. Verifique os arquivos PDF na pasta.")
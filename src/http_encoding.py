@@ -0,0 +1,239 @@
+"""Compressão das respostas HTTP do webapp (gzip e, se instalado, brotli).
+
+- ``escolher_codificacao`` negocia o ``Accept-Encoding`` do cliente (com pesos q);
+- ``arquivo_comprimido`` grava uma vez, ao lado do arquivo exportado, a versão
+  ``.gz``/``.br`` servida nos downloads seguintes: como é um arquivo estável, o
+  download comprimido também aceita ``Range`` para retomada;
+- ``Compressor`` comprime em fluxo as exportações geradas sob demanda;
+- ``RespostaPreparada`` guarda um corpo já serializado (página HTML ou JSON) com
+  seu ETag e as versões comprimidas, geradas uma única vez, e responde 304 a um
+  ``If-None-Match`` que ainda vale; ``CacheDeRespostas`` mantém essas respostas
+  enquanto a versão dos dados de origem (job, estatísticas) não muda.
+
+O brotli (pacote ``brotli``) é opcional: sem ele, apenas gzip é oferecido.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Extensões de arquivos exportados que valem a pena comprimir (xlsx e parquet já são comprimidos)
+EXTENSOES_COMPRIMIVEIS = {".csv", ".json", ".ndjson"}
+_SUFIXOS = {"gzip": ".gz", "br": ".br"}
+_NIVEL_GZIP = 6
+_QUALIDADE_BROTLI = 5
+
+_brotli = None
+
+
+def _carregar_brotli():
+    """Importa o brotli sob demanda; retorna None se o pacote não estiver instalado."""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+        except ImportError:
+            _brotli = False
+        else:
+            _brotli = brotli
+    return _brotli or None
+
+
+def codificacoes_disponiveis() -> Sequence[str]:
+    """Codificações suportadas, na ordem de preferência do servidor."""
+    return ("br", "gzip") if _carregar_brotli() else ("gzip",)
+
+
+def escolher_codificacao(accept_encoding: Optional[str]) -> Optional[str]:
+    """Escolhe a codificação pelo Accept-Encoding (maior q; empate = preferência do servidor).
+
+    Returns:
+        "br", "gzip" ou None (sem compressão)
+    """
+    if not accept_encoding:
+        return None
+    pesos = {}
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.strip().partition(";")
+        peso = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith("q="):
+            try:
+                peso = float(parametro[2:])
+            except ValueError:
+                peso = 0.0
+        pesos[nome.strip().lower()] = peso
+    melhor, melhor_peso = None, 0.0
+    for codificacao in codificacoes_disponiveis():
+        peso = pesos.get(codificacao, pesos.get("*", 0.0))
+        if peso > melhor_peso:
+            melhor, melhor_peso = codificacao, peso
+    return melhor
+
+
+def arquivo_comprimido(caminho: Path, codificacao: str) -> Path:
+    """Versão comprimida de um arquivo, gerada na primeira chamada e refeita se o original mudar."""
+    destino = caminho.with_name(caminho.name + _SUFIXOS[codificacao])
+    if destino.exists() and destino.stat().st_mtime >= caminho.stat().st_mtime:
+        return destino
+    temporario = destino.with_name(f"{destino.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(caminho, "rb") as origem, open(temporario, "wb") as saida:
+            compressor = Compressor(codificacao)
+            for bloco in iter(lambda: origem.read(1024 * 1024), b""):
+                saida.write(compressor.comprimir(bloco))
+            saida.write(compressor.finalizar())
+        os.replace(temporario, destino)
+    finally:
+        if temporario.exists():
+            temporario.unlink()
+    return destino
+
+
+class Compressor:
+    """Compressão em fluxo: comprimir() a cada bloco e finalizar() no fim."""
+
+    def __init__(self, codificacao: str):
+        if codificacao == "br":
+            self._objeto = _carregar_brotli().Compressor(quality=_QUALIDADE_BROTLI)
+            self._comprimir = self._objeto.process
+            self._finalizar = self._objeto.finish
+        else:
+            # wbits=31: formato gzip (cabeçalho e CRC)
+            self._objeto = zlib.compressobj(_NIVEL_GZIP, zlib.DEFLATED, 31)
+            self._comprimir = self._objeto.compress
+            self._finalizar = self._objeto.flush
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._comprimir(dados)
+
+    def finalizar(self) -> bytes:
+        return self._finalizar()
+
+
+def comprimir(dados: bytes, codificacao: str) -> bytes:
+    """Comprime um corpo inteiro de uma vez."""
+    compressor = Compressor(codificacao)
+    return compressor.comprimir(dados) + compressor.finalizar()
+
+
+class RespostaPreparada:
+    """Corpo serializado uma vez, com ETag e versões comprimidas guardadas para as próximas respostas.
+
+    Cada representação tem seu próprio ETag (``"<hash>"``, ``"<hash>-gzip"``...), mas
+    qualquer uma delas no ``If-None-Match`` vale para o 304: o conteúdo é o mesmo.
+    """
+
+    def __init__(
+        self,
+        corpo: bytes,
+        media_type: str,
+        tamanho_minimo: int = 1024,
+        cache_control: str = "no-cache",
+    ):
+        self.corpo = corpo
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self._hash = hashlib.sha256(corpo).hexdigest()[:32]
+        self._comprimivel = len(corpo) >= tamanho_minimo
+        self._comprimidos: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def json(cls, conteudo: Any, tamanho_minimo: int = 1024) -> "RespostaPreparada":
+        """Serializa como o JSONResponse (UTF-8, sem espaços)."""
+        corpo = json.dumps(conteudo, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        return cls(corpo, "application/json", tamanho_minimo)
+
+    def etag(self, codificacao: Optional[str] = None) -> str:
+        return f'"{self._hash}-{codificacao}"' if codificacao else f'"{self._hash}"'
+
+    def comprimido(self, codificacao: str) -> bytes:
+        with self._lock:
+            if codificacao not in self._comprimidos:
+                self._comprimidos[codificacao] = comprimir(self.corpo, codificacao)
+            return self._comprimidos[codificacao]
+
+    def preaquecer(self) -> "RespostaPreparada":
+        """Gera já as versões comprimidas (páginas estáticas, ao subir o servidor)."""
+        if self._comprimivel:
+            for codificacao in codificacoes_disponiveis():
+                self.comprimido(codificacao)
+        return self
+
+    def _ainda_valida(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        for etag in if_none_match.split(","):
+            etag = etag.strip()
+            if etag.startswith("W/"):
+                etag = etag[2:]
+            if etag == "*" or etag.strip('"').split("-")[0] == self._hash:
+                return True
+        return False
+
+    def responder(self, request: Request) -> Response:
+        """Resposta para a requisição: 304, comprimida pelo Accept-Encoding ou o corpo original."""
+        codificacao = escolher_codificacao(request.headers.get("accept-encoding")) if self._comprimivel else None
+        headers = {"ETag": self.etag(codificacao), "Cache-Control": self.cache_control}
+        if self._comprimivel:
+            headers["Vary"] = "Accept-Encoding"
+        if self._ainda_valida(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        if codificacao:
+            headers["Content-Encoding"] = codificacao
+            return Response(self.comprimido(codificacao), media_type=self.media_type, headers=headers)
+        return Response(self.corpo, media_type=self.media_type, headers=headers)
+
+
+class CacheDeRespostas:
+    """Respostas preparadas por chave (LRU), válidas enquanto a versão dos dados não muda.
+
+    As chaves são tuplas cujo primeiro item agrupa as entradas (ex.: o job_id),
+    para ``descartar`` todas as respostas de um mesmo job.
+    """
+
+    def __init__(self, max_itens: int = 256):
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(
+        self, chave: tuple, versao: Hashable, gerar: Callable[[], RespostaPreparada]
+    ) -> RespostaPreparada:
+        """Resposta guardada para a chave, ou gerar() se não houver ou se a versão mudou."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == versao:
+                self._itens.move_to_end(chave)
+                return item[1]
+        resposta = gerar()
+        with self._lock:
+            self._itens[chave] = (versao, resposta)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return resposta
+
+    def descartar(self, grupo: Hashable) -> None:
+        with self._lock:
+            for chave in [chave for chave in self._itens if chave[0] == grupo]:
+                del self._itens[chave]
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
@@ -0,0 +1,301 @@
+"""Armazenamento do estado dos jobs de processamento do webapp.
+
+O webapp guarda em um job store o status, o progresso, o resultado e o pedido
+de cancelamento de cada job. Com o store SQLite (padrão) o estado fica em disco
+e é compartilhado entre processos: qualquer worker do uvicorn (``--workers N``)
+responde ``/api/process/status`` e ``/api/process/cancel`` de jobs iniciados por
+outro worker, e um servidor reiniciado encontra os jobs que ficaram na fila.
+O store em memória mantém o comportamento de um único processo.
+
+Cada job registra o ``dono`` (``host:pid:token`` do processo que o executa, com
+um token sorteado por processo); jobs na fila cujo dono não existe mais são
+assumidos por outro processo com ``assumir()``, que é atômico entre processos.
+O token distingue o processo atual de um anterior com o mesmo host e pid, comum
+quando um contêiner reinicia.
+
+Configuração (application.properties):
+    web.job_store=sqlite          # sqlite | memory
+    web.job_store_path=           # vazio = <stats.folder>/web_jobs.sqlite
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    dono TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, criado_em);
+"""
+
+
+@contextmanager
+def _transacao(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE com COMMIT no fim do bloco e ROLLBACK se ele falhar."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# Sorteado uma vez por processo: o pid se repete entre reinícios de um contêiner
+_TOKEN_PROCESSO = uuid.uuid4().hex[:12]
+
+
+def dono_atual() -> str:
+    """Identificador do processo atual como dono de jobs (host:pid:token)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_TOKEN_PROCESSO}"
+
+
+def dono_ativo(dono: Optional[str]) -> bool:
+    """Indica se o processo dono de um job ainda existe.
+
+    Processos de outra máquina são considerados ativos: apenas donos deste host
+    podem ser verificados. Um dono com o pid do processo atual mas outro token (ou
+    sem token, no formato antigo host:pid) é de um processo anterior e não está ativo.
+    """
+    if not dono:
+        return False
+    if dono == dono_atual():
+        return True
+    host, _, resto = dono.partition(":")
+    if host != socket.gethostname():
+        return True
+    pid = resto.split(":")[0]
+    if pid == str(os.getpid()):
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class MemoryJobStore:
+    """Job store em memória, restrito ao processo atual."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._atualizado_em: Dict[str, float] = {}
+
+    def criar(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+            self._atualizado_em[job["job_id"]] = time.time()
+
+    def obter(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def atualizar(self, job_id: str, **mudancas: Any) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return False
+            job.update(mudancas)
+            self._atualizado_em[job_id] = time.time()
+            return True
+
+    def remover(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._atualizado_em.pop(job_id, None)
+
+    def remover_expirados(self, antes_de: float, status: Iterable[str]) -> List[Dict[str, Any]]:
+        status = set(status)
+        with self._lock:
+            expirados = [
+                job_id for job_id, job in self._jobs.items()
+                if job.get("status") in status and self._atualizado_em.get(job_id, 0) < antes_de
+            ]
+            for job_id in expirados:
+                self._atualizado_em.pop(job_id, None)
+            return [self._jobs.pop(job_id) for job_id in expirados]
+
+    def listar(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                dict(job) for job in self._jobs.values() if status is None or job.get("status") == status
+            ]
+
+    def posicao_na_fila(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.get("status") != "queued":
+                return None
+            fila = [
+                outro for outro in self._jobs.values()
+                if outro.get("status") == "queued" and outro.get("dono") == job.get("dono")
+            ]
+            return [outro["job_id"] for outro in fila].index(job_id) + 1
+
+    def assumir(self, job_id: str, dono_anterior: Optional[str], dono_novo: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.get("dono") != dono_anterior:
+                return False
+            job["dono"] = dono_novo
+            return True
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._jobs.clear()
+            self._atualizado_em.clear()
+
+
+class SQLiteJobStore:
+    """Job store em um arquivo SQLite compartilhado entre processos.
+
+    O job inteiro fica serializado em JSON na coluna ``dados`` (caminhos viram
+    texto); status e dono também ficam em colunas próprias para as consultas da
+    fila. Cada operação abre a própria conexão, e ``atualizar`` lê e regrava o
+    job em uma transação ``BEGIN IMMEDIATE``: o progresso gravado pela thread do
+    job e o pedido de cancelamento vindo de outro worker nunca se sobrescrevem.
+    """
+
+    def __init__(self, caminho: str, timeout: float = 30.0):
+        self.caminho = caminho
+        self.timeout = timeout
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with closing(self._conectar()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_ESQUEMA)
+
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.caminho, timeout=self.timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _serializar(job: Dict[str, Any]) -> str:
+        return json.dumps(job, ensure_ascii=False, default=str)
+
+    def criar(self, job: Dict[str, Any]) -> None:
+        agora = time.time()
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, dono, criado_em, atualizado_em, dados) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job["job_id"], job.get("status") or "", job.get("dono"), agora, agora, self._serializar(job)),
+            )
+
+    def obter(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._conectar()) as conn:
+            linha = conn.execute("SELECT dados FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(linha["dados"]) if linha else None
+
+    def atualizar(self, job_id: str, **mudancas: Any) -> bool:
+        with closing(self._conectar()) as conn:
+            with _transacao(conn):
+                linha = conn.execute("SELECT dados FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if not linha:
+                    return False
+                job = json.loads(linha["dados"])
+                job.update(mudancas)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, dono = ?, atualizado_em = ?, dados = ? WHERE job_id = ?",
+                    (job.get("status") or "", job.get("dono"), time.time(), self._serializar(job), job_id),
+                )
+        return True
+
+    def remover(self, job_id: str) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def remover_expirados(self, antes_de: float, status: Iterable[str]) -> List[Dict[str, Any]]:
+        """Remove os jobs com um dos status sem atualização desde antes_de e os retorna."""
+        status = sorted(set(status))
+        marcadores = ", ".join("?" for _ in status)
+        with closing(self._conectar()) as conn:
+            with _transacao(conn):
+                linhas = conn.execute(
+                    f"SELECT job_id, dados FROM jobs WHERE atualizado_em < ? AND status IN ({marcadores})",
+                    (antes_de, *status),
+                ).fetchall()
+                conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(linha["job_id"],) for linha in linhas])
+        return [json.loads(linha["dados"]) for linha in linhas]
+
+    def listar(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        with closing(self._conectar()) as conn:
+            if status is None:
+                linhas = conn.execute("SELECT dados FROM jobs ORDER BY criado_em").fetchall()
+            else:
+                linhas = conn.execute(
+                    "SELECT dados FROM jobs WHERE status = ? ORDER BY criado_em", (status,)
+                ).fetchall()
+        return [json.loads(linha["dados"]) for linha in linhas]
+
+    def posicao_na_fila(self, job_id: str) -> Optional[int]:
+        """Posição do job entre os jobs na fila do mesmo dono (1 = próximo a rodar)."""
+        with closing(self._conectar()) as conn:
+            linha = conn.execute(
+                "SELECT dono, criado_em FROM jobs WHERE job_id = ? AND status = 'queued'", (job_id,)
+            ).fetchone()
+            if not linha:
+                return None
+            (antes,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND dono IS ? "
+                "AND (criado_em < ? OR (criado_em = ? AND job_id < ?))",
+                (linha["dono"], linha["criado_em"], linha["criado_em"], job_id),
+            ).fetchone()
+        return antes + 1
+
+    def assumir(self, job_id: str, dono_anterior: Optional[str], dono_novo: str) -> bool:
+        """Transfere o job para outro dono se ele ainda pertence a dono_anterior (atômico)."""
+        with closing(self._conectar()) as conn:
+            with _transacao(conn):
+                linha = conn.execute(
+                    "SELECT dados FROM jobs WHERE job_id = ? AND dono IS ?", (job_id, dono_anterior)
+                ).fetchone()
+                if not linha:
+                    return False
+                job = json.loads(linha["dados"])
+                job["dono"] = dono_novo
+                conn.execute(
+                    "UPDATE jobs SET dono = ?, atualizado_em = ?, dados = ? WHERE job_id = ?",
+                    (dono_novo, time.time(), self._serializar(job), job_id),
+                )
+        return True
+
+    def limpar(self) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute("DELETE FROM jobs")
+
+
+def criar_job_store(tipo: str, caminho: Optional[str] = None):
+    """Cria o job store configurado ("sqlite" ou "memory").
+
+    Raises:
+        ValueError: Tipo desconhecido ou SQLite sem caminho
+    """
+    tipo = (tipo or "sqlite").strip().lower()
+    if tipo == "memory":
+        return MemoryJobStore()
+    if tipo == "sqlite":
+        if not caminho:
+            raise ValueError("web.job_store=sqlite requer um caminho (web.job_store_path)")
+        return SQLiteJobStore(caminho)
+    raise ValueError(f"Job store desconhecido: {tipo!r} (use 'sqlite' ou 'memory')")
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Mesclagem incremental das operações extraídas em um dataset mestre.
+
+Formatos suportados pelo mestre (definidos pela extensão do caminho):
+
+- ``.csv``: novas operações são anexadas ao final quando são mais recentes que o
+  mestre; caso contrário o arquivo é regravado em ordem de data.
+- ``.parquet``: diretório particionado por ano (``ano=AAAA/dados.parquet``); apenas
+  as partições que recebem operações novas são regravadas.
+- ``.sqlite`` / ``.db``: tabela ``operacoes`` com a chave como PRIMARY KEY e
+  ``INSERT OR IGNORE`` (upsert idempotente).
+- ``.xlsx``: o arquivo é regravado em streaming (modo write-only) apenas quando há
+  operações novas — o formato não permite anexar linhas no lugar.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+
+from extratorNotasCorretagem import (
+    _converter_datas_pregao,
+    _exportar_xlsx_streaming,
+    ordenar_dados_por_data,
+)
+
+logger = logging.getLogger(__name__)
+
+COLUNA_CHAVE = "Chave"
+SQLITE_TABLE = "operacoes"
+PARQUET_PARTITION_FILE = "dados.parquet"
+
+_COLUNAS_ASSINATURA = ["Data", "Ticker", "Operação", "Quantidade", "Preço"]
+
+
+def chaves_operacoes(df: pd.DataFrame) -> pd.Series:
+    """Retorna a chave estável de cada operação do DataFrame.
+
+    Usa a coluna ``Chave`` quando existe. Para dados antigos, sem chave, monta a
+    assinatura Data|Ticker|Operação|Quantidade|Preço seguida do número da ocorrência,
+    preservando operações idênticas legítimas.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+
+    chaves = pd.Series([None] * len(df), index=df.index, dtype=object)
+    if COLUNA_CHAVE in df.columns:
+        chaves = df[COLUNA_CHAVE].astype(object).where(df[COLUNA_CHAVE].notna(), None)
+        chaves = chaves.where(chaves.astype(str).str.len() > 0, None)
+
+    sem_chave = chaves.isna()
+    if sem_chave.any():
+        colunas = [c for c in _COLUNAS_ASSINATURA if c in df.columns]
+        assinatura = (
+            df.loc[sem_chave, colunas].astype(str).agg("|".join, axis=1)
+            if colunas
+            else pd.Series("", index=df.index[sem_chave])
+        )
+        ocorrencia = assinatura.groupby(assinatura).cumcount()
+        chaves.loc[sem_chave] = "sig:" + assinatura + "#" + ocorrencia.astype(str)
+    return chaves.astype(str)
+
+
+def _novas_operacoes(df: pd.DataFrame, chaves_existentes: Iterable[str]) -> pd.DataFrame:
+    """Filtra as operações cuja chave ainda não está no mestre (O(n) com conjunto de chaves)."""
+    existentes = set(chaves_existentes)
+    chaves = chaves_operacoes(df)
+    novas = df[~chaves.isin(existentes)]
+    # Também descarta repetições dentro do próprio lote novo
+    return novas[~chaves[novas.index].duplicated()]
+
+
+def _como_texto(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte todas as colunas para texto, com ausentes como string vazia."""
+    return df.astype(object).where(df.notna(), "").astype(str)
+
+
+def _valor_sqlite(valor: Any) -> Any:
+    """Converte escalares numpy/pandas para tipos aceitos pelo sqlite3."""
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return None
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    return valor if isinstance(valor, (int, float, str)) else str(valor)
+
+
+def _data_inteira(datas: pd.Series) -> pd.Series:
+    """Converte Data (DD/MM/YYYY) em inteiro AAAAMMDD; ausentes viram 0."""
+    convertidas = _converter_datas_pregao(datas.reset_index(drop=True))
+    return (
+        (convertidas.dt.year * 10000 + convertidas.dt.month * 100 + convertidas.dt.day)
+        .fillna(0)
+        .astype("int64")
+    )
+
+
+def _substituir_arquivo(destino: str, escrever) -> None:
+    """Grava em arquivo temporário no mesmo diretório e substitui o destino atomicamente."""
+    pasta = os.path.dirname(os.path.abspath(destino)) or "."
+    os.makedirs(pasta, exist_ok=True)
+    sufixo = os.path.splitext(destino)[1]
+    descritor, temporario = tempfile.mkstemp(prefix=".merge_", suffix=sufixo, dir=pasta)
+    os.close(descritor)
+    try:
+        escrever(temporario)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def _merge_csv(df: pd.DataFrame, master_path: str) -> Dict[str, Any]:
+    if not os.path.exists(master_path):
+        novas = _novas_operacoes(df, [])
+        _substituir_arquivo(
+            master_path,
+            lambda destino: ordenar_dados_por_data(novas).to_csv(
+                destino, index=False, encoding="utf-8-sig"
+            ),
+        )
+        return {"existing": 0, "new": len(novas), "mode": "created"}
+
+    mestre = pd.read_csv(master_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    novas = _novas_operacoes(df, chaves_operacoes(mestre))
+    if novas.empty:
+        return {"existing": len(mestre), "new": 0, "mode": "unchanged"}
+
+    novas = ordenar_dados_por_data(novas)
+    mesmas_colunas = set(novas.columns) <= set(mestre.columns)
+    ultima_data = int(_data_inteira(mestre["Data"]).max()) if not mestre.empty else 0
+    if mesmas_colunas and int(_data_inteira(novas["Data"]).min()) > ultima_data:
+        # Operações todas posteriores à última data do mestre: basta anexar ao final
+        # (na mesma data, a ordem por Ticker exige reescrever)
+        novas.reindex(columns=mestre.columns).to_csv(
+            master_path, mode="a", header=False, index=False, encoding="utf-8"
+        )
+        return {"existing": len(mestre), "new": len(novas), "mode": "appended"}
+
+    combinado = ordenar_dados_por_data(pd.concat([mestre, _como_texto(novas)], ignore_index=True))
+    _substituir_arquivo(
+        master_path,
+        lambda destino: combinado.to_csv(destino, index=False, encoding="utf-8-sig"),
+    )
+    return {"existing": len(mestre), "new": len(novas), "mode": "rewritten"}
+
+
+def _merge_parquet(df: pd.DataFrame, master_path: str) -> Dict[str, Any]:
+    if os.path.isfile(master_path):
+        # Mestre em arquivo único (não particionado): regrava o arquivo inteiro
+        mestre = pd.read_parquet(master_path)
+        novas = _novas_operacoes(df, chaves_operacoes(mestre))
+        if novas.empty:
+            return {"existing": len(mestre), "new": 0, "mode": "unchanged"}
+        combinado = ordenar_dados_por_data(pd.concat([mestre, novas], ignore_index=True))
+        _substituir_arquivo(master_path, lambda destino: combinado.to_parquet(destino, index=False))
+        return {"existing": len(mestre), "new": len(novas), "mode": "rewritten"}
+
+    anos = _data_inteira(df["Data"]) // 10000
+    anos.index = df.index
+    existentes = 0
+    total_novas = 0
+    particoes = []
+    for ano, lote in df.groupby(anos):
+        particao = os.path.join(master_path, f"ano={int(ano)}", PARQUET_PARTITION_FILE)
+        mestre = pd.read_parquet(particao) if os.path.exists(particao) else pd.DataFrame()
+        existentes += len(mestre)
+        novas = _novas_operacoes(lote, chaves_operacoes(mestre))
+        if novas.empty:
+            continue
+        combinado = ordenar_dados_por_data(pd.concat([mestre, novas], ignore_index=True))
+        _substituir_arquivo(
+            particao, lambda destino, combinado=combinado: combinado.to_parquet(destino, index=False)
+        )
+        total_novas += len(novas)
+        particoes.append(int(ano))
+
+    return {
+        "existing": existentes,
+        "new": total_novas,
+        "mode": "partitions" if particoes else "unchanged",
+        "touched_partitions": particoes,
+    }
+
+
+def _merge_sqlite(df: pd.DataFrame, master_path: str) -> Dict[str, Any]:
+    registros = df.copy()
+    registros[COLUNA_CHAVE] = chaves_operacoes(df)
+    registros = registros.drop_duplicates(subset=[COLUNA_CHAVE])
+    registros["data_iso"] = _data_inteira(registros["Data"]).to_numpy()
+    colunas = list(registros.columns)
+
+    with closing(sqlite3.connect(master_path)) as conn, conn:
+        existentes = {row[1] for row in conn.execute(f"PRAGMA table_info({SQLITE_TABLE})")}
+        if not existentes:
+            definicoes = ", ".join(
+                f'"{c}" TEXT PRIMARY KEY' if c == COLUNA_CHAVE else f'"{c}"' for c in colunas
+            )
+            conn.execute(f"CREATE TABLE {SQLITE_TABLE} ({definicoes})")
+            conn.execute(f"CREATE INDEX idx_{SQLITE_TABLE}_data ON {SQLITE_TABLE} (data_iso)")
+        else:
+            for coluna in colunas:
+                if coluna not in existentes:
+                    conn.execute(f'ALTER TABLE {SQLITE_TABLE} ADD COLUMN "{coluna}"')
+
+        (total_antes,) = conn.execute(f"SELECT COUNT(*) FROM {SQLITE_TABLE}").fetchone()
+        nomes = ", ".join(f'"{c}"' for c in colunas)
+        marcadores = ", ".join("?" for _ in colunas)
+        valores = (
+            tuple(_valor_sqlite(v) for v in linha)
+            for linha in registros.itertuples(index=False, name=None)
+        )
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {SQLITE_TABLE} ({nomes}) VALUES ({marcadores})", valores
+        )
+        (total_depois,) = conn.execute(f"SELECT COUNT(*) FROM {SQLITE_TABLE}").fetchone()
+
+    return {
+        "existing": total_antes,
+        "new": total_depois - total_antes,
+        "mode": "upsert" if total_depois > total_antes else "unchanged",
+    }
+
+
+def _merge_xlsx(df: pd.DataFrame, master_path: str) -> Dict[str, Any]:
+    mestre = pd.DataFrame()
+    if os.path.exists(master_path):
+        mestre = pd.read_excel(master_path, sheet_name="Dados", dtype=str).fillna("")
+    novas = _novas_operacoes(df, chaves_operacoes(mestre))
+    if novas.empty:
+        return {"existing": len(mestre), "new": 0, "mode": "unchanged"}
+
+    combinado = ordenar_dados_por_data(pd.concat([mestre, _como_texto(novas)], ignore_index=True))
+    _substituir_arquivo(master_path, lambda destino: _exportar_xlsx_streaming(destino, combinado))
+    return {
+        "existing": len(mestre),
+        "new": len(novas),
+        "mode": "rewritten" if len(mestre) else "created",
+    }
+
+
+_MERGERS = {
+    ".csv": _merge_csv,
+    ".parquet": _merge_parquet,
+    ".sqlite": _merge_sqlite,
+    ".db": _merge_sqlite,
+    ".xlsx": _merge_xlsx,
+}
+
+
+def mesclar_no_mestre(df: pd.DataFrame, master_path: str) -> Optional[Dict[str, Any]]:
+    """Mescla apenas as operações novas de ``df`` no dataset mestre.
+
+    Args:
+        df: Operações extraídas na execução atual
+        master_path: Caminho do mestre (.csv, .parquet, .sqlite/.db ou .xlsx)
+
+    Returns:
+        dict com o resumo da mesclagem (existing, new, mode), ou None se o formato
+        não for suportado ou ocorrer erro
+    """
+    extensao = os.path.splitext(master_path.rstrip("/\\"))[1].lower()
+    merger = _MERGERS.get(extensao)
+    if merger is None:
+        logger.error(f"✗ Formato de mestre não suportado: {master_path}")
+        logger.info(f"   Extensões suportadas: {', '.join(sorted(_MERGERS))}")
+        return None
+
+    try:
+        resumo = merger(df, master_path)
+    except ImportError as e:
+        logger.error(f"✗ Biblioteca não encontrada: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"✗ Erro ao mesclar no mestre {master_path}: {str(e)}")
+        return None
+
+    resumo["master"] = master_path
+    logger.info(
+        f"✓ Mestre atualizado ({resumo['mode']}): {master_path} | "
+        f"existentes: {resumo['existing']} | novas: {resumo['new']}"
+    )
+    return resumo
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""Merge k-way em streaming de saídas parciais (dados_extraidos_*) já ordenadas por data.
+
+Cada arquivo de entrada (CSV, JSON/NDJSON ou Parquet) deve estar ordenado como em
+ordenar_dados_por_data (Data e depois Ticker). Os arquivos são lidos registro a
+registro e intercalados com heapq.merge, sem carregar tudo em um DataFrame.
+Operações repetidas entre arquivos são descartadas pela coluna Chave.
+
+Uso:
+    python3 src/merge_outputs.py parte1.csv parte2.json parte3.parquet -o combinado.csv
+    python3 src/extratorNotasCorretagem.py merge parte1.csv parte2.csv -o combinado.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+COLUNA_CHAVE = "Chave"
+_COLUNAS_ASSINATURA = ("Data", "Ticker", "Operação", "Quantidade", "Preço")
+_JSON_CHUNK_SIZE = 64 * 1024
+_PARQUET_BATCH_SIZE = 10_000
+
+# Data inválida/ausente vai para o final, como em ordenar_dados_por_data
+_DATA_AUSENTE = 99_999_999
+
+
+def _data_inteira(data: Any) -> int:
+    """Converte 'DD/MM/YYYY' em AAAAMMDD sem parse de datetime (chamado por registro)."""
+    texto = str(data or "")
+    if len(texto) != 10 or texto[2] != "/" or texto[5] != "/":
+        return _DATA_AUSENTE
+    dia, mes, ano = texto[:2], texto[3:5], texto[6:]
+    if not (dia.isdigit() and mes.isdigit() and ano.isdigit()):
+        return _DATA_AUSENTE
+    return int(ano) * 10000 + int(mes) * 100 + int(dia)
+
+
+def chave_ordenacao(registro: Dict[str, Any]) -> Tuple[int, int, str]:
+    """Chave de ordenação (data, ticker ausente por último, ticker)."""
+    ticker = registro.get("Ticker")
+    ausente = ticker is None or ticker == ""
+    return _data_inteira(registro.get("Data")), int(ausente), "" if ausente else str(ticker)
+
+
+# ---------------------------------------------------------------------------
+# Leitores (um registro por vez)
+# ---------------------------------------------------------------------------
+
+
+def _iter_csv(caminho: str) -> Iterator[Dict[str, Any]]:
+    with open(caminho, "r", encoding="utf-8-sig", newline="") as arquivo:
+        yield from csv.DictReader(arquivo)
+
+
+def _iter_json(caminho: str) -> Iterator[Dict[str, Any]]:
+    """Lê um array JSON (orient=records) ou NDJSON incrementalmente, objeto por objeto."""
+    decoder = json.JSONDecoder()
+    with open(caminho, "r", encoding="utf-8-sig") as arquivo:
+        buffer = ""
+        posicao = 0
+        while True:
+            while posicao < len(buffer) and buffer[posicao] in " \t\r\n,[]":
+                posicao += 1
+            if posicao >= len(buffer):
+                buffer = arquivo.read(_JSON_CHUNK_SIZE)
+                posicao = 0
+                if not buffer:
+                    return
+                continue
+            try:
+                registro, posicao = decoder.raw_decode(buffer, posicao)
+            except json.JSONDecodeError:
+                bloco = arquivo.read(_JSON_CHUNK_SIZE)
+                if not bloco:
+                    raise
+                buffer = buffer[posicao:] + bloco
+                posicao = 0
+                continue
+            yield registro
+
+
+def _iter_parquet(caminho: str) -> Iterator[Dict[str, Any]]:
+    import pyarrow.parquet as pq
+
+    arquivo = pq.ParquetFile(caminho)
+    for lote in arquivo.iter_batches(batch_size=_PARQUET_BATCH_SIZE):
+        yield from lote.to_pylist()
+
+
+_LEITORES = {
+    ".csv": _iter_csv,
+    ".json": _iter_json,
+    ".ndjson": _iter_json,
+    ".jsonl": _iter_json,
+    ".parquet": _iter_parquet,
+}
+
+
+def _leitor(caminho: str):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in _LEITORES:
+        raise ValueError(f"Formato não suportado para merge: {caminho}")
+    return _LEITORES[extensao]
+
+
+def _colunas_arquivo(caminho: str) -> List[str]:
+    """Descobre as colunas de um arquivo lendo apenas o cabeçalho/primeiro registro."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(caminho).schema_arrow.names)
+    if extensao == ".csv":
+        with open(caminho, "r", encoding="utf-8-sig", newline="") as arquivo:
+            return next(csv.reader(arquivo), [])
+    primeiro = next(_iter_json(caminho), None)
+    return list(primeiro.keys()) if primeiro else []
+
+
+def _iter_ordenado(caminho: str) -> Iterator[Tuple[Tuple[int, int, str], Dict[str, Any]]]:
+    """Percorre o arquivo validando que ele já está ordenado por (Data, Ticker)."""
+    anterior = None
+    for registro in _leitor(caminho)(caminho):
+        chave = chave_ordenacao(registro)
+        if anterior is not None and chave < anterior:
+            raise ValueError(
+                f"Entrada não está ordenada por data/ticker: {caminho} "
+                f"(registro {registro.get('Data')} {registro.get('Ticker')})"
+            )
+        anterior = chave
+        yield chave, registro
+
+
+# ---------------------------------------------------------------------------
+# Escritores (streaming)
+# ---------------------------------------------------------------------------
+
+
+class _EscritorCSV:
+    def __init__(self, caminho: str, colunas: Sequence[str]):
+        self._arquivo = open(caminho, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.DictWriter(self._arquivo, fieldnames=list(colunas), extrasaction="ignore")
+        self._writer.writeheader()
+
+    def escrever(self, registro: Dict[str, Any]) -> None:
+        self._writer.writerow(registro)
+
+    def fechar(self) -> None:
+        self._arquivo.close()
+
+
+class _EscritorJSON:
+    """Escreve um array JSON (ou NDJSON quando ndjson=True) sem manter os registros em memória."""
+
+    def __init__(self, caminho: str, colunas: Sequence[str], ndjson: bool = False):
+        self._arquivo = open(caminho, "w", encoding="utf-8")
+        self._colunas = list(colunas)
+        self._ndjson = ndjson
+        self._primeiro = True
+        if not ndjson:
+            self._arquivo.write("[")
+
+    def escrever(self, registro: Dict[str, Any]) -> None:
+        conteudo = json.dumps(
+            {coluna: registro.get(coluna) for coluna in self._colunas}, ensure_ascii=False
+        )
+        if self._ndjson:
+            self._arquivo.write(conteudo + "\n")
+            return
+        self._arquivo.write(("\n  " if self._primeiro else ",\n  ") + conteudo)
+        self._primeiro = False
+
+    def fechar(self) -> None:
+        if not self._ndjson:
+            self._arquivo.write("\n]" if not self._primeiro else "]")
+        self._arquivo.close()
+
+
+class _EscritorParquet:
+    """Grava em lotes com pyarrow.ParquetWriter; todas as colunas como texto."""
+
+    def __init__(self, caminho: str, colunas: Sequence[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._colunas = list(colunas)
+        self._schema = pa.schema([(coluna, pa.string()) for coluna in self._colunas])
+        self._writer = pq.ParquetWriter(caminho, self._schema)
+        self._lote: List[Dict[str, Any]] = []
+
+    def escrever(self, registro: Dict[str, Any]) -> None:
+        self._lote.append(
+            {c: None if registro.get(c) is None else str(registro.get(c)) for c in self._colunas}
+        )
+        if len(self._lote) >= _PARQUET_BATCH_SIZE:
+            self._descarregar()
+
+    def _descarregar(self) -> None:
+        if self._lote:
+            self._writer.write_table(self._pa.Table.from_pylist(self._lote, schema=self._schema))
+            self._lote = []
+
+    def fechar(self) -> None:
+        self._descarregar()
+        self._writer.close()
+
+
+def _criar_escritor(caminho: str, colunas: Sequence[str]):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        return _EscritorCSV(caminho, colunas)
+    if extensao == ".json":
+        return _EscritorJSON(caminho, colunas)
+    if extensao in (".ndjson", ".jsonl"):
+        return _EscritorJSON(caminho, colunas, ndjson=True)
+    if extensao == ".parquet":
+        return _EscritorParquet(caminho, colunas)
+    raise ValueError(f"Formato de saída não suportado para merge: {caminho}")
+
+
+# ---------------------------------------------------------------------------
+# Merge
+# ---------------------------------------------------------------------------
+
+
+def _chave_registro(registro: Dict[str, Any], ocorrencias: Dict[str, int], origem: int) -> str:
+    """Chave de deduplicação: coluna Chave ou, em arquivos antigos, assinatura + ocorrência."""
+    chave = registro.get(COLUNA_CHAVE)
+    if chave not in (None, ""):
+        return str(chave)
+    assinatura = "|".join(str(registro.get(coluna, "")) for coluna in _COLUNAS_ASSINATURA)
+    contador = f"{origem}:{assinatura}"
+    ocorrencias[contador] = ocorrencias.get(contador, 0) + 1
+    return f"sig:{assinatura}#{ocorrencias[contador] - 1}"
+
+
+def _marcar_origem(fluxo, indice: int):
+    for chave, registro in fluxo:
+        yield (chave, indice), registro
+
+
+def mesclar_saidas(entradas: Sequence[str], saida: str) -> Dict[str, Any]:
+    """Intercala as saídas parciais em um único arquivo ordenado, descartando duplicatas.
+
+    A memória usada não depende do total de registros: os leitores são consumidos
+    em streaming e o conjunto de chaves vistas é reiniciado a cada nova data
+    (operações duplicadas sempre têm a mesma data).
+
+    Args:
+        entradas: Arquivos dados_extraidos_* (CSV, JSON/NDJSON ou Parquet) já ordenados
+        saida: Arquivo de saída (.csv, .json, .ndjson/.jsonl ou .parquet)
+
+    Returns:
+        dict com totais de registros lidos, gravados e duplicados descartados
+    """
+    if not entradas:
+        raise ValueError("Informe ao menos um arquivo de entrada.")
+
+    colunas: List[str] = []
+    for caminho in entradas:
+        for coluna in _colunas_arquivo(caminho):
+            if coluna not in colunas:
+                colunas.append(coluna)
+
+    # Cada fluxo carrega o índice da entrada para desempate estável entre arquivos
+    fluxos = [
+        _marcar_origem(_iter_ordenado(caminho), indice) for indice, caminho in enumerate(entradas)
+    ]
+
+    escritor = _criar_escritor(saida, colunas)
+    lidos = gravados = duplicados = 0
+    data_atual: Optional[int] = None
+    chaves_vistas: set = set()
+    ocorrencias: Dict[str, int] = {}
+    try:
+        for (chave_ordem, origem), registro in heapq.merge(*fluxos, key=lambda item: item[0]):
+            lidos += 1
+            if chave_ordem[0] != data_atual:
+                data_atual = chave_ordem[0]
+                chaves_vistas.clear()
+                ocorrencias.clear()
+            chave = _chave_registro(registro, ocorrencias, origem)
+            if chave in chaves_vistas:
+                duplicados += 1
+                continue
+            chaves_vistas.add(chave)
+            escritor.escrever(registro)
+            gravados += 1
+    finally:
+        escritor.fechar()
+
+    logger.info(
+        f"✓ Merge concluído: {saida} | lidos: {lidos} | gravados: {gravados} | "
+        f"duplicados descartados: {duplicados}"
+    )
+    return {
+        "output": saida,
+        "inputs": len(entradas),
+        "records_read": lidos,
+        "records_written": gravados,
+        "duplicates_skipped": duplicados,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="merge",
+        description="Intercala saídas parciais já ordenadas por data em um único arquivo, sem duplicatas.",
+    )
+    parser.add_argument("inputs", nargs="+", help="Arquivos dados_extraidos_* (.csv, .json, .ndjson, .parquet)")
+    parser.add_argument(
+        "--output",
+        "-o",
+        required=True,
+        help="Arquivo de saída (.csv, .json, .ndjson/.jsonl ou .parquet)",
+    )
+    args = parser.parse_args(argv)
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    try:
+        mesclar_saidas(args.inputs, args.output)
+    except (OSError, ValueError) as e:
+        logger.error(f"✗ Erro no merge: {str(e)}")
+        return 1
+    except ImportError as e:
+        logger.error(f"✗ Biblioteca não encontrada: {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Cache de registros extraídos e de resultados de jobs do webapp.
+
+Usuários costumam reenviar as mesmas notas (o ano inteiro de novo mais um mês
+novo). O cache evita reprocessar o que já foi extraído em dois níveis:
+
+- registros por arquivo: a chave junta o SHA-256 do PDF (solto ou entrada de
+  ZIP), a assinatura da extração (versão do parser e hash do mapeamento de
+  tickers) e o filtro de ticker; é o ``record_cache`` de
+  ``analisar_pasta_ou_zip``, que reaproveita os registros e guarda os novos;
+- resultado do job: um upload idêntico (mesmos arquivos, pelos hashes) com os
+  mesmos parâmetros devolve na hora o resultado anterior, desde que os arquivos
+  exportados ainda existam.
+
+A limpeza periódica do webapp chama limpar(): registros sem uso há mais de
+web.result_cache_ttl_days saem (LRU por ``usado_em``), assim como os menos
+usados além de web.result_cache_max_files; resultados saem junto com os jobs
+(web.job_ttl_hours), cujas pastas de saída eles referenciam.
+
+Configuração (application.properties):
+    web.result_cache=true
+    web.result_cache_path=        # vazio = <stats.folder>/cache_resultados.sqlite
+    web.result_cache_ttl_days=30
+    web.result_cache_max_files=50000   # 0 = sem limite
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Sequence
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    chave TEXT PRIMARY KEY,
+    registros TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    usado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    chave TEXT PRIMARY KEY,
+    resultado TEXT NOT NULL,
+    criado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_registros_usado_em ON registros (usado_em);
+CREATE INDEX IF NOT EXISTS idx_resultados_criado_em ON resultados (criado_em);
+"""
+
+
+def chave_upload(
+    uploads: Sequence[Dict[str, Any]], parametros: Dict[str, Any], assinatura: str
+) -> Optional[str]:
+    """Chave do resultado de um job: hashes dos arquivos, parâmetros e assinatura da extração.
+
+    A ordem dos arquivos não importa. Retorna None se algum arquivo não tiver hash.
+    """
+    if not uploads or any(not upload.get("sha256") for upload in uploads):
+        return None
+    conteudo = {
+        "arquivos": sorted((upload.get("filename") or "", upload["sha256"]) for upload in uploads),
+        "parametros": parametros,
+        "assinatura": assinatura,
+    }
+    return hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Cache SQLite de registros por arquivo e de resultados por upload."""
+
+    def __init__(self, caminho: str, timeout: float = 30.0):
+        self.caminho = caminho
+        self.timeout = timeout
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with closing(self._conectar()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_ESQUEMA)
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.caminho, timeout=self.timeout, isolation_level=None)
+
+    def buscar(self, chave: str) -> Optional[List[Dict[str, Any]]]:
+        """Registros guardados para a chave de um arquivo, ou None."""
+        with closing(self._conectar()) as conn:
+            linha = conn.execute("SELECT registros FROM registros WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                return None
+            conn.execute("UPDATE registros SET usado_em = ? WHERE chave = ?", (time.time(), chave))
+        return json.loads(linha[0])
+
+    def guardar(self, chave: str, registros: List[Dict[str, Any]]) -> None:
+        agora = time.time()
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO registros (chave, registros, criado_em, usado_em) VALUES (?, ?, ?, ?)",
+                (chave, json.dumps(registros, ensure_ascii=False, default=str), agora, agora),
+            )
+
+    def buscar_resultado(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Resultado guardado para um upload, ou None."""
+        with closing(self._conectar()) as conn:
+            linha = conn.execute("SELECT resultado FROM resultados WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def guardar_resultado(self, chave: str, resultado: Dict[str, Any]) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resultados (chave, resultado, criado_em) VALUES (?, ?, ?)",
+                (chave, json.dumps(resultado, ensure_ascii=False, default=str), time.time()),
+            )
+
+    def remover_resultado(self, chave: str) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute("DELETE FROM resultados WHERE chave = ?", (chave,))
+
+    def limpar(
+        self, registros_usados_antes: float, resultados_criados_antes: float, max_registros: int = 0
+    ) -> Dict[str, int]:
+        """Remove registros e resultados que não valem mais ser guardados.
+
+        Saem os registros sem uso desde registros_usados_antes e, com max_registros,
+        os menos usados além desse número (LRU por usado_em); e os resultados criados
+        antes de resultados_criados_antes.
+
+        Returns:
+            Quantidade de registros e de resultados removidos
+        """
+        with closing(self._conectar()) as conn:
+            registros = conn.execute(
+                "DELETE FROM registros WHERE usado_em < ?", (registros_usados_antes,)
+            ).rowcount
+            if max_registros > 0:
+                registros += conn.execute(
+                    "DELETE FROM registros WHERE chave NOT IN "
+                    "(SELECT chave FROM registros ORDER BY usado_em DESC LIMIT ?)",
+                    (max_registros,),
+                ).rowcount
+            resultados = conn.execute(
+                "DELETE FROM resultados WHERE criado_em < ?", (resultados_criados_antes,)
+            ).rowcount
+        return {"registros": registros, "resultados": resultados}
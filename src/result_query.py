@@ -0,0 +1,177 @@
+"""Resultados dos jobs do webapp guardados para consulta paginada.
+
+Cada job concluído grava as operações extraídas em um SQLite na própria pasta de
+saída (``<output.folder>/jobs/<job_id>/resultado.sqlite``), com a data do pregão
+em ISO (``_data``) e índices por data e ticker. ``/api/results/{job_id}`` lê
+apenas a página pedida (offset/limit), com filtro de ticker, intervalo de datas e
+ordenação por qualquer coluna, sem carregar nem reordenar o resultado inteiro.
+
+A ordem padrão é a mesma de ``ordenar_dados_por_data``: data, depois ticker (com
+valores ausentes no final) e, nos empates, a ordem de extração.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from catalog import converter_data
+
+ARQUIVO_RESULTADO = "resultado.sqlite"
+LIMITE_MAXIMO = 1000
+
+_TABELA = "operacoes"
+_COLUNA_DATA = "_data"
+_ORDEM_PADRAO = f'{_COLUNA_DATA} IS NULL, {_COLUNA_DATA}, "Ticker" IS NULL, "Ticker", rowid'
+
+
+def _identificador(coluna: str) -> str:
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+def gravar_registros(df: pd.DataFrame, caminho: str) -> int:
+    """Grava as operações de um job (substituindo um resultado anterior). Retorna a quantidade."""
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    tabela = df.copy()
+    datas = pd.to_datetime(tabela["Data"], format="%d/%m/%Y", errors="coerce") if "Data" in tabela else None
+    tabela[_COLUNA_DATA] = datas.dt.strftime("%Y-%m-%d") if datas is not None else None
+    if "Ticker" not in tabela:
+        tabela["Ticker"] = None
+    with closing(sqlite3.connect(temporario)) as conn:
+        tabela.to_sql(_TABELA, conn, index=False)
+        conn.execute(f"CREATE INDEX {_TABELA}_data ON {_TABELA} ({_COLUNA_DATA}, \"Ticker\")")
+        conn.execute(f"CREATE INDEX {_TABELA}_ticker ON {_TABELA} (\"Ticker\", {_COLUNA_DATA})")
+        conn.commit()
+    os.replace(temporario, caminho)
+    return len(tabela)
+
+
+def _abrir_leitura(caminho: str) -> sqlite3.Connection:
+    # Somente leitura; a exportação em fluxo avança o cursor a partir de threads diferentes
+    return sqlite3.connect(f"{Path(caminho).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+
+def _colunas(conn: sqlite3.Connection) -> List[str]:
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({_TABELA})") if linha[1] != _COLUNA_DATA]
+
+
+def _filtros(
+    ticker: Optional[str], date_from: Optional[str], date_to: Optional[str]
+) -> Tuple[str, List[Any]]:
+    condicoes, parametros = [], []
+    if ticker:
+        condicoes.append('"Ticker" = ?')
+        parametros.append(ticker.strip().upper())
+    if date_from:
+        condicoes.append(f"{_COLUNA_DATA} >= ?")
+        parametros.append(converter_data(date_from))
+    if date_to:
+        condicoes.append(f"{_COLUNA_DATA} <= ?")
+        parametros.append(converter_data(date_to))
+    return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+
+def _ordem(colunas: List[str], sort_by: Optional[str], descending: bool) -> str:
+    if not sort_by:
+        return _ORDEM_PADRAO
+    if sort_by not in colunas:
+        raise ValueError(f"Coluna de ordenação desconhecida: {sort_by!r} (use {', '.join(colunas)})")
+    coluna = _COLUNA_DATA if sort_by == "Data" else _identificador(sort_by)
+    direcao = "DESC" if descending else "ASC"
+    return f"{coluna} IS NULL, {coluna} {direcao}, rowid"
+
+
+def consultar_registros(
+    caminho: str,
+    offset: int = 0,
+    limit: int = 100,
+    ticker: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    descending: bool = False,
+) -> Dict[str, Any]:
+    """Uma página do resultado de um job.
+
+    Args:
+        offset, limit: Janela de linhas (limit até LIMITE_MAXIMO)
+        ticker: Apenas operações do ticker
+        date_from, date_to: Intervalo da data do pregão (DD/MM/AAAA ou AAAA-MM-DD)
+        sort_by: Coluna de ordenação (None = data e ticker); descending inverte
+
+    Returns:
+        dict: total (após os filtros), offset, limit, columns e rows
+
+    Raises:
+        ValueError: Data, coluna de ordenação ou janela inválidas
+        FileNotFoundError: Resultado não encontrado
+    """
+    if offset < 0 or not 1 <= limit <= LIMITE_MAXIMO:
+        raise ValueError(f"Use offset >= 0 e limit entre 1 e {LIMITE_MAXIMO}.")
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(caminho)
+    where, parametros = _filtros(ticker, date_from, date_to)
+    with closing(_abrir_leitura(caminho)) as conn:
+        colunas = _colunas(conn)
+        ordem = _ordem(colunas, sort_by, descending)
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM {_TABELA}{where}", parametros).fetchone()
+        selecao = ", ".join(_identificador(coluna) for coluna in colunas)
+        linhas = conn.execute(
+            f"SELECT {selecao} FROM {_TABELA}{where} ORDER BY {ordem} LIMIT ? OFFSET ?",
+            [*parametros, limit, offset],
+        ).fetchall()
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "columns": colunas,
+        "rows": [dict(zip(colunas, linha)) for linha in linhas],
+    }
+
+
+def iterar_registros(
+    caminho: str,
+    ticker: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    tamanho_lote: int = 1000,
+) -> Tuple[List[str], Iterator[List[tuple]]]:
+    """Percorre o resultado inteiro na ordem padrão, em lotes, sem carregá-lo na memória.
+
+    Os filtros são validados antes de a leitura começar.
+
+    Returns:
+        tuple: (colunas, iterador de lotes de linhas)
+
+    Raises:
+        ValueError: Data inválida
+        FileNotFoundError: Resultado não encontrado
+    """
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(caminho)
+    where, parametros = _filtros(ticker, date_from, date_to)
+    with closing(_abrir_leitura(caminho)) as conn:
+        colunas = _colunas(conn)
+
+    def _lotes() -> Iterator[List[tuple]]:
+        selecao = ", ".join(_identificador(coluna) for coluna in colunas)
+        with closing(_abrir_leitura(caminho)) as conn:
+            cursor = conn.execute(f"SELECT {selecao} FROM {_TABELA}{where} ORDER BY {_ORDEM_PADRAO}", parametros)
+            while True:
+                lote = cursor.fetchmany(tamanho_lote)
+                if not lote:
+                    return
+                yield lote
+
+    return colunas, _lotes()
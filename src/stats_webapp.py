@@ -7,10 +7,12 @@ import argparse
 import threading
 import webbrowser
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
 
-from execution_stats import build_history_payload
+from config import get_config
+from execution_stats import build_history_payload, history_signature
+from http_encoding import CacheDeRespostas, RespostaPreparada
 
 app = FastAPI(
     title="Dashboard de Estatísticas",
@@ -544,6 +546,13 @@ HTML_PAGE = """<!doctype html>
 </body>
 </html>"""
 
+_COMPRESS_MIN_BYTES = get_config().get_web_compress_min_bytes()
+# Página serializada e comprimida uma única vez; o histórico fica guardado até um execucao_*.json mudar
+_INDEX_PAGE = RespostaPreparada(
+    HTML_PAGE.encode("utf-8"), "text/html; charset=utf-8", _COMPRESS_MIN_BYTES
+).preaquecer()
+_RESPONSES = CacheDeRespostas(max_itens=32)
+
 
 def _schedule_browser_open(url: str, delay_seconds: float = 1.0) -> None:
     def _open() -> None:
@@ -558,13 +567,19 @@ def _schedule_browser_open(url: str, delay_seconds: float = 1.0) -> None:
 
 
 @app.get("/", response_class=HTMLResponse)
-def index() -> HTMLResponse:
-    return HTMLResponse(HTML_PAGE)
+def index(request: Request) -> Response:
+    return _INDEX_PAGE.responder(request)
 
 
 @app.get("/api/history")
-def get_history(limit: int = 20) -> JSONResponse:
-    return JSONResponse(content=build_history_payload(limit=max(1, min(limit, 200))))
+def get_history(request: Request, limit: int = 20) -> Response:
+    limit = max(1, min(limit, 200))
+    response = _RESPONSES.obter(
+        ("history", limit),
+        history_signature(),
+        lambda: RespostaPreparada.json(build_history_payload(limit=limit), _COMPRESS_MIN_BYTES),
+    )
+    return response.responder(request)
 
 
 if __name__ == "__main__":
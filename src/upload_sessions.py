@@ -0,0 +1,329 @@
+"""Sessões de upload retomável para arquivos grandes enviados ao webapp.
+
+Um ZIP com o histórico completo de notas pode ter centenas de MB; em vez de
+um único POST que recomeça do zero se a conexão cair, o cliente:
+
+1. cria uma sessão informando nome, tamanho total e (opcional) o SHA-256;
+2. envia blocos com ``PUT`` informando o offset de cada um (em qualquer ordem,
+   podendo reenviar blocos), cada um com seu SHA-256 opcional;
+3. consulta os intervalos já recebidos para saber o que falta;
+4. finaliza a sessão, que vira um job de processamento.
+
+Os blocos são gravados direto na posição final de ``dados.part``, à medida que
+o corpo do ``PUT`` chega (o hash é calculado junto), e a lista de
+blocos (offset, tamanho e hash) fica em ``sessao.json``, ao lado. Na
+finalização, o hash de cada bloco é conferido contra o arquivo em disco, assim
+como o SHA-256 do arquivo inteiro (se informado na criação).
+
+``sessao.json`` é lido e regravado sob uma trava de arquivo (``fcntl.flock`` em
+``sessao.lock``): blocos da mesma sessão recebidos por workers diferentes do
+uvicorn não perdem o registro um do outro. Sem ``fcntl`` (Windows), a trava
+vale apenas entre as threads do processo.
+
+Configuração (application.properties):
+    web.upload_sessions_folder=    # vazio = <tmp>/extrator_upload_sessions
+    web.upload_chunk_max_mb=64     # tamanho máximo de cada bloco
+    web.upload_session_ttl_hours=24
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_SESSAO_ARQUIVO = "sessao.json"
+_TRAVA_ARQUIVO = "sessao.lock"
+_DADOS_ARQUIVO = "dados.part"
+_BLOCO_LEITURA = 1024 * 1024
+_RE_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadSessionError(Exception):
+    """Erro de uma sessão de upload, com o status HTTP correspondente."""
+
+    def __init__(self, mensagem: str, status_code: int = 400):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+
+def _mesclar_intervalos(blocos: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """Intervalos [início, fim) cobertos pelos blocos, ordenados e sem sobreposição."""
+    intervalos: List[Tuple[int, int]] = []
+    for inicio, fim in sorted((b["offset"], b["offset"] + b["length"]) for b in blocos):
+        if intervalos and inicio <= intervalos[-1][1]:
+            intervalos[-1] = (intervalos[-1][0], max(intervalos[-1][1], fim))
+        else:
+            intervalos.append((inicio, fim))
+    return intervalos
+
+
+class BlocoUpload:
+    """Bloco em gravação: as partes vão direto para dados.part e o hash é calculado junto.
+
+    Criado por UploadSessionStore.abrir_bloco; o bloco só entra na lista de blocos
+    recebidos em concluir().
+    """
+
+    def __init__(
+        self, store: "UploadSessionStore", upload_id: str, offset: int, tamanho_arquivo: int
+    ):
+        self._store = store
+        self.upload_id = upload_id
+        self.offset = offset
+        self._limite = min(store.max_chunk_bytes, tamanho_arquivo - offset)
+        self._recebidos = 0
+        self._digest = hashlib.sha256()
+        self._arquivo = open(store._pasta_sessao(upload_id) / _DADOS_ARQUIVO, "r+b")
+        self._arquivo.seek(offset)
+
+    def escrever(self, parte: bytes) -> None:
+        """Grava a próxima parte do bloco.
+
+        Raises:
+            UploadSessionError: Bloco grande demais (413) ou além do fim do arquivo (416)
+        """
+        if self._recebidos + len(parte) > self._limite:
+            self.fechar()
+            if self._recebidos + len(parte) > self._store.max_chunk_bytes:
+                limite_mb = self._store.max_chunk_bytes // (1024 * 1024)
+                raise UploadSessionError(f"Bloco maior que o limite de {limite_mb} MB.", 413)
+            raise UploadSessionError("Bloco fora dos limites do arquivo.", 416)
+        self._arquivo.write(parte)
+        self._digest.update(parte)
+        self._recebidos += len(parte)
+
+    def concluir(self, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Confere o hash informado e registra o bloco (substitui o anterior no mesmo offset).
+
+        Raises:
+            UploadSessionError: Hash diferente do informado (422)
+        """
+        self.fechar()
+        digest = self._digest.hexdigest()
+        if sha256 and sha256.lower() != digest:
+            raise UploadSessionError("SHA-256 do bloco não confere com os dados recebidos.", 422)
+        with self._store._travar(self.upload_id):
+            sessao = self._store._ler(self.upload_id)
+            sessao["chunks"] = [b for b in sessao["chunks"] if b["offset"] != self.offset]
+            sessao["chunks"].append(
+                {"offset": self.offset, "length": self._recebidos, "sha256": digest}
+            )
+            self._store._gravar(sessao)
+        return self._store._resumo(sessao)
+
+    def fechar(self) -> None:
+        """Fecha o arquivo sem registrar o bloco (usado quando a gravação é interrompida)."""
+        self._arquivo.close()
+
+
+class UploadSessionStore:
+    """Sessões de upload guardadas em disco (uma pasta por sessão)."""
+
+    def __init__(self, pasta: str, max_chunk_bytes: int, ttl_seconds: float):
+        self.pasta = Path(pasta)
+        self.max_chunk_bytes = max_chunk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    def _pasta_sessao(self, upload_id: str) -> Path:
+        if not _RE_UPLOAD_ID.match(upload_id or ""):
+            raise UploadSessionError("Sessão de upload não encontrada.", 404)
+        return self.pasta / upload_id
+
+    def _ler(self, upload_id: str) -> Dict[str, Any]:
+        caminho = self._pasta_sessao(upload_id) / _SESSAO_ARQUIVO
+        try:
+            return json.loads(caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise UploadSessionError("Sessão de upload não encontrada.", 404) from exc
+
+    def _gravar(self, sessao: Dict[str, Any]) -> None:
+        sessao["updated_at"] = time.time()
+        caminho = self._pasta_sessao(sessao["upload_id"]) / _SESSAO_ARQUIVO
+        temporario = caminho.with_name(f"{_SESSAO_ARQUIVO}.{uuid.uuid4().hex}.tmp")
+        try:
+            temporario.write_text(json.dumps(sessao, ensure_ascii=False), encoding="utf-8")
+            os.replace(temporario, caminho)
+        finally:
+            if temporario.exists():
+                temporario.unlink()
+
+    @contextmanager
+    def _travar(self, upload_id: str):
+        """Acesso exclusivo à sessão entre threads e entre processos (workers do uvicorn)."""
+        pasta = self._pasta_sessao(upload_id)
+        with self._lock:
+            if not pasta.is_dir():
+                raise UploadSessionError("Sessão de upload não encontrada.", 404)
+            with open(pasta / _TRAVA_ARQUIVO, "a+b") as trava:
+                if fcntl is not None:
+                    fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+                yield
+
+    @staticmethod
+    def _resumo(sessao: Dict[str, Any]) -> Dict[str, Any]:
+        intervalos = _mesclar_intervalos(sessao["chunks"])
+        recebidos = sum(fim - inicio for inicio, fim in intervalos)
+        return {
+            "upload_id": sessao["upload_id"],
+            "filename": sessao["filename"],
+            "size": sessao["size"],
+            "sha256": sessao.get("sha256"),
+            "received": [[inicio, fim] for inicio, fim in intervalos],
+            "received_bytes": recebidos,
+            "complete": intervalos == [(0, sessao["size"])] or sessao["size"] == 0,
+        }
+
+    def criar(self, nome_arquivo: str, tamanho: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Cria uma sessão vazia para um arquivo de tamanho conhecido."""
+        nome = os.path.basename(nome_arquivo or "")
+        if not nome:
+            raise UploadSessionError("Informe o nome do arquivo.")
+        if tamanho < 0:
+            raise UploadSessionError("Tamanho do arquivo inválido.")
+        if sha256 is not None and not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+            raise UploadSessionError("SHA-256 inválido (64 caracteres hexadecimais).")
+        self.limpar_expiradas()
+
+        upload_id = uuid.uuid4().hex
+        pasta = self._pasta_sessao(upload_id)
+        pasta.mkdir(parents=True)
+        with open(pasta / _DADOS_ARQUIVO, "wb") as dados:
+            dados.truncate(tamanho)
+        sessao = {
+            "upload_id": upload_id,
+            "filename": nome,
+            "size": tamanho,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": time.time(),
+            "chunks": [],
+        }
+        self._gravar(sessao)
+        return self._resumo(sessao)
+
+    def obter(self, upload_id: str) -> Dict[str, Any]:
+        """Estado da sessão: intervalos recebidos, bytes recebidos e se está completa."""
+        return self._resumo(self._ler(upload_id))
+
+    def abrir_bloco(self, upload_id: str, offset: int) -> BlocoUpload:
+        """Começa a gravar um bloco na posição offset; as partes chegam via BlocoUpload.escrever.
+
+        Raises:
+            UploadSessionError: Sessão inexistente (404) ou offset fora do arquivo (416)
+        """
+        sessao = self._ler(upload_id)
+        if offset < 0 or offset > sessao["size"]:
+            raise UploadSessionError("Bloco fora dos limites do arquivo.", 416)
+        try:
+            return BlocoUpload(self, upload_id, offset, sessao["size"])
+        except OSError as exc:
+            raise UploadSessionError("Sessão de upload não encontrada.", 404) from exc
+
+    def gravar_bloco(
+        self, upload_id: str, offset: int, dados: bytes, sha256: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Grava um bloco inteiro na posição offset; reenviado no mesmo offset, substitui o anterior.
+
+        Raises:
+            UploadSessionError: Bloco fora do arquivo (416), grande demais (413) ou
+                com hash diferente do informado (422)
+        """
+        bloco = self.abrir_bloco(upload_id, offset)
+        bloco.escrever(dados)
+        return bloco.concluir(sha256)
+
+    def finalizar(self, upload_id: str, destino: Path) -> Dict[str, Any]:
+        """Confere os blocos e o arquivo inteiro e move o arquivo para a pasta destino.
+
+        Returns:
+            Item do manifesto de uploads (nome, tamanho e SHA-256)
+
+        Raises:
+            UploadSessionError: Sessão incompleta (409) ou hash divergente (422)
+        """
+        with self._travar(upload_id):
+            sessao = self._ler(upload_id)
+            resumo = self._resumo(sessao)
+            if not resumo["complete"]:
+                raise UploadSessionError(
+                    f"Upload incompleto: {resumo['received_bytes']} de {sessao['size']} bytes recebidos.", 409
+                )
+            caminho_dados = self._pasta_sessao(upload_id) / _DADOS_ARQUIVO
+            digest = hashlib.sha256()
+            with open(caminho_dados, "rb") as arquivo:
+                for bloco in sessao["chunks"]:
+                    arquivo.seek(bloco["offset"])
+                    if hashlib.sha256(arquivo.read(bloco["length"])).hexdigest() != bloco["sha256"]:
+                        raise UploadSessionError(
+                            f"Bloco no offset {bloco['offset']} foi sobrescrito ou corrompido; reenvie-o.", 422
+                        )
+                arquivo.seek(0)
+                for parte in iter(lambda: arquivo.read(_BLOCO_LEITURA), b""):
+                    digest.update(parte)
+            sha256 = digest.hexdigest()
+            if sessao.get("sha256") and sessao["sha256"] != sha256:
+                raise UploadSessionError("SHA-256 do arquivo não confere com o informado na criação.", 422)
+
+            destino.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(caminho_dados), str(destino / sessao["filename"]))
+            shutil.rmtree(self._pasta_sessao(upload_id), ignore_errors=True)
+        return {"filename": sessao["filename"], "size": sessao["size"], "sha256": sha256}
+
+    def restaurar(self, upload_id: str, arquivo: Path, manifesto: Dict[str, Any]) -> None:
+        """Desfaz finalizar(): devolve o arquivo à sessão, completa, para finalizar de novo.
+
+        Usado quando o job não pôde ser criado depois de a sessão ser consumida
+        (ex.: a fila lotou entre a verificação de admissão e o início do job).
+        """
+        pasta = self._pasta_sessao(upload_id)
+        with self._lock:
+            pasta.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(arquivo), str(pasta / _DADOS_ARQUIVO))
+            sessao = {
+                "upload_id": upload_id,
+                "filename": manifesto["filename"],
+                "size": manifesto["size"],
+                "sha256": manifesto["sha256"],
+                "created_at": time.time(),
+                "chunks": [{"offset": 0, "length": manifesto["size"], "sha256": manifesto["sha256"]}],
+            }
+            self._gravar(sessao)
+
+    def remover(self, upload_id: str) -> None:
+        """Descarta a sessão e os blocos recebidos."""
+        pasta = self._pasta_sessao(upload_id)
+        if not pasta.is_dir():
+            raise UploadSessionError("Sessão de upload não encontrada.", 404)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    def limpar_expiradas(self) -> int:
+        """Remove sessões sem atividade há mais de ttl_seconds. Retorna quantas foram removidas."""
+        if not self.pasta.is_dir():
+            return 0
+        limite = time.time() - self.ttl_seconds
+        removidas = 0
+        for pasta in self.pasta.iterdir():
+            if not _RE_UPLOAD_ID.match(pasta.name):
+                continue
+            try:
+                atualizado = (pasta / _SESSAO_ARQUIVO).stat().st_mtime
+            except OSError:
+                atualizado = pasta.stat().st_mtime
+            if atualizado < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+                removidas += 1
+        return removidas
@@ -3,6 +3,11 @@
 
 from __future__ import annotations
 
+import asyncio
+import csv
+import hashlib
+import json
+import math
 import mimetypes
 import os
 import re
@@ -13,38 +18,102 @@ import threading
 import time
 import uuid
 import webbrowser
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from io import BytesIO
+from io import BytesIO, StringIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 
 import pandas as pd
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from PIL import Image
-from ocrmac import ocrmac as _ocrmac
+
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart import MultipartParser
+    from multipart.multipart import parse_options_header
 
 from config import get_config
 from extratorNotasCorretagem import (
+    _extract_year_from_filename,
     _filter_dataframe_by_ticker,
     analisar_pasta_ou_zip,
+    caminho_checkpoint,
+    chave_cache_registros,
+    criar_bytesio_com_nome,
     exportar_dados,
-    ordenar_dados_por_data,
+    inicializar,
+    primeiras_por_data,
+    sessao_padrao,
+)
+from http_encoding import (
+    EXTENSOES_COMPRIMIVEIS,
+    CacheDeRespostas,
+    Compressor,
+    RespostaPreparada,
+    arquivo_comprimido,
+    escolher_codificacao,
 )
+from job_store import criar_job_store, dono_ativo, dono_atual
+from result_cache import ResultCache, chave_upload
+from result_query import ARQUIVO_RESULTADO, consultar_registros, gravar_registros, iterar_registros
+from upload_sessions import UploadSessionError, UploadSessionStore
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+  # Pastas, log em arquivo e mapeamento de tickers prontos antes do primeiro job (o Ctrl+C fica com o uvicorn)
+  inicializar(registrar_sigint=False)
+  sessao_padrao().aquecer()
+  _recuperar_jobs_orfaos()
+  janitor = asyncio.create_task(_janitor_loop())
+  yield
+  janitor.cancel()
+  _JOB_EXECUTOR.encerrar()
+
 
 app = FastAPI(
     title="Extrator Notas Corretagem",
     description="Frontend web para upload de PDFs/ZIPs, processamento e download dos resultados.",
+    lifespan=_lifespan,
 )
 
 config = get_config()
 OUTPUT_DIR = Path(config.resolve_path(config.get_output_folder()))
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-_JOBS_LOCK = threading.Lock()
-_PROCESS_JOBS: Dict[str, Dict[str, Any]] = {}
+# Saídas do webapp: uma pasta por job, removida com o job após web.job_ttl_hours
+JOBS_OUTPUT_SUBDIR = "jobs"
+# Linhas de prévia devolvidas com o resultado (o restante via /api/results/{job_id})
+PREVIEW_ROWS = 80
+# Formatos da exportação em fluxo (/api/results/{job_id}/export)
+_STREAM_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# Tamanho máximo de um campo de formulário (year, ticker, ...) no multipart
+_MAX_FIELD_BYTES = 64 * 1024
+
+# Estado dos jobs (web.job_store): criado no primeiro uso, compartilhado entre workers do uvicorn
+_JOB_STORE = None
+# Sessões de upload retomável (/api/uploads), criadas no primeiro uso
+_UPLOAD_SESSIONS = None
+# Cache de registros e resultados (web.result_cache), criado no primeiro uso
+_RESULT_CACHE = None
+# Extração antecipada dos uploads (web.upload_prefetch_workers): pool criado no primeiro uso
+# e, por pasta de upload, o _UploadPrefetch que o job consulta como record_cache
+_PREFETCH_EXECUTOR = None
+_UPLOAD_PREFETCHES: Dict[str, "_UploadPrefetch"] = {}
+# JSON já serializado (e comprimido) dos jobs finalizados e das páginas de resultado, por job
+_RESPONSES = CacheDeRespostas()
+
+# ocrmac (Vision framework) só existe no macOS: importado no primeiro OCR
+_ocrmac = None
 
 # Segurança: endpoint de desligamento só fica disponível quando o app é iniciado via CLI.
 app.state.allow_shutdown = False
@@ -263,14 +332,30 @@ def _build_e2e_demo_image_payload() -> Dict[str, Any]:
   return _build_sheets_payload(df)
 
 
+def _carregar_ocrmac():
+  """Importa o ocrmac sob demanda; sem ele o OCR responde 503 em vez de impedir o app de subir."""
+  global _ocrmac
+  if _ocrmac is None:
+    try:
+      from ocrmac import ocrmac
+    except ImportError as exc:
+      raise HTTPException(
+        status_code=503,
+        detail="OCR indisponível: o pacote 'ocrmac' (somente macOS) não está instalado.",
+      ) from exc
+    _ocrmac = ocrmac
+  return _ocrmac
+
+
 def _process_image_content(image_bytes: bytes, payment_date: Optional[str]) -> Dict[str, Any]:
   try:
     image = Image.open(BytesIO(image_bytes))
   except Exception as exc:
     raise HTTPException(status_code=400, detail=f"Imagem inválida: {exc}") from exc
 
+  ocrmac = _carregar_ocrmac()
   try:
-    results = _ocrmac.OCR(
+    results = ocrmac.OCR(
       image,
       language_preference=["pt-BR"],
       recognition_level="accurate",
@@ -1142,22 +1227,27 @@ HTML_PAGE = """<!doctype html>
 </body>
 </html>"""
 
+# Página inicial serializada, com ETag e versões gzip/br geradas uma única vez ao subir
+_INDEX_PAGE = RespostaPreparada(
+  HTML_PAGE.encode("utf-8"), "text/html; charset=utf-8", config.get_web_compress_min_bytes()
+).preaquecer()
+
+
+def _job_store():
+  global _JOB_STORE
+  if _JOB_STORE is None:
+    _JOB_STORE = criar_job_store(
+      config.get_web_job_store(), config.resolve_path(config.get_web_job_store_path())
+    )
+  return _JOB_STORE
+
 
 def _update_job(job_id: str, **changes: Any) -> None:
-  with _JOBS_LOCK:
-    job = _PROCESS_JOBS.get(job_id)
-    if not job:
-      return
-    job.update(changes)
+  _job_store().atualizar(job_id, **changes)
 
 
 def _get_job(job_id: str) -> Optional[Dict[str, Any]]:
-  with _JOBS_LOCK:
-    job = _PROCESS_JOBS.get(job_id)
-    if not job:
-      return None
-    snapshot = dict(job)
-  return snapshot
+  return _job_store().obter(job_id)
 
 
 def _job_cancel_requested(job_id: str) -> bool:
@@ -1167,6 +1257,177 @@ def _job_cancel_requested(job_id: str) -> bool:
   return bool(job.get("cancel_requested"))
 
 
+class _JobRejected(Exception):
+  """Job recusado na admissão: fila cheia ou cliente no limite de jobs."""
+
+  def __init__(self, message: str, retry_after: int):
+    super().__init__(message)
+    self.retry_after = retry_after
+
+
+class _JobExecutor:
+  """Executor dos jobs do webapp: concorrência fixa, fila limitada e limite por cliente.
+
+  Os jobs rodam em um ThreadPoolExecutor de tamanho fixo e aguardam em fila FIFO
+  (a posição aparece no status). As threads só coordenam: a extração dos PDFs vai
+  para o pool de processos da sessão de extração (web.process_workers). Quando a
+  fila está cheia ou o cliente já tem web.max_jobs_per_client jobs, o job é recusado
+  com uma estimativa de espera baseada na duração média dos jobs concluídos.
+  """
+
+  def __init__(self, max_concurrent: int, max_queued: int, max_per_client: int):
+    self.max_concurrent = max(1, max_concurrent)
+    self.max_queued = max(0, max_queued)
+    self.max_per_client = max(1, max_per_client)
+    self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="web-job")
+    self._lock = threading.Lock()
+    self._fila: List[str] = []
+    self._executando: set = set()
+    self._clientes: Dict[str, str] = {}
+    self._futuros: Dict[str, Future] = {}
+    # Média móvel da duração dos jobs, usada no Retry-After
+    self._duracao_media = 10.0
+
+  def _estimar_espera(self) -> int:
+    ondas = len(self._fila) // self.max_concurrent + 1
+    return max(1, math.ceil(self._duracao_media * ondas))
+
+  def _verificar_admissao(self, cliente: str) -> None:
+    if len(self._fila) + len(self._executando) >= self.max_concurrent + self.max_queued:
+      raise _JobRejected(
+        "Fila de processamento cheia. Tente novamente em instantes.", self._estimar_espera()
+      )
+    if sum(1 for dono in self._clientes.values() if dono == cliente) >= self.max_per_client:
+      raise _JobRejected(
+        f"Limite de {self.max_per_client} job(s) por cliente atingido. "
+        "Aguarde a conclusão dos jobs em andamento.",
+        self._estimar_espera(),
+      )
+
+  def verificar_admissao(self, cliente: str) -> None:
+    """Verifica, sem enfileirar, se um novo job do cliente seria aceito.
+
+    Raises:
+        _JobRejected: Fila cheia ou cliente no limite de jobs simultâneos
+    """
+    with self._lock:
+      self._verificar_admissao(cliente)
+
+  def submeter(self, job_id: str, cliente: str, fn, *args: Any) -> Optional[int]:
+    """Enfileira o job e devolve a posição na fila (None se já começou a rodar).
+
+    Raises:
+        _JobRejected: Fila cheia ou cliente no limite de jobs simultâneos
+    """
+    with self._lock:
+      self._verificar_admissao(cliente)
+      self._fila.append(job_id)
+      self._clientes[job_id] = cliente
+      self._futuros[job_id] = self._pool.submit(self._executar, job_id, fn, *args)
+    return self.posicao(job_id)
+
+  def _executar(self, job_id: str, fn, *args: Any) -> None:
+    with self._lock:
+      if job_id in self._fila:
+        self._fila.remove(job_id)
+      self._executando.add(job_id)
+    inicio = time.monotonic()
+    try:
+      fn(job_id, *args)
+    finally:
+      duracao = time.monotonic() - inicio
+      with self._lock:
+        self._executando.discard(job_id)
+        self._clientes.pop(job_id, None)
+        self._futuros.pop(job_id, None)
+        self._duracao_media = 0.8 * self._duracao_media + 0.2 * duracao
+
+  def posicao(self, job_id: str) -> Optional[int]:
+    """Posição do job na fila (1 = próximo a rodar) ou None se não está aguardando."""
+    with self._lock:
+      if job_id not in self._fila:
+        return None
+      return self._fila.index(job_id) + 1
+
+  def cancelar(self, job_id: str) -> bool:
+    """Retira da fila um job que ainda não começou. Retorna False se ele já está rodando."""
+    with self._lock:
+      futuro = self._futuros.get(job_id)
+      if futuro is None or not futuro.cancel():
+        return False
+      self._fila.remove(job_id)
+      self._clientes.pop(job_id, None)
+      self._futuros.pop(job_id, None)
+    return True
+
+  def encerrar(self) -> None:
+    """Descarta a fila e pede o cancelamento dos jobs em andamento (fim do servidor)."""
+    with self._lock:
+      executando = list(self._executando)
+      self._fila.clear()
+      self._clientes.clear()
+      # shutdown(cancel_futures=True) só existe a partir do Python 3.9
+      for futuro in self._futuros.values():
+        futuro.cancel()
+    for job_id in executando:
+      _update_job(job_id, cancel_requested=True)
+    self._pool.shutdown(wait=False)
+
+
+_JOB_EXECUTOR = _JobExecutor(
+  config.get_web_max_concurrent_jobs(),
+  config.get_web_max_queued_jobs(),
+  config.get_web_max_jobs_per_client(),
+)
+
+
+class _JobEventBus:
+  """Eventos de progresso dos jobs que rodam neste processo, lidos pelo stream SSE.
+
+  Cada evento recebe um número de sequência global (o "id" do SSE). Os eventos
+  recentes de cada job ficam guardados mesmo depois do fim do job, de modo que um
+  cliente que se conecta tarde (ou reconecta com Last-Event-ID) recebe o histórico.
+  """
+
+  def __init__(self, max_events_per_job: int = 500, max_jobs: int = 200):
+    self.max_events_per_job = max_events_per_job
+    self.max_jobs = max_jobs
+    self._lock = threading.Lock()
+    self._seq = 0
+    self._eventos: "OrderedDict[str, deque]" = OrderedDict()
+
+  def publicar(self, job_id: str, tipo: str, dados: Dict[str, Any]) -> int:
+    with self._lock:
+      self._seq += 1
+      fila = self._eventos.get(job_id)
+      if fila is None:
+        fila = self._eventos[job_id] = deque(maxlen=self.max_events_per_job)
+        while len(self._eventos) > self.max_jobs:
+          self._eventos.popitem(last=False)
+      fila.append((self._seq, tipo, dados))
+      return self._seq
+
+  def descartar(self, job_id: str) -> None:
+    with self._lock:
+      self._eventos.pop(job_id, None)
+
+  def depois_de(self, job_id: str, seq: int) -> List[tuple]:
+    """Eventos do job com sequência maior que seq, em ordem."""
+    with self._lock:
+      fila = self._eventos.get(job_id)
+      return [evento for evento in fila if evento[0] > seq] if fila else []
+
+
+_JOB_EVENTS = _JobEventBus()
+
+# Stream SSE: intervalo entre verificações dos eventos locais, leitura do job store
+# (jobs de outro worker) e comentário de keep-alive para proxies
+_SSE_POLL_SECONDS = 0.1
+_SSE_STORE_POLL_SECONDS = 0.5
+_SSE_KEEPALIVE_SECONDS = 15.0
+_FINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
 def _build_processing_result(
   temp_path: Path,
   year: Optional[int],
@@ -1177,8 +1438,29 @@ def _build_processing_result(
   e2e_demo: bool,
   progress_callback=None,
   should_stop=None,
+  resume_from: Optional[str] = None,
+  uploads: Optional[List[Dict[str, Any]]] = None,
+  output_dir: Optional[Path] = None,
 ) -> Dict[str, Any]:
-  before = _snapshot_output_files()
+  checkpoint_execution_id = None
+  cache_stats = None
+  result_key = None
+  cache = None if e2e_demo else _result_cache()
+  if cache is not None and not resume_from:
+    result_key = chave_upload(
+      uploads or [],
+      {
+        "year": year,
+        "ticker": ticker,
+        "sort_by": sort_by,
+        "output_format": (output_format or config.get_output_format()).lower(),
+      },
+      sessao_padrao().assinatura_extracao(),
+    )
+    reused = _reuse_cached_result(cache, result_key, files_received, progress_callback)
+    if reused is not None:
+      return reused
+
   if e2e_demo:
     if progress_callback:
       progress_callback(
@@ -1221,6 +1503,7 @@ def _build_processing_result(
       )
     df = _build_e2e_demo_dataframe()
   else:
+    stats_paths: List[str] = []
     try:
       df = analisar_pasta_ou_zip(
         str(temp_path),
@@ -1228,6 +1511,11 @@ def _build_processing_result(
         sort_by=sort_by,
         progress_callback=progress_callback,
         should_stop=should_stop,
+        stats_output_path=stats_paths,
+        resume_from=resume_from,
+        ticker_filter=ticker,
+        workers=config.get_web_process_workers(),
+        record_cache=_UPLOAD_PREFETCHES.get(str(temp_path)) or cache,
       )
     except TypeError:
       # Compatibilidade com versões/mocks sem parâmetro progress_callback/should_stop.
@@ -1237,6 +1525,13 @@ def _build_processing_result(
         sort_by=sort_by,
       )
 
+    # Execução interrompida deixa um checkpoint que permite retomar o job
+    if stats_paths:
+      execution_id = Path(stats_paths[-1]).stem.replace("execucao_", "", 1)
+      if os.path.exists(caminho_checkpoint(execution_id)):
+        checkpoint_execution_id = execution_id
+      cache_stats = _read_record_cache_stats(stats_paths[-1])
+
   df = _filter_dataframe_by_ticker(df, ticker)
 
   if df.empty:
@@ -1249,25 +1544,143 @@ def _build_processing_result(
       "columns": [],
       "filename": None,
       "download_url": None,
+      "checkpoint_execution_id": checkpoint_execution_id,
+      "cache": _cache_summary(cache_stats),
     }
 
-  df_preview = ordenar_dados_por_data(df.copy())
-  exported = exportar_dados(df, output_format, ticker)
+  exported = exportar_dados(df, output_format, ticker, pasta=str(output_dir) if output_dir else None)
   if not exported:
     raise RuntimeError("Os dados foram extraídos, mas não foi possível exportar o arquivo.")
 
-  exported_file = _find_latest_export(before)
-  preview_rows = df_preview.head(80).to_dict(orient="records")
+  exported_files = [Path(path) for path in exported]
+  # Prévia por seleção parcial; o resultado completo fica consultável em /api/results/{job_id}
+  preview_rows = primeiras_por_data(df, PREVIEW_ROWS).to_dict(orient="records")
+  if output_dir:
+    try:
+      gravar_registros(df, str(output_dir / ARQUIVO_RESULTADO))
+    except Exception as exc:
+      print(f"Aviso: não foi possível guardar o resultado para consulta ({exc}).")
 
-  return {
-    "message": f"Processamento concluído com {len(df_preview)} registro(s).",
-    "records_extracted": len(df_preview),
+  result = {
+    "message": f"Processamento concluído com {len(df)} registro(s).",
+    "records_extracted": len(df),
     "files_received": files_received,
     "export_format": (output_format or config.get_output_format()).lower(),
-    "columns": list(df_preview.columns),
+    "columns": list(df.columns),
     "preview_rows": preview_rows,
-    "filename": exported_file.name if exported_file else None,
-    "download_url": f"/api/download/{exported_file.name}" if exported_file else None,
+    "filename": exported_files[0].name,
+    "download_url": _download_url(exported_files[0]),
+    "exported_files": [
+      {"filename": path.name, "download_url": _download_url(path)} for path in exported_files
+    ],
+    "checkpoint_execution_id": checkpoint_execution_id,
+    "cache": _cache_summary(cache_stats),
+  }
+  # Só um processamento completo (sem checkpoint pendente) vale para uploads idênticos
+  if result_key and not checkpoint_execution_id:
+    try:
+      cache.guardar_resultado(result_key, result)
+    except Exception as exc:
+      print(f"Aviso: não foi possível guardar o resultado no cache ({exc}).")
+  return result
+
+
+def _job_output_dir(job_id: str) -> Path:
+  return OUTPUT_DIR / JOBS_OUTPUT_SUBDIR / job_id
+
+
+_DOWNLOAD_PREFIX = "/api/download/"
+
+
+def _download_url(path: Path) -> str:
+  """URL de download de um arquivo exportado, pelo caminho relativo à pasta de saída."""
+  try:
+    relative = Path(path).resolve().relative_to(OUTPUT_DIR.resolve()).as_posix()
+  except ValueError:
+    relative = Path(path).name
+  return f"{_DOWNLOAD_PREFIX}{relative}"
+
+
+def _download_path(download_url: str) -> Path:
+  """Arquivo exportado de um download_url (HTTPException 400 se sair da pasta de saída)."""
+  relative = download_url
+  if relative.startswith(_DOWNLOAD_PREFIX):
+    relative = relative[len(_DOWNLOAD_PREFIX):]
+  return _safe_output_path(relative)
+
+
+def _result_cache() -> Optional[ResultCache]:
+  """Cache de registros e resultados, ou None se desativado (web.result_cache=false)."""
+  global _RESULT_CACHE
+  if _RESULT_CACHE is None and config.get_web_result_cache():
+    _RESULT_CACHE = ResultCache(config.resolve_path(config.get_web_result_cache_path()))
+  return _RESULT_CACHE
+
+
+def _read_record_cache_stats(stats_path: str) -> Optional[Dict[str, Any]]:
+  try:
+    with open(stats_path, "r", encoding="utf-8") as stats_file:
+      return json.load(stats_file).get("record_cache")
+  except (OSError, ValueError):
+    return None
+
+
+def _cache_summary(cache_stats: Optional[Dict[str, Any]], result_reused: bool = False) -> Optional[Dict[str, Any]]:
+  if result_reused:
+    return {"result_reused": True, "hit_ratio": 1.0}
+  if not cache_stats:
+    return None
+  return {
+    "result_reused": False,
+    "hit_ratio": cache_stats.get("hit_ratio", 0.0),
+    "hits": cache_stats.get("hits", 0),
+    "misses": cache_stats.get("misses", 0),
+  }
+
+
+def _exported_file_exists(download_url: str) -> bool:
+  try:
+    return _download_path(download_url).is_file()
+  except HTTPException:
+    return False
+
+
+def _reuse_cached_result(
+  cache: ResultCache,
+  result_key: Optional[str],
+  files_received: int,
+  progress_callback=None,
+) -> Optional[Dict[str, Any]]:
+  """Resultado de um upload idêntico já processado, se os arquivos exportados ainda existem."""
+  if not result_key:
+    return None
+  try:
+    previous = cache.buscar_resultado(result_key)
+  except Exception as exc:
+    print(f"Aviso: cache de resultados indisponível ({exc}).")
+    return None
+  if not previous:
+    return None
+  urls = [item["download_url"] for item in previous.get("exported_files") or []]
+  if not urls or any(not _exported_file_exists(url) for url in urls):
+    cache.remover_resultado(result_key)
+    return None
+
+  if progress_callback:
+    progress_callback(
+      {
+        "stage": "finished",
+        "current_file": "",
+        "processed_files": files_received,
+        "failed_files": 0,
+        "total_files": files_received,
+      }
+    )
+  return {
+    **previous,
+    "message": f"{previous.get('message') or 'Processamento concluído.'} (resultado reaproveitado)",
+    "files_received": files_received,
+    "cache": _cache_summary(None, result_reused=True),
   }
 
 
@@ -1280,13 +1693,17 @@ def _run_processing_job(
   output_format: Optional[str],
   files_received: int,
   e2e_demo: bool,
+  resume_from: Optional[str] = None,
+  uploads: Optional[List[Dict[str, Any]]] = None,
 ) -> None:
+  keep_uploads = False
+
   def on_progress(progress: Dict[str, Any]) -> None:
     if _job_cancel_requested(job_id):
       _update_job(
         job_id,
         status="cancelling",
-        message="Cancelamento solicitado. Finalizando arquivo atual...",
+        message="Cancelamento solicitado. Finalizando página atual...",
       )
       return
 
@@ -1294,6 +1711,22 @@ def _run_processing_job(
     processed_files = int(progress.get("processed_files") or 0)
     current_file = str(progress.get("current_file") or "")
     stage = str(progress.get("stage") or "processing")
+    if stage == "page":
+      page = {
+        "current_file": current_file,
+        "page_number": int(progress.get("page_number") or 0),
+        "page_count": int(progress.get("page_count") or 0),
+        "records_extracted": int(progress.get("records_extracted") or 0),
+      }
+      _update_job(
+        job_id,
+        status="running",
+        current_file=current_file,
+        current_page=page["page_number"],
+        page_count=page["page_count"],
+      )
+      _JOB_EVENTS.publicar(job_id, "page", page)
+      return
     if stage == "processing" and current_file:
       message = f"Processando arquivo: {current_file}"
     elif stage == "processed":
@@ -1311,8 +1744,32 @@ def _run_processing_job(
       current_file=current_file,
       message=message,
     )
+    _JOB_EVENTS.publicar(
+      job_id,
+      "progress",
+      {
+        "stage": stage,
+        "status": "running",
+        "message": message,
+        "current_file": current_file,
+        "processed_files": processed_files,
+        "failed_files": int(progress.get("failed_files") or 0),
+        "total_files": total_files,
+        "progress_percent": _progress_percent(processed_files, total_files),
+      },
+    )
 
   try:
+    if _job_cancel_requested(job_id):
+      # Cancelado ainda na fila (possivelmente por outro worker): uma retomada devolve o checkpoint
+      keep_uploads = bool(resume_from)
+      _update_job(
+        job_id,
+        status="cancelled",
+        message="Processamento cancelado antes de iniciar.",
+        checkpoint_execution_id=resume_from,
+      )
+      return
     _update_job(job_id, status="running", message="Iniciando processamento...")
     result = _build_processing_result(
       temp_path=temp_path,
@@ -1324,18 +1781,27 @@ def _run_processing_job(
       e2e_demo=e2e_demo,
       progress_callback=on_progress,
       should_stop=lambda: _job_cancel_requested(job_id),
+      resume_from=resume_from,
+      uploads=uploads,
+      output_dir=_job_output_dir(job_id),
     )
 
     if _job_cancel_requested(job_id):
+      # Os uploads ficam guardados para que o job possa ser retomado do checkpoint
+      keep_uploads = bool(result.get("checkpoint_execution_id"))
       _update_job(
         job_id,
         status="cancelled",
-        message="Processamento interrompido pelo usuário.",
+        message="Processamento interrompido pelo usuário."
+        + (" É possível retomar de onde parou." if keep_uploads else ""),
         current_file="",
         result=result,
+        checkpoint_execution_id=result.get("checkpoint_execution_id"),
       )
       return
 
+    if result.get("records_extracted"):
+      result["results_url"] = f"/api/results/{job_id}"
     _update_job(
       job_id,
       status="completed",
@@ -1354,7 +1820,12 @@ def _run_processing_job(
       current_file="",
     )
   finally:
-    shutil.rmtree(temp_path, ignore_errors=True)
+    _discard_upload_prefetch(temp_path)
+    if not keep_uploads:
+      shutil.rmtree(temp_path, ignore_errors=True)
+    # Evento final: o stream SSE lê o job store e envia o resultado
+    job = _get_job(job_id) or {}
+    _JOB_EVENTS.publicar(job_id, "progress", _progress_snapshot(job, stage=job.get("status")))
 
 
 def _safe_output_path(filename: str) -> Path:
@@ -1364,24 +1835,11 @@ def _safe_output_path(filename: str) -> Path:
     return candidate
 
 
-def _snapshot_output_files() -> set[str]:
-    return {path.name for path in OUTPUT_DIR.glob("dados_extraidos*")}
-
-
-def _find_latest_export(before: set[str]) -> Optional[Path]:
-    candidates = [path for path in OUTPUT_DIR.glob("dados_extraidos*") if path.name not in before]
-    if not candidates:
-        candidates = list(OUTPUT_DIR.glob("dados_extraidos*"))
-    if not candidates:
-        return None
-    return max(candidates, key=lambda path: path.stat().st_mtime)
-
-
-def _should_use_e2e_demo(files: List[UploadFile]) -> bool:
+def _should_use_e2e_demo(filenames: List[str]) -> bool:
     """Habilita dados fixos apenas em execução E2E quando explicitamente solicitado."""
     if os.getenv("WEBAPP_E2E_DEMO") != "1":
         return False
-    return any((upload.filename or "").lower() == "e2e_sample.pdf" for upload in files)
+    return any((filename or "").lower() == "e2e_sample.pdf" for filename in filenames)
 
 
 def _build_e2e_demo_dataframe() -> pd.DataFrame:
@@ -1397,17 +1855,398 @@ def _build_e2e_demo_dataframe() -> pd.DataFrame:
     )
 
 
-async def _persist_uploads(files: List[UploadFile], destination: Path) -> None:
-    for upload in files:
-        file_name = os.path.basename(upload.filename or "arquivo_enviado")
-        target = destination / file_name
-        content = await upload.read()
-        target.write_bytes(content)
+def _mb_to_bytes(megabytes: float) -> int:
+    return int(megabytes * 1024 * 1024)
+
+
+class _StreamedUploads:
+    """Lê um corpo multipart/form-data em fluxo, gravando cada arquivo em disco à medida que chega.
+
+    Os campos de formulário ficam em fields. Cada arquivo do campo "files" é gravado
+    em blocos com o SHA-256 calculado no caminho e, ao terminar, entra em manifest e
+    é repassado a on_file(caminho, item do manifesto, campos já recebidos), sem
+    esperar o restante do corpo.
+    """
+
+    def __init__(
+        self,
+        content_type: str,
+        destination: Path,
+        on_file: Optional[Callable[[Path, Dict[str, Any], Dict[str, str]], None]] = None,
+    ):
+        media_type, options = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or not options.get(b"boundary"):
+            raise HTTPException(status_code=400, detail="Envie os arquivos como multipart/form-data.")
+        self.destination = destination
+        self.fields: Dict[str, str] = {}
+        self.manifest: List[Dict[str, Any]] = []
+        self._on_file = on_file
+        self._max_file_bytes = _mb_to_bytes(config.get_web_max_upload_mb())
+        self._max_request_bytes = _mb_to_bytes(config.get_web_max_request_mb())
+        self._buffer_size = config.get_web_upload_chunk_kb() * 1024
+        self._received = 0
+        # Os callbacks do parser só enfileiram os eventos; feed() os trata depois de cada write
+        self._events: List[tuple] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._part: Optional[Dict[str, Any]] = None
+        self._parser = MultipartParser(
+            options[b"boundary"],
+            {
+                "on_part_begin": self._queue("part_begin"),
+                "on_header_field": self._queue("header_field"),
+                "on_header_value": self._queue("header_value"),
+                "on_header_end": self._queue("header_end"),
+                "on_headers_finished": self._queue("headers_finished"),
+                "on_part_data": self._queue("part_data"),
+                "on_part_end": self._queue("part_end"),
+            },
+        )
+
+    def _queue(self, event: str):
+        def callback(data: bytes = b"", start: int = 0, end: int = 0) -> None:
+            self._events.append((event, data[start:end]))
+
+        return callback
+
+    def feed(self, chunk: bytes) -> None:
+        """Processa o próximo trecho do corpo.
+
+        Raises:
+            HTTPException: 413 se um arquivo passar de web.max_upload_mb, um campo de
+                _MAX_FIELD_BYTES ou a requisição de web.max_request_mb; 400 se o corpo
+                multipart for inválido ou repetir o nome de um arquivo
+        """
+        self._received += len(chunk)
+        if self._received > self._max_request_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"A requisição excede o limite de {self._max_request_bytes // (1024 * 1024)} MB.",
+            )
+        try:
+            self._parser.write(chunk)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Corpo multipart inválido.") from exc
+        events, self._events = self._events, []
+        for event, data in events:
+            self._handle(event, data)
+
+    def finish(self) -> None:
+        """Confere o fim do corpo: uma parte ainda aberta indica upload interrompido."""
+        self._parser.finalize()
+        if self._part is not None:
+            raise HTTPException(status_code=400, detail="Corpo multipart incompleto.")
+
+    def close(self) -> None:
+        """Fecha o arquivo em gravação, se o corpo foi interrompido no meio de uma parte."""
+        if self._part is not None and "file" in self._part:
+            self._part["file"].close()
+
+    def _handle(self, event: str, data: bytes) -> None:
+        if event == "part_begin":
+            self._headers = {}
+        elif event == "header_field":
+            self._header_field += data
+        elif event == "header_value":
+            self._header_value += data
+        elif event == "header_end":
+            self._headers[self._header_field.lower()] = self._header_value
+            self._header_field = self._header_value = b""
+        elif event == "headers_finished":
+            self._part = self._open_part()
+        elif event == "part_data":
+            self._write_part(data)
+        elif event == "part_end":
+            part, self._part = self._part, None
+            self._close_part(part)
+
+    def _open_part(self) -> Dict[str, Any]:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            return {"name": name, "value": bytearray()}
+        file_name = os.path.basename(filename.decode("utf-8", "replace"))
+        if name != "files" or not file_name:
+            # Campo de arquivo vazio (nenhum arquivo escolhido) ou fora de "files": descartado
+            return {"name": name}
+        target = self.destination / file_name
+        if target.exists():
+            # Reabrir o mesmo caminho trocaria o conteúdo de um arquivo já registrado
+            raise HTTPException(
+                status_code=400, detail=f"O arquivo {file_name} foi enviado mais de uma vez."
+            )
+        return {
+            "name": name,
+            "target": target,
+            "file": open(target, "wb", buffering=self._buffer_size),
+            "digest": hashlib.sha256(),
+            "size": 0,
+        }
+
+    def _write_part(self, data: bytes) -> None:
+        part = self._part
+        if part is None:
+            return
+        if "file" in part:
+            part["size"] += len(data)
+            if part["size"] > self._max_file_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=(
+                        f"O arquivo {part['target'].name} excede o limite de "
+                        f"{self._max_file_bytes // (1024 * 1024)} MB."
+                    ),
+                )
+            part["digest"].update(data)
+            part["file"].write(data)
+        elif "value" in part:
+            if len(part["value"]) + len(data) > _MAX_FIELD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"O campo {part['name']} excede o limite de {_MAX_FIELD_BYTES // 1024} KB.",
+                )
+            part["value"].extend(data)
+
+    def _close_part(self, part: Optional[Dict[str, Any]]) -> None:
+        if part is None:
+            return
+        if "file" in part:
+            part["file"].close()
+            info = {
+                "filename": part["target"].name,
+                "size": part["size"],
+                "sha256": part["digest"].hexdigest(),
+            }
+            self.manifest.append(info)
+            if self._on_file is not None:
+                self._on_file(part["target"], info, self.fields)
+        elif "value" in part:
+            self.fields[part["name"]] = part["value"].decode("utf-8", "replace")
+
+
+async def _receive_uploads(
+    http_request: Request, destination: Path, prefetch: Optional["_UploadPrefetch"] = None
+) -> _StreamedUploads:
+    """Grava os arquivos do corpo multipart em disco enquanto ele chega (sem juntá-lo em memória).
+
+    Com prefetch, cada arquivo concluído já vai para a extração antecipada.
+
+    Raises:
+        HTTPException: 400 sem nenhum arquivo, com corpo inválido ou nome de arquivo repetido;
+            413 acima dos limites
+    """
+    uploads = _StreamedUploads(
+        http_request.headers.get("content-type", ""),
+        destination,
+        on_file=prefetch.add if prefetch is not None else None,
+    )
+    try:
+        async for chunk in http_request.stream():
+            if chunk:
+                await run_in_threadpool(uploads.feed, chunk)
+        await run_in_threadpool(uploads.finish)
+    finally:
+        uploads.close()
+    if not uploads.manifest:
+        raise HTTPException(status_code=400, detail="Envie ao menos um arquivo PDF ou ZIP.")
+    return uploads
+
+
+def _processing_options(fields: Dict[str, str]) -> Dict[str, Any]:
+    """Parâmetros do processamento enviados junto com os arquivos (campos vazios valem o padrão).
+
+    Raises:
+        HTTPException: 422 se year não for um número inteiro
+    """
+    year = (fields.get("year") or "").strip()
+    if year and not re.fullmatch(r"-?\d+", year):
+        raise HTTPException(status_code=422, detail="O campo year deve ser um número inteiro.")
+    return {
+        "year": int(year) if year else None,
+        "ticker": fields.get("ticker") or None,
+        "sort_by": fields.get("sort_by") or "name",
+        "output_format": fields.get("output_format") or None,
+    }
+
+
+class _UploadPrefetch:
+    """Extrai os PDFs de um upload enquanto o restante do corpo ainda está chegando.
+
+    Cada PDF (ou cada PDF de um ZIP) concluído vai para o pool web.upload_prefetch_workers.
+    O job usa este objeto como record_cache de analisar_pasta_ou_zip: na primeira
+    busca, as extrações que ainda não começaram são canceladas (o job as faz com os
+    próprios workers) e as que estão em andamento são aguardadas. Os registros ficam
+    pela mesma chave do cache de registros (SHA-256, assinatura da extração e filtro de
+    ticker), que também os recebe quando web.result_cache está ativo.
+
+    year e ticker são lidos dos campos recebidos antes de cada arquivo; se mudarem
+    depois (campos enviados após os arquivos), a extração antecipada é descartada.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, cache: Optional[ResultCache]):
+        self._executor = executor
+        self._cache = cache
+        self._signature: Optional[str] = None
+        self._options: Optional[tuple] = None
+        self._futures: List[Future] = []
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._taken_over = False
+
+    def add(self, path: Path, info: Dict[str, Any], fields: Dict[str, str]) -> None:
+        """Agenda a extração de um arquivo recém-recebido (callback de _StreamedUploads)."""
+        if self._stopped.is_set() or not self.matches(_processing_options(fields)):
+            return
+        if self._signature is None:
+            self._signature = sessao_padrao().assinatura_extracao()
+        name = path.name
+        if name.endswith(".pdf"):
+            self._submit(name, str(path), None, info["sha256"])
+        elif name.endswith(".zip"):
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    entries = [entry for entry in archive.namelist() if entry.endswith(".pdf")]
+            except (OSError, zipfile.BadZipFile) as exc:
+                print(f"Aviso: não foi possível ler o ZIP {name} para extração antecipada ({exc}).")
+                return
+            for entry in entries:
+                self._submit(os.path.basename(entry), str(path), entry, None)
+
+    def matches(self, options: Dict[str, Any]) -> bool:
+        """Confere year/ticker com os usados até aqui; divergentes descartam o que foi antecipado."""
+        current = (options["year"], options["ticker"])
+        if self._options is None:
+            self._options = current
+        elif self._options != current:
+            self.close()
+        return not self._stopped.is_set()
+
+    def _submit(self, name: str, source: str, entry: Optional[str], sha256: Optional[str]) -> None:
+        year, _ = self._options
+        if year is not None and _extract_year_from_filename(name) != year:
+            # Sem o ano no nome, o job decide lendo o cabeçalho da nota
+            return
+        with self._lock:
+            if not self._taken_over:
+                self._futures.append(self._executor.submit(self._extract, source, entry, sha256))
+
+    def _extract(self, source: str, entry: Optional[str], sha256: Optional[str]) -> None:
+        if self._stopped.is_set():
+            return
+        _, ticker = self._options
+        try:
+            if entry is None:
+                pdf = source
+            else:
+                with zipfile.ZipFile(source) as archive, archive.open(entry) as member:
+                    content = member.read()
+                sha256 = hashlib.sha256(content).hexdigest()
+                pdf = criar_bytesio_com_nome(content, os.path.basename(entry))
+            metrics: List[Dict[str, Any]] = []
+            options = {"ticker_filter": ticker} if ticker else {}
+            records = sessao_padrao().processar_pdf(
+                pdf, metrics_collector=metrics, should_stop=self._stopped.is_set, **options
+            )
+        except Exception as exc:
+            print(f"Aviso: extração antecipada de {entry or source} falhou; o job refaz ({exc}).")
+            return
+        pages = metrics[0].get("pages", []) if metrics else []
+        if self._stopped.is_set() or any("error" in page for page in pages):
+            return
+        key = chave_cache_registros(sha256, self._signature, ticker)
+        with self._lock:
+            self._records[key] = records
+        if self._cache is not None:
+            try:
+                self._cache.guardar(key, records)
+            except Exception as exc:
+                print(f"Aviso: não foi possível guardar {entry or source} no cache de registros ({exc}).")
+
+    def _take_over(self) -> None:
+        with self._lock:
+            if self._taken_over:
+                return
+            self._taken_over = True
+            futures = list(self._futures)
+        for future in futures:
+            if not future.cancel():
+                future.result()
+
+    def buscar(self, chave: str) -> Optional[List[Dict[str, Any]]]:
+        """Registros antecipados para a chave; os demais vêm do cache configurado, se houver."""
+        self._take_over()
+        with self._lock:
+            records = self._records.get(chave)
+        if records is not None:
+            return records
+        return self._cache.buscar(chave) if self._cache is not None else None
+
+    def guardar(self, chave: str, registros: List[Dict[str, Any]]) -> None:
+        if self._cache is not None:
+            self._cache.guardar(chave, registros)
+
+    def close(self) -> None:
+        """Interrompe as extrações pendentes (upload recusado, job encerrado ou parâmetros alterados)."""
+        self._stopped.set()
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+
+def _new_upload_prefetch() -> Optional[_UploadPrefetch]:
+    """Extração antecipada de um upload, ou None se desativada (web.upload_prefetch_workers=0).
+
+    Só é criada para uploads de jobs já admitidos pelo _JOB_EXECUTOR, que limita quantos
+    uploads extraem ao mesmo tempo no processo web.
+    """
+    global _PREFETCH_EXECUTOR
+    workers = config.get_web_upload_prefetch_workers()
+    if workers <= 0 or os.getenv("WEBAPP_E2E_DEMO") == "1":
+        return None
+    if _PREFETCH_EXECUTOR is None:
+        _PREFETCH_EXECUTOR = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="upload-prefetch"
+        )
+    return _UploadPrefetch(_PREFETCH_EXECUTOR, _result_cache())
+
+
+def _register_upload_prefetch(
+    temp_path: Path, prefetch: Optional[_UploadPrefetch], options: Dict[str, Any]
+) -> None:
+    """Deixa a extração antecipada disponível para o job da pasta (se os parâmetros conferem)."""
+    if prefetch is not None and prefetch.matches(options):
+        _UPLOAD_PREFETCHES[str(temp_path)] = prefetch
+
+
+def _discard_upload_prefetch(temp_path: Path, prefetch: Optional[_UploadPrefetch] = None) -> None:
+    prefetch = _UPLOAD_PREFETCHES.pop(str(temp_path), None) or prefetch
+    if prefetch is not None:
+        prefetch.close()
+
+
+@app.middleware("http")
+async def _reject_oversized_uploads(request: Request, call_next):
+    """Recusa com 413 uploads cujo Content-Length já passa do limite, antes de ler o corpo."""
+    if request.method in {"POST", "PUT"} and request.url.path.startswith("/api/process"):
+        content_length = request.headers.get("content-length") or ""
+        max_request_bytes = _mb_to_bytes(config.get_web_max_request_mb())
+        if content_length.isdigit() and int(content_length) > max_request_bytes:
+            return JSONResponse(
+                status_code=413,
+                content={
+                    "detail": f"A requisição excede o limite de {max_request_bytes // (1024 * 1024)} MB."
+                },
+            )
+    return await call_next(request)
 
 
 @app.get("/", response_class=HTMLResponse)
-def index() -> HTMLResponse:
-    return HTMLResponse(HTML_PAGE)
+def index(request: Request) -> Response:
+    return _INDEX_PAGE.responder(request)
 
 
 @app.post("/api/process-image")
@@ -1427,32 +2266,53 @@ async def process_image(
     return JSONResponse(content=content)
 
 
-@app.post("/api/process")
-async def process_files(
-    files: List[UploadFile] = File(...),
-    year: Optional[int] = Form(default=None),
-    ticker: Optional[str] = Form(default=None),
-    sort_by: str = Form(default="name"),
-    output_format: Optional[str] = Form(default=None),
-):
-    if not files:
-        raise HTTPException(status_code=400, detail="Envie ao menos um arquivo PDF ou ZIP.")
+# Os endpoints de processamento leem o corpo multipart em fluxo (_receive_uploads); o
+# formulário fica descrito aqui para a documentação da API
+_PROCESS_FORM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "year": {"type": "integer"},
+                        "ticker": {"type": "string"},
+                        "sort_by": {"type": "string", "default": "name"},
+                        "output_format": {"type": "string"},
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                    },
+                }
+            }
+        },
+    }
+}
 
+
+@app.post("/api/process", openapi_extra=_PROCESS_FORM_OPENAPI)
+async def process_files(http_request: Request):
+    """Processa os arquivos enviados e devolve o resultado na mesma requisição.
+
+    Não passa pela admissão de jobs, então não usa a extração antecipada (só /api/process/start).
+    """
     with tempfile.TemporaryDirectory(prefix="extrator_web_") as temp_dir:
         temp_path = Path(temp_dir)
-        await _persist_uploads(files, temp_path)
-
         try:
+            uploads = await _receive_uploads(http_request, temp_path)
+            options = _processing_options(uploads.fields)
+            filenames = [item["filename"] for item in uploads.manifest]
             content = await run_in_threadpool(
                 _build_processing_result,
                 temp_path,
-                year,
-                ticker,
-                sort_by,
-                output_format,
-                len(files),
-                _should_use_e2e_demo(files),
-                None,
+                options["year"],
+                options["ticker"],
+                options["sort_by"],
+                options["output_format"],
+                len(uploads.manifest),
+                _should_use_e2e_demo(filenames),
+                uploads=uploads.manifest,
+                output_dir=_job_output_dir(uuid.uuid4().hex),
             )
         except RuntimeError as exc:
             raise HTTPException(status_code=500, detail=str(exc)) from exc
@@ -1460,78 +2320,671 @@ async def process_files(
         return JSONResponse(content=content)
 
 
-@app.post("/api/process/start")
-async def start_process_job(
-    files: List[UploadFile] = File(...),
+@app.post("/api/process/start", openapi_extra=_PROCESS_FORM_OPENAPI)
+async def start_process_job(http_request: Request):
+    """Grava os arquivos enviados e cria um job de processamento em segundo plano.
+
+    Envie year/ticker antes dos arquivos para que a extração comece durante o upload.
+    """
+    client = _client_id(http_request)
+    try:
+        # Recusa antes de ler o corpo: um job sem vaga não grava arquivos nem extrai nada
+        _JOB_EXECUTOR.verificar_admissao(client)
+    except _JobRejected as exc:
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+
+    temp_path = Path(tempfile.mkdtemp(prefix="extrator_web_job_"))
+    prefetch = _new_upload_prefetch()
+    try:
+        uploads = await _receive_uploads(http_request, temp_path, prefetch)
+        options = _processing_options(uploads.fields)
+        filenames = [item["filename"] for item in uploads.manifest]
+        _register_upload_prefetch(temp_path, prefetch, options)
+        job_id = _start_processing_job(
+            {
+                "temp_path": temp_path,
+                "year": options["year"],
+                "ticker": options["ticker"],
+                "sort_by": options["sort_by"],
+                "output_format": options["output_format"],
+                "files_received": len(uploads.manifest),
+                "e2e_demo": _should_use_e2e_demo(filenames),
+                "uploads": uploads.manifest,
+            },
+            client=client,
+        )
+    except HTTPException:
+        _discard_upload_prefetch(temp_path, prefetch)
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    return JSONResponse(
+        content={"job_id": job_id, "queue_position": _JOB_EXECUTOR.posicao(job_id)}
+    )
+
+
+def _upload_sessions() -> UploadSessionStore:
+    global _UPLOAD_SESSIONS
+    if _UPLOAD_SESSIONS is None:
+        _UPLOAD_SESSIONS = UploadSessionStore(
+            config.resolve_path(config.get_web_upload_sessions_folder()),
+            max_chunk_bytes=_mb_to_bytes(config.get_web_upload_chunk_max_mb()),
+            ttl_seconds=config.get_web_upload_session_ttl_hours() * 3600,
+        )
+    return _UPLOAD_SESSIONS
+
+
+async def _upload_session_call(fn, *args: Any) -> Any:
+    try:
+        return await run_in_threadpool(fn, *args)
+    except UploadSessionError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+
+
+@app.post("/api/uploads", status_code=201)
+async def create_upload_session(
+    filename: str = Form(...),
+    size: int = Form(...),
+    sha256: Optional[str] = Form(default=None),
+):
+    """Cria uma sessão de upload retomável para um arquivo grande (PDF ou ZIP)."""
+    max_file_bytes = _mb_to_bytes(config.get_web_max_upload_mb())
+    if size > max_file_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"O arquivo {filename} excede o limite de {max_file_bytes // (1024 * 1024)} MB.",
+        )
+    session = await _upload_session_call(_upload_sessions().criar, filename, size, sha256)
+    session["chunk_max_bytes"] = _upload_sessions().max_chunk_bytes
+    return JSONResponse(status_code=201, content=session)
+
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, http_request: Request):
+    """Recebe um bloco (corpo bruto) na posição offset; X-Chunk-SHA256 confere a integridade.
+
+    O corpo é gravado direto no arquivo da sessão à medida que chega, sem juntar o bloco em memória.
+    """
+    chunk = await _upload_session_call(_upload_sessions().abrir_bloco, upload_id, offset)
+    try:
+        async for part in http_request.stream():
+            if part:
+                await _upload_session_call(chunk.escrever, part)
+    finally:
+        chunk.fechar()
+    session = await _upload_session_call(chunk.concluir, http_request.headers.get("x-chunk-sha256"))
+    return JSONResponse(content=session)
+
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Intervalos já recebidos ([início, fim) em bytes) e se o arquivo está completo."""
+    return JSONResponse(content=await _upload_session_call(_upload_sessions().obter, upload_id))
+
+
+@app.delete("/api/uploads/{upload_id}")
+async def delete_upload_session(upload_id: str):
+    await _upload_session_call(_upload_sessions().remover, upload_id)
+    return JSONResponse(content={"upload_id": upload_id, "status": "deleted"})
+
+
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload_session(
+    upload_id: str,
+    http_request: Request,
     year: Optional[int] = Form(default=None),
     ticker: Optional[str] = Form(default=None),
     sort_by: str = Form(default="name"),
     output_format: Optional[str] = Form(default=None),
 ):
-    if not files:
-        raise HTTPException(status_code=400, detail="Envie ao menos um arquivo PDF ou ZIP.")
+    """Confere o arquivo montado a partir dos blocos e o transforma em um job de processamento."""
+    client = _client_id(http_request)
+    try:
+        # Verifica a admissão antes de consumir a sessão: recusado, o upload continua disponível
+        _JOB_EXECUTOR.verificar_admissao(client)
+    except _JobRejected as exc:
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
 
     temp_path = Path(tempfile.mkdtemp(prefix="extrator_web_job_"))
-    await _persist_uploads(files, temp_path)
+    upload = None
+    try:
+        upload = await _upload_session_call(_upload_sessions().finalizar, upload_id, temp_path)
+        job_id = _start_processing_job(
+            {
+                "temp_path": temp_path,
+                "year": year,
+                "ticker": ticker,
+                "sort_by": sort_by,
+                "output_format": output_format,
+                "files_received": 1,
+                "e2e_demo": False,
+                "uploads": [upload],
+            },
+            client=client,
+        )
+    except Exception:
+        if upload is not None:
+            # A sessão já foi consumida (ex.: 429 da fila logo após a admissão): devolve o
+            # arquivo para que o cliente possa finalizar de novo sem reenviar os blocos
+            try:
+                await run_in_threadpool(
+                    _upload_sessions().restaurar, upload_id, temp_path / upload["filename"], upload
+                )
+            except OSError as exc:
+                print(f"Aviso: não foi possível restaurar a sessão de upload {upload_id} ({exc}).")
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    return JSONResponse(
+        content={
+            "job_id": job_id,
+            "queue_position": _JOB_EXECUTOR.posicao(job_id),
+            "upload": upload,
+        }
+    )
+
 
+@app.post("/api/process/resume/{job_id}")
+def resume_process_job(job_id: str, http_request: Request):
+    job = _get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job.get("status") != "cancelled" or not job.get("checkpoint_execution_id"):
+        raise HTTPException(status_code=409, detail="Job não pode ser retomado.")
+
+    # O checkpoint e os uploads passam para o novo job; o job original deixa de ser retomável
+    _update_job(job_id, checkpoint_execution_id=None)
+    try:
+        new_job_id = _start_processing_job(
+            job["request"],
+            resume_from=job["checkpoint_execution_id"],
+            client=_client_id(http_request),
+        )
+    except HTTPException:
+        # Recusado na admissão: o job original continua retomável
+        _update_job(job_id, checkpoint_execution_id=job["checkpoint_execution_id"])
+        raise
+    return JSONResponse(
+        content={
+            "job_id": new_job_id,
+            "resumed_from": job_id,
+            "queue_position": _JOB_EXECUTOR.posicao(new_job_id),
+        }
+    )
+
+
+def _client_id(http_request: Request) -> str:
+    return http_request.client.host if http_request.client else "local"
+
+
+def _start_processing_job(
+    request: Dict[str, Any], resume_from: Optional[str] = None, client: str = "local"
+) -> str:
+    """Registra o job e o submete ao executor; HTTP 429 (com Retry-After) se for recusado."""
     job_id = uuid.uuid4().hex
     job_state = {
         "job_id": job_id,
         "status": "queued",
         "message": "Fila criada. Processamento será iniciado.",
-      "cancel_requested": False,
+        "cancel_requested": False,
         "current_file": "",
         "processed_files": 0,
-        "total_files": len(files),
+        "total_files": request["files_received"],
         "result": None,
         "error": None,
+        "request": request,
+        "checkpoint_execution_id": None,
+        "resume_from": resume_from,
+        "client": client,
+        "dono": dono_atual(),
     }
-    with _JOBS_LOCK:
-        _PROCESS_JOBS[job_id] = job_state
+    _job_store().criar(job_state)
 
-    worker = threading.Thread(
-        target=_run_processing_job,
-        args=(
-            job_id,
-            temp_path,
-            year,
-            ticker,
-            sort_by,
-            output_format,
-            len(files),
-            _should_use_e2e_demo(files),
-        ),
-        daemon=True,
+    try:
+        _submit_job(job_id, request, resume_from, client)
+    except _JobRejected as exc:
+        _job_store().remover(job_id)
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+    return job_id
+
+
+def _submit_job(job_id: str, request: Dict[str, Any], resume_from: Optional[str], client: str) -> None:
+    _JOB_EXECUTOR.submeter(
+        job_id,
+        client,
+        _run_processing_job,
+        Path(request["temp_path"]),
+        request["year"],
+        request["ticker"],
+        request["sort_by"],
+        request["output_format"],
+        request["files_received"],
+        request["e2e_demo"],
+        resume_from,
+        request.get("uploads"),
+    )
+
+
+def _recuperar_jobs_orfaos() -> int:
+    """Assume os jobs cujo processo dono não existe mais (ex.: servidor reiniciado).
+
+    Jobs que estavam na fila voltam para a fila deste processo; jobs que estavam
+    rodando são marcados como falhos (ou cancelados, se o cancelamento já havia
+    sido pedido). Com vários workers, apenas um deles assume cada job.
+
+    Returns:
+        Quantidade de jobs recolocados na fila
+    """
+    store = _job_store()
+    dono = dono_atual()
+    recolocados = 0
+    for job in store.listar():
+        status = job.get("status")
+        if status not in {"queued", "running", "cancelling"} or dono_ativo(job.get("dono")):
+            continue
+        if not store.assumir(job["job_id"], job.get("dono"), dono):
+            continue
+        job_id = job["job_id"]
+        request = job.get("request") or {}
+        resume_from = job.get("resume_from")
+        temp_path = request.get("temp_path")
+
+        if status == "queued" and not job.get("cancel_requested") and temp_path and os.path.isdir(temp_path):
+            try:
+                _submit_job(job_id, request, resume_from, job.get("client") or "local")
+                recolocados += 1
+                continue
+            except _JobRejected as exc:
+                _update_job(job_id, status="failed", error=str(exc), message="Fila cheia ao reiniciar o servidor.")
+        elif job.get("cancel_requested"):
+            _update_job(
+                job_id,
+                status="cancelled",
+                message="Processamento interrompido pelo usuário.",
+                current_file="",
+                checkpoint_execution_id=resume_from,
+            )
+        else:
+            _update_job(
+                job_id,
+                status="failed",
+                error="O servidor foi reiniciado durante o processamento.",
+                message="Falha durante o processamento.",
+                current_file="",
+            )
+        if temp_path and not resume_from:
+            shutil.rmtree(temp_path, ignore_errors=True)
+    return recolocados
+
+
+def _result_download_urls(result: Optional[Dict[str, Any]]) -> List[str]:
+    """download_url do arquivo principal e dos demais formatos exportados de um resultado."""
+    if not result:
+        return []
+    urls = [item.get("download_url") for item in result.get("exported_files") or []]
+    urls.append(result.get("download_url"))
+    return [url for url in urls if url]
+
+
+def _limpar_jobs_expirados() -> Dict[str, int]:
+    """Remove jobs finalizados há mais de web.job_ttl_hours, com suas saídas e uploads guardados.
+
+    Pastas de saída sem job ativo (ex.: de /api/process ou de um job store em
+    memória de um processo anterior) também são removidas após o mesmo prazo.
+    Uma pasta ainda referenciada pelo resultado de um job que continua no store
+    (resultado reaproveitado de um upload idêntico, com download_url e
+    resultado.sqlite na pasta do job original) fica até esse job expirar.
+
+    Returns:
+        Quantidade de jobs e de pastas de saída removidos
+    """
+    limite = time.time() - config.get_web_job_ttl_hours() * 3600
+    store = _job_store()
+    expirados = store.remover_expirados(limite, _FINAL_STATUSES)
+    restantes = store.listar()
+    # Uploads guardados para retomada só saem se nenhum job ativo (a retomada) ainda os usa
+    em_uso = {str((job.get("request") or {}).get("temp_path")) for job in restantes}
+    saidas_em_uso = set()
+    for job in restantes:
+        for url in _result_download_urls(job.get("result")):
+            try:
+                saidas_em_uso.add(_download_path(url).parent)
+            except HTTPException:
+                continue
+    pastas_removidas = 0
+    for job in expirados:
+        _JOB_EVENTS.descartar(job["job_id"])
+        _RESPONSES.descartar(job["job_id"])
+        temp_path = (job.get("request") or {}).get("temp_path")
+        if temp_path and str(temp_path) not in em_uso:
+            shutil.rmtree(temp_path, ignore_errors=True)
+        pasta = _job_output_dir(job["job_id"])
+        if pasta.is_dir() and pasta.resolve() not in saidas_em_uso:
+            shutil.rmtree(pasta, ignore_errors=True)
+            pastas_removidas += 1
+
+    raiz = OUTPUT_DIR / JOBS_OUTPUT_SUBDIR
+    for pasta in raiz.iterdir() if raiz.is_dir() else []:
+        try:
+            antiga = pasta.stat().st_mtime < limite and pasta.resolve() not in saidas_em_uso
+        except OSError:
+            continue
+        job = store.obter(pasta.name) if antiga else None
+        if antiga and (job is None or job.get("status") in _FINAL_STATUSES):
+            shutil.rmtree(pasta, ignore_errors=True)
+            pastas_removidas += 1
+    return {"jobs": len(expirados), "output_dirs": pastas_removidas}
+
+
+def _limpar_cache_resultados() -> Dict[str, int]:
+    """Limpa o cache de resultados (ResultCache.limpar) com os prazos configurados.
+
+    Saem os registros sem uso há web.result_cache_ttl_days, os menos usados além de
+    web.result_cache_max_files e os resultados mais antigos que web.job_ttl_hours.
+
+    Returns:
+        Quantidade de registros e de resultados removidos (zero com o cache desativado)
+    """
+    cache = _result_cache()
+    if cache is None:
+        return {"registros": 0, "resultados": 0}
+    agora = time.time()
+    return cache.limpar(
+        registros_usados_antes=agora - config.get_web_result_cache_ttl_days() * 86400,
+        resultados_criados_antes=agora - config.get_web_job_ttl_hours() * 3600,
+        max_registros=config.get_web_result_cache_max_files(),
     )
-    worker.start()
 
-    return JSONResponse(content={"job_id": job_id})
+
+async def _janitor_loop() -> None:
+    """Limpa jobs, sessões de upload e cache de resultados a cada web.janitor_interval_minutes."""
+    while True:
+        try:
+            removidos = await run_in_threadpool(_limpar_jobs_expirados)
+            sessoes = await run_in_threadpool(_upload_sessions().limpar_expiradas)
+            cache = await run_in_threadpool(_limpar_cache_resultados)
+            if removidos["jobs"] or removidos["output_dirs"] or sessoes or any(cache.values()):
+                print(
+                    f"🧹 Limpeza: {removidos['jobs']} job(s), {removidos['output_dirs']} pasta(s) de saída, "
+                    f"{sessoes} sessão(ões) de upload, {cache['registros']} registro(s) e "
+                    f"{cache['resultados']} resultado(s) do cache expirados"
+                )
+        except Exception as exc:
+            print(f"Aviso: falha na limpeza de jobs expirados ({exc}).")
+        await asyncio.sleep(config.get_web_janitor_interval_minutes() * 60)
+
+
+def _progress_percent(processed_files: int, total_files: int) -> int:
+    return min(100, max(0, round((processed_files / total_files) * 100))) if total_files > 0 else 0
+
+
+def _progress_snapshot(job: Dict[str, Any], stage: Optional[str] = None) -> Dict[str, Any]:
+    """Progresso do job sem o resultado (payload dos eventos "progress" do SSE)."""
+    job_id = job.get("job_id")
+    total_files = int(job.get("total_files") or 0)
+    processed_files = int(job.get("processed_files") or 0)
+    queue_position = None
+    if job_id and job.get("status") == "queued":
+        # A fila local é exata; jobs de outro worker usam a ordem de criação no job store
+        queue_position = _JOB_EXECUTOR.posicao(job_id) or _job_store().posicao_na_fila(job_id)
+    message = job.get("message")
+    if queue_position is not None:
+        message = f"Aguardando na fila (posição {queue_position})."
+    snapshot = {
+        "status": job.get("status"),
+        "message": message,
+        "queue_position": queue_position,
+        "current_file": job.get("current_file"),
+        "current_page": job.get("current_page"),
+        "page_count": job.get("page_count"),
+        "processed_files": processed_files,
+        "total_files": total_files,
+        "progress_percent": _progress_percent(processed_files, total_files),
+    }
+    if stage:
+        snapshot["stage"] = stage
+    return snapshot
+
+
+def _job_status_payload(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job_id,
+        **_progress_snapshot(job),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "resumable": bool(job.get("checkpoint_execution_id")),
+        "cache_hit_ratio": ((job.get("result") or {}).get("cache") or {}).get("hit_ratio"),
+    }
+
+
+def _prepared_json(request: Request, key: tuple, version: Any, build) -> Response:
+    """JSON com ETag (304) e gzip/br a partir de web.compress_min_bytes.
+
+    Com uma versão, o corpo serializado fica em _RESPONSES até a versão mudar;
+    version=None serializa a cada chamada (ex.: job em andamento).
+    """
+
+    def _prepare() -> RespostaPreparada:
+        return RespostaPreparada.json(build(), config.get_web_compress_min_bytes())
+
+    if version is None:
+        return _prepare().responder(request)
+    return _RESPONSES.obter(key, version, _prepare).responder(request)
+
+
+def _status_version(job: Dict[str, Any]) -> Optional[tuple]:
+    """Versão do status de um job finalizado: só muda se ele deixar de ser retomável."""
+    if job.get("status") not in _FINAL_STATUSES:
+        return None
+    return job.get("status"), job.get("checkpoint_execution_id")
+
+
+def _result_store_path(result: Dict[str, Any]) -> Optional[Path]:
+    """Resultado consultável de um job: fica na pasta dos arquivos exportados (inclusive se reaproveitados)."""
+    download_url = (result or {}).get("download_url")
+    if not download_url:
+        return None
+    return _download_path(download_url).parent / ARQUIVO_RESULTADO
+
+
+def _completed_job_store_path(job_id: str) -> Path:
+    job = _get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job.get("status") != "completed":
+        raise HTTPException(status_code=409, detail="O resultado só fica disponível quando o job é concluído.")
+    store_path = _result_store_path(job.get("result"))
+    if store_path is None:
+        raise HTTPException(status_code=404, detail="O job não extraiu registros.")
+    return store_path
+
+
+@app.get("/api/results/{job_id}")
+def get_job_results(
+    http_request: Request,
+    job_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    ticker: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = "asc",
+):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Use order=asc ou order=desc.")
+    store_path = _completed_job_store_path(job_id)
+
+    def _page() -> Dict[str, Any]:
+        page = consultar_registros(
+            str(store_path),
+            offset=offset,
+            limit=limit,
+            ticker=ticker,
+            date_from=date_from,
+            date_to=date_to,
+            sort_by=sort,
+            descending=order == "desc",
+        )
+        return {"job_id": job_id, **page}
+
+    # A página só muda se o resultado guardado for regravado
+    key = (job_id, "results", offset, limit, ticker, date_from, date_to, sort, order)
+    try:
+        return _prepared_json(http_request, key, store_path.stat().st_mtime_ns, _page)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="O resultado deste job não está mais disponível.") from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _export_chunks(columns: List[str], batches, export_format: str, encoding: Optional[str]):
+    """Gera a exportação CSV (com BOM, como o arquivo exportado) ou NDJSON lote a lote."""
+    compressor = Compressor(encoding) if encoding else None
+
+    def _emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.comprimir(data) if compressor else data
+
+    if export_format == "csv":
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        yield _emit("\ufeff" + buffer.getvalue())
+    for batch in batches:
+        if export_format == "csv":
+            buffer = StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerows(batch)
+            chunk = _emit(buffer.getvalue())
+        else:
+            chunk = _emit(
+                "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in batch)
+            )
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.finalizar()
+
+
+@app.get("/api/results/{job_id}/export")
+def export_job_results(
+    request: Request,
+    job_id: str,
+    export_format: str = Query(default="csv", alias="format"),
+    ticker: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+):
+    """Exporta o resultado em fluxo, a partir do resultado guardado, sem gravar arquivo em disco."""
+    export_format = export_format.lower()
+    if export_format not in _STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Use format=csv ou format=ndjson.")
+    store_path = _completed_job_store_path(job_id)
+    try:
+        columns, batches = iterar_registros(
+            str(store_path), ticker=ticker, date_from=date_from, date_to=date_to
+        )
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="O resultado deste job não está mais disponível.") from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    encoding = escolher_codificacao(request.headers.get("accept-encoding"))
+    headers = {
+        "Content-Disposition": f'attachment; filename="dados_extraidos_{job_id}.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        _export_chunks(columns, batches, export_format, encoding),
+        media_type=_STREAM_MEDIA_TYPES[export_format],
+        headers=headers,
+    )
 
 
 @app.get("/api/process/status/{job_id}")
-def get_process_status(job_id: str):
+def get_process_status(job_id: str, http_request: Request):
     job = _get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job não encontrado.")
 
-    total_files = int(job.get("total_files") or 0)
-    processed_files = int(job.get("processed_files") or 0)
-    progress_percent = (
-        min(100, max(0, round((processed_files / total_files) * 100))) if total_files > 0 else 0
+    return _prepared_json(
+        http_request, (job_id, "status"), _status_version(job), lambda: _job_status_payload(job_id, job)
     )
 
-    return JSONResponse(
-        content={
-            "job_id": job_id,
-            "status": job.get("status"),
-            "message": job.get("message"),
-            "current_file": job.get("current_file"),
-            "processed_files": processed_files,
-            "total_files": total_files,
-            "progress_percent": progress_percent,
-            "result": job.get("result"),
-            "error": job.get("error"),
-        }
+
+def _sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _job_event_stream(job_id: str, last_event_id: int):
+    """Gera o stream SSE de um job até o resultado final.
+
+    Os eventos publicados por este processo (progress e page) são repassados na
+    ordem; para jobs de outro worker, o job store é lido periodicamente e um
+    evento "progress" é enviado quando o estado muda. O resultado completo vai
+    uma única vez, no evento "result", e encerra o stream.
+    """
+    last_seq = last_event_id
+    last_snapshot = None
+    last_store_read = 0.0
+    last_sent = time.monotonic()
+    while True:
+        events = _JOB_EVENTS.depois_de(job_id, last_seq)
+        for seq, event, data in events:
+            last_seq = seq
+            yield _sse(event, data, seq)
+
+        now = time.monotonic()
+        if events:
+            last_sent = now
+        if events or now - last_store_read >= _SSE_STORE_POLL_SECONDS:
+            last_store_read = now
+            job = await run_in_threadpool(_get_job, job_id)
+            if job is None:
+                yield _sse("error", {"detail": "Job não encontrado."})
+                return
+            if job.get("status") in _FINAL_STATUSES:
+                for seq, event, data in _JOB_EVENTS.depois_de(job_id, last_seq):
+                    yield _sse(event, data, seq)
+                yield _sse("result", _job_status_payload(job_id, job))
+                return
+            snapshot = _progress_snapshot(job)
+            if not events and snapshot != last_snapshot:
+                yield _sse("progress", snapshot)
+                last_sent = now
+            last_snapshot = snapshot
+
+        if now - last_sent >= _SSE_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = now
+        await asyncio.sleep(_SSE_POLL_SECONDS)
+
+
+@app.get("/api/process/events/{job_id}")
+async def process_job_events(job_id: str, http_request: Request):
+    """Stream SSE (text/event-stream) do progresso de um job, substituindo o polling de status."""
+    if await run_in_threadpool(_get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    try:
+        last_event_id = int(http_request.headers.get("last-event-id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    return StreamingResponse(
+        _job_event_stream(job_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -1551,18 +3004,35 @@ def cancel_process_job(job_id: str):
             }
         )
 
+    if status == "queued" and _JOB_EXECUTOR.cancelar(job_id):
+        # Ainda na fila: sai sem rodar. Uma retomada na fila devolve o checkpoint ao job
+        resume_from = job.get("resume_from")
+        _discard_upload_prefetch(job["request"]["temp_path"])
+        if not resume_from:
+            shutil.rmtree(job["request"]["temp_path"], ignore_errors=True)
+        _update_job(
+            job_id,
+            cancel_requested=True,
+            status="cancelled",
+            message="Job removido da fila.",
+            checkpoint_execution_id=resume_from,
+        )
+        return JSONResponse(
+            content={"job_id": job_id, "status": "cancelled", "message": "Job removido da fila."}
+        )
+
     _update_job(
         job_id,
         cancel_requested=True,
         status="cancelling",
-        message="Cancelamento solicitado. Finalizando arquivo atual...",
+        message="Cancelamento solicitado. Finalizando página atual...",
     )
 
     return JSONResponse(
         content={
             "job_id": job_id,
             "status": "cancelling",
-            "message": "Cancelamento solicitado. Finalizando arquivo atual...",
+            "message": "Cancelamento solicitado. Finalizando página atual...",
         }
     )
 
@@ -1581,17 +3051,30 @@ def shutdown_webapp():
     )
 
 
-@app.get("/api/download/{filename}")
-def download_file(filename: str):
+@app.get("/api/download/{filename:path}")
+def download_file(filename: str, request: Request):
+    """Serve um arquivo exportado, comprimido (gzip/br) quando o cliente aceita.
+
+    Range (retomada) vale também para a versão comprimida, gravada uma única vez
+    ao lado do arquivo e servida como um arquivo estável, com ETag próprio.
+    """
     file_path = _safe_output_path(filename)
-    if not file_path.exists():
+    if not file_path.is_file():
         raise HTTPException(status_code=404, detail="Arquivo não encontrado.")
 
     media_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+    served_path, headers = file_path, {}
+    if file_path.suffix.lower() in EXTENSOES_COMPRIMIVEIS:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = escolher_codificacao(request.headers.get("accept-encoding"))
+        if encoding:
+            served_path = arquivo_comprimido(file_path, encoding)
+            headers["Content-Encoding"] = encoding
     return FileResponse(
-        path=file_path,
+        path=served_path,
         filename=file_path.name,
         media_type=media_type,
+        headers=headers,
     )
 
 
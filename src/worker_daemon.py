@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Daemon de extração com estado aquecido e cliente para submeter jobs a ele.
+
+O daemon (extratorNotasCorretagem.py --serve) mantém uma ExtractorSession
+aquecida — bibliotecas importadas, mapeamento de tickers compilado e pool de
+workers — e recebe jobs como linhas JSON por um socket Unix (ou pela entrada
+padrão com --socket -). Para cada job são devolvidos, também em linhas JSON,
+os eventos de progresso, opcionalmente os registros extraídos e o resultado.
+
+Job:
+    {"id": "opcional", "path": "/notas", "year": 2024, "ticker": "VALE3",
+     "format": "csv,xlsx", "sort_by": "name", "records": false}
+
+Eventos:
+    {"event": "accepted", "id": ...}
+    {"event": "progress", "id": ..., "stage": ..., "current_file": ..., ...}
+    {"event": "record", "id": ..., "data": {...}}        (apenas com "records": true)
+    {"event": "result", "id": ..., "records_extracted": N, "output_files": [...], "stats_path": ...}
+    {"event": "error", "id": ..., "message": ...}
+
+Uso:
+    python3 src/extratorNotasCorretagem.py --serve [--socket /tmp/extrator.sock] [--workers 4]
+    python3 src/extratorNotasCorretagem.py submit /notas --year 2024 --ticker VALE3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, TextIO
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_SOCKET_PADRAO = os.path.join(
+    tempfile.gettempdir(), f"extrator-notas-{os.getuid() if hasattr(os, 'getuid') else 0}.sock"
+)
+_CAMPOS_JOB = {"id", "path", "year", "ticker", "format", "sort_by", "records"}
+
+Emissor = Callable[[Dict[str, Any]], None]
+
+
+def _validar_job(job: Any) -> Dict[str, Any]:
+    """Confere os campos do job e normaliza year (int) e path (obrigatório)."""
+    if not isinstance(job, dict):
+        raise ValueError("o job deve ser um objeto JSON")
+    desconhecidos = sorted(set(job) - _CAMPOS_JOB)
+    if desconhecidos:
+        raise ValueError(f"campo(s) desconhecido(s): {', '.join(desconhecidos)}")
+    if not job.get("path"):
+        raise ValueError("campo 'path' é obrigatório")
+    if job.get("year") is not None:
+        try:
+            job["year"] = int(job["year"])
+        except (TypeError, ValueError):
+            raise ValueError(f"ano inválido: {job['year']!r}") from None
+    return job
+
+
+def executar_job(job: Dict[str, Any], sessao, emitir: Emissor, should_stop=None) -> Dict[str, Any]:
+    """Executa um job com a sessão informada, enviando os eventos para emitir.
+
+    É o mesmo fluxo da CLI: extrai, filtra pelo ticker e exporta nos formatos pedidos.
+
+    Returns:
+        O evento "result" (também enviado para emitir)
+    """
+    from extratorNotasCorretagem import _filter_dataframe_by_ticker
+
+    identificador = job.get("id")
+
+    def _progresso(evento: Dict[str, Any]) -> None:
+        emitir({"event": "progress", "id": identificador, **evento})
+
+    stats_paths: list = []
+    df = sessao.analisar_pasta_ou_zip(
+        job["path"],
+        year_filter=job.get("year"),
+        sort_by=job.get("sort_by") or "name",
+        progress_callback=_progresso,
+        should_stop=should_stop,
+        stats_output_path=stats_paths,
+        ticker_filter=job.get("ticker"),
+    )
+    df = _filter_dataframe_by_ticker(df, job.get("ticker"))
+
+    if job.get("records") and not df.empty:
+        for registro in df.to_dict(orient="records"):
+            emitir({"event": "record", "id": identificador, "data": registro})
+
+    arquivos = []
+    if not df.empty:
+        formato = job.get("format") or sessao.config.get_output_format()
+        arquivos = sessao.exportar_dados(df, formato, ticker=job.get("ticker"))
+
+    resultado = {
+        "event": "result",
+        "id": identificador,
+        "records_extracted": int(len(df)),
+        "output_files": arquivos,
+        "stats_path": stats_paths[-1] if stats_paths else None,
+    }
+    emitir(resultado)
+    return resultado
+
+
+class _Atendente:
+    """Lê jobs (linhas JSON) de um fluxo e escreve os eventos em outro.
+
+    Os jobs são executados um por vez por daemon (trava compartilhada); o
+    paralelismo fica dentro de cada job, no pool de workers da sessão.
+    """
+
+    def __init__(self, sessao, trava: threading.Lock, saida: TextIO):
+        self.sessao = sessao
+        self.trava = trava
+        self.saida = saida
+        self.desconectado = False
+
+    def emitir(self, evento: Dict[str, Any]) -> None:
+        if self.desconectado:
+            return
+        try:
+            self.saida.write(json.dumps(evento, ensure_ascii=False, default=str) + "\n")
+            self.saida.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError, ValueError):
+            # Cliente foi embora: o job corrente para na próxima página
+            self.desconectado = True
+
+    def atender(self, entrada: TextIO) -> None:
+        for linha in entrada:
+            if self.desconectado:
+                break
+            linha = linha.strip()
+            if not linha:
+                continue
+            identificador = None
+            try:
+                job = _validar_job(json.loads(linha))
+                identificador = job.get("id")
+                self.emitir({"event": "accepted", "id": identificador})
+                with self.trava:
+                    executar_job(job, self.sessao, self.emitir, should_stop=lambda: self.desconectado)
+            except (json.JSONDecodeError, ValueError) as e:
+                self.emitir({"event": "error", "id": identificador, "message": str(e)})
+            except Exception as e:
+                logger.error(f"✗ Erro no job {identificador or ''}: {str(e)}")
+                self.emitir({"event": "error", "id": identificador, "message": str(e)})
+
+
+class _SaidaSocket:
+    """Adapta o wfile binário do socket à interface de texto usada por _Atendente."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, texto: str) -> None:
+        self._wfile.write(texto.encode("utf-8"))
+
+    def flush(self) -> None:
+        self._wfile.flush()
+
+
+class _ServidorUnix(socketserver.ThreadingUnixStreamServer):
+    """Um thread por conexão; os jobs compartilham a sessão e a trava do servidor."""
+
+    daemon_threads = True
+
+    def __init__(self, caminho_socket: str, sessao):
+        self.sessao = sessao
+        self.trava = threading.Lock()
+        super().__init__(caminho_socket, _AtendenteSocket)
+
+
+class _AtendenteSocket(socketserver.StreamRequestHandler):
+    def handle(self):
+        entrada = (linha.decode("utf-8") for linha in self.rfile)
+        _Atendente(self.server.sessao, self.server.trava, _SaidaSocket(self.wfile)).atender(entrada)
+
+
+def criar_servidor(caminho_socket: str, sessao) -> _ServidorUnix:
+    """Cria o servidor no socket Unix (removendo um socket órfão) sem começar a atender.
+
+    Raises:
+        OSError: já existe um daemon ativo no socket
+    """
+    if os.path.exists(caminho_socket):
+        if _daemon_ativo(caminho_socket):
+            raise OSError(f"já existe um daemon ativo em {caminho_socket}")
+        os.remove(caminho_socket)  # socket órfão de um daemon encerrado
+    servidor = _ServidorUnix(caminho_socket, sessao)
+    os.chmod(caminho_socket, 0o600)
+    return servidor
+
+
+def servir(caminho_socket: Optional[str] = None, sessao=None) -> int:
+    """Roda o daemon até Ctrl+C.
+
+    Args:
+        caminho_socket: Socket Unix onde os jobs são recebidos (None = CAMINHO_SOCKET_PADRAO);
+            "-" lê os jobs da entrada padrão e escreve os eventos na saída padrão
+        sessao: ExtractorSession a reutilizar (padrão: sessao_padrao())
+    """
+    from extratorNotasCorretagem import sessao_padrao
+
+    sessao = (sessao or sessao_padrao()).aquecer()
+
+    if caminho_socket == "-":
+        logger.info("🔌 Daemon lendo jobs da entrada padrão (uma linha JSON por job)")
+        _Atendente(sessao, threading.Lock(), sys.stdout).atender(sys.stdin)
+        return 0
+
+    caminho_socket = caminho_socket or CAMINHO_SOCKET_PADRAO
+    try:
+        servidor = criar_servidor(caminho_socket, sessao)
+    except OSError as e:
+        logger.error(f"✗ Não foi possível iniciar o daemon: {str(e)}")
+        return 1
+    logger.info(f"🔌 Daemon aguardando jobs em {caminho_socket} (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("⏹️  Encerrando daemon...")
+    finally:
+        servidor.server_close()
+        sessao.fechar()
+        if os.path.exists(caminho_socket):
+            os.remove(caminho_socket)
+    return 0
+
+
+def _daemon_ativo(caminho_socket: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+            conexao.connect(caminho_socket)
+        return True
+    except OSError:
+        return False
+
+
+def enviar_job(
+    job: Dict[str, Any],
+    caminho_socket: str = CAMINHO_SOCKET_PADRAO,
+    ao_receber: Optional[Emissor] = None,
+    fallback: bool = True,
+) -> Dict[str, Any]:
+    """Envia o job ao daemon e devolve o evento final ("result" ou "error").
+
+    Sem daemon no socket (e com fallback), o job roda no próprio processo com a
+    sessão padrão, produzindo os mesmos eventos.
+
+    Raises:
+        ConnectionError: sem daemon disponível e fallback=False
+    """
+    job = _validar_job(dict(job))
+    job["path"] = os.path.abspath(job["path"])  # o daemon pode ter outro diretório de trabalho
+    ao_receber = ao_receber or (lambda _evento: None)
+
+    try:
+        conexao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conexao.connect(caminho_socket)
+    except OSError as e:
+        conexao.close()
+        if not fallback:
+            raise ConnectionError(f"nenhum daemon em {caminho_socket}: {e}") from e
+        return _executar_localmente(job, ao_receber)
+
+    with conexao, conexao.makefile("rwb") as fluxo:
+        fluxo.write((json.dumps(job, ensure_ascii=False) + "\n").encode("utf-8"))
+        fluxo.flush()
+        conexao.shutdown(socket.SHUT_WR)
+        for linha in fluxo:
+            evento = json.loads(linha)
+            ao_receber(evento)
+            if evento.get("event") in ("result", "error"):
+                return evento
+    return {"event": "error", "id": job.get("id"), "message": "daemon encerrou a conexão sem resultado"}
+
+
+def _executar_localmente(job: Dict[str, Any], ao_receber: Emissor) -> Dict[str, Any]:
+    from extratorNotasCorretagem import inicializar, sessao_padrao
+
+    logger.info("ℹ️  Nenhum daemon ativo: executando o job neste processo")
+    inicializar()
+    ao_receber({"event": "accepted", "id": job.get("id")})
+    try:
+        return executar_job(job, sessao_padrao(), ao_receber)
+    except Exception as e:
+        evento = {"event": "error", "id": job.get("id"), "message": str(e)}
+        ao_receber(evento)
+        return evento
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Cliente: submit <caminho> [--year] [--ticker] [--format] — imprime os eventos em JSON."""
+    parser = argparse.ArgumentParser(
+        prog="submit",
+        description="Envia um job ao daemon de extração (--serve) ou o executa localmente se não houver daemon.",
+    )
+    parser.add_argument("path", help="Pasta, PDF ou ZIP a processar")
+    parser.add_argument("--year", "-y", type=int, default=None, help="Filtra por ano")
+    parser.add_argument("--ticker", "-t", default=None, help="Filtra por ticker")
+    parser.add_argument("--format", "-f", dest="output_format", default=None, help="Formato(s) de saída")
+    parser.add_argument("--sort-by", "-s", choices=["name", "mtime", "ctime"], default="name")
+    parser.add_argument("--socket", default=CAMINHO_SOCKET_PADRAO, help="Socket Unix do daemon")
+    parser.add_argument("--records", action="store_true", help="Recebe também os registros extraídos")
+    parser.add_argument(
+        "--no-fallback", action="store_true", help="Falha se não houver daemon, em vez de executar localmente"
+    )
+    args = parser.parse_args(argv)
+
+    job = {
+        "path": args.path,
+        "year": args.year,
+        "ticker": args.ticker,
+        "format": args.output_format,
+        "sort_by": args.sort_by,
+        "records": args.records,
+    }
+
+    def _imprimir(evento: Dict[str, Any]) -> None:
+        print(json.dumps(evento, ensure_ascii=False, default=str), flush=True)
+
+    try:
+        final = enviar_job(job, args.socket, _imprimir, fallback=not args.no_fallback)
+    except (ConnectionError, ValueError) as e:
+        print(json.dumps({"event": "error", "message": str(e)}, ensure_ascii=False), file=sys.stderr)
+        return 1
+    return 0 if final.get("event") == "result" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
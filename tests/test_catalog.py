@@ -0,0 +1,189 @@
+"""
+Testes para o catálogo de notas (catalog.py) e seu uso na execução principal
+"""
+
+import json
+import os
+import re
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import catalog as catalog_module
+import extratorNotasCorretagem as extrator_module
+from catalog import (
+    carregar_catalogo,
+    construir_catalogo,
+    converter_data,
+    selecionar_tarefas,
+)
+from extratorNotasCorretagem import _listar_tarefas, analisar_pasta_ou_zip
+
+
+def _pdf(nota, data, extra=b""):
+    """Conteúdo de um PDF simulado: o cabeçalho vai no próprio conteúdo."""
+    return b"%PDF CLEAR CORRETORA Nr. nota Folha Data preg\xc3\xa3o\n" + (
+        f"{nota} 1 {data}".encode() + extra
+    )
+
+
+class _FakePage:
+    def __init__(self, texto):
+        self._texto = texto
+
+    def extract_text(self):
+        return self._texto
+
+
+class _FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _abrir_fake(pdf_file, *args, **kwargs):
+    conteudo = pdf_file.read() if hasattr(pdf_file, "read") else Path(pdf_file).read_bytes()
+    texto = conteudo.decode("utf-8", errors="ignore")
+    # Cada "||" separa uma página
+    return _FakePdf([_FakePage(pagina) for pagina in texto.split("||")])
+
+
+@pytest.fixture
+def entrada(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    stats.mkdir()
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setattr(extrator_module.pdfplumber, "open", _abrir_fake)
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    (pasta / "marco.pdf").write_bytes(_pdf("300", "15/03/2024"))
+    (pasta / "janeiro.pdf").write_bytes(_pdf("100", "05/01/2024", b"||Nr. nota Folha Data preg\xc3\xa3o\n101 1 08/01/2024"))
+    (pasta / "protegido.pdf").write_bytes(_pdf("200", "20/02/2024", b" /Encrypt"))
+    with zipfile.ZipFile(pasta / "notas.zip", "w") as z:
+        z.writestr("copia_marco.pdf", _pdf("300", "15/03/2024"))
+        z.writestr("fevereiro.pdf", _pdf("150", "10/02/2024"))
+    return pasta, stats
+
+
+class TestConstruirCatalogo:
+    """Testes da varredura só de cabeçalhos e do índice SQLite"""
+
+    def test_indexes_loose_files_and_zip_entries(self, entrada):
+        pasta, stats = entrada
+
+        resumo = construir_catalogo(str(pasta))
+
+        assert resumo["catalog"] == str(stats / "catalogo.sqlite")
+        assert (resumo["notes"], resumo["scanned"], resumo["duplicates"], resumo["encrypted"]) == (5, 5, 1, 1)
+        notas = {os.path.basename(origem): linha for origem, linha in carregar_catalogo().items()}
+        janeiro = notas["janeiro.pdf"]
+        assert janeiro["paginas"] == 2
+        assert janeiro["data_pregao"] == "2024-01-05"
+        assert janeiro["datas_pregao"] == "2024-01-05,2024-01-08"
+        assert janeiro["numeros_nota"] == "100,101"
+        assert janeiro["corretora"] == "Clear"
+        assert len(janeiro["hash_conteudo"]) == 64
+        assert notas["protegido.pdf"]["criptografado"] == 1
+        # A cópia dentro do ZIP aponta para o PDF solto
+        copia = notas["notas.zip::copia_marco.pdf"]
+        assert copia["entrada_zip"] == "copia_marco.pdf"
+        assert copia["duplicado_de"] == str(pasta / "marco.pdf")
+        assert notas["marco.pdf"]["duplicado_de"] is None
+
+    def test_rebuild_only_rescans_changed_files(self, entrada):
+        pasta, _ = entrada
+        construir_catalogo(str(pasta))
+
+        assert construir_catalogo(str(pasta))["scanned"] == 0
+
+        (pasta / "marco.pdf").write_bytes(_pdf("301", "16/03/2024"))
+        os.utime(pasta / "marco.pdf", (1, 1))
+        (pasta / "protegido.pdf").unlink()
+        resumo = construir_catalogo(str(pasta))
+
+        assert (resumo["scanned"], resumo["removed"], resumo["duplicates"]) == (1, 1, 0)
+        notas = {os.path.basename(origem): linha for origem, linha in carregar_catalogo().items()}
+        assert notas["marco.pdf"]["data_pregao"] == "2024-03-16"
+        assert "protegido.pdf" not in notas
+
+
+class TestSelecionarTarefas:
+    """Testes da seleção por data do pregão e do descarte de duplicatas"""
+
+    def test_date_range_uses_any_trade_date_and_skips_duplicates(self, entrada):
+        pasta, _ = entrada
+        construir_catalogo(str(pasta))
+        tarefas, _ = _listar_tarefas(str(pasta))
+
+        selecionadas, fora, duplicatas = selecionar_tarefas(
+            tarefas, carregar_catalogo(), "2024-01-06", "2024-03-31"
+        )
+
+        assert sorted(t["_name"] for t in selecionadas) == [
+            "fevereiro.pdf", "janeiro.pdf", "marco.pdf", "protegido.pdf"
+        ]
+        assert (fora, duplicatas) == (0, 1)
+
+    def test_duplicate_is_kept_when_original_is_not_selected(self, entrada):
+        pasta, _ = entrada
+        construir_catalogo(str(pasta))
+        tarefas = [t for t in _listar_tarefas(str(pasta))[0] if t["_name"] == "copia_marco.pdf"]
+
+        selecionadas, _, duplicatas = selecionar_tarefas(tarefas, carregar_catalogo())
+
+        assert [t["_name"] for t in selecionadas] == ["copia_marco.pdf"]
+        assert duplicatas == 0
+
+    def test_converter_data_accepts_both_formats(self):
+        assert converter_data("05/01/2024") == converter_data("2024-01-05") == "2024-01-05"
+        with pytest.raises(ValueError):
+            converter_data("2024/01/05")
+
+
+def test_main_run_selects_by_trade_date_and_sorts(entrada, monkeypatch):
+    pasta, stats = entrada
+    lidos = []
+
+    def _fake_processar_pdf(pdf_file, metrics_collector=None, **_opcoes):
+        nome = getattr(pdf_file, "name", None) or Path(str(pdf_file)).name
+        lidos.append(os.path.basename(nome))
+        return [{"Data": "01/01/2024", "Ticker": "VALE3"}]
+
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf)
+    )
+    stats_paths = []
+
+    analisar_pasta_ou_zip(
+        str(pasta),
+        sort_by="trade_date",
+        date_from="01/02/2024",
+        stats_output_path=stats_paths,
+    )
+
+    assert lidos == ["fevereiro.pdf", "protegido.pdf", "marco.pdf"]
+    estatisticas = json.loads(Path(stats_paths[-1]).read_text(encoding="utf-8"))
+    assert estatisticas["catalog"]["ignored_by_date"] == 1
+    assert estatisticas["catalog"]["duplicates_skipped"] == 1
+    assert estatisticas["catalog"]["date_from"] == "2024-02-01"
+
+
+def test_catalog_command_lists_notes(entrada, capsys):
+    pasta, stats = entrada
+
+    assert catalog_module.main([str(pasta), "--list"]) == 0
+
+    linhas = capsys.readouterr().out.strip().splitlines()
+    assert [linha.split("\t")[0] for linha in linhas] == [
+        "2024-01-05", "2024-02-10", "2024-02-20", "2024-03-15", "2024-03-15"
+    ]
+    assert any(re.search(r"duplicata de .*marco\.pdf", linha) for linha in linhas)
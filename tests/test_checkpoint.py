@@ -0,0 +1,102 @@
+"""
+Testes para o checkpoint de execuções interrompidas e a retomada (--resume)
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import analisar_pasta_ou_zip, caminho_checkpoint, carregar_checkpoint
+
+PAGINAS_POR_ARQUIVO = 3
+
+
+def _fake_processar_pdf(
+    pdf_file, senha=None, metrics_collector=None, should_stop=None, pagina_inicial=1
+):
+    """Simula um PDF de 3 páginas (1 registro por página) que respeita should_stop por página."""
+    nome = Path(str(pdf_file)).name
+    dados = []
+    metricas = {"file_name": nome, "status": "success", "page_count": PAGINAS_POR_ARQUIVO}
+    for pagina in range(pagina_inicial, PAGINAS_POR_ARQUIVO + 1):
+        if should_stop is not None and should_stop():
+            metricas.update(status="cancelled", pages_completed=pagina - 1)
+            break
+        _fake_processar_pdf.paginas_lidas.append((nome, pagina))
+        dados.append({"Data": "05/01/2024", "Ticker": "VALE3", "Chave": f"{nome}-{pagina}"})
+    if metrics_collector is not None:
+        metrics_collector.append(metricas)
+    return dados
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    stats.mkdir()
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    for nome in ("a.pdf", "b.pdf", "c.pdf"):
+        (pasta / nome).write_bytes(b"%PDF")
+    _fake_processar_pdf.paginas_lidas = []
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf)
+    )
+    return pasta, stats
+
+
+def _execution_id(stats_paths):
+    return Path(stats_paths[-1]).stem.replace("execucao_", "", 1)
+
+
+def test_cancel_mid_file_writes_checkpoint(ambiente):
+    pasta, _ = ambiente
+    stats_paths = []
+
+    # Cancela depois de 4 páginas lidas: a.pdf completo e b.pdf na página 1
+    df = analisar_pasta_ou_zip(
+        str(pasta),
+        should_stop=lambda: len(_fake_processar_pdf.paginas_lidas) >= 4,
+        stats_output_path=stats_paths,
+    )
+
+    assert list(df["Chave"]) == ["a.pdf-1", "a.pdf-2", "a.pdf-3", "b.pdf-1"]
+    estatisticas = json.loads(Path(stats_paths[-1]).read_text(encoding="utf-8"))
+    assert estatisticas["status"] == "cancelled"
+    checkpoint = carregar_checkpoint(_execution_id(stats_paths))
+    assert list(checkpoint["completed"]) == ["a.pdf"]
+    assert checkpoint["partial"]["b.pdf"]["pages_completed"] == 1
+    assert estatisticas["checkpoint"] == caminho_checkpoint(_execution_id(stats_paths))
+
+
+def test_resume_continues_from_next_page_and_matches_full_run(ambiente):
+    pasta, _ = ambiente
+    completo = list(analisar_pasta_ou_zip(str(pasta))["Chave"])
+    _fake_processar_pdf.paginas_lidas = []
+    stats_paths = []
+    analisar_pasta_ou_zip(
+        str(pasta),
+        should_stop=lambda: len(_fake_processar_pdf.paginas_lidas) >= 4,
+        stats_output_path=stats_paths,
+    )
+    execution_id = _execution_id(stats_paths)
+    _fake_processar_pdf.paginas_lidas = []
+
+    retomado = analisar_pasta_ou_zip(str(pasta), resume_from=execution_id)
+
+    assert list(retomado["Chave"]) == completo
+    assert _fake_processar_pdf.paginas_lidas == [
+        ("b.pdf", 2), ("b.pdf", 3), ("c.pdf", 1), ("c.pdf", 2), ("c.pdf", 3)
+    ]
+    assert carregar_checkpoint(execution_id) is None
+
+
+def test_resume_with_unknown_checkpoint_returns_empty(ambiente):
+    pasta, _ = ambiente
+
+    assert analisar_pasta_ou_zip(str(pasta), resume_from="inexistente").empty
@@ -208,3 +208,85 @@ class TestExportFormats:
         
         for fmt in formats:
             assert fmt in formats, f"Formato {fmt} não suportado"
+
+
+@pytest.fixture
+def extrator(tmp_path, monkeypatch):
+    """Módulo principal com a pasta de saída redirecionada para tmp_path"""
+    import extratorNotasCorretagem as extrator_module
+
+    monkeypatch.setitem(extrator_module.config.configs, "output.folder", str(tmp_path))
+    return extrator_module
+
+
+class TestXLSXStreamingExport:
+    """Testa a exportação XLSX em modo write-only feita por exportar_dados"""
+
+    def _exportar_xlsx(self, extrator, df, tmp_path):
+        arquivos = extrator.exportar_dados(df, "xlsx")
+        assert arquivos == [str(p) for p in tmp_path.glob("dados_extraidos_*.xlsx")]
+        return arquivos[0]
+
+    def test_numbers_are_native_excel_values(self, extrator, sample_dataframe, tmp_path):
+        """Preço e Quantidade devem ser gravados como números, não como texto com vírgula"""
+        from openpyxl import load_workbook
+
+        xlsx_path = self._exportar_xlsx(extrator, sample_dataframe, tmp_path)
+        workbook = load_workbook(xlsx_path)
+
+        for sheet in ["Dados", "Árvore"]:
+            rows = list(workbook[sheet].iter_rows(min_row=2))
+            header = [cell.value for cell in next(workbook[sheet].iter_rows(max_row=1))]
+            preco = rows[0][header.index("Preço")]
+            quantidade = rows[0][header.index("Quantidade")]
+            assert isinstance(preco.value, float)
+            assert preco.number_format == "#,##0.00"
+            assert isinstance(quantidade.value, int)
+
+    def test_tree_sheet_matches_criar_aba_arvore(self, extrator, sample_dataframe, tmp_path):
+        """A aba Árvore gerada em streaming deve ter o mesmo layout de criar_aba_arvore"""
+        xlsx_path = self._exportar_xlsx(extrator, sample_dataframe, tmp_path)
+
+        df_xlsx = pd.read_excel(xlsx_path, sheet_name="Árvore", dtype=str).fillna("")
+        esperado = extrator.criar_aba_arvore(extrator.ordenar_dados_por_data(sample_dataframe))
+
+        assert list(df_xlsx.columns) == list(esperado.columns)
+        for coluna in ["Ano", "Mes", "Dia", "Data", "Ticker"]:
+            assert list(df_xlsx[coluna]) == [str(v) for v in esperado[coluna]]
+
+
+class TestMultiFormatExport:
+    """Testa a exportação de vários formatos em uma única chamada de exportar_dados"""
+
+    def test_exports_all_requested_formats_with_same_timestamp(self, extrator, sample_dataframe, tmp_path):
+        """Cada formato gera um arquivo e os caminhos são retornados na ordem pedida"""
+        arquivos = extrator.exportar_dados(sample_dataframe, "csv, xlsx,json")
+
+        assert [Path(a).suffix for a in arquivos] == [".csv", ".xlsx", ".json"]
+        assert len({Path(a).stem for a in arquivos}) == 1
+        for arquivo in arquivos:
+            assert Path(arquivo).parent == tmp_path
+            assert Path(arquivo).exists()
+
+    def test_all_formats_are_sorted_by_date(self, extrator, sample_unsorted_dataframe):
+        """A ordenação compartilhada vale para todos os formatos"""
+        csv_path, json_path = extrator.exportar_dados(sample_unsorted_dataframe, ["csv", "json"])
+
+        datas_csv = list(pd.read_csv(csv_path, dtype=str)["Data"])
+        with open(json_path, "r", encoding="utf-8") as f:
+            datas_json = [registro["Data"] for registro in json.load(f)]
+
+        assert datas_csv == datas_json == ["03/10/2018", "03/10/2018", "04/10/2018", "23/11/2018"]
+
+    def test_parquet_export(self, extrator, sample_dataframe):
+        """Parquet é suportado quando pyarrow está instalado"""
+        pytest.importorskip("pyarrow")
+
+        (arquivo,) = extrator.exportar_dados(sample_dataframe, "parquet")
+
+        assert len(pd.read_parquet(arquivo)) == len(sample_dataframe)
+
+    def test_unsupported_format_exports_nothing(self, extrator, sample_dataframe, tmp_path):
+        """Formato desconhecido na lista cancela a exportação"""
+        assert extrator.exportar_dados(sample_dataframe, "csv,pdf") == []
+        assert list(tmp_path.iterdir()) == []
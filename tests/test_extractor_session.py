@@ -0,0 +1,220 @@
+"""
+Testes para a ExtractorSession (estado reaproveitado entre arquivos e execuções)
+"""
+
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import (
+    ExtractorSession,
+    _extract_ticker_from_cells,
+    sessao_padrao,
+)
+
+PAGE_TEXT = (
+    "NOTA DE NEGOCIAÇÃO\n"
+    "Nr. nota Folha Data pregão\n"
+    "12.345 {folha} 04/05/2021\n"
+    "1-BOVESPA C VISTA VALE ON NM 100 30,00 3.000,00 D\n"
+)
+
+
+class _FakeConfig:
+    """ConfigManager mínimo que conta as leituras do mapeamento."""
+
+    def __init__(self, mapping=None, senha=""):
+        self.mapping = dict(mapping or {})
+        self.senha = senha
+        self.leituras_mapeamento = 0
+
+    def get_ticker_mapping(self):
+        self.leituras_mapeamento += 1
+        return dict(self.mapping)
+
+    def get_pdf_password(self):
+        return self.senha
+
+
+class _FakePage:
+    def __init__(self, text, paginas_lidas):
+        self._text = text
+        self._paginas_lidas = paginas_lidas
+
+    def extract_text(self):
+        self._paginas_lidas.append(self)
+        return self._text
+
+    def extract_tables(self):
+        return []
+
+
+class _FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def paginas_lidas(monkeypatch):
+    lidas = []
+    paginas = [_FakePage(PAGE_TEXT.format(folha=folha), lidas) for folha in (1, 2, 3)]
+    monkeypatch.setattr(extrator_module.pdfplumber, "open", lambda *args, **kwargs: _FakePdf(paginas))
+    return lidas
+
+
+class TestTickerMapping:
+    """Testes do mapeamento de tickers compilado pela sessão"""
+
+    def test_mapping_is_loaded_once_for_many_files(self, paginas_lidas):
+        fake_config = _FakeConfig({"VALE ON NM": "VALE3"})
+        sessao = ExtractorSession(fake_config)
+
+        for _ in range(3):
+            dados = sessao.processar_pdf("nota.pdf")
+
+        assert fake_config.leituras_mapeamento == 1
+        assert {op["Ticker"] for op in dados} == {"VALE3"}
+
+    def test_atualizar_mapeamento_recompiles_only_when_changed(self):
+        fake_config = _FakeConfig({"VALE ON NM": "VALE3"})
+        sessao = ExtractorSession(fake_config).aquecer()
+        compilado = sessao.ticker_mapping
+
+        assert sessao.atualizar_mapeamento() is False
+        assert sessao.ticker_mapping is compilado
+        fake_config.mapping["SUZANO PAPEL ON NM"] = "SUZB3"
+        assert sessao.atualizar_mapeamento() is True
+        assert _extract_ticker_from_cells(["SUZANO PAPEL ON NM"], sessao.ticker_mapping) == "SUZB3"
+
+    @pytest.mark.parametrize(
+        "celula",
+        ["VALE ON NM", "PETROBRAS PN EJ N2", "BRASKEN PNA", "SUZANO PAPEL ON", "ITAUSA PN N1", "XYZ", "PETR4"],
+    )
+    def test_compiled_mapping_matches_plain_dictionary(self, celula):
+        mapping = {"VALE ON NM": "VALE3", "PETROBRAS PN": "PETR4", "PETROBRAS PN EJ N2": "PETR4",
+                   "SUZANO PAPEL ON NM": "SUZB3"}
+        sessao = ExtractorSession(_FakeConfig(mapping))
+
+        for ticker_mapping in (mapping, None):
+            assert _extract_ticker_from_cells([celula], ticker_mapping) == _extract_ticker_from_cells(
+                [celula], extrator_module._MapeamentoTickers(ticker_mapping)
+            )
+        assert _extract_ticker_from_cells([celula], sessao.ticker_mapping) == _extract_ticker_from_cells(
+            [celula], mapping
+        )
+
+
+class TestSessionState:
+    """Testes do cancelamento, da senha em cache e do metrics_sink"""
+
+    def test_cancelar_stops_running_call_and_next_call_runs_normally(self, paginas_lidas):
+        sessao = ExtractorSession(_FakeConfig())
+        metricas = []
+
+        def _cancelar_apos_primeira_pagina():
+            # Simula outro thread (ex.: endpoint de cancelamento) sinalizando a sessão
+            if paginas_lidas:
+                sessao.cancelar()
+            return False
+
+        sessao.processar_pdf(
+            "nota.pdf", metrics_collector=metricas, should_stop=_cancelar_apos_primeira_pagina
+        )
+
+        assert len(paginas_lidas) == 1
+        assert metricas[0]["status"] == "cancelled"
+
+        # O cancelamento vale só para a chamada em andamento: a sessão continua reutilizável
+        paginas_lidas.clear()
+        sessao.cancelar()
+        sessao.processar_pdf("nota.pdf", metrics_collector=metricas)
+        assert len(paginas_lidas) == 3
+        assert metricas[1]["status"] != "cancelled"
+        assert sessao._cancelamentos == set()
+
+    def test_password_that_worked_is_tried_first(self, monkeypatch):
+        tentativas = []
+
+        def _abrir(pdf_file, password=None):
+            tentativas.append(password)
+            if password != "segredo":
+                raise extrator_module.pdfplumber.utils.exceptions.PdfminerException("protegido")
+            return _FakePdf([])
+
+        monkeypatch.setattr(extrator_module.pdfplumber, "open", _abrir)
+        sessao = ExtractorSession(_FakeConfig(senha="segredo"))
+
+        sessao.processar_pdf("a.pdf")
+        sessao.processar_pdf("b.pdf")
+
+        assert tentativas == [None, "segredo", "segredo"]
+
+    def test_metrics_sink_receives_each_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(extrator_module, "stats_folder", str(tmp_path))
+        pasta = tmp_path / "entrada"
+        pasta.mkdir()
+        for nome in ("a.pdf", "b.pdf"):
+            (pasta / nome).write_bytes(b"%PDF")
+
+        def _fake_processar_pdf(pdf_file, metrics_collector=None, **_opcoes):
+            metrics_collector.append({"file_name": Path(pdf_file).name, "status": "success"})
+            return []
+
+        monkeypatch.setattr(ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf))
+        recebidas = []
+
+        ExtractorSession(metrics_sink=recebidas.append).analisar_pasta_ou_zip(str(pasta))
+
+        assert [m["file_name"] for m in recebidas] == ["a.pdf", "b.pdf"]
+
+    def test_progress_callback_receives_page_ticks(self, paginas_lidas, tmp_path, monkeypatch):
+        monkeypatch.setattr(extrator_module, "stats_folder", str(tmp_path))
+        pasta = tmp_path / "entrada"
+        pasta.mkdir()
+        (pasta / "nota.pdf").write_bytes(b"%PDF")
+        eventos = []
+
+        ExtractorSession(_FakeConfig({"VALE ON NM": "VALE3"})).analisar_pasta_ou_zip(
+            str(pasta), progress_callback=eventos.append
+        )
+
+        assert [evento["stage"] for evento in eventos] == [
+            "started", "processing", "page", "page", "page", "processed", "finished"
+        ]
+        paginas = [evento for evento in eventos if evento["stage"] == "page"]
+        assert [(p["page_number"], p["page_count"]) for p in paginas] == [(1, 3), (2, 3), (3, 3)]
+        assert paginas[0]["current_file"] == "nota.pdf"
+        assert paginas[0]["records_extracted"] == 1
+
+    def test_pickled_session_keeps_mapping_and_drops_process_local_state(self):
+        sessao = ExtractorSession(_FakeConfig({"VALE ON NM": "VALE3"}), metrics_sink=print).aquecer()
+        sessao.cancelar()
+
+        copia = pickle.loads(pickle.dumps(sessao))
+
+        assert copia.ticker_mapping.ticker_mapping == {"VALE ON NM": "VALE3"}
+        assert copia.metrics_sink is None
+        assert copia._cancelamentos == set()
+
+
+def test_module_functions_delegate_to_default_session(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(
+        ExtractorSession, "processar_pdf", lambda self, pdf_file, **opcoes: chamadas.append(self) or []
+    )
+
+    extrator_module.processar_pdf("nota.pdf")
+
+    assert chamadas == [sessao_padrao()]
+    assert sessao_padrao() is sessao_padrao()
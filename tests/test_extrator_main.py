@@ -13,6 +13,7 @@ Cobertura:
 """
 
 import pytest
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
@@ -31,9 +32,41 @@ from extratorNotasCorretagem import (
     _is_likely_header,
     _extract_operations_from_text,
     ordenar_dados_por_data,
+    primeiras_por_data,
     criar_aba_arvore,
     DE_PARA_TICKERS,
+    _extract_note_header,
+    _build_operation_key,
+    processar_pdf,
 )
+import extratorNotasCorretagem as extrator_module
+
+
+class _FakePage:
+    """Página fake com a interface mínima usada por processar_pdf."""
+
+    def __init__(self, text, tables=None):
+        self._text = text
+        self._tables = tables or []
+
+    def extract_text(self):
+        return self._text
+
+    def extract_tables(self):
+        return self._tables
+
+
+class _FakePdf:
+    """PDF fake (context manager) com uma lista de páginas."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
 
 
 class TestNormalizeNumber:
@@ -334,6 +367,20 @@ class TestOrdenarDadosPorData:
         if len(first_two_tickers) >= 2:
             assert first_two_tickers[0] < first_two_tickers[1]  # Alfabético
 
+    def test_primeiras_por_data_matches_full_sort_head(self):
+        """A prévia por seleção parcial é igual às primeiras linhas da ordenação completa."""
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({
+            "Data": [f"{dia:02d}/05/2024" for dia in rng.integers(1, 6, 300)],
+            "Ticker": rng.choice(["VALE3", "PETR3", "NEOE3", None], 300),
+            "Quantidade": np.arange(300),
+        })
+        df.loc[[3, 50], "Data"] = None
+
+        for quantidade in (0, 1, 17, 299, 300, 400):
+            esperado = ordenar_dados_por_data(df).head(quantidade).reset_index(drop=True)
+            pd.testing.assert_frame_equal(primeiras_por_data(df, quantidade), esperado)
+
 
 class TestCriarAbaArvore:
     """Testes para criação da estrutura de árvore."""
@@ -401,6 +448,51 @@ class TestCriarAbaArvore:
             assert col in df_tree.columns
 
 
+class TestPosProcessamentoVetorizado:
+    """Testes da ordenação/árvore vetorizadas (uma única conversão da coluna Data)."""
+
+    def test_order_keeps_original_date_strings_and_input(self):
+        """A ordenação não converte Data de volta para texto nem altera o DataFrame original."""
+        df = pd.DataFrame({
+            "Data": ["10/05/2024", "04/05/2024", None, "04/05/2024"],
+            "Ticker": ["VALE3", "PETR3", "ITSA4", "ABEV3"],
+            "Operação": ["C", "V", "C", "C"],
+            "Quantidade": ["100", "50", "1", "2"],
+            "Preço": ["24.50", "28.00", "9.00", "12.00"],
+        })
+        original = df.copy()
+
+        df_sorted = ordenar_dados_por_data(df)
+
+        assert list(df_sorted["Ticker"]) == ["ABEV3", "PETR3", "VALE3", "ITSA4"]
+        assert df_sorted["Data"].iloc[0] == "04/05/2024"
+        pd.testing.assert_frame_equal(df, original)
+
+    def test_tree_marks_only_period_changes(self):
+        """Ano/Mês/Dia são preenchidos apenas quando o respectivo período muda."""
+        df = pd.DataFrame({
+            "Data": ["30/12/2023", "02/01/2024", "02/01/2024", "15/01/2024", "01/02/2024"],
+            "Ticker": ["VALE3", "PETR3", "VALE3", "PETR3", "ITSA4"],
+            "Operação": ["C"] * 5,
+            "Quantidade": ["1"] * 5,
+            "Preço": ["1.00"] * 5,
+        })
+
+        df_tree = criar_aba_arvore(df)
+
+        assert list(df_tree["Ano"]) == ["2023", "2024", "", "", ""]
+        assert list(df_tree["Mes"]) == ["12", "01", "", "", "02"]
+        assert list(df_tree["Dia"]) == ["30", "02", "", "15", "01"]
+
+    def test_filter_by_ticker_normalizes_values(self):
+        """Filtro de ticker ignora caixa e espaços nos valores e no alvo."""
+        df = pd.DataFrame({"Ticker": ["pssa3", " PSSA 3", "VALE3", None], "Quantidade": [1, 2, 3, 4]})
+
+        filtered = _filter_dataframe_by_ticker(df, "Pssa3 ")
+
+        assert list(filtered["Quantidade"]) == [1, 2]
+
+
 class TestIntegration:
     """Testes de integração entre múltiplas funções."""
 
@@ -581,3 +673,84 @@ class TestTextFallbackDeduplication:
         assert "22.08" in precos
         assert "22.15" in precos
 
+
+
+class TestOperationKey:
+    """Testes da chave natural por operação (nota + folha + linha)."""
+
+    PAGE_TEXT = (
+        "NOTA DE NEGOCIAÇÃO\n"
+        "Nr. nota Folha Data pregão\n"
+        "12.345 2 04/05/2021\n"
+        "1-BOVESPA C VISTA VALE ON NM 100 30,00 3.000,00 D\n"
+        "1-BOVESPA C VISTA VALE ON NM 100 30,00 3.000,00 D\n"
+    )
+
+    def test_extract_note_header(self):
+        """Número da nota e folha vêm da linha abaixo do cabeçalho."""
+        assert _extract_note_header(self.PAGE_TEXT) == ("12345", "2")
+
+    def test_extract_note_header_missing(self):
+        """Sem cabeçalho, retorna strings vazias."""
+        assert _extract_note_header("sem cabeçalho") == ("", "")
+
+    def test_build_operation_key(self):
+        """Chave usa a data ISO compacta, nota, folha e linha."""
+        assert _build_operation_key("04/05/2021", "12345", "2", 3) == "20210504-12345-2-3"
+
+    def test_processar_pdf_emits_stable_unique_keys(self, monkeypatch):
+        """Operações idênticas na mesma nota recebem chaves distintas e estáveis entre execuções."""
+        monkeypatch.setattr(
+            extrator_module.pdfplumber,
+            "open",
+            lambda *args, **kwargs: _FakePdf([_FakePage(self.PAGE_TEXT)]),
+        )
+
+        primeira = processar_pdf("nota.pdf")
+        segunda = processar_pdf("nota.pdf")
+
+        assert [op["Chave"] for op in primeira] == ["20210504-12345-2-1", "20210504-12345-2-2"]
+        assert [op["Chave"] for op in primeira] == [op["Chave"] for op in segunda]
+        assert primeira[0]["Nota"] == "12345"
+        assert primeira[0]["Folha"] == "2"
+        assert [op["Linha"] for op in primeira] == [1, 2]
+
+
+class TestPageCancellation:
+    """Testes do cancelamento por página e da retomada a partir de uma página."""
+
+    PAGE_TEXT = TestOperationKey.PAGE_TEXT.replace("12.345 2", "12.345 {folha}")
+
+    def _pdf(self, monkeypatch, paginas_lidas):
+        class _PaginaContada(_FakePage):
+            def extract_text(self):
+                paginas_lidas.append(self)
+                return super().extract_text()
+
+        paginas = [_PaginaContada(self.PAGE_TEXT.format(folha=folha)) for folha in (1, 2, 3)]
+        monkeypatch.setattr(
+            extrator_module.pdfplumber, "open", lambda *args, **kwargs: _FakePdf(paginas)
+        )
+
+    def test_should_stop_is_checked_before_each_page(self, monkeypatch):
+        paginas_lidas = []
+        self._pdf(monkeypatch, paginas_lidas)
+        metricas = []
+
+        dados = processar_pdf(
+            "nota.pdf", metrics_collector=metricas, should_stop=lambda: len(paginas_lidas) >= 1
+        )
+
+        assert len(paginas_lidas) == 1
+        assert {op["Folha"] for op in dados} == {"1"}
+        assert metricas[0]["status"] == "cancelled"
+        assert metricas[0]["pages_completed"] == 1
+
+    def test_pagina_inicial_skips_completed_pages(self, monkeypatch):
+        paginas_lidas = []
+        self._pdf(monkeypatch, paginas_lidas)
+
+        dados = processar_pdf("nota.pdf", pagina_inicial=2)
+
+        assert len(paginas_lidas) == 2
+        assert [op["Chave"] for op in dados][0] == "20210504-12345-2-1"
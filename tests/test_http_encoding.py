@@ -0,0 +1,116 @@
+"""
+Testes para a compressão das respostas do webapp (http_encoding.py)
+"""
+
+import gzip
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import http_encoding
+from http_encoding import (
+    CacheDeRespostas,
+    Compressor,
+    RespostaPreparada,
+    arquivo_comprimido,
+    escolher_codificacao,
+)
+from starlette.requests import Request
+
+
+@pytest.fixture
+def sem_brotli(monkeypatch):
+    monkeypatch.setattr(http_encoding, "_brotli", False)
+
+
+def test_negotiation_follows_q_values(sem_brotli):
+    assert escolher_codificacao("gzip, deflate, br") == "gzip"
+    assert escolher_codificacao("gzip;q=0") is None
+    assert escolher_codificacao("identity") is None
+    assert escolher_codificacao("*;q=0.5") == "gzip"
+    assert escolher_codificacao(None) is None
+
+
+def test_negotiation_prefers_brotli_when_installed(monkeypatch):
+    monkeypatch.setattr(http_encoding, "_brotli", object())
+
+    assert escolher_codificacao("gzip, br") == "br"
+    assert escolher_codificacao("gzip, br;q=0.5") == "gzip"
+
+
+def test_compressed_copy_is_written_once_and_refreshed_when_source_changes(tmp_path):
+    origem = tmp_path / "dados.csv"
+    origem.write_text("Data,Ticker\n" * 1000, encoding="utf-8")
+
+    comprimido = arquivo_comprimido(origem, "gzip")
+    assert comprimido == tmp_path / "dados.csv.gz"
+    assert gzip.decompress(comprimido.read_bytes()) == origem.read_bytes()
+    gerado_em = comprimido.stat().st_mtime_ns
+    assert arquivo_comprimido(origem, "gzip").stat().st_mtime_ns == gerado_em
+
+    origem.write_text("Data,Ticker\n01/01/2024,VALE3\n", encoding="utf-8")
+    os.utime(origem, ns=(gerado_em + 10**9, gerado_em + 10**9))
+    assert gzip.decompress(arquivo_comprimido(origem, "gzip").read_bytes()) == origem.read_bytes()
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def test_stream_compressor_produces_a_valid_gzip():
+    compressor = Compressor("gzip")
+    partes = [compressor.comprimir(f"linha {i}\n".encode()) for i in range(500)]
+    partes.append(compressor.finalizar())
+
+    assert gzip.decompress(b"".join(partes)) == "".join(f"linha {i}\n" for i in range(500)).encode()
+
+
+def _requisicao(**headers):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(nome.replace("_", "-").encode(), valor.encode()) for nome, valor in headers.items()],
+        }
+    )
+
+
+def test_prepared_response_compresses_above_threshold_and_answers_304(sem_brotli):
+    resposta = RespostaPreparada.json({"linhas": ["VALE3"] * 500}, tamanho_minimo=1024)
+
+    comprimida = resposta.responder(_requisicao(accept_encoding="gzip"))
+    assert comprimida.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(comprimida.body) == resposta.corpo
+    assert comprimida.headers["etag"] == resposta.etag("gzip")
+
+    for etag in (resposta.etag(), resposta.etag("gzip"), f"W/{resposta.etag()}", "*"):
+        assert resposta.responder(_requisicao(if_none_match=etag)).status_code == 304
+    assert resposta.responder(_requisicao(if_none_match='"outro"')).status_code == 200
+
+    pequena = RespostaPreparada.json({"status": "ok"}, tamanho_minimo=1024)
+    resposta_pequena = pequena.responder(_requisicao(accept_encoding="gzip"))
+    assert "content-encoding" not in resposta_pequena.headers
+    assert resposta_pequena.body == b'{"status":"ok"}'
+
+
+def test_response_cache_serializes_once_per_version():
+    cache = CacheDeRespostas(max_itens=2)
+    gerados = []
+
+    def gerar(valor):
+        gerados.append(valor)
+        return RespostaPreparada.json({"valor": valor})
+
+    primeira = cache.obter(("job", "status"), 1, lambda: gerar("a"))
+    assert cache.obter(("job", "status"), 1, lambda: gerar("b")) is primeira
+    assert cache.obter(("job", "status"), 2, lambda: gerar("c")).corpo == b'{"valor":"c"}'
+    assert gerados == ["a", "c"]
+
+    cache.obter(("outro", "status"), 1, lambda: gerar("d"))
+    cache.descartar("job")
+    assert len(cache) == 1
+    cache.obter(("terceiro", "status"), 1, lambda: gerar("e"))
+    cache.obter(("quarto", "status"), 1, lambda: gerar("f"))
+    assert len(cache) == 2
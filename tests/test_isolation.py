@@ -0,0 +1,136 @@
+"""
+Testes para o modo isolado (processo filho por PDF com timeout, limite de memória e quarentena)
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import _rss_processo_mb, analisar_pasta_ou_zip, carregar_quarentena
+
+_CONTEXTO_FORK = (
+    multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+)
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods() or _rss_processo_mb(os.getpid()) is None,
+    reason="requer multiprocessing fork e medição de RSS",
+)
+
+
+def _fake_processar_pdf(pdf_file, senha=None, metrics_collector=None, **_opcoes):
+    nome = Path(str(pdf_file)).name
+    if "lento" in nome:
+        time.sleep(30)
+    if "gordo" in nome:
+        blocos = [b"x" * (50 * 1024 * 1024) for _ in range(10)]
+        time.sleep(30)
+        del blocos
+    if "quebrado" in nome:
+        raise ValueError("PDF corrompido")
+    if metrics_collector is not None:
+        metrics_collector.append({"file_name": nome, "status": "processed", "page_count": 1})
+    return [{"Data": "05/01/2024", "Ticker": "VALE3", "Arquivo": nome}]
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    stats.mkdir()
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf)
+    )
+    # O filho precisa herdar o processar_pdf simulado (fork), qualquer que seja o padrão da plataforma
+    monkeypatch.setattr(multiprocessing, "get_context", lambda method=None: _CONTEXTO_FORK)
+    return pasta, stats
+
+
+def _ultimas_estatisticas(stats):
+    return json.loads(sorted(stats.glob("execucao_*.json"))[-1].read_text(encoding="utf-8"))
+
+
+class TestIsolatedProcessing:
+    """Testes para o watchdog por arquivo"""
+
+    def test_timeout_is_killed_recorded_and_quarantined(self, ambiente):
+        pasta, stats = ambiente
+        (pasta / "nota_ok.pdf").write_bytes(b"%PDF")
+        (pasta / "nota_lento.pdf").write_bytes(b"%PDF")
+
+        inicio = time.monotonic()
+        df = analisar_pasta_ou_zip(str(pasta), isolate=True, file_timeout=0.5, max_rss_mb=0)
+
+        assert time.monotonic() - inicio < 10
+        assert list(df["Arquivo"]) == ["nota_ok.pdf"]
+        status = {f["file_name"]: f["status"] for f in _ultimas_estatisticas(stats)["files"]}
+        assert status == {"nota_ok.pdf": "processed", "nota_lento.pdf": "timeout"}
+        assert carregar_quarentena()["nota_lento.pdf"]["status"] == "timeout"
+
+    def test_memory_cap_marks_file_as_oom(self, ambiente):
+        pasta, stats = ambiente
+        (pasta / "nota_gordo.pdf").write_bytes(b"%PDF")
+        limite = _rss_processo_mb(os.getpid()) + 200
+
+        analisar_pasta_ou_zip(str(pasta), isolate=True, file_timeout=20, max_rss_mb=limite)
+
+        assert _ultimas_estatisticas(stats)["files"][0]["status"] == "oom"
+        assert carregar_quarentena()["nota_gordo.pdf"]["status"] == "oom"
+
+    def test_child_errors_are_reported_without_quarantine(self, ambiente):
+        pasta, stats = ambiente
+        (pasta / "nota_quebrado.pdf").write_bytes(b"%PDF")
+
+        df = analisar_pasta_ou_zip(str(pasta), isolate=True, file_timeout=5, max_rss_mb=0)
+
+        assert df.empty
+        arquivo = _ultimas_estatisticas(stats)["files"][0]
+        assert arquivo["status"] == "error"
+        assert "PDF corrompido" in arquivo["error"]
+        assert carregar_quarentena() == {}
+
+
+class TestQuarantine:
+    """Testes para a quarentena entre execuções"""
+
+    def test_quarantined_files_are_skipped_in_next_runs(self, ambiente):
+        pasta, stats = ambiente
+        (pasta / "nota_lento.pdf").write_bytes(b"%PDF")
+        analisar_pasta_ou_zip(str(pasta), isolate=True, file_timeout=0.3, max_rss_mb=0)
+
+        analisar_pasta_ou_zip(str(pasta))
+
+        assert _ultimas_estatisticas(stats)["totals"]["quarantined_files"] == 1
+        assert _ultimas_estatisticas(stats)["files"] == []
+
+    def test_forced_success_removes_file_from_quarantine(self, ambiente):
+        pasta, stats = ambiente
+        (pasta / "nota_2024.pdf").write_bytes(b"%PDF")
+        (stats / "quarentena.json").write_text(
+            json.dumps({"nota_2024.pdf": {"status": "timeout", "size": 4}}), encoding="utf-8"
+        )
+
+        assert analisar_pasta_ou_zip(str(pasta)).empty
+        df = analisar_pasta_ou_zip(str(pasta), force=True)
+
+        assert list(df["Arquivo"]) == ["nota_2024.pdf"]
+        assert carregar_quarentena() == {}
+
+    def test_changed_file_is_no_longer_quarantined(self, ambiente):
+        pasta, stats = ambiente
+        (pasta / "nota_2024.pdf").write_bytes(b"%PDF-corrigido")
+        (stats / "quarentena.json").write_text(
+            json.dumps({"nota_2024.pdf": {"status": "oom", "size": 4}}), encoding="utf-8"
+        )
+
+        assert len(analisar_pasta_ou_zip(str(pasta))) == 1
@@ -0,0 +1,141 @@
+"""
+Testes para o armazenamento de jobs do webapp (job_store.py)
+"""
+
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from job_store import MemoryJobStore, SQLiteJobStore, criar_job_store, dono_ativo, dono_atual
+
+
+def _job(job_id, dono="host:1", status="queued"):
+    return {"job_id": job_id, "status": status, "dono": dono, "cancel_requested": False, "processed_files": 0}
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "jobs.sqlite"))
+    return MemoryJobStore()
+
+
+def test_update_merges_changes(store):
+    store.criar(_job("a"))
+
+    assert store.atualizar("a", status="running", processed_files=2)
+    assert store.atualizar("a", cancel_requested=True)
+
+    job = store.obter("a")
+    assert (job["status"], job["processed_files"], job["cancel_requested"]) == ("running", 2, True)
+    assert store.atualizar("inexistente", status="running") is False
+    assert store.obter("inexistente") is None
+
+
+def test_queue_position_follows_creation_order_per_owner(store):
+    for job_id, dono in (("a", "w1"), ("b", "w2"), ("c", "w1"), ("d", "w1")):
+        store.criar(_job(job_id, dono))
+    store.atualizar("a", status="running")
+
+    assert [store.posicao_na_fila(job_id) for job_id in "abcd"] == [None, 1, 1, 2]
+    assert [job["job_id"] for job in store.listar("queued")] == ["b", "c", "d"]
+
+
+def test_assumir_only_succeeds_for_current_owner(store):
+    store.criar(_job("a", "morto:1"))
+
+    assert store.assumir("a", "morto:1", "w1")
+    assert not store.assumir("a", "morto:1", "w2")
+    assert store.obter("a")["dono"] == "w1"
+
+
+def test_remover_expirados_only_takes_old_finished_jobs(store):
+    store.criar(_job("feito", status="completed"))
+    store.criar(_job("rodando", status="running"))
+    corte = time.time() + 1
+    store.criar(_job("novo", status="failed"))
+    if isinstance(store, SQLiteJobStore):
+        with closing(store._conectar()) as conn:
+            conn.execute("UPDATE jobs SET atualizado_em = ? WHERE job_id = 'novo'", (corte + 10,))
+    else:
+        store._atualizado_em["novo"] = corte + 10
+
+    removidos = store.remover_expirados(corte, {"completed", "failed", "cancelled"})
+
+    assert [job["job_id"] for job in removidos] == ["feito"]
+    assert sorted(job["job_id"] for job in store.listar()) == ["novo", "rodando"]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    """Duas instâncias no mesmo arquivo fazem o papel de dois workers do uvicorn."""
+    worker_a = SQLiteJobStore(str(tmp_path / "jobs.sqlite"))
+    worker_b = SQLiteJobStore(str(tmp_path / "jobs.sqlite"))
+    worker_a.criar({**_job("a"), "request": {"temp_path": tmp_path}})
+
+    worker_b.atualizar("a", cancel_requested=True)
+    worker_a.atualizar("a", status="running", processed_files=1)
+
+    job = worker_b.obter("a")
+    assert job["cancel_requested"] is True
+    assert job["processed_files"] == 1
+    # Caminhos são gravados como texto
+    assert job["request"]["temp_path"] == str(tmp_path)
+
+
+def test_sqlite_store_rolls_back_a_failed_transaction(tmp_path):
+    """Um erro no meio de remover_expirados() desfaz as remoções já feitas na transação."""
+    caminho = str(tmp_path / "jobs.sqlite")
+    store = SQLiteJobStore(caminho)
+    for job_id in ("a", "b"):
+        store.criar(_job(job_id, status="completed"))
+    with closing(sqlite3.connect(caminho)) as conn:
+        conn.execute(
+            "CREATE TRIGGER falha BEFORE DELETE ON jobs WHEN old.job_id = 'b' "
+            "BEGIN SELECT RAISE(ABORT, 'falha'); END"
+        )
+        conn.commit()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        store.remover_expirados(time.time() + 1, {"completed"})
+
+    assert store.obter("a") is not None
+    # A conexão seguinte não encontra o arquivo travado por uma transação pendente
+    assert SQLiteJobStore(caminho, timeout=0.5).atualizar("a", status="failed")
+
+
+def test_dono_ativo_detects_finished_process():
+    processo = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    pid = int(processo.stdout)
+
+    assert dono_ativo(dono_atual())
+    assert not dono_ativo(f"{socket.gethostname()}:{pid}")
+    assert not dono_ativo(None)
+    # Processos de outra máquina não podem ser verificados e contam como ativos
+    assert dono_ativo("outra-maquina:1")
+
+
+def test_dono_ativo_rejects_previous_process_with_the_same_pid():
+    """Após reiniciar um contêiner, o servidor volta com o mesmo host e pid: o token os distingue."""
+    host_pid = f"{socket.gethostname()}:{os.getpid()}"
+
+    assert dono_atual().startswith(host_pid + ":")
+    assert not dono_ativo(f"{host_pid}:tokenanterior")
+    assert not dono_ativo(host_pid)
+
+
+def test_criar_job_store_validates_type(tmp_path):
+    assert isinstance(criar_job_store("memory"), MemoryJobStore)
+    assert isinstance(criar_job_store("SQLite", str(tmp_path / "j.sqlite")), SQLiteJobStore)
+    with pytest.raises(ValueError):
+        criar_job_store("redis", "x")
+    with pytest.raises(ValueError):
+        criar_job_store("sqlite")
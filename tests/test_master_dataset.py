@@ -0,0 +1,139 @@
+"""
+Testes para a mesclagem incremental no dataset mestre (master_dataset.py)
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from master_dataset import chaves_operacoes, mesclar_no_mestre
+
+
+def _operacoes(*linhas):
+    """Monta DataFrame no formato de analisar_pasta_ou_zip a partir de (data, ticker, chave)."""
+    return pd.DataFrame(
+        {
+            "Data": [data for data, _, _ in linhas],
+            "Ticker": [ticker for _, ticker, _ in linhas],
+            "Operação": ["C"] * len(linhas),
+            "Quantidade": ["100"] * len(linhas),
+            "Preço": ["10.00"] * len(linhas),
+            "Chave": [chave for _, _, chave in linhas],
+        }
+    )
+
+
+JANEIRO = _operacoes(
+    ("05/01/2024", "VALE3", "20240105-1-1-1"),
+    ("05/01/2024", "VALE3", "20240105-1-1-2"),
+)
+FEVEREIRO = _operacoes(("07/02/2024", "PETR4", "20240207-2-1-1"))
+DEZEMBRO_ANTERIOR = _operacoes(("20/12/2023", "ITSA4", "20231220-3-1-1"))
+
+
+class TestChavesOperacoes:
+    """Testes para o cálculo da chave de cada operação"""
+
+    def test_uses_chave_column(self):
+        assert list(chaves_operacoes(JANEIRO)) == ["20240105-1-1-1", "20240105-1-1-2"]
+
+    def test_legacy_rows_keep_identical_operations_distinct(self):
+        """Sem coluna Chave, operações idênticas recebem o número da ocorrência"""
+        legado = JANEIRO.drop(columns=["Chave"])
+
+        chaves = list(chaves_operacoes(legado))
+
+        assert len(set(chaves)) == 2
+        assert all(chave.startswith("sig:05/01/2024|VALE3") for chave in chaves)
+
+
+class TestMergeCSV:
+    """Testes para mestre em CSV"""
+
+    def test_create_append_and_skip_duplicates(self, tmp_path):
+        mestre = str(tmp_path / "mestre.csv")
+
+        assert mesclar_no_mestre(JANEIRO, mestre)["mode"] == "created"
+        resumo = mesclar_no_mestre(pd.concat([JANEIRO, FEVEREIRO]), mestre)
+        assert resumo["mode"] == "appended"
+        assert resumo["new"] == 1
+        assert mesclar_no_mestre(FEVEREIRO, mestre)["mode"] == "unchanged"
+
+        df = pd.read_csv(mestre, dtype=str, encoding="utf-8-sig")
+        assert list(df["Chave"]) == ["20240105-1-1-1", "20240105-1-1-2", "20240207-2-1-1"]
+
+    def test_older_operations_rewrite_in_date_order(self, tmp_path):
+        mestre = str(tmp_path / "mestre.csv")
+        mesclar_no_mestre(JANEIRO, mestre)
+
+        resumo = mesclar_no_mestre(DEZEMBRO_ANTERIOR, mestre)
+
+        assert resumo["mode"] == "rewritten"
+        df = pd.read_csv(mestre, dtype=str, encoding="utf-8-sig")
+        assert list(df["Data"]) == ["20/12/2023", "05/01/2024", "05/01/2024"]
+
+    def test_same_last_date_rewrites_in_ticker_order(self, tmp_path):
+        mestre = str(tmp_path / "mestre.csv")
+        mesclar_no_mestre(_operacoes(("10/05/2024", "VALE3", "20240510-1-1-1")), mestre)
+
+        resumo = mesclar_no_mestre(_operacoes(("10/05/2024", "ABEV3", "20240510-2-1-1")), mestre)
+
+        assert resumo["mode"] == "rewritten"
+        df = pd.read_csv(mestre, dtype=str, encoding="utf-8-sig")
+        assert list(df["Ticker"]) == ["ABEV3", "VALE3"]
+
+
+class TestMergeParquet:
+    """Testes para mestre Parquet particionado por ano"""
+
+    def test_only_touched_partitions_are_rewritten(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        mestre = tmp_path / "mestre.parquet"
+        mesclar_no_mestre(pd.concat([DEZEMBRO_ANTERIOR, JANEIRO]), str(mestre))
+        particao_2023 = mestre / "ano=2023" / "dados.parquet"
+        mtime_2023 = particao_2023.stat().st_mtime_ns
+
+        resumo = mesclar_no_mestre(pd.concat([JANEIRO, FEVEREIRO]), str(mestre))
+
+        assert resumo["touched_partitions"] == [2024]
+        assert resumo["new"] == 1
+        assert particao_2023.stat().st_mtime_ns == mtime_2023
+        assert len(pd.read_parquet(mestre / "ano=2024" / "dados.parquet")) == 3
+
+
+class TestMergeSQLite:
+    """Testes para mestre SQLite"""
+
+    def test_upsert_is_idempotent(self, tmp_path):
+        mestre = str(tmp_path / "mestre.sqlite")
+
+        assert mesclar_no_mestre(JANEIRO, mestre)["new"] == 2
+        assert mesclar_no_mestre(pd.concat([JANEIRO, FEVEREIRO]), mestre)["new"] == 1
+
+        with sqlite3.connect(mestre) as conn:
+            datas = [row[0] for row in conn.execute("SELECT Data FROM operacoes ORDER BY data_iso")]
+        assert datas == ["05/01/2024", "05/01/2024", "07/02/2024"]
+
+
+class TestMergeXLSX:
+    """Testes para mestre XLSX"""
+
+    def test_xlsx_is_rewritten_only_with_new_rows(self, tmp_path):
+        mestre = tmp_path / "mestre.xlsx"
+        mesclar_no_mestre(JANEIRO, str(mestre))
+        mtime = mestre.stat().st_mtime_ns
+
+        assert mesclar_no_mestre(JANEIRO, str(mestre))["mode"] == "unchanged"
+        assert mestre.stat().st_mtime_ns == mtime
+
+        assert mesclar_no_mestre(FEVEREIRO, str(mestre))["new"] == 1
+        assert len(pd.read_excel(mestre, sheet_name="Dados")) == 3
+
+
+def test_unsupported_extension_returns_none(tmp_path):
+    assert mesclar_no_mestre(JANEIRO, str(tmp_path / "mestre.txt")) is None
@@ -0,0 +1,128 @@
+"""
+Testes para o merge k-way de saídas parciais (merge_outputs.py)
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import merge_outputs
+from merge_outputs import chave_ordenacao, main, mesclar_saidas
+
+
+def _parte(*linhas):
+    """Monta DataFrame ordenado a partir de (data, ticker, chave)."""
+    return pd.DataFrame(
+        {
+            "Data": [data for data, _, _ in linhas],
+            "Ticker": [ticker for _, ticker, _ in linhas],
+            "Operação": ["C"] * len(linhas),
+            "Quantidade": ["100"] * len(linhas),
+            "Preço": ["10.00"] * len(linhas),
+            "Chave": [chave for _, _, chave in linhas],
+        }
+    )
+
+
+PARTE_A = _parte(
+    ("05/01/2024", "PETR4", "20240105-1-1-1"),
+    ("07/02/2024", "VALE3", "20240207-2-1-1"),
+)
+PARTE_B = _parte(
+    ("05/01/2024", "ITSA4", "20240105-3-1-1"),
+    ("05/01/2024", "PETR4", "20240105-1-1-1"),  # duplicada da parte A
+    ("10/03/2024", "BBAS3", "20240310-4-1-1"),
+)
+
+
+class TestChaveOrdenacao:
+    """Testes para a chave de ordenação por registro"""
+
+    def test_invalid_date_goes_last(self):
+        assert chave_ordenacao({"Data": "31/12/2099", "Ticker": "A"}) < chave_ordenacao(
+            {"Data": "", "Ticker": "A"}
+        )
+
+    def test_missing_ticker_after_present_on_same_date(self):
+        assert chave_ordenacao({"Data": "01/01/2024", "Ticker": "ZZZZ3"}) < chave_ordenacao(
+            {"Data": "01/01/2024", "Ticker": None}
+        )
+
+
+class TestMesclarSaidas:
+    """Testes para o merge entre formatos"""
+
+    def test_csv_and_json_are_interleaved_and_deduplicated(self, tmp_path):
+        parte_a = tmp_path / "parte_a.csv"
+        parte_b = tmp_path / "parte_b.json"
+        PARTE_A.to_csv(parte_a, index=False, encoding="utf-8-sig")
+        PARTE_B.to_json(parte_b, orient="records", force_ascii=False, indent=2)
+        saida = tmp_path / "todos.csv"
+
+        resumo = mesclar_saidas([str(parte_a), str(parte_b)], str(saida))
+
+        assert resumo["records_read"] == 5
+        assert resumo["records_written"] == 4
+        assert resumo["duplicates_skipped"] == 1
+        df = pd.read_csv(saida, dtype=str, encoding="utf-8-sig")
+        assert list(df["Ticker"]) == ["ITSA4", "PETR4", "VALE3", "BBAS3"]
+
+    def test_parquet_input_and_ndjson_output(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        parte_a = tmp_path / "parte_a.parquet"
+        parte_b = tmp_path / "parte_b.csv"
+        PARTE_A.to_parquet(parte_a, index=False)
+        PARTE_B.to_csv(parte_b, index=False, encoding="utf-8-sig")
+        saida = tmp_path / "todos.ndjson"
+
+        mesclar_saidas([str(parte_a), str(parte_b)], str(saida))
+
+        linhas = [json.loads(linha) for linha in saida.read_text(encoding="utf-8").splitlines()]
+        assert [linha["Chave"] for linha in linhas] == [
+            "20240105-3-1-1",
+            "20240105-1-1-1",
+            "20240207-2-1-1",
+            "20240310-4-1-1",
+        ]
+
+    def test_json_reader_streams_in_small_chunks(self, tmp_path, monkeypatch):
+        """Objetos que atravessam o limite do bloco lido continuam sendo decodificados"""
+        monkeypatch.setattr(merge_outputs, "_JSON_CHUNK_SIZE", 7)
+        parte = tmp_path / "parte.json"
+        PARTE_B.to_json(parte, orient="records", force_ascii=False)
+        saida = tmp_path / "todos.json"
+
+        mesclar_saidas([str(parte)], str(saida))
+
+        assert len(json.loads(saida.read_text(encoding="utf-8"))) == 3
+
+    def test_legacy_files_without_key_deduplicate_by_signature(self, tmp_path):
+        parte_a = tmp_path / "a.csv"
+        parte_b = tmp_path / "b.csv"
+        PARTE_A.drop(columns=["Chave"]).to_csv(parte_a, index=False)
+        PARTE_A.drop(columns=["Chave"]).to_csv(parte_b, index=False)
+
+        resumo = mesclar_saidas([str(parte_a), str(parte_b)], str(tmp_path / "todos.csv"))
+
+        assert resumo["records_written"] == 2
+        assert resumo["duplicates_skipped"] == 2
+
+    def test_unsorted_input_is_rejected(self, tmp_path):
+        parte = tmp_path / "fora_de_ordem.csv"
+        PARTE_A.iloc[::-1].to_csv(parte, index=False)
+
+        with pytest.raises(ValueError, match="ordenada"):
+            mesclar_saidas([str(parte)], str(tmp_path / "todos.csv"))
+
+
+def test_main_returns_error_for_unsupported_output(tmp_path):
+    parte = tmp_path / "parte.csv"
+    PARTE_A.to_csv(parte, index=False)
+
+    assert main([str(parte), "-o", str(tmp_path / "todos.txt")]) == 1
+    assert main([str(parte), "-o", str(tmp_path / "todos.csv")]) == 0
@@ -0,0 +1,206 @@
+"""
+Testes para os filtros de ticker e de ano aplicados durante a extração (predicate pushdown)
+"""
+
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import ExtractorSession, _listar_tarefas, _should_process_file
+
+MAPPING = {"VALE ON NM": "VALE3", "PETROBRAS PN": "PETR4", "ITAUSA PN N1": "ITSA4"}
+
+CABECALHO = "NOTA DE NEGOCIAÇÃO\nNr. nota Folha Data pregão\n12.345 {folha} 04/05/2021\n"
+
+
+def _linha(operacao, ativo, quantidade, preco):
+    return ["1-BOVESPA", "", operacao, "VISTA", "", ativo, "", quantidade, preco, "0,00", "D"]
+
+
+class _FakeConfig:
+    def get_ticker_mapping(self):
+        return dict(MAPPING)
+
+    def get_pdf_password(self):
+        return ""
+
+
+class _FakePage:
+    def __init__(self, texto, linhas=()):
+        self._texto = texto
+        self._linhas = list(linhas)
+
+    def extract_text(self):
+        return self._texto
+
+    def extract_tables(self):
+        return [self._linhas] if self._linhas else []
+
+
+class _FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _paginas():
+    return [
+        _FakePage(
+            CABECALHO.format(folha=1) + "PETROBRAS PN VALE ON NM",
+            [
+                _linha("C", "PETROBRAS PN", "10", "25,00"),
+                _linha("C", "VALE ON NM", "100", "30,00"),
+                _linha("V", "ITAUSA PN N1", "5", "9,00"),
+                _linha("V", "VALE ON NM", "20", "31,00"),
+                _linha("C", "PETROBRAS PN", "7", "26,00"),
+            ],
+        ),
+        _FakePage(
+            CABECALHO.format(folha=2) + "PETROBRAS PN",
+            [_linha("C", "PETROBRAS PN", "1", "25,00")],
+        ),
+        _FakePage(
+            CABECALHO.format(folha=3) + "VALE ON NM ATIVO DESCONHECIDO",
+            [
+                _linha("C", "ATIVO DESCONHECIDO", "3", "1,00"),
+                _linha("C", "PETROBRAS PN", "2", "25,00"),
+                _linha("V", "VALE ON NM", "40", "32,00"),
+            ],
+        ),
+        # A tabela perdeu a linha da VALE: ela vem do fallback de texto, no fim da página
+        _FakePage(
+            CABECALHO.format(folha=4)
+            + "1-BOVESPA C VISTA PETROBRAS PN 4 25,00 100,00 D\n"
+            + "1-BOVESPA V VISTA VALE ON NM 50 33,00 1.650,00 D\n",
+            [_linha("C", "PETROBRAS PN", "4", "25,00"), _linha("C", "ITAUSA PN N1", "6", "9,00")],
+        ),
+    ]
+
+
+@pytest.fixture
+def sessao(monkeypatch):
+    monkeypatch.setattr(
+        extrator_module.pdfplumber, "open", lambda *args, **kwargs: _FakePdf(_paginas())
+    )
+    return ExtractorSession(_FakeConfig())
+
+
+@pytest.fixture
+def resolucoes(monkeypatch):
+    """Conta as resoluções completas (fuzzy) de ticker."""
+    chamadas = []
+    original = extrator_module._extract_ticker_from_cells
+
+    def _contar(cells, ticker_mapping=None):
+        chamadas.append(list(cells))
+        return original(cells, ticker_mapping)
+
+    monkeypatch.setattr(extrator_module, "_extract_ticker_from_cells", _contar)
+    return chamadas
+
+
+class TestTickerPushdown:
+    """Testes do filtro de ticker dentro da extração"""
+
+    def test_filtered_extraction_matches_filtering_afterwards(self, sessao):
+        completo = sessao.processar_pdf("nota.pdf")
+
+        filtrado = sessao.processar_pdf("nota.pdf", ticker_filter="vale3")
+
+        assert filtrado == [op for op in completo if op["Ticker"] == "VALE3"]
+        assert [op["Chave"] for op in filtrado] == [
+            "20210504-12345-1-2",
+            "20210504-12345-1-4",
+            "20210504-12345-3-2",
+            "20210504-12345-4-3",
+        ]
+
+    def test_pages_without_alias_are_skipped(self, sessao):
+        metricas = []
+
+        sessao.processar_pdf("nota.pdf", metrics_collector=metricas, ticker_filter="VALE3")
+
+        assert metricas[0]["pages_skipped"] == 1
+        assert metricas[0]["pages"][1] == {
+            "page_number": 2,
+            "records_extracted": 0,
+            "elapsed_seconds": metricas[0]["pages"][1]["elapsed_seconds"],
+            "skipped": "ticker_filter",
+        }
+        assert metricas[0]["records_extracted"] == 4
+
+    def test_rows_that_cannot_match_are_not_resolved(self, sessao, resolucoes):
+        sessao.processar_pdf("nota.pdf")
+        sem_filtro = len(resolucoes)
+        resolucoes.clear()
+
+        sessao.processar_pdf("nota.pdf", ticker_filter="VALE3")
+
+        # Página 1: a PETROBRAS depois da última VALE não é resolvida; página 2 pulada
+        assert _linha("C", "PETROBRAS PN", "7", "26,00") not in resolucoes
+        assert _linha("C", "PETROBRAS PN", "1", "25,00") not in resolucoes
+        assert len(resolucoes) < sem_filtro
+
+    def test_typo_in_page_text_still_counts_as_alias(self):
+        filtro = extrator_module._FiltroTicker("VALE3", extrator_module._MapeamentoTickers(MAPPING))
+
+        assert filtro.pagina_relevante("1-BOVESPA C VISTA VALLE ON NM 10 1,00")
+        assert not filtro.pagina_relevante("1-BOVESPA C VISTA PETROBRAS PN 10 1,00")
+        assert filtro.linha_candidata(["VAL3", "VALE3"])
+        assert not filtro.linha_candidata(["PETROBRAS PN", "10", "25,00"])
+
+
+class TestYearProbe:
+    """Testes da sondagem do ano pela primeira página quando o nome não tem ano"""
+
+    @pytest.fixture
+    def pasta(self, tmp_path, monkeypatch):
+        anos = {"nota_maio.pdf": 2024, "nota_antiga.pdf": 2023, "Clear 2024 01.pdf": 2023}
+        for nome in anos:
+            (tmp_path / nome).write_bytes(b"%PDF")
+        with zipfile.ZipFile(tmp_path / "notas.zip", "w") as z:
+            z.writestr("dentro_do_zip.pdf", b"%PDF")
+        anos["dentro_do_zip.pdf"] = 2024
+        sondados = []
+
+        def _abrir(pdf_file, *args, **kwargs):
+            nome = Path(getattr(pdf_file, "name", str(pdf_file))).name
+            sondados.append(nome)
+            return _FakePdf([_FakePage(f"Data pregão 10/05/{anos[nome]}")])
+
+        monkeypatch.setattr(extrator_module.pdfplumber, "open", _abrir)
+        return tmp_path, sondados
+
+    def test_files_without_year_use_first_page_date(self, pasta):
+        caminho, sondados = pasta
+
+        tarefas, ignorados = _listar_tarefas(str(caminho), 2024)
+
+        assert sorted(t["_name"] for t in tarefas) == [
+            "Clear 2024 01.pdf", "dentro_do_zip.pdf", "nota_maio.pdf"
+        ]
+        assert ignorados == 1
+        # O ano do nome tem prioridade: apenas os arquivos sem ano no nome são abertos
+        assert sorted(sondados) == ["dentro_do_zip.pdf", "nota_antiga.pdf", "nota_maio.pdf"]
+
+    def test_without_year_filter_nothing_is_probed(self, pasta):
+        caminho, sondados = pasta
+
+        tarefas, _ = _listar_tarefas(str(caminho))
+
+        assert len(tarefas) == 4
+        assert sondados == []
+
+    def test_probe_without_date_skips_file(self):
+        assert _should_process_file("sem_ano.pdf", 2024, lambda: None) is False
+        assert _should_process_file("sem_ano.pdf", 2024, lambda: 2024) is True
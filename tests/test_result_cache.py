@@ -0,0 +1,124 @@
+"""
+Testes para o cache de registros e resultados (result_cache.py) e seu uso em analisar_pasta_ou_zip
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+import result_cache as result_cache_module
+from extratorNotasCorretagem import analisar_pasta_ou_zip, sessao_padrao
+from result_cache import ResultCache, chave_upload
+
+
+def _fake_processar_pdf(pdf_file, metrics_collector=None, **_opcoes):
+    nome = Path(str(pdf_file)).name
+    _fake_processar_pdf.lidos.append(nome)
+    if metrics_collector is not None:
+        metrics_collector.append({"file_name": nome, "status": "success", "page_count": 1})
+    return [{"Data": "05/01/2024", "Ticker": "VALE3", "Chave": nome}]
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    stats.mkdir()
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    for nome in ("a.pdf", "b.pdf"):
+        (pasta / nome).write_bytes(b"%PDF " + nome.encode())
+    _fake_processar_pdf.lidos = []
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf)
+    )
+    monkeypatch.setattr(sessao_padrao().config, "get_ticker_mapping", lambda: {"VALE ON": "VALE3"})
+    return pasta, ResultCache(str(tmp_path / "cache.sqlite"))
+
+
+def _record_cache_stats(stats_paths):
+    return json.loads(Path(stats_paths[-1]).read_text(encoding="utf-8"))["record_cache"]
+
+
+def test_second_run_reuses_records_and_processes_only_new_files(ambiente):
+    pasta, cache = ambiente
+    primeira = analisar_pasta_ou_zip(str(pasta), record_cache=cache)
+    (pasta / "c.pdf").write_bytes(b"%PDF c.pdf")
+    _fake_processar_pdf.lidos = []
+    stats_paths = []
+
+    segunda = analisar_pasta_ou_zip(str(pasta), record_cache=cache, stats_output_path=stats_paths)
+
+    assert _fake_processar_pdf.lidos == ["c.pdf"]
+    assert list(segunda["Chave"]) == list(primeira["Chave"]) + ["c.pdf"]
+    estatisticas = _record_cache_stats(stats_paths)
+    assert (estatisticas["hits"], estatisticas["misses"]) == (2, 1)
+    assert estatisticas["hit_ratio"] == pytest.approx(2 / 3, abs=0.001)
+    assert sorted(estatisticas["cached_files"]) == ["a.pdf", "b.pdf"]
+
+
+def test_mapping_change_or_ticker_filter_invalidate_records(ambiente, monkeypatch):
+    pasta, cache = ambiente
+    analisar_pasta_ou_zip(str(pasta), record_cache=cache)
+
+    _fake_processar_pdf.lidos = []
+    analisar_pasta_ou_zip(str(pasta), record_cache=cache, ticker_filter="VALE3")
+    assert sorted(_fake_processar_pdf.lidos) == ["a.pdf", "b.pdf"]
+
+    monkeypatch.setattr(sessao_padrao().config, "get_ticker_mapping", lambda: {"VALE ON NM": "VALE3"})
+    _fake_processar_pdf.lidos = []
+    analisar_pasta_ou_zip(str(pasta), record_cache=cache)
+    assert sorted(_fake_processar_pdf.lidos) == ["a.pdf", "b.pdf"]
+
+
+def test_records_and_results_survive_a_new_instance(tmp_path):
+    caminho = str(tmp_path / "sub" / "cache.sqlite")
+    ResultCache(caminho).guardar("chave", [{"Ticker": "VALE3", "Quantidade": 10}])
+    ResultCache(caminho).guardar_resultado("upload", {"filename": "dados.csv"})
+
+    cache = ResultCache(caminho)
+
+    assert cache.buscar("chave") == [{"Ticker": "VALE3", "Quantidade": 10}]
+    assert cache.buscar("outra") is None
+    assert cache.buscar_resultado("upload") == {"filename": "dados.csv"}
+    cache.remover_resultado("upload")
+    assert cache.buscar_resultado("upload") is None
+
+
+def test_upload_key_ignores_file_order_and_requires_hashes():
+    a = {"filename": "a.pdf", "size": 1, "sha256": "aa"}
+    b = {"filename": "b.pdf", "size": 2, "sha256": "bb"}
+    parametros = {"year": 2024, "ticker": None}
+
+    assert chave_upload([a, b], parametros, "1:x") == chave_upload([b, a], parametros, "1:x")
+    assert chave_upload([a, b], parametros, "1:x") != chave_upload([a, b], parametros, "1:y")
+    assert chave_upload([a, b], parametros, "1:x") != chave_upload([a], parametros, "1:x")
+    assert chave_upload([a, {"filename": "c.pdf"}], parametros, "1:x") is None
+    assert chave_upload([], parametros, "1:x") is None
+
+
+def test_cleanup_evicts_idle_and_least_recently_used_records(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    relogio = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "time", lambda: relogio[0])
+    for chave in ("antigo", "a", "b", "c"):
+        cache.guardar(chave, [{"Chave": chave}])
+        relogio[0] += 10
+    cache.guardar_resultado("upload_antigo", {"filename": "velho.csv"})
+    relogio[0] += 100
+    cache.guardar_resultado("upload_novo", {"filename": "novo.csv"})
+    cache.buscar("a")  # usado por último: sobrevive ao limite de tamanho
+
+    removidos = cache.limpar(
+        registros_usados_antes=1005.0, resultados_criados_antes=1100.0, max_registros=2
+    )
+
+    assert removidos == {"registros": 2, "resultados": 1}
+    assert [chave for chave in ("antigo", "a", "b", "c") if cache.buscar(chave)] == ["a", "c"]
+    assert cache.buscar_resultado("upload_antigo") is None
+    assert cache.buscar_resultado("upload_novo") == {"filename": "novo.csv"}
@@ -0,0 +1,74 @@
+"""
+Testes para a consulta paginada dos resultados dos jobs (result_query.py)
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from extratorNotasCorretagem import ordenar_dados_por_data
+from result_query import consultar_registros, gravar_registros
+
+
+@pytest.fixture
+def resultado(tmp_path):
+    df = pd.DataFrame(
+        {
+            "Data": ["10/05/2024", "04/05/2024", None, "04/05/2024", "15/05/2024", "04/05/2024"],
+            "Ticker": ["VALE3", "VALE3", "PETR4", None, "PETR4", "ITSA4"],
+            "Quantidade": [100, 50, 10, 5, 200, 30],
+            "Preço": [24.5, 28.0, 30.1, 11.0, 26.0, 9.9],
+        }
+    )
+    caminho = str(tmp_path / "job" / "resultado.sqlite")
+    assert gravar_registros(df, caminho) == 6
+    return df, caminho
+
+
+def test_default_order_matches_ordenar_dados_por_data(resultado):
+    df, caminho = resultado
+
+    pagina = consultar_registros(caminho, limit=10)
+
+    assert pagina["total"] == 6
+    assert pagina["columns"] == ["Data", "Ticker", "Quantidade", "Preço"]
+    assert [linha["Quantidade"] for linha in pagina["rows"]] == list(ordenar_dados_por_data(df)["Quantidade"])
+    assert pagina["rows"][0] == {"Data": "04/05/2024", "Ticker": "ITSA4", "Quantidade": 30, "Preço": 9.9}
+
+
+def test_paging_filters_and_sort(resultado):
+    _, caminho = resultado
+
+    segunda = consultar_registros(caminho, offset=2, limit=2)
+    assert [linha["Quantidade"] for linha in segunda["rows"]] == [5, 100]
+    assert segunda["total"] == 6
+
+    vale = consultar_registros(caminho, ticker="vale3")
+    assert [linha["Quantidade"] for linha in vale["rows"]] == [50, 100]
+
+    periodo = consultar_registros(caminho, date_from="05/05/2024", date_to="2024-05-31")
+    assert [linha["Quantidade"] for linha in periodo["rows"]] == [100, 200]
+
+    por_preco = consultar_registros(caminho, sort_by="Preço", descending=True, limit=3)
+    assert [linha["Preço"] for linha in por_preco["rows"]] == [30.1, 28.0, 26.0]
+
+    por_data = consultar_registros(caminho, sort_by="Data", descending=True)
+    assert por_data["rows"][0]["Data"] == "15/05/2024"
+    assert por_data["rows"][-1]["Data"] is None
+
+
+def test_invalid_queries_raise(resultado, tmp_path):
+    _, caminho = resultado
+
+    with pytest.raises(ValueError):
+        consultar_registros(caminho, sort_by="Data; DROP TABLE operacoes")
+    with pytest.raises(ValueError):
+        consultar_registros(caminho, date_from="2024/05/01")
+    with pytest.raises(ValueError):
+        consultar_registros(caminho, limit=0)
+    with pytest.raises(FileNotFoundError):
+        consultar_registros(str(tmp_path / "inexistente.sqlite"))
@@ -0,0 +1,180 @@
+"""
+Testes para o escalonamento longest-job-first em execuções paralelas (--workers)
+"""
+
+import json
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import (
+    _estimar_custos,
+    _listar_tarefas,
+    _simular_makespan,
+    ExtractorSession,
+)
+
+_CONTEXTO_FORK = (
+    multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+)
+
+# Duração simulada de cada arquivo: um único arquivo grande em último lugar pela ordem de nome
+DURACOES = {"a.pdf": 0.1, "b.pdf": 0.1, "c.pdf": 0.1, "d.pdf": 0.1, "z_grande.pdf": 0.4}
+
+
+def _fake_processar_pdf(pdf_file, senha=None, metrics_collector=None, **_opcoes):
+    nome = Path(str(pdf_file)).name
+    time.sleep(DURACOES[nome])
+    if metrics_collector is not None:
+        metrics_collector.append(
+            {"file_name": nome, "status": "success", "page_count": 1, "elapsed_seconds": DURACOES[nome]}
+        )
+    return [{"Data": "05/01/2024", "Ticker": "VALE3", "Arquivo": nome}]
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    stats.mkdir()
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    for nome in DURACOES:
+        (pasta / nome).write_bytes(b"%PDF" * 10)
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf)
+    )
+    return pasta, stats
+
+
+def _gravar_historico(stats, arquivos):
+    (stats / "execucao_20240101_000000_000000.json").write_text(
+        json.dumps({"files": arquivos}), encoding="utf-8"
+    )
+
+
+class TestEstimarCustos:
+    """Testes para a estimativa de custo por arquivo"""
+
+    def test_uses_previous_elapsed_time_for_same_file(self, ambiente):
+        pasta, stats = ambiente
+        _gravar_historico(
+            stats,
+            [
+                {"file_name": "z_grande.pdf", "status": "success", "elapsed_seconds": 9.0,
+                 "page_count": 9},
+                {"file_name": "a.pdf", "status": "error", "elapsed_seconds": 50.0},
+            ],
+        )
+        tarefas, _ = _listar_tarefas(str(pasta))
+        custos = dict(zip([t["_name"] for t in tarefas], _estimar_custos(tarefas)))
+
+        assert custos["z_grande.pdf"] == 9.0
+        assert custos["a.pdf"] == pytest.approx(1.0)  # 1 página estimada × 1 s/página do histórico
+
+    def test_changed_file_falls_back_to_size(self, ambiente):
+        pasta, stats = ambiente
+        _gravar_historico(
+            stats,
+            [{"file_name": "a.pdf", "status": "success", "elapsed_seconds": 9.0, "file_size": 999}],
+        )
+        tarefas, _ = _listar_tarefas(str(pasta))
+
+        assert max(_estimar_custos(tarefas)) < 9.0
+
+
+def test_simular_makespan_longest_first_is_shorter():
+    assert _simular_makespan([1, 1, 1, 1, 4], 2) == 6
+    assert _simular_makespan([4, 1, 1, 1, 1], 2) == 4
+
+
+@pytest.mark.skipif(_CONTEXTO_FORK is None, reason="requer multiprocessing fork")
+def test_parallel_run_dispatches_longest_first_and_keeps_sort_order(ambiente, monkeypatch):
+    pasta, stats = ambiente
+    monkeypatch.setattr(multiprocessing, "get_context", lambda method=None: _CONTEXTO_FORK)
+    _gravar_historico(
+        stats,
+        [
+            {"file_name": nome, "status": "success", "elapsed_seconds": duracao, "page_count": 1}
+            for nome, duracao in DURACOES.items()
+        ],
+    )
+
+    with ExtractorSession(workers=2) as sessao:
+        df = sessao.analisar_pasta_ou_zip(str(pasta))
+
+    assert list(df["Arquivo"]) == sorted(DURACOES)
+    execucao = json.loads(sorted(stats.glob("execucao_2*.json"))[-1].read_text(encoding="utf-8"))
+    escalonamento = execucao["scheduling"]
+    assert escalonamento["strategy"] == "longest_job_first"
+    assert escalonamento["estimated_makespan_seconds"] == pytest.approx(0.4)
+    assert escalonamento["estimated_makespan_sort_order_seconds"] == pytest.approx(0.6)
+    assert escalonamento["makespan_improvement_seconds"] > 0
+    assert len(execucao["files"]) == len(DURACOES)
+
+
+def _fake_processar_pdf_paginado(pdf_file, senha=None, metrics_collector=None, should_stop=None,
+                                 page_callback=None, **_opcoes):
+    nome = Path(str(pdf_file)).name
+    paginas = 0
+    for numero in range(1, 41):
+        if should_stop is not None and should_stop():
+            break
+        time.sleep(0.05)
+        paginas = numero
+        if page_callback is not None:
+            page_callback({"page_number": numero, "page_count": 40, "records_extracted": 0})
+    if metrics_collector is not None:
+        metrics_collector.append(
+            {"file_name": nome, "status": "cancelled" if paginas < 40 else "success", "page_count": 40,
+             "pages_completed": paginas}
+        )
+    return []
+
+
+@pytest.mark.skipif(_CONTEXTO_FORK is None, reason="requer multiprocessing fork")
+def test_parallel_run_relays_pages_and_cancels_workers_before_next_page(ambiente, monkeypatch):
+    pasta, stats = ambiente
+    monkeypatch.setattr(multiprocessing, "get_context", lambda method=None: _CONTEXTO_FORK)
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf_paginado)
+    )
+    eventos = []
+
+    with ExtractorSession(workers=2) as sessao:
+        inicio = time.monotonic()
+        sessao.analisar_pasta_ou_zip(
+            str(pasta),
+            progress_callback=eventos.append,
+            should_stop=lambda: sum(evento["stage"] == "page" for evento in eventos) >= 3,
+        )
+        decorrido = time.monotonic() - inicio
+
+    paginas = [evento for evento in eventos if evento["stage"] == "page"]
+    assert paginas and paginas[0]["page_count"] == 40
+    # Sem a parada repassada, cada um dos dois arquivos em andamento levaria 2 s até o fim
+    assert decorrido < 1.5
+    execucao = json.loads(sorted(stats.glob("execucao_2*.json"))[-1].read_text(encoding="utf-8"))
+    assert execucao["status"] == "cancelled"
+
+
+def test_pool_workers_log_to_the_run_log_file(tmp_path, monkeypatch):
+    """Os processos do pool gravam INFO e avisos no arquivo de log da execução, como o pai."""
+    arquivo_log = tmp_path / "extracao.log"
+    monkeypatch.setattr(extrator_module, "log_file", str(arquivo_log))
+    monkeypatch.setattr(extrator_module, "logging_level", "INFO")
+
+    with ExtractorSession() as sessao:
+        pool = sessao._executor(1, isolate=False)
+        pool.submit(extrator_module.logger.info, "página lida no worker").result(timeout=60)
+        pool.submit(extrator_module.logger.warning, "aviso do worker").result(timeout=60)
+
+    conteudo = arquivo_log.read_text(encoding="utf-8")
+    assert " - INFO - página lida no worker" in conteudo
+    assert " - WARNING - aviso do worker" in conteudo
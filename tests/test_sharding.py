@@ -0,0 +1,211 @@
+"""
+Testes para a divisão do trabalho entre máquinas/processos (--shard i/n e --queue-dir)
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import (
+    _caminho_fila,
+    _concluir_tarefa,
+    _filtrar_shard,
+    _identificador_tarefa,
+    _listar_tarefas,
+    _parse_shard,
+    _reivindicar_tarefa,
+    analisar_pasta_ou_zip,
+)
+
+
+def _fake_processar_pdf(pdf_file, senha=None, metrics_collector=None, **_opcoes):
+    nome = getattr(pdf_file, "name", None) or Path(str(pdf_file)).name
+    if metrics_collector is not None:
+        metrics_collector.append({"file_name": Path(nome).name, "status": "processed", "page_count": 1})
+    return [{"Data": "05/01/2024", "Ticker": "VALE3", "Arquivo": Path(nome).name}]
+
+
+@pytest.fixture
+def pasta_entrada(tmp_path):
+    """Pasta com PDFs diretos e um ZIP com mais PDFs (conteúdo irrelevante: o parser é simulado)."""
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    for indice in range(12):
+        (pasta / f"nota_2024_{indice:02d}.pdf").write_bytes(b"%PDF-fake")
+    with zipfile.ZipFile(pasta / "lote.zip", "w") as z:
+        for indice in range(6):
+            z.writestr(f"notas/nota_2023_{indice:02d}.pdf", b"%PDF-fake")
+    return pasta
+
+
+@pytest.fixture
+def extrator_isolado(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    stats.mkdir()
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setattr(
+        extrator_module.ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf)
+    )
+    return stats
+
+
+def _worker_fila(pasta, fila, resultados):
+    df = analisar_pasta_ou_zip(str(pasta), queue_dir=str(fila))
+    resultados.put(sorted(df["Arquivo"]) if not df.empty else [])
+
+
+class TestParseShard:
+    """Testes para a leitura do argumento --shard"""
+
+    def test_valid(self):
+        assert _parse_shard("2/3") == (2, 3)
+
+    @pytest.mark.parametrize("valor", ["0/3", "4/3", "1/0", "abc", "1-3"])
+    def test_invalid(self, valor):
+        with pytest.raises(ValueError):
+            _parse_shard(valor)
+
+
+class TestShardPartition:
+    """Testes para a partição determinística das tarefas"""
+
+    def test_shards_are_disjoint_and_complete(self, pasta_entrada):
+        tarefas, _ = _listar_tarefas(str(pasta_entrada))
+        particoes = [
+            {_identificador_tarefa(t) for t in _filtrar_shard(tarefas, (i, 3))} for i in (1, 2, 3)
+        ]
+
+        assert sum(len(p) for p in particoes) == len(tarefas) == 18
+        assert set.union(*particoes) == {_identificador_tarefa(t) for t in tarefas}
+
+    def test_partition_does_not_depend_on_mount_point(self, pasta_entrada, tmp_path):
+        copia = tmp_path / "outra_montagem"
+        copia.mkdir()
+        for arquivo in pasta_entrada.iterdir():
+            (copia / arquivo.name).write_bytes(arquivo.read_bytes())
+
+        def _ids(pasta):
+            tarefas, _ = _listar_tarefas(str(pasta))
+            return sorted(_identificador_tarefa(t) for t in _filtrar_shard(tarefas, (1, 4)))
+
+        assert _ids(pasta_entrada) == _ids(copia)
+
+    def test_each_shard_writes_its_own_stats(self, pasta_entrada, extrator_isolado):
+        arquivos = []
+        for indice in (1, 2):
+            df = analisar_pasta_ou_zip(str(pasta_entrada), shard=(indice, 2))
+            arquivos.extend(df["Arquivo"])
+
+        assert sorted(arquivos) == sorted(
+            Path(_identificador_tarefa(t).split("::")[-1]).name
+            for t in _listar_tarefas(str(pasta_entrada))[0]
+        )
+        stats = sorted(extrator_isolado.glob("execucao_*.json"))
+        assert [p.name.endswith(f"_shard{i}de2.json") for i, p in enumerate(stats, 1)] == [True, True]
+        assert json.loads(stats[0].read_text(encoding="utf-8"))["sharding"]["shard"] == "1/2"
+
+
+class TestQueue:
+    """Testes para a fila compartilhada baseada em arquivos .lock"""
+
+    def test_task_can_be_claimed_only_once(self, pasta_entrada, tmp_path):
+        tarefa = _listar_tarefas(str(pasta_entrada))[0][0]
+
+        assert _reivindicar_tarefa(str(tmp_path), tarefa) is True
+        assert _reivindicar_tarefa(str(tmp_path), tarefa) is False
+
+    def _lock_de(self, fila, tarefa, dono, idade_segundos=0):
+        """Grava o lock de outro processo para a tarefa, com a idade desejada."""
+        lock = Path(_caminho_fila(str(fila), tarefa, ".lock"))
+        host, pid = dono.split(":")[:2]
+        dados = {"owner": dono, "host": host, "pid": int(pid)}
+        lock.write_text(json.dumps(dados), encoding="utf-8")
+        antigo = time.time() - idade_segundos
+        os.utime(lock, (antigo, antigo))
+        return lock
+
+    def _pid_encerrado(self):
+        processo = subprocess.Popen([sys.executable, "-c", "pass"])
+        processo.wait()
+        return processo.pid
+
+    def test_lock_of_dead_process_is_reclaimed_once(self, pasta_entrada, tmp_path):
+        tarefa = _listar_tarefas(str(pasta_entrada))[0][0]
+        dono = f"{socket.gethostname()}:{self._pid_encerrado()}:tok"
+        lock = self._lock_de(tmp_path, tarefa, dono)
+
+        assert _reivindicar_tarefa(str(tmp_path), tarefa, lease_seconds=3600) is True
+        assert _reivindicar_tarefa(str(tmp_path), tarefa, lease_seconds=3600) is False
+        assert json.loads(lock.read_text(encoding="utf-8"))["pid"] == os.getpid()
+        assert len(list(tmp_path.glob("*.reclaim"))) == 1
+
+    def test_lock_from_another_host_is_reclaimed_only_after_the_lease(
+        self, pasta_entrada, tmp_path
+    ):
+        recente, antiga = _listar_tarefas(str(pasta_entrada))[0][:2]
+        self._lock_de(tmp_path, recente, "outra-maquina:123:tok", idade_segundos=60)
+        self._lock_de(tmp_path, antiga, "outra-maquina:123:tok", idade_segundos=7200)
+
+        assert _reivindicar_tarefa(str(tmp_path), recente, lease_seconds=3600) is False
+        assert _reivindicar_tarefa(str(tmp_path), antiga, lease_seconds=3600) is True
+
+    def test_presence_of_the_owner_keeps_its_lock(self, pasta_entrada, tmp_path):
+        tarefa = _listar_tarefas(str(pasta_entrada))[0][0]
+        self._lock_de(tmp_path, tarefa, "outra-maquina:123:tok", idade_segundos=7200)
+        (tmp_path / "outra-maquina_123_tok.alive").touch()
+
+        assert _reivindicar_tarefa(str(tmp_path), tarefa, lease_seconds=3600) is False
+
+    def test_completed_task_is_not_reclaimed(self, pasta_entrada, tmp_path):
+        tarefa = _listar_tarefas(str(pasta_entrada))[0][0]
+        self._lock_de(tmp_path, tarefa, f"{socket.gethostname()}:{self._pid_encerrado()}:tok")
+        _concluir_tarefa(str(tmp_path), tarefa, "processed")
+
+        assert _reivindicar_tarefa(str(tmp_path), tarefa, lease_seconds=0) is False
+
+    def test_run_marks_its_tasks_done_and_leaves_the_queue(
+        self, pasta_entrada, extrator_isolado, tmp_path
+    ):
+        fila = tmp_path / "fila"
+
+        df = analisar_pasta_ou_zip(str(pasta_entrada), queue_dir=str(fila))
+
+        assert len(df) == 18
+        assert len(list(fila.glob("*.done"))) == 18
+        assert list(fila.glob("*.alive")) == []
+
+    @pytest.mark.skipif(
+        "fork" not in multiprocessing.get_all_start_methods(), reason="requer multiprocessing fork"
+    )
+    def test_multiprocess_run_processes_each_file_once(
+        self, pasta_entrada, extrator_isolado, tmp_path
+    ):
+        contexto = multiprocessing.get_context("fork")
+        fila = tmp_path / "fila"
+        resultados = contexto.Queue()
+        processos = [
+            contexto.Process(target=_worker_fila, args=(pasta_entrada, fila, resultados))
+            for _ in range(4)
+        ]
+        for processo in processos:
+            processo.start()
+        processados = [resultados.get(timeout=60) for _ in processos]
+        for processo in processos:
+            processo.join(timeout=60)
+
+        todos = [arquivo for lote in processados for arquivo in lote]
+        assert len(todos) == len(set(todos)) == 18
+        assert len(list(fila.glob("*.lock"))) == 18
+        assert len(list(fila.glob("*.done"))) == 18
+        assert len(list(extrator_isolado.glob("execucao_*.json"))) == 4
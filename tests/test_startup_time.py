@@ -0,0 +1,67 @@
+"""
+Testes de tempo de inicialização: importar o extrator não carrega pandas/pdfplumber nem cria arquivos
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+# Orçamento (ms) do import do módulo medido com -X importtime. Antes das importações sob
+# demanda o import levava ~600 ms, dominado por pandas (~350 ms) e pdfplumber (~115 ms).
+ORCAMENTO_IMPORT_MS = 250
+MODULOS_PESADOS = ("pandas", "numpy", "pdfplumber", "pdfminer")
+
+
+def _python(codigo, *opcoes, env=None):
+    return subprocess.run(
+        [sys.executable, *opcoes, "-c", codigo],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+        env=env,
+    )
+
+
+def test_import_stays_within_startup_budget():
+    resultado = _python("import extratorNotasCorretagem", "-X", "importtime")
+
+    assert resultado.returncode == 0, resultado.stderr
+    linha = next(
+        linha for linha in resultado.stderr.splitlines() if linha.rstrip().endswith("| extratorNotasCorretagem")
+    )
+    cumulativo_ms = int(re.split(r"\s*\|\s*", linha)[1]) / 1000
+    assert cumulativo_ms < ORCAMENTO_IMPORT_MS, linha
+
+
+def test_import_defers_heavy_modules_and_has_no_side_effects():
+    resultado = _python(
+        "import json, logging, sys\n"
+        "import extratorNotasCorretagem as m\n"
+        f"pesados = [n for n in {MODULOS_PESADOS!r} if n in sys.modules and not type(sys.modules[n]).__name__ == '_LazyModule']\n"
+        "print(json.dumps({'pesados': pesados, 'log_file': m.log_file, 'handlers': len(logging.getLogger().handlers)}))"
+    )
+
+    assert resultado.returncode == 0, resultado.stderr
+    estado = json.loads(resultado.stdout)
+    assert estado == {"pesados": [], "log_file": None, "handlers": 0}
+
+
+def test_inicializar_creates_folders_and_log_file(tmp_path):
+    resultado = _python(
+        "import extratorNotasCorretagem as m\n"
+        f"m.logs_folder = {str(tmp_path / 'logs')!r}\n"
+        f"m.stats_folder = {str(tmp_path / 'stats')!r}\n"
+        "print(m.inicializar(registrar_sigint=False))\n"
+        "assert m.inicializar() == m.log_file\n"
+        "m.pd.DataFrame()  # o primeiro acesso carrega o pandas de fato\n"
+    )
+
+    assert resultado.returncode == 0, resultado.stderr
+    assert os.path.isfile(resultado.stdout.strip())
+    assert (tmp_path / "stats").is_dir()
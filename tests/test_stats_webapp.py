@@ -47,3 +47,40 @@ def test_stats_webapp_serves_history_and_html(tmp_path, monkeypatch):
     assert payload["summary"]["total_runs"] == 1
     assert payload["runs"][0]["records_extracted"] == 32
     assert payload["runs"][0]["stats_file"] == "execucao_dashboard.json"
+
+
+def test_history_is_cached_until_a_stats_file_changes(tmp_path, monkeypatch):
+    stats_dir = tmp_path / "stats"
+    stats_dir.mkdir()
+    monkeypatch.setattr(execution_stats_module, "STATS_DIR", stats_dir)
+    monkeypatch.setattr(stats_webapp_module, "_RESPONSES", stats_webapp_module.CacheDeRespostas())
+    calls = []
+    original = stats_webapp_module.build_history_payload
+
+    def counting_build(limit):
+        calls.append(limit)
+        return original(limit=limit)
+
+    monkeypatch.setattr(stats_webapp_module, "build_history_payload", counting_build)
+    (stats_dir / "execucao_a.json").write_text(
+        json.dumps({"execution_id": "a", "started_at": "2026-05-14T10:00:00", "status": "completed"}),
+        encoding="utf-8",
+    )
+    client = TestClient(stats_webapp_module.app)
+
+    first = client.get("/api/history")
+    assert client.get("/api/history", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert calls == [20]
+
+    (stats_dir / "execucao_b.json").write_text(
+        json.dumps({"execution_id": "b", "started_at": "2026-05-14T11:00:00", "status": "failed"}),
+        encoding="utf-8",
+    )
+    refreshed = client.get("/api/history", headers={"If-None-Match": first.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert refreshed.json()["summary"]["total_runs"] == 2
+    assert calls == [20, 20]
+
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert page.headers["content-encoding"] == "gzip"
+    assert client.get("/", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
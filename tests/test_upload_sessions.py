@@ -0,0 +1,142 @@
+"""
+Testes para as sessões de upload retomável (upload_sessions.py)
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from upload_sessions import UploadSessionError, UploadSessionStore
+
+CONTEUDO = bytes(range(256)) * 40  # 10 KB
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadSessionStore(str(tmp_path / "sessoes"), max_chunk_bytes=4096, ttl_seconds=3600)
+
+
+def _sha(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def test_chunks_out_of_order_are_assembled_and_verified(store, tmp_path):
+    sessao = store.criar("historico.zip", len(CONTEUDO), _sha(CONTEUDO))
+
+    store.gravar_bloco(sessao["upload_id"], 8192, CONTEUDO[8192:], _sha(CONTEUDO[8192:]))
+    parcial = store.gravar_bloco(sessao["upload_id"], 0, CONTEUDO[:4096])
+
+    assert parcial["received"] == [[0, 4096], [8192, len(CONTEUDO)]]
+    assert parcial["complete"] is False
+
+    store.gravar_bloco(sessao["upload_id"], 4096, CONTEUDO[4096:8192])
+    assert store.obter(sessao["upload_id"])["complete"] is True
+
+    manifesto = store.finalizar(sessao["upload_id"], tmp_path / "job")
+
+    assert manifesto == {"filename": "historico.zip", "size": len(CONTEUDO), "sha256": _sha(CONTEUDO)}
+    assert (tmp_path / "job" / "historico.zip").read_bytes() == CONTEUDO
+    with pytest.raises(UploadSessionError) as erro:
+        store.obter(sessao["upload_id"])
+    assert erro.value.status_code == 404
+
+
+def test_invalid_chunks_are_rejected(store):
+    upload_id = store.criar("nota.pdf", 100)["upload_id"]
+
+    casos = [
+        ((upload_id, 90, b"x" * 20), 416),
+        ((upload_id, 0, b"x" * 10, "0" * 64), 422),
+        ((upload_id, 0, b"x" * 5000), 413),
+        (("../../etc", 0, b"x"), 404),
+    ]
+    for argumentos, status in casos:
+        with pytest.raises(UploadSessionError) as erro:
+            store.gravar_bloco(*argumentos)
+        assert erro.value.status_code == status
+
+
+def test_finalize_requires_complete_and_matching_file(store, tmp_path):
+    incompleta = store.criar("nota.pdf", 10)["upload_id"]
+    store.gravar_bloco(incompleta, 0, b"12345")
+    with pytest.raises(UploadSessionError) as erro:
+        store.finalizar(incompleta, tmp_path / "job")
+    assert erro.value.status_code == 409
+
+    divergente = store.criar("nota.pdf", 5, _sha(b"abcde"))["upload_id"]
+    store.gravar_bloco(divergente, 0, b"12345")
+    with pytest.raises(UploadSessionError) as erro:
+        store.finalizar(divergente, tmp_path / "job")
+    assert erro.value.status_code == 422
+    # A sessão continua disponível para reenviar o bloco correto
+    store.gravar_bloco(divergente, 0, b"abcde")
+    assert store.finalizar(divergente, tmp_path / "job")["sha256"] == _sha(b"abcde")
+
+
+def test_resending_chunk_replaces_previous_one(store, tmp_path):
+    upload_id = store.criar("nota.pdf", 6)["upload_id"]
+    store.gravar_bloco(upload_id, 0, b"xxx")
+    store.gravar_bloco(upload_id, 3, b"def")
+    store.gravar_bloco(upload_id, 0, b"abc")
+
+    assert store.finalizar(upload_id, tmp_path / "job")["sha256"] == _sha(b"abcdef")
+
+
+def test_idle_sessions_expire(store):
+    antiga = store.criar("antiga.pdf", 1)["upload_id"]
+    passado = time.time() - 7200
+    os.utime(store.pasta / antiga / "sessao.json", (passado, passado))
+
+    store.criar("nova.pdf", 1)
+
+    assert not (store.pasta / antiga).exists()
+
+
+def test_concurrent_chunks_from_separate_workers_keep_every_record(store, tmp_path):
+    # Dois stores na mesma pasta simulam dois workers do uvicorn (sem lock em memória comum)
+    outro_worker = UploadSessionStore(str(store.pasta), max_chunk_bytes=4096, ttl_seconds=3600)
+    tamanho = 64
+    upload_id = store.criar("nota.pdf", tamanho * 32)["upload_id"]
+
+    def enviar(worker, offsets):
+        for offset in offsets:
+            worker.gravar_bloco(upload_id, offset, CONTEUDO[offset : offset + tamanho])
+
+    threads = [
+        threading.Thread(target=enviar, args=(worker, range(inicio, tamanho * 32, tamanho * 2)))
+        for worker, inicio in ((store, 0), (outro_worker, tamanho))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.obter(upload_id)["complete"]
+    assert len(store._ler(upload_id)["chunks"]) == 32
+    assert [p.name for p in (store.pasta / upload_id).glob("*.tmp")] == []
+
+
+def test_chunk_is_written_as_parts_arrive(store, tmp_path):
+    upload_id = store.criar("nota.pdf", 4096)["upload_id"]
+
+    bloco = store.abrir_bloco(upload_id, 0)
+    for inicio in range(0, 4096, 1000):
+        bloco.escrever(CONTEUDO[inicio : min(inicio + 1000, 4096)])
+    assert bloco.concluir(_sha(CONTEUDO[:4096]))["complete"]
+
+    excedente = store.abrir_bloco(upload_id, 0)
+    excedente.escrever(b"x" * 4096)
+    with pytest.raises(UploadSessionError) as erro:
+        excedente.escrever(b"x")
+    assert erro.value.status_code == 413
+    # O bloco interrompido não é registrado; o anterior no mesmo offset acusa a sobrescrita
+    with pytest.raises(UploadSessionError) as erro:
+        store.finalizar(upload_id, tmp_path / "job")
+    assert erro.value.status_code == 422
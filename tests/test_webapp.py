@@ -1,14 +1,28 @@
+import hashlib
+import json
+import os
+import re
 import sys
+import threading
+import time
+import zipfile
+from contextlib import closing
+from io import BytesIO
 from pathlib import Path
+from types import SimpleNamespace
 
 import pandas as pd
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from PIL import Image
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 import webapp as webapp_module
+from http_encoding import CacheDeRespostas
+from job_store import SQLiteJobStore
+from result_cache import ResultCache
 
 
 @pytest.fixture()
@@ -19,14 +33,17 @@ def client(tmp_path, monkeypatch):
     Responsabilidades:
     - Redireciona OUTPUT_DIR para um diretório temporário isolado por teste,
       evitando que arquivos gerados poluam o repositório.
-    - Limpa o dicionário de jobs em memória antes e depois de cada teste,
-      garantindo isolamento entre execuções paralelas ou sequenciais.
+    - Usa um job store SQLite e um cache de resultados novos por teste (o padrão
+      do webapp), garantindo isolamento entre execuções paralelas ou sequenciais.
     - Substitui as funções de análise de PDF e exportação pelas versões fake,
       para que os testes de /api/process não dependam de arquivos reais.
+    - Desliga a extração antecipada dos uploads (os testes dela a religam).
     """
     monkeypatch.setattr(webapp_module, "OUTPUT_DIR", tmp_path)
-    with webapp_module._JOBS_LOCK:
-        webapp_module._PROCESS_JOBS.clear()
+    monkeypatch.setattr(webapp_module.config, "get_web_upload_prefetch_workers", lambda: 0)
+    monkeypatch.setattr(webapp_module, "_JOB_STORE", SQLiteJobStore(str(tmp_path / "jobs.sqlite")))
+    monkeypatch.setattr(webapp_module, "_RESULT_CACHE", ResultCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(webapp_module, "_RESPONSES", CacheDeRespostas())
 
     def fake_analisar_pasta_ou_zip(caminho, year_filter=None, sort_by="name"):
         return pd.DataFrame(
@@ -39,19 +56,18 @@ def client(tmp_path, monkeypatch):
             }
         )
 
-    def fake_exportar_dados(df, formato=None, ticker=None):
+    def fake_exportar_dados(df, formato=None, ticker=None, pasta=None):
         suffix = f"_{ticker.upper()}" if ticker else ""
-        export_name = f"dados_extraidos{suffix}_20260513_120000.csv"
-        (tmp_path / export_name).write_text("Data,Ticker\n13/05/2026,VALE3\n", encoding="utf-8")
-        return True
+        export_path = Path(pasta or tmp_path) / f"dados_extraidos{suffix}_20260513_120000.csv"
+        export_path.parent.mkdir(parents=True, exist_ok=True)
+        export_path.write_text("Data,Ticker\n13/05/2026,VALE3\n", encoding="utf-8")
+        return [str(export_path)]
 
     monkeypatch.setattr(webapp_module, "analisar_pasta_ou_zip", fake_analisar_pasta_ou_zip)
     monkeypatch.setattr(webapp_module, "exportar_dados", fake_exportar_dados)
 
     test_client = TestClient(webapp_module.app)
     yield test_client
-    with webapp_module._JOBS_LOCK:
-        webapp_module._PROCESS_JOBS.clear()
 
 
 def test_index_returns_html(client):
@@ -107,8 +123,10 @@ def test_process_endpoint_returns_preview_and_download(client):
     assert payload["records_extracted"] == 2
     # O endpoint deve confirmar que recebeu exatamente 1 arquivo
     assert payload["files_received"] == 1
-    # A URL de download deve apontar para o arquivo gerado pelo fake_exportar_dados
-    assert payload["download_url"] == "/api/download/dados_extraidos_20260513_120000.csv"
+    # A URL de download deve apontar para o arquivo gerado na pasta própria da requisição
+    assert re.fullmatch(
+        r"/api/download/jobs/[0-9a-f]{32}/dados_extraidos_20260513_120000\.csv", payload["download_url"]
+    )
     # A pré-visualização deve conter as mesmas 2 linhas retornadas pelo fake
     assert len(payload["preview_rows"]) == 2
 
@@ -121,13 +139,13 @@ def test_download_endpoint_serves_exported_file(client):
     depois solicita o download pelo nome do arquivo e confirma que o conteúdo é
     entregue com o Content-Type correto.
     """
-    client.post(
+    payload = client.post(
         "/api/process",
         files={"files": ("nota.pdf", b"dummy pdf", "application/pdf")},
         data={"sort_by": "name", "output_format": "csv"},
-    )
+    ).json()
 
-    response = client.get("/api/download/dados_extraidos_20260513_120000.csv")
+    response = client.get(payload["download_url"])
 
     # O arquivo deve ser encontrado e entregue com sucesso
     assert response.status_code == 200
@@ -148,8 +166,8 @@ def test_cancel_process_job_sets_cancelling_state(client):
     e não apenas retornada pontualmente na resposta do POST.
     """
     job_id = "job_cancel_test"
-    with webapp_module._JOBS_LOCK:
-        webapp_module._PROCESS_JOBS[job_id] = {
+    webapp_module._JOB_STORE.criar(
+        {
             "job_id": job_id,
             "status": "running",
             "message": "Processando",
@@ -160,6 +178,7 @@ def test_cancel_process_job_sets_cancelling_state(client):
             "result": None,
             "error": None,
         }
+    )
 
     response = client.post(f"/api/process/cancel/{job_id}")
 
@@ -186,8 +205,8 @@ def test_cancel_process_job_returns_final_state_when_already_done(client):
     cancelamento para uma operação que já terminou.
     """
     job_id = "job_done_test"
-    with webapp_module._JOBS_LOCK:
-        webapp_module._PROCESS_JOBS[job_id] = {
+    webapp_module._JOB_STORE.criar(
+        {
             "job_id": job_id,
             "status": "completed",
             "message": "Processamento concluído.",
@@ -198,6 +217,7 @@ def test_cancel_process_job_returns_final_state_when_already_done(client):
             "result": {"records_extracted": 1},
             "error": None,
         }
+    )
 
     response = client.post(f"/api/process/cancel/{job_id}")
 
@@ -207,6 +227,184 @@ def test_cancel_process_job_returns_final_state_when_already_done(client):
     assert payload["status"] == "completed"
 
 
+def test_resume_process_job_starts_new_job_from_checkpoint(client, tmp_path):
+    """
+    Verifica que um job cancelado com checkpoint pode ser retomado uma única vez.
+
+    O job original precisa estar 'cancelled' e ter checkpoint_execution_id; a
+    retomada cria um novo job com os mesmos parâmetros e consome o checkpoint,
+    de modo que uma segunda tentativa é recusada com HTTP 409.
+    """
+    job_id = "job_resume_test"
+    webapp_module._JOB_STORE.criar(
+        {
+            "job_id": job_id,
+            "status": "cancelled",
+            "message": "Processamento interrompido pelo usuário.",
+            "cancel_requested": True,
+            "current_file": "",
+            "processed_files": 1,
+            "total_files": 2,
+            "result": None,
+            "error": None,
+            "checkpoint_execution_id": "20260513_120000_000000",
+            "request": {
+                "temp_path": tmp_path,
+                "year": None,
+                "ticker": None,
+                "sort_by": "name",
+                "output_format": "csv",
+                "files_received": 2,
+                "e2e_demo": False,
+            },
+        }
+    )
+
+    assert client.get(f"/api/process/status/{job_id}").json()["resumable"] is True
+
+    response = client.post(f"/api/process/resume/{job_id}")
+
+    # A retomada devolve o identificador do novo job
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["resumed_from"] == job_id
+    assert payload["job_id"] != job_id
+
+    # O checkpoint foi consumido: o job original não pode ser retomado de novo
+    assert client.post(f"/api/process/resume/{job_id}").status_code == 409
+
+
+@pytest.fixture()
+def blocked_executor(monkeypatch):
+    """
+    Executor de jobs pequeno cujos jobs ficam presos até o teste liberar.
+
+    Devolve uma função que cria o executor com os limites desejados, além dos
+    eventos 'started' (algum job começou a rodar) e 'release' (libera os jobs).
+    """
+    started = threading.Event()
+    release = threading.Event()
+    executors = []
+
+    def fake_run_processing_job(job_id, temp_path, *args):
+        started.set()
+        release.wait(5)
+        webapp_module._update_job(job_id, status="completed")
+
+    monkeypatch.setattr(webapp_module, "_run_processing_job", fake_run_processing_job)
+
+    def make(max_concurrent, max_queued, max_per_client):
+        executor = webapp_module._JobExecutor(max_concurrent, max_queued, max_per_client)
+        monkeypatch.setattr(webapp_module, "_JOB_EXECUTOR", executor)
+        executors.append(executor)
+        return executor
+
+    yield make, started
+    release.set()
+    for executor in executors:
+        executor._pool.shutdown(wait=True)
+
+
+def _start_job(client):
+    return client.post(
+        "/api/process/start",
+        files=[("files", ("nota.pdf", b"%PDF", "application/pdf"))],
+    )
+
+
+def test_start_returns_429_with_retry_after_when_queue_is_full(client, blocked_executor):
+    """
+    Com um job rodando e a fila cheia, novos jobs são recusados com HTTP 429.
+
+    O job na fila informa sua posição no status e a recusa traz Retry-After.
+    """
+    make, started = blocked_executor
+    make(max_concurrent=1, max_queued=1, max_per_client=5)
+
+    assert _start_job(client).status_code == 200
+    assert started.wait(5)
+    queued = _start_job(client)
+    assert queued.status_code == 200
+    assert queued.json()["queue_position"] == 1
+
+    status = client.get(f"/api/process/status/{queued.json()['job_id']}").json()
+    assert status["status"] == "queued"
+    assert status["queue_position"] == 1
+    assert "posição 1" in status["message"]
+
+    rejected = _start_job(client)
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+    # O job recusado não fica registrado
+    assert len(webapp_module._JOB_STORE.listar()) == 2
+
+
+def test_start_rejects_before_reading_the_upload(client, blocked_executor, monkeypatch):
+    """Sem vaga para o cliente, o 429 sai antes de gravar os arquivos ou iniciar a extração."""
+    make, _ = blocked_executor
+    make(max_concurrent=1, max_queued=5, max_per_client=1)
+    assert _start_job(client).status_code == 200
+
+    async def fail_receive(*args, **kwargs):
+        raise AssertionError("o corpo não deveria ser lido")
+
+    def fail_prefetch():
+        raise AssertionError("a extração antecipada não deveria começar")
+
+    monkeypatch.setattr(webapp_module, "_receive_uploads", fail_receive)
+    monkeypatch.setattr(webapp_module, "_new_upload_prefetch", fail_prefetch)
+
+    response = _start_job(client)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_shutdown_cancels_queued_jobs_and_flags_running_ones(client, blocked_executor):
+    """No fim do servidor, os jobs na fila são cancelados e os em execução recebem o pedido de cancelamento."""
+    make, started = blocked_executor
+    executor = make(max_concurrent=1, max_queued=2, max_per_client=5)
+    rodando = _start_job(client).json()["job_id"]
+    assert started.wait(5)
+    na_fila = _start_job(client).json()["job_id"]
+    futuro = executor._futuros[na_fila]
+
+    executor.encerrar()
+
+    assert futuro.cancelled()
+    assert webapp_module._get_job(rodando)["cancel_requested"] is True
+
+
+def test_start_enforces_per_client_limit(client, blocked_executor):
+    """Um mesmo cliente não passa de web.max_jobs_per_client jobs, mesmo com a fila vazia."""
+    make, _ = blocked_executor
+    make(max_concurrent=2, max_queued=5, max_per_client=1)
+
+    assert _start_job(client).status_code == 200
+    response = _start_job(client)
+
+    assert response.status_code == 429
+    assert "por cliente" in response.json()["detail"]
+
+
+def test_cancel_queued_job_removes_it_from_queue(client, blocked_executor):
+    """Cancelar um job que ainda está na fila o finaliza na hora e apaga os uploads."""
+    make, started = blocked_executor
+    make(max_concurrent=1, max_queued=2, max_per_client=5)
+    _start_job(client)
+    assert started.wait(5)
+    job_id = _start_job(client).json()["job_id"]
+    temp_path = webapp_module._get_job(job_id)["request"]["temp_path"]
+
+    response = client.post(f"/api/process/cancel/{job_id}")
+
+    assert response.json()["status"] == "cancelled"
+    assert webapp_module._JOB_EXECUTOR.posicao(job_id) is None
+    assert not Path(temp_path).exists()
+    # A vaga na fila foi liberada
+    assert _start_job(client).json()["queue_position"] == 1
+
+
 def test_process_image_endpoint_rejects_non_image(client):
     """
     Garante que o endpoint /api/process-image recusa arquivos que não são imagens.
@@ -253,7 +451,7 @@ def test_process_image_endpoint_returns_sheets_payload(client, monkeypatch):
         def recognize(self, *_args, **_kwargs):
             return fake_results
 
-    monkeypatch.setattr(webapp_module._ocrmac, "OCR", FakeOCR)
+    monkeypatch.setattr(webapp_module, "_ocrmac", SimpleNamespace(OCR=FakeOCR))
 
     response = client.post(
         "/api/process-image",
@@ -272,6 +470,23 @@ def test_process_image_endpoint_returns_sheets_payload(client, monkeypatch):
     assert "\t" in payload["sheets_text"]
 
 
+
+def test_process_image_without_ocrmac_returns_503(client, monkeypatch):
+    """Sem o pacote ocrmac (Linux/Windows) o app sobe normalmente e só o OCR fica indisponível."""
+    image = Image.new("RGB", (60, 40), "white")
+    buffer = webapp_module.BytesIO()
+    image.save(buffer, format="PNG")
+    monkeypatch.setattr(webapp_module, "_ocrmac", None)
+    monkeypatch.setitem(sys.modules, "ocrmac", None)
+
+    response = client.post(
+        "/api/process-image",
+        files={"file": ("extrato.png", buffer.getvalue(), "image/png")},
+    )
+
+    assert response.status_code == 503
+    assert "ocrmac" in response.json()["detail"]
+
 def test_process_image_multiline_ocr(client, monkeypatch):
     """
     Verifica o parsing de um extrato com múltiplos registros em datas diferentes,
@@ -316,7 +531,7 @@ def test_process_image_multiline_ocr(client, monkeypatch):
         def recognize(self, *_args, **_kwargs):
             return fake_results
 
-    monkeypatch.setattr(webapp_module._ocrmac, "OCR", FakeOCR)
+    monkeypatch.setattr(webapp_module, "_ocrmac", SimpleNamespace(OCR=FakeOCR))
 
     response = client.post(
         "/api/process-image",
@@ -433,7 +648,7 @@ def test_process_image_bbox_sorting_fixes_column_ordering(client, monkeypatch):
         def recognize(self, *_args, **_kwargs):
             return fake_results
 
-    monkeypatch.setattr(webapp_module._ocrmac, "OCR", FakeOCR)
+    monkeypatch.setattr(webapp_module, "_ocrmac", SimpleNamespace(OCR=FakeOCR))
 
     response = client.post(
         "/api/process-image",
@@ -478,7 +693,7 @@ def test_process_image_hoje_uses_today_date(client, monkeypatch):
         def recognize(self, *_args, **_kwargs):
             return fake_results
 
-    monkeypatch.setattr(webapp_module._ocrmac, "OCR", FakeOCR)
+    monkeypatch.setattr(webapp_module, "_ocrmac", SimpleNamespace(OCR=FakeOCR))
 
     response = client.post(
         "/api/process-image",
@@ -492,4 +707,741 @@ def test_process_image_hoje_uses_today_date(client, monkeypatch):
     today = _dt.now().strftime("%d/%m/%Y")
     assert payload["preview_rows"][0]["Data"] == today
     assert payload["preview_rows"][0]["Ticker"] == "TVRI11"
-    assert payload["preview_rows"][0]["Valor Recebido"] == "257,25"
\ No newline at end of file
+    assert payload["preview_rows"][0]["Valor Recebido"] == "257,25"
+
+def test_restart_requeues_orphan_queued_jobs(client, blocked_executor, tmp_path, monkeypatch):
+    """
+    Ao subir, o webapp assume os jobs de processos que não existem mais.
+
+    O job que estava na fila volta para a fila do novo processo; o que estava
+    rodando é marcado como falho e tem os uploads apagados.
+    """
+    make, started = blocked_executor
+    make(max_concurrent=1, max_queued=2, max_per_client=5)
+    monkeypatch.setattr(webapp_module, "dono_ativo", lambda dono: False)
+    uploads = {}
+    for job_id, status in (("orfao_fila", "queued"), ("orfao_rodando", "running")):
+        uploads[job_id] = tmp_path / job_id
+        uploads[job_id].mkdir()
+        webapp_module._JOB_STORE.criar(
+            {
+                "job_id": job_id,
+                "status": status,
+                "cancel_requested": False,
+                "processed_files": 0,
+                "total_files": 1,
+                "dono": "servidor-antigo:1",
+                "client": "10.0.0.1",
+                "request": {
+                    "temp_path": str(uploads[job_id]),
+                    "year": None,
+                    "ticker": None,
+                    "sort_by": "name",
+                    "output_format": "csv",
+                    "files_received": 1,
+                    "e2e_demo": False,
+                },
+            }
+        )
+
+    assert webapp_module._recuperar_jobs_orfaos() == 1
+
+    assert started.wait(5)
+    assert webapp_module._get_job("orfao_fila")["dono"] == webapp_module.dono_atual()
+    failed = client.get("/api/process/status/orfao_rodando").json()
+    assert failed["status"] == "failed"
+    assert not uploads["orfao_rodando"].exists()
+    # Uma segunda recuperação não assume de novo o job já recolocado na fila
+    monkeypatch.setattr(webapp_module, "dono_ativo", lambda dono: dono == webapp_module.dono_atual())
+    assert webapp_module._recuperar_jobs_orfaos() == 0
+
+
+def test_status_of_job_queued_by_another_worker_uses_store_position(client):
+    """Um job na fila de outro worker informa a posição pela ordem de criação no job store."""
+    for job_id in ("primeiro", "segundo"):
+        webapp_module._JOB_STORE.criar(
+            {"job_id": job_id, "status": "queued", "dono": "outro-worker:1", "total_files": 1}
+        )
+
+    payload = client.get("/api/process/status/segundo").json()
+
+    assert payload["queue_position"] == 2
+
+
+def _parse_sse(body):
+    """Converte o corpo text/event-stream em uma lista de (evento, id, dados)."""
+    eventos = []
+    for bloco in body.strip().split("\n\n"):
+        campos = dict(linha.split(": ", 1) for linha in bloco.splitlines() if not linha.startswith(":"))
+        eventos.append((campos["event"], campos.get("id"), json.loads(campos["data"])))
+    return eventos
+
+
+def _run_job_with_progress(monkeypatch, tmp_path, job_id):
+    """Roda um job até o fim com uma análise fake que emite os eventos de progresso."""
+
+    def fake_analisar(caminho, year_filter=None, sort_by="name", progress_callback=None, **_opcoes):
+        base = {"current_file": "nota.pdf", "failed_files": 0, "total_files": 1}
+        progress_callback({**base, "stage": "started", "current_file": "", "processed_files": 0})
+        progress_callback({**base, "stage": "processing", "processed_files": 0})
+        for pagina in (1, 2):
+            progress_callback(
+                {**base, "stage": "page", "processed_files": 0, "page_number": pagina,
+                 "page_count": 2, "records_extracted": 1}
+            )
+        progress_callback({**base, "stage": "processed", "processed_files": 1})
+        progress_callback({**base, "stage": "finished", "current_file": "", "processed_files": 1})
+        return pd.DataFrame({"Data": ["13/05/2026"], "Ticker": ["VALE3"]})
+
+    monkeypatch.setattr(webapp_module, "analisar_pasta_ou_zip", fake_analisar)
+    uploads = tmp_path / f"uploads_{job_id}"
+    uploads.mkdir()
+    webapp_module._JOB_STORE.criar(
+        {"job_id": job_id, "status": "queued", "cancel_requested": False, "total_files": 1}
+    )
+    webapp_module._run_processing_job(job_id, uploads, None, None, "name", "csv", 1, False)
+
+
+def test_events_stream_pushes_progress_pages_and_result_once(client, tmp_path, monkeypatch):
+    """
+    O stream SSE repassa os estágios de progresso e as páginas, e envia o resultado uma vez.
+
+    O job termina antes da conexão: os eventos guardados pelo processo são
+    repassados em ordem e o stream se encerra com o evento 'result'.
+    """
+    _run_job_with_progress(monkeypatch, tmp_path, "job_sse")
+
+    response = client.get("/api/process/events/job_sse")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    eventos = _parse_sse(response.text)
+    assert [(evento, dados.get("stage")) for evento, _, dados in eventos] == [
+        ("progress", "started"),
+        ("progress", "processing"),
+        ("page", None),
+        ("page", None),
+        ("progress", "processed"),
+        ("progress", "finished"),
+        ("progress", "completed"),
+        ("result", None),
+    ]
+    assert eventos[2][2] == {"current_file": "nota.pdf", "page_number": 1, "page_count": 2, "records_extracted": 1}
+    assert eventos[4][2]["progress_percent"] == 100
+    # Só o evento final carrega o resultado (com as linhas de preview)
+    assert [evento for evento, _, dados in eventos if "result" in dados] == ["result"]
+    assert eventos[-1][2]["status"] == "completed"
+    assert eventos[-1][2]["result"]["records_extracted"] == 1
+
+
+def test_events_stream_resumes_after_last_event_id(client, tmp_path, monkeypatch):
+    """Ao reconectar com Last-Event-ID, só os eventos posteriores são reenviados."""
+    _run_job_with_progress(monkeypatch, tmp_path, "job_sse_retomado")
+    eventos = _parse_sse(client.get("/api/process/events/job_sse_retomado").text)
+    ultimo_id_pagina = [event_id for evento, event_id, _ in eventos if evento == "page"][-1]
+
+    response = client.get(
+        "/api/process/events/job_sse_retomado", headers={"Last-Event-ID": ultimo_id_pagina}
+    )
+
+    assert [evento for evento, _, _ in _parse_sse(response.text)] == [
+        "progress", "progress", "progress", "result"
+    ]
+
+
+def test_events_stream_of_job_from_another_worker_reads_the_store(client):
+    """Sem eventos locais (job de outro worker), o stream usa o estado do job store."""
+    webapp_module._JOB_STORE.criar(
+        {"job_id": "job_remoto", "status": "completed", "message": "Pronto.", "total_files": 1,
+         "processed_files": 1, "result": {"records_extracted": 3}}
+    )
+
+    eventos = _parse_sse(client.get("/api/process/events/job_remoto").text)
+
+    assert [evento for evento, _, _ in eventos] == ["result"]
+    assert eventos[0][2]["result"] == {"records_extracted": 3}
+    assert client.get("/api/process/events/inexistente").status_code == 404
+
+
+def test_start_records_upload_sizes_and_hashes(client, blocked_executor, monkeypatch):
+    """Os uploads são gravados em blocos e o job guarda tamanho e SHA-256 de cada arquivo."""
+    monkeypatch.setattr(webapp_module.config, "get_web_upload_chunk_kb", lambda: 1)
+    make, _ = blocked_executor
+    make(max_concurrent=1, max_queued=2, max_per_client=5)
+    conteudo = b"%PDF" + b"x" * 5000
+
+    response = client.post(
+        "/api/process/start", files=[("files", ("nota.pdf", conteudo, "application/pdf"))]
+    )
+
+    job = webapp_module._get_job(response.json()["job_id"])
+    assert job["request"]["uploads"] == [
+        {"filename": "nota.pdf", "size": len(conteudo), "sha256": hashlib.sha256(conteudo).hexdigest()}
+    ]
+    assert (Path(job["request"]["temp_path"]) / "nota.pdf").read_bytes() == conteudo
+
+
+def test_start_rejects_file_over_upload_limit(client, monkeypatch, tmp_path):
+    """Um arquivo acima de web.max_upload_mb é recusado com 413 e nada fica em disco."""
+    monkeypatch.setattr(webapp_module.config, "get_web_max_upload_mb", lambda: 1 / 1024)
+    monkeypatch.setattr(webapp_module.config, "get_web_upload_chunk_kb", lambda: 1)
+    criados = []
+    mkdtemp = webapp_module.tempfile.mkdtemp
+    monkeypatch.setattr(
+        webapp_module.tempfile, "mkdtemp", lambda **kwargs: criados.append(mkdtemp(**kwargs)) or criados[-1]
+    )
+
+    response = client.post(
+        "/api/process/start", files=[("files", ("grande.zip", b"z" * 4096, "application/zip"))]
+    )
+
+    assert response.status_code == 413
+    assert "grande.zip" in response.json()["detail"]
+    assert not Path(criados[0]).exists()
+    assert webapp_module._JOB_STORE.listar() == []
+
+
+def _multipart_body(boundary, fields, files, fields_first=True):
+    campos = []
+    for nome, valor in fields:
+        campos.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    arquivos = []
+    for nome_arquivo, conteudo in files:
+        arquivos.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{nome_arquivo}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".encode()
+            + conteudo
+            + b"\r\n"
+        )
+    partes = campos + arquivos if fields_first else arquivos + campos
+    return b"".join(partes) + f"--{boundary}--\r\n".encode()
+
+
+def test_streamed_upload_reports_the_limit_actually_exceeded(monkeypatch, tmp_path):
+    """O 413 da leitura em fluxo diz se o limite excedido foi o do arquivo ou o da requisição."""
+    monkeypatch.setattr(webapp_module.config, "get_web_max_upload_mb", lambda: 1 / 1024)
+    monkeypatch.setattr(webapp_module.config, "get_web_max_request_mb", lambda: 2 / 1024)
+    corpo = _multipart_body("limite", [], [("a.pdf", b"a" * 1000), ("b.pdf", b"b" * 1000)])
+    grande = _multipart_body("limite", [], [("grande.pdf", b"g" * 1500)])
+
+    erros = []
+    for conteudo in (corpo, grande):
+        uploads = webapp_module._StreamedUploads("multipart/form-data; boundary=limite", tmp_path)
+        with pytest.raises(webapp_module.HTTPException) as erro:
+            for inicio in range(0, len(conteudo), 256):
+                uploads.feed(conteudo[inicio : inicio + 256])
+        uploads.close()
+        erros.append(erro.value)
+
+    assert erros[0].status_code == 413
+    assert erros[0].detail.startswith("A requisição excede o limite de 0 MB")
+    assert erros[1].status_code == 413
+    assert erros[1].detail.startswith("O arquivo grande.pdf excede o limite")
+
+
+def test_streamed_upload_limits_form_fields(tmp_path):
+    """Um campo de formulário acima de _MAX_FIELD_BYTES é recusado com 413 sem ser acumulado."""
+    limite = webapp_module._MAX_FIELD_BYTES
+    corpo = _multipart_body("campo", [("ticker", "A" * (limite + 1))], [("a.pdf", b"%PDF")])
+    uploads = webapp_module._StreamedUploads("multipart/form-data; boundary=campo", tmp_path)
+
+    with pytest.raises(webapp_module.HTTPException) as erro:
+        for inicio in range(0, len(corpo), 4096):
+            uploads.feed(corpo[inicio : inicio + 4096])
+    uploads.close()
+
+    assert erro.value.status_code == 413
+    assert erro.value.detail.startswith("O campo ticker excede o limite")
+
+
+def test_streamed_upload_rejects_repeated_filenames(tmp_path):
+    """Dois arquivos com o mesmo nome não se sobrescrevem: a requisição é recusada com 400."""
+    corpo = _multipart_body("repetido", [], [("nota.pdf", b"primeiro"), ("nota.pdf", b"segundo")])
+    uploads = webapp_module._StreamedUploads("multipart/form-data; boundary=repetido", tmp_path)
+
+    with pytest.raises(webapp_module.HTTPException) as erro:
+        uploads.feed(corpo)
+    uploads.close()
+
+    assert erro.value.status_code == 400
+    assert "nota.pdf" in erro.value.detail
+    assert (tmp_path / "nota.pdf").read_bytes() == b"primeiro"
+
+
+class _FakePrefetchSession:
+    """Sessão de extração fake: cada PDF vira um registro com o tamanho do conteúdo."""
+
+    def __init__(self):
+        self.extraidos = []
+        self.primeiro = threading.Event()
+
+    def assinatura_extracao(self, atualizar=True):
+        return "assinatura"
+
+    def processar_pdf(self, pdf, metrics_collector=None, should_stop=None, ticker_filter=None):
+        conteudo = pdf.getvalue() if hasattr(pdf, "getvalue") else Path(pdf).read_bytes()
+        self.extraidos.append((getattr(pdf, "name", None) or Path(pdf).name, ticker_filter))
+        self.primeiro.set()
+        metrics_collector.append({"pages": [{"page": 1}]})
+        return [{"Ticker": ticker_filter or "VALE3", "Quantidade": len(conteudo)}]
+
+
+def test_completed_parts_are_extracted_before_the_body_ends(monkeypatch, tmp_path):
+    """Um PDF (ou entrada de ZIP) concluído vai para a extração sem esperar o restante do corpo."""
+    sessao = _FakePrefetchSession()
+    monkeypatch.setattr(webapp_module, "sessao_padrao", lambda: sessao)
+    executor = webapp_module.ThreadPoolExecutor(max_workers=1)
+    prefetch = webapp_module._UploadPrefetch(executor, cache=None)
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as arquivo_zip:
+        arquivo_zip.writestr("2024/nota_zip.pdf", b"%PDF zip")
+    corpo = _multipart_body(
+        "fluxo",
+        [("ticker", "VALE3")],
+        [("nota.pdf", b"%PDF solto"), ("notas.zip", zip_buffer.getvalue())],
+    )
+    fim_do_primeiro = corpo.index(b"--fluxo", corpo.index(b"%PDF solto"))
+    uploads = webapp_module._StreamedUploads(
+        "multipart/form-data; boundary=fluxo", tmp_path, on_file=prefetch.add
+    )
+
+    uploads.feed(corpo[: fim_do_primeiro + 10])
+    assert sessao.primeiro.wait(5), "o PDF concluído deveria ser extraído antes do fim do corpo"
+    uploads.feed(corpo[fim_do_primeiro + 10 :])
+    uploads.finish()
+    # Aguarda as extrações na fila: na primeira busca, o job assume as que ainda não começaram
+    executor.shutdown(wait=True)
+
+    chave_zip = webapp_module.chave_cache_registros(
+        hashlib.sha256(b"%PDF zip").hexdigest(), "assinatura", "VALE3"
+    )
+    assert prefetch.buscar(chave_zip) == [{"Ticker": "VALE3", "Quantidade": len(b"%PDF zip")}]
+    assert sorted(sessao.extraidos) == [("nota.pdf", "VALE3"), ("nota_zip.pdf", "VALE3")]
+
+
+def test_start_uses_records_extracted_during_upload(client, monkeypatch):
+    """O job recebe a extração antecipada como record_cache e não refaz os arquivos já extraídos."""
+    sessao = _FakePrefetchSession()
+    monkeypatch.setattr(webapp_module, "sessao_padrao", lambda: sessao)
+    monkeypatch.setattr(webapp_module.config, "get_web_upload_prefetch_workers", lambda: 1)
+    monkeypatch.setattr(webapp_module, "_PREFETCH_EXECUTOR", None)
+    conteudo = b"%PDF" * 10
+    buscados = []
+
+    def fake_analisar(caminho, year_filter=None, sort_by="name", record_cache=None, **_opcoes):
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        chave = webapp_module.chave_cache_registros(sha256, "assinatura", None)
+        buscados.append(record_cache.buscar(chave))
+        return pd.DataFrame({"Data": ["13/05/2026"], "Ticker": ["VALE3"]})
+
+    monkeypatch.setattr(webapp_module, "analisar_pasta_ou_zip", fake_analisar)
+
+    response = client.post(
+        "/api/process/start", files=[("files", ("nota.pdf", conteudo, "application/pdf"))]
+    )
+
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+    prazo = time.monotonic() + 5
+    while webapp_module._get_job(job_id)["status"] not in {"completed", "failed"}:
+        assert time.monotonic() < prazo
+        time.sleep(0.01)
+    assert buscados == [[{"Ticker": "VALE3", "Quantidade": len(conteudo)}]]
+    assert sessao.extraidos == [("nota.pdf", None)]
+    assert webapp_module._UPLOAD_PREFETCHES == {}
+
+
+def test_synchronous_process_does_not_extract_during_upload(client, monkeypatch):
+    """/api/process não passa pela admissão de jobs e por isso não usa a extração antecipada."""
+    monkeypatch.setattr(webapp_module.config, "get_web_upload_prefetch_workers", lambda: 1)
+    monkeypatch.setattr(
+        webapp_module, "_new_upload_prefetch", lambda: pytest.fail("extração antecipada criada")
+    )
+    monkeypatch.setattr(
+        webapp_module,
+        "analisar_pasta_ou_zip",
+        lambda caminho, **_opcoes: pd.DataFrame({"Data": ["13/05/2026"], "Ticker": ["VALE3"]}),
+    )
+
+    response = client.post(
+        "/api/process", files=[("files", ("nota.pdf", b"%PDF", "application/pdf"))]
+    )
+
+    assert response.status_code == 200
+
+
+def test_prefetch_is_dropped_when_fields_arrive_after_the_files(monkeypatch, tmp_path):
+    """Um ticker enviado depois dos arquivos invalida o que foi extraído sem ele."""
+    sessao = _FakePrefetchSession()
+    monkeypatch.setattr(webapp_module, "sessao_padrao", lambda: sessao)
+    executor = webapp_module.ThreadPoolExecutor(max_workers=1)
+    prefetch = webapp_module._UploadPrefetch(executor, cache=None)
+    uploads = webapp_module._StreamedUploads(
+        "multipart/form-data; boundary=ordem", tmp_path, on_file=prefetch.add
+    )
+
+    uploads.feed(
+        _multipart_body("ordem", [("ticker", "VALE3")], [("nota.pdf", b"%PDF")], fields_first=False)
+    )
+    uploads.finish()
+    webapp_module._register_upload_prefetch(
+        tmp_path, prefetch, webapp_module._processing_options(uploads.fields)
+    )
+
+    assert str(tmp_path) not in webapp_module._UPLOAD_PREFETCHES
+    assert prefetch.buscar("qualquer") is None
+    executor.shutdown()
+
+
+def test_request_over_content_length_limit_is_rejected_before_reading(client, monkeypatch):
+    """Com Content-Length acima de web.max_request_mb, a resposta 413 sai antes do corpo ser lido."""
+    monkeypatch.setattr(webapp_module.config, "get_web_max_request_mb", lambda: 1 / 1024)
+
+    response = client.post(
+        "/api/process", files=[("files", ("nota.pdf", b"%PDF" * 1024, "application/pdf"))]
+    )
+
+    assert response.status_code == 413
+
+
+def test_resumable_upload_session_becomes_a_job(client, blocked_executor, monkeypatch, tmp_path):
+    """
+    Fluxo completo do upload retomável: cria a sessão, envia blocos fora de ordem,
+    consulta os intervalos recebidos e finaliza em um job com o manifesto do arquivo.
+    """
+    make, _ = blocked_executor
+    make(max_concurrent=1, max_queued=2, max_per_client=5)
+    monkeypatch.setattr(
+        webapp_module,
+        "_UPLOAD_SESSIONS",
+        webapp_module.UploadSessionStore(str(tmp_path / "sessoes"), max_chunk_bytes=1024, ttl_seconds=3600),
+    )
+    conteudo = b"PK" + b"z" * 1998
+    criada = client.post(
+        "/api/uploads",
+        data={"filename": "historico.zip", "size": str(len(conteudo)),
+              "sha256": hashlib.sha256(conteudo).hexdigest()},
+    )
+    assert criada.status_code == 201
+    upload_id = criada.json()["upload_id"]
+    assert criada.json()["chunk_max_bytes"] == 1024
+
+    segundo = conteudo[1000:]
+    resposta = client.put(
+        f"/api/uploads/{upload_id}?offset=1000",
+        content=segundo,
+        headers={"X-Chunk-SHA256": hashlib.sha256(segundo).hexdigest()},
+    )
+    assert resposta.json()["received"] == [[1000, 2000]]
+    # Finalizar antes de receber tudo é recusado e a sessão continua aberta
+    assert client.post(f"/api/uploads/{upload_id}/finalize").status_code == 409
+    assert client.put(f"/api/uploads/{upload_id}?offset=0", content=b"x" * 1025).status_code == 413
+    client.put(f"/api/uploads/{upload_id}?offset=0", content=conteudo[:1000])
+    assert client.get(f"/api/uploads/{upload_id}").json()["complete"] is True
+
+    finalizado = client.post(f"/api/uploads/{upload_id}/finalize", data={"ticker": "VALE3"})
+
+    assert finalizado.status_code == 200
+    job = webapp_module._get_job(finalizado.json()["job_id"])
+    assert job["request"]["ticker"] == "VALE3"
+    assert job["request"]["uploads"][0]["sha256"] == hashlib.sha256(conteudo).hexdigest()
+    assert (Path(job["request"]["temp_path"]) / "historico.zip").read_bytes() == conteudo
+    assert client.get(f"/api/uploads/{upload_id}").status_code == 404
+
+
+def test_finalize_refused_after_admission_keeps_the_upload(client, monkeypatch, tmp_path):
+    """Se a fila lota entre a admissão e o início do job, o arquivo volta para a sessão."""
+    monkeypatch.setattr(
+        webapp_module,
+        "_UPLOAD_SESSIONS",
+        webapp_module.UploadSessionStore(str(tmp_path / "sessoes"), max_chunk_bytes=1024, ttl_seconds=3600),
+    )
+    monkeypatch.setattr(webapp_module._JOB_EXECUTOR, "verificar_admissao", lambda client: None)
+
+    def fila_lotada(request, client=None):
+        raise HTTPException(status_code=429, detail="Fila cheia.")
+
+    monkeypatch.setattr(webapp_module, "_start_processing_job", fila_lotada)
+    conteudo = b"PK" + b"z" * 98
+    upload_id = client.post(
+        "/api/uploads", data={"filename": "historico.zip", "size": str(len(conteudo))}
+    ).json()["upload_id"]
+    client.put(f"/api/uploads/{upload_id}?offset=0", content=conteudo)
+
+    assert client.post(f"/api/uploads/{upload_id}/finalize").status_code == 429
+
+    sessao = client.get(f"/api/uploads/{upload_id}").json()
+    assert sessao["complete"] is True
+    destino = tmp_path / "retomado"
+    manifesto = webapp_module._UPLOAD_SESSIONS.finalizar(upload_id, destino)
+    assert manifesto["sha256"] == hashlib.sha256(conteudo).hexdigest()
+    assert (destino / "historico.zip").read_bytes() == conteudo
+
+
+def test_upload_session_over_file_limit_is_refused(client, monkeypatch):
+    monkeypatch.setattr(webapp_module.config, "get_web_max_upload_mb", lambda: 1)
+
+    response = client.post("/api/uploads", data={"filename": "enorme.zip", "size": str(2 * 1024 * 1024)})
+
+    assert response.status_code == 413
+
+
+def test_identical_upload_reuses_previous_result(client, tmp_path, monkeypatch):
+    """
+    Um upload com os mesmos arquivos (pelos hashes) e parâmetros devolve o
+    resultado anterior sem reprocessar, enquanto o arquivo exportado existir.
+    """
+    analyses = []
+
+    def fake_analisar(caminho, year_filter=None, sort_by="name", record_cache=None, **_opcoes):
+        analyses.append(record_cache)
+        return pd.DataFrame({"Data": ["13/05/2026"], "Ticker": ["VALE3"]})
+
+    monkeypatch.setattr(webapp_module, "analisar_pasta_ou_zip", fake_analisar)
+    manifest = [{"filename": "nota.pdf", "size": 4, "sha256": hashlib.sha256(b"%PDF").hexdigest()}]
+
+    def run(job_id):
+        uploads = tmp_path / f"uploads_{job_id}"
+        uploads.mkdir()
+        webapp_module._JOB_STORE.criar({"job_id": job_id, "status": "queued", "cancel_requested": False})
+        webapp_module._run_processing_job(
+            job_id, uploads, None, None, "name", "csv", 1, False, None, manifest
+        )
+        return client.get(f"/api/process/status/{job_id}").json()
+
+    first = run("primeiro")
+    second = run("segundo")
+
+    assert len(analyses) == 1
+    assert analyses[0] is webapp_module._RESULT_CACHE
+    assert first["cache_hit_ratio"] is None
+    assert second["status"] == "completed"
+    assert second["cache_hit_ratio"] == 1.0
+    assert second["result"]["cache"]["result_reused"] is True
+    assert second["result"]["filename"] == first["result"]["filename"]
+
+    # Sem o arquivo exportado, o upload volta a ser processado
+    assert first["result"]["download_url"].startswith("/api/download/jobs/primeiro/")
+    (tmp_path / "jobs" / "primeiro" / first["result"]["filename"]).unlink()
+    assert run("terceiro")["result"]["cache"] is None
+    assert len(analyses) == 2
+
+
+def test_each_request_exports_to_its_own_folder_and_download_rejects_traversal(client):
+    """Cada processamento exporta na própria pasta; o download não sai da pasta de saída."""
+    urls = [
+        client.post("/api/process", files={"files": ("nota.pdf", content, "application/pdf")}).json()[
+            "download_url"
+        ]
+        for content in (b"primeira nota", b"segunda nota")
+    ]
+
+    assert urls[0] != urls[1]
+    assert all(client.get(url).status_code == 200 for url in urls)
+    assert client.get("/api/download/..%2F..%2Fetc%2Fpasswd").status_code in (400, 404)
+
+
+def test_janitor_evicts_expired_jobs_with_outputs_and_kept_uploads(client, tmp_path, monkeypatch):
+    """
+    Jobs finalizados além de web.job_ttl_hours saem do store junto com a pasta de
+    saída e os uploads guardados; jobs ativos e pastas recentes permanecem.
+    """
+    monkeypatch.setattr(webapp_module.config, "get_web_job_ttl_hours", lambda: 1)
+    kept_uploads = tmp_path / "uploads_resumable"
+    kept_uploads.mkdir()
+    store = webapp_module._JOB_STORE
+    store.criar({"job_id": "antigo", "status": "cancelled", "request": {"temp_path": str(kept_uploads)}})
+    store.criar({"job_id": "rodando", "status": "running", "request": {}})
+    store.criar({"job_id": "recente", "status": "completed", "request": {}})
+    for job_id in ("antigo", "rodando", "recente", "sem_job"):
+        webapp_module._job_output_dir(job_id).mkdir(parents=True)
+    two_hours_ago = time.time() - 7200
+    with closing(store._conectar()) as conn:
+        conn.execute(
+            "UPDATE jobs SET atualizado_em = ? WHERE job_id IN ('antigo', 'rodando')", (two_hours_ago,)
+        )
+    for job_id in ("antigo", "rodando", "sem_job"):
+        os.utime(webapp_module._job_output_dir(job_id), (two_hours_ago, two_hours_ago))
+
+    assert webapp_module._limpar_jobs_expirados() == {"jobs": 1, "output_dirs": 2}
+
+    assert store.obter("antigo") is None
+    assert not kept_uploads.exists()
+    assert {job["job_id"] for job in store.listar()} == {"rodando", "recente"}
+    assert sorted(path.name for path in (tmp_path / "jobs").iterdir()) == ["recente", "rodando"]
+
+
+def test_janitor_keeps_output_folder_of_a_reused_result(client, tmp_path, monkeypatch):
+    """A pasta do job original fica enquanto um job que reaproveitou o resultado ainda existe."""
+    monkeypatch.setattr(webapp_module.config, "get_web_job_ttl_hours", lambda: 1)
+    monkeypatch.setattr(
+        webapp_module,
+        "analisar_pasta_ou_zip",
+        lambda caminho, **_opcoes: pd.DataFrame({"Data": ["13/05/2026"], "Ticker": ["VALE3"]}),
+    )
+    manifest = [{"filename": "nota.pdf", "size": 4, "sha256": hashlib.sha256(b"%PDF").hexdigest()}]
+    store = webapp_module._JOB_STORE
+    for job_id in ("original", "reaproveitado"):
+        uploads = tmp_path / f"uploads_{job_id}"
+        uploads.mkdir()
+        store.criar({"job_id": job_id, "status": "queued", "cancel_requested": False})
+        webapp_module._run_processing_job(
+            job_id, uploads, None, None, "name", "csv", 1, False, None, manifest
+        )
+    two_hours_ago = time.time() - 7200
+    with closing(store._conectar()) as conn:
+        conn.execute("UPDATE jobs SET atualizado_em = ? WHERE job_id = 'original'", (two_hours_ago,))
+    os.utime(webapp_module._job_output_dir("original"), (two_hours_ago, two_hours_ago))
+
+    assert webapp_module._limpar_jobs_expirados() == {"jobs": 1, "output_dirs": 0}
+
+    reaproveitado = client.get("/api/process/status/reaproveitado").json()
+    assert reaproveitado["result"]["download_url"].startswith("/api/download/jobs/original/")
+    assert client.get(reaproveitado["result"]["download_url"]).status_code == 200
+    assert client.get("/api/results/reaproveitado").status_code == 200
+
+    # Expirado também o job que reaproveitou, a pasta original sai na limpeza seguinte
+    with closing(store._conectar()) as conn:
+        conn.execute("UPDATE jobs SET atualizado_em = ?", (two_hours_ago,))
+    os.utime(webapp_module._job_output_dir("original"), (two_hours_ago, two_hours_ago))
+    assert webapp_module._limpar_jobs_expirados() == {"jobs": 1, "output_dirs": 1}
+    assert not webapp_module._job_output_dir("original").exists()
+
+
+def _run_job_with_records(monkeypatch, tmp_path, job_id):
+    """Roda um job até o fim com 30 operações (datas de 30/05 a 01/05/2026) e três tickers."""
+
+    def fake_analisar(caminho, year_filter=None, sort_by="name", **_opcoes):
+        return pd.DataFrame(
+            {
+                "Data": [f"{dia:02d}/05/2026" for dia in range(30, 0, -1)],
+                "Ticker": ["VALE3", "PSSA3", "ITSA4"] * 10,
+                "Quantidade": list(range(30)),
+            }
+        )
+
+    monkeypatch.setattr(webapp_module, "analisar_pasta_ou_zip", fake_analisar)
+    uploads = tmp_path / f"uploads_{job_id}"
+    uploads.mkdir()
+    webapp_module._JOB_STORE.criar({"job_id": job_id, "status": "queued", "cancel_requested": False})
+    webapp_module._run_processing_job(job_id, uploads, None, None, "name", "csv", 1, False)
+
+
+def test_results_endpoint_pages_filters_and_sorts_completed_job(client, tmp_path, monkeypatch):
+    """O resultado completo do job é consultado em páginas, com filtros e ordenação."""
+    _run_job_with_records(monkeypatch, tmp_path, "consulta")
+
+    status = client.get("/api/process/status/consulta").json()
+    assert status["result"]["results_url"] == "/api/results/consulta"
+    assert status["result"]["preview_rows"][0]["Data"] == "01/05/2026"
+
+    page = client.get("/api/results/consulta", params={"offset": 10, "limit": 5}).json()
+    assert page["total"] == 30
+    assert [row["Data"] for row in page["rows"]] == [f"{dia:02d}/05/2026" for dia in range(11, 16)]
+
+    filtered = client.get(
+        "/api/results/consulta",
+        params={"ticker": "VALE3", "date_from": "01/05/2026", "date_to": "10/05/2026", "sort": "Quantidade",
+                "order": "desc"},
+    ).json()
+    assert [row["Quantidade"] for row in filtered["rows"]] == [27, 24, 21]
+
+    assert client.get("/api/results/consulta", params={"sort": "Inexistente"}).status_code == 400
+    assert client.get("/api/results/consulta", params={"limit": 5000}).status_code == 400
+    assert client.get("/api/results/nao-existe").status_code == 404
+
+    webapp_module._JOB_STORE.criar({"job_id": "rodando", "status": "running"})
+    assert client.get("/api/results/rodando").status_code == 409
+
+
+def test_download_is_compressed_on_request_and_supports_range(client):
+    """O download comprimido é servido de uma cópia .gz estável, que também aceita Range."""
+    url = client.post("/api/process", files={"files": ("nota.pdf", b"dummy pdf", "application/pdf")}).json()[
+        "download_url"
+    ]
+    original = client.get(url, headers={"Accept-Encoding": "identity"})
+
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.content == original.content
+    assert "content-encoding" not in original.headers
+
+    partial = client.get(url, headers={"Accept-Encoding": "identity", "Range": "bytes=5-9"})
+    assert partial.status_code == 206
+    assert partial.content == original.content[5:10]
+    assert partial.headers["content-range"] == f"bytes 5-9/{len(original.content)}"
+
+    raw = client.get(url, headers={"Accept-Encoding": "gzip", "Range": "bytes=0-1"})
+    assert raw.status_code == 206
+    assert raw.headers["content-encoding"] == "gzip"
+
+
+def test_streaming_export_generates_csv_and_ndjson_from_stored_result(client, tmp_path, monkeypatch):
+    """A exportação em fluxo sai do resultado guardado, sem gravar arquivos na pasta de saída."""
+    _run_job_with_records(monkeypatch, tmp_path, "fluxo")
+    files_before = sorted(path.name for path in (tmp_path / "jobs" / "fluxo").iterdir())
+
+    csv_response = client.get(
+        "/api/results/fluxo/export", params={"ticker": "VALE3"}, headers={"Accept-Encoding": "identity"}
+    )
+    assert csv_response.status_code == 200
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    assert 'filename="dados_extraidos_fluxo.csv"' in csv_response.headers["content-disposition"]
+    lines = csv_response.content.decode("utf-8-sig").splitlines()
+    assert lines[0] == "Data,Ticker,Quantidade"
+    assert lines[1:3] == ["03/05/2026,VALE3,27", "06/05/2026,VALE3,24"]
+    assert len(lines) == 11
+
+    ndjson_response = client.get(
+        "/api/results/fluxo/export", params={"format": "ndjson"}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert ndjson_response.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in ndjson_response.text.splitlines()]
+    assert len(rows) == 30
+    assert rows[0] == {"Data": "01/05/2026", "Ticker": "ITSA4", "Quantidade": 29}
+
+    assert sorted(path.name for path in (tmp_path / "jobs" / "fluxo").iterdir()) == files_before
+    assert client.get("/api/results/fluxo/export", params={"format": "xlsx"}).status_code == 400
+    assert client.get("/api/results/fluxo/export", params={"date_from": "2026/05/01"}).status_code == 400
+
+
+def test_index_page_is_precompressed_and_revalidated_with_etag(client):
+    """A página inicial sai comprimida com ETag, e a revalidação com If-None-Match responde 304."""
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == webapp_module.HTML_PAGE
+
+    revalidated = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+
+def test_finished_job_status_is_serialized_once_until_it_changes(client, tmp_path, monkeypatch):
+    """O status de um job finalizado é serializado uma vez; volta a ser gerado se o job mudar."""
+    _run_job_with_records(monkeypatch, tmp_path, "cacheado")
+    payloads = []
+    original = webapp_module._job_status_payload
+
+    def counting_payload(job_id, job):
+        payloads.append(job_id)
+        return original(job_id, job)
+
+    monkeypatch.setattr(webapp_module, "_job_status_payload", counting_payload)
+
+    first = client.get("/api/process/status/cacheado")
+    second = client.get("/api/process/status/cacheado", headers={"If-None-Match": first.headers["etag"]})
+    assert first.json()["status"] == "completed"
+    assert second.status_code == 304
+    assert payloads == ["cacheado"]
+
+    results = client.get("/api/results/cacheado", params={"limit": 5})
+    assert client.get("/api/results/cacheado", params={"limit": 5}).headers["etag"] == results.headers["etag"]
+
+    webapp_module._update_job("cacheado", status="cancelled", checkpoint_execution_id="exec")
+    assert client.get("/api/process/status/cacheado").json()["resumable"] is True
+    assert payloads == ["cacheado", "cacheado"]
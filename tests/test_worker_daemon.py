@@ -0,0 +1,126 @@
+"""
+Testes para o daemon de extração (--serve) e o cliente submit
+"""
+
+import io
+import json
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import extratorNotasCorretagem as extrator_module
+from extratorNotasCorretagem import ExtractorSession
+from worker_daemon import _Atendente, _validar_job, criar_servidor, enviar_job
+
+
+def _fake_processar_pdf(pdf_file, metrics_collector=None, **_opcoes):
+    nome = Path(str(pdf_file)).name
+    if metrics_collector is not None:
+        metrics_collector.append({"file_name": nome, "status": "success", "page_count": 1})
+    ticker = "VALE3" if "vale" in nome else "PETR4"
+    return [{"Data": "05/01/2024", "Ticker": ticker, "Operação": "C", "Quantidade": "1", "Preço": "1.00"}]
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    stats = tmp_path / "stats"
+    saida = tmp_path / "saida"
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    for nome in ("nota_vale.pdf", "nota_petro.pdf"):
+        (pasta / nome).write_bytes(b"%PDF")
+    monkeypatch.setattr(extrator_module, "stats_folder", str(stats))
+    monkeypatch.setitem(extrator_module.config.configs, "output.folder", str(saida))
+    monkeypatch.setattr(ExtractorSession, "processar_pdf", staticmethod(_fake_processar_pdf))
+    return pasta, saida
+
+
+@pytest.fixture
+def caminho_socket():
+    # Caminhos de socket Unix têm limite de ~100 caracteres: evita o tmp_path do pytest
+    pasta = tempfile.mkdtemp(prefix="extr", dir="/tmp")
+    yield str(Path(pasta) / "d.sock")
+    shutil.rmtree(pasta, ignore_errors=True)
+
+
+@pytest.mark.parametrize(
+    "job, mensagem",
+    [({"year": 2024}, "path"), ({"path": "x", "outro": 1}, "outro"), ({"path": "x", "year": "abc"}, "ano")],
+)
+def test_invalid_jobs_are_rejected(job, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        _validar_job(job)
+
+
+def test_stdin_mode_streams_progress_records_and_result(ambiente):
+    pasta, saida = ambiente
+    entrada = io.StringIO(
+        json.dumps({"id": "j1", "path": str(pasta), "ticker": "VALE3", "format": "csv", "records": True})
+        + "\nisto não é json\n"
+    )
+    resposta = io.StringIO()
+
+    _Atendente(ExtractorSession(), threading.Lock(), resposta).atender(entrada)
+
+    eventos = [json.loads(linha) for linha in resposta.getvalue().splitlines()]
+    tipos = [e["event"] for e in eventos]
+    assert tipos[0] == "accepted" and "progress" in tipos
+    assert [e["data"]["Ticker"] for e in eventos if e["event"] == "record"] == ["VALE3"]
+    resultado = next(e for e in eventos if e["event"] == "result")
+    assert resultado["id"] == "j1"
+    assert resultado["records_extracted"] == 1
+    assert [Path(p).parent for p in resultado["output_files"]] == [saida]
+    assert eventos[-1]["event"] == "error"
+
+
+def test_socket_daemon_reuses_session_between_jobs(ambiente, caminho_socket):
+    pasta, _ = ambiente
+    sessao = ExtractorSession()
+    servidor = criar_servidor(caminho_socket, sessao)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(OSError, match="daemon ativo"):
+            criar_servidor(caminho_socket, sessao)
+
+        eventos = []
+        primeiro = enviar_job({"path": str(pasta), "format": "json"}, caminho_socket, eventos.append, fallback=False)
+        compilado = sessao.ticker_mapping
+        segundo = enviar_job({"path": str(pasta), "year": 2024}, caminho_socket, fallback=False)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    assert primeiro["event"] == segundo["event"] == "result"
+    assert primeiro["records_extracted"] == 2
+    assert primeiro["output_files"][0].endswith(".json")
+    assert {"accepted", "progress", "result"} <= {e["event"] for e in eventos}
+    assert sessao.ticker_mapping is compilado  # mapeamento compilado uma vez para os dois jobs
+
+
+def test_client_falls_back_to_in_process_execution(ambiente, caminho_socket, monkeypatch):
+    pasta, _ = ambiente
+    monkeypatch.setattr(extrator_module, "inicializar", lambda *a, **k: None)
+
+    with pytest.raises(ConnectionError):
+        enviar_job({"path": str(pasta)}, caminho_socket, fallback=False)
+    resultado = enviar_job({"path": str(pasta), "format": "csv"}, caminho_socket)
+
+    assert resultado["event"] == "result"
+    assert resultado["records_extracted"] == 2
+
+
+def test_orphan_socket_is_replaced(ambiente, caminho_socket):
+    orfao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    orfao.bind(caminho_socket)
+    orfao.close()  # arquivo do socket fica no disco sem ninguém escutando
+
+    servidor = criar_servidor(caminho_socket, ExtractorSession())
+    servidor.server_close()